@@ -22,6 +22,24 @@ SERVICES = [
         "routes": ["/transactions"],
         "plugins": ["rate-limiting"],
     },
+    {
+        "name": "reconciliation",
+        "url": "http://reconciliation:8005",
+        "routes": ["/reconciliations"],
+        "plugins": ["rate-limiting"],
+    },
+    {
+        "name": "audit",
+        "url": "http://audit:8006",
+        "routes": ["/audit"],
+        "plugins": ["rate-limiting"],
+    },
+    {
+        "name": "cards",
+        "url": "http://cards:8007",
+        "routes": ["/cards"],
+        "plugins": ["rate-limiting"],
+    },
 ]
 
 
@@ -22,14 +22,26 @@ from app.schemas.account import (
     PinPayload,
 )
 from app.db.db import get_db
+from app.db.replica import get_read_db, mark_primary_write
 from app.core.auth import get_current_user
 from app.core.rate_limiter import rate_limit_dependency
 from app.core.events import publish_event
 from app.core.deps import require_superuser
 from app.core.security import generate_account_number, hash_pin, verify_pin
+from app.core.serialization import (
+    RawJSONResponse,
+    columns_for,
+    dumps_row,
+    dumps_rows,
+)
 
 router = APIRouter(prefix="/accounts", tags=["accounts"])
 
+# Read endpoints select only the AccountOut columns and encode the rows
+# directly, skipping ORM hydration and a second pass through Pydantic.
+ACCOUNT_OUT_FIELDS = tuple(AccountOut.model_fields)
+ACCOUNT_OUT_COLUMNS = columns_for(Account, AccountOut)
+
 
 def rate_limit_dep(request: Request, limit: int = 20, period: int = 60):
     return rate_limit_dependency(request, limit, period)
@@ -55,6 +67,7 @@ async def create_account(
     db.add(account)
     await db.commit()
     await db.refresh(account)
+    await mark_primary_write(user, account.owner_user_id)
 
     await publish_event(
         "account.created",
@@ -64,6 +77,8 @@ async def create_account(
             "currency": account.currency,
             "account_number": account.account_number,
         },
+        actor=user["sub"],
+        account=account,
     )
 
     return account
@@ -74,11 +89,11 @@ async def list_accounts(
     owner_user_id: Optional[str] = None,
     currency: Optional[str] = None,
     is_active: Optional[bool] = None,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     user=Depends(get_current_user),
     _rl=Depends(rate_limit_dep),
 ):
-    query = select(Account)
+    query = select(*ACCOUNT_OUT_COLUMNS)
 
     if not user.get("is_superuser"):
         query = query.where(Account.owner_user_id == user.get("sub"))
@@ -91,41 +106,52 @@ async def list_accounts(
         query = query.where(Account.is_active == is_active)
 
     result = await db.execute(query)
-    return result.scalars().all()
+    return RawJSONResponse(dumps_rows(ACCOUNT_OUT_FIELDS, result.all()))
 
 
 @router.get("/{external_id}", response_model=AccountOut)
 async def get_account(
     external_id: str,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     user=Depends(get_current_user),
     _rl=Depends(rate_limit_dep),
 ):
-    q = await db.execute(select(Account).where(Account.external_id == external_id))
-    account = q.scalars().first()
-    if not account:
+    q = await db.execute(
+        select(*ACCOUNT_OUT_COLUMNS).where(Account.external_id == external_id)
+    )
+    row = q.first()
+    if not row:
         raise HTTPException(404, "Account not found")
 
-    if user.get("sub") != account.owner_user_id and not user.get("is_superuser"):
+    if user.get("sub") != row.owner_user_id and not user.get("is_superuser"):
         raise HTTPException(403, "Forbidden")
-    return account
+    return RawJSONResponse(dumps_row(ACCOUNT_OUT_FIELDS, row))
 
 
 @router.get("/{external_id}/balance", response_model=BalanceOut)
 async def get_balance(
     external_id: str,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     user=Depends(get_current_user),
     _rl=Depends(rate_limit_dep),
 ):
-    q = await db.execute(select(Account).where(Account.external_id == external_id))
-    account = q.scalars().first()
+    q = await db.execute(
+        select(
+            Account.external_id,
+            Account.account_number,
+            Account.balance,
+            Account.currency,
+            Account.owner_user_id,
+        ).where(Account.external_id == external_id)
+    )
+    account = q.first()
     if not account:
         raise HTTPException(404, "Account not found")
     if user.get("sub") != account.owner_user_id and not user.get("is_superuser"):
         raise HTTPException(403, "Forbidden")
     return BalanceOut(
         external_id=account.external_id,
+        account_number=account.account_number,
         balance=account.balance,
         currency=account.currency,
     )
@@ -146,10 +172,13 @@ async def patch_status(
     account.is_frozen = is_frozen
     await db.commit()
     await db.refresh(account)
+    await mark_primary_write(user, account.owner_user_id)
 
     await publish_event(
         "account.status_changed",
         {"external_id": account.external_id, "is_frozen": account.is_frozen},
+        actor=user["sub"],
+        account=account,
     )
     return account
 
@@ -174,10 +203,13 @@ async def update_account(
 
     await db.commit()
     await db.refresh(account)
+    await mark_primary_write(user, account.owner_user_id)
 
     await publish_event(
         "account.updated",
         {"external_id": account.external_id, **payload.dict(exclude_unset=True)},
+        actor=user["sub"],
+        account=account,
     )
     return account
 
@@ -197,10 +229,13 @@ async def set_account_active_status(
     account.is_active = is_active
     await db.commit()
     await db.refresh(account)
+    await mark_primary_write(user, account.owner_user_id)
 
     await publish_event(
         "account.active_status_changed",
         {"external_id": account.external_id, "is_active": is_active},
+        actor=user["sub"],
+        account=account,
     )
     return account
 
@@ -226,10 +261,13 @@ async def create_account_pin(
     account.hashed_pin = hash_pin(payload.new_pin)
     await db.commit()
     await db.refresh(account)
+    await mark_primary_write(user, account.owner_user_id)
 
     await publish_event(
         "account.pin_created",
         {"external_id": account.external_id, "owner_user_id": account.owner_user_id},
+        actor=user["sub"],
+        account=account,
     )
 
     return account
@@ -259,10 +297,13 @@ async def set_account_pin(
     account.hashed_pin = hash_pin(payload.new_pin)
     await db.commit()
     await db.refresh(account)
+    await mark_primary_write(user, account.owner_user_id)
 
     await publish_event(
         "account.pin_set",
         {"external_id": account.external_id, "owner_user_id": account.owner_user_id},
+        actor=user["sub"],
+        account=account,
     )
 
     return account
@@ -2,6 +2,7 @@ from fastapi import Depends, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError
 from app.core.jwks import verify_jwt
+from app.core.revocations import revoked_tokens
 
 bearer_scheme = HTTPBearer(auto_error=False)
 
@@ -17,6 +18,8 @@ async def get_current_user(
         payload = verify_jwt(token)
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
+    if revoked_tokens.is_revoked(token):
+        raise HTTPException(status_code=401, detail="Token has been revoked")
 
     return {
         "sub": payload.get("sub"),
@@ -11,13 +11,42 @@ class Settings(BaseSettings):
     DATABASE_URL: str
     DATABASE_URL_SYNC: str
 
+    # Connection pool (per process; size against Postgres max_connections
+    # divided by the number of replicas)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 100
+
+    # Optional read replica for GET endpoints
+    DATABASE_REPLICA_URL: str | None = None
+    REPLICA_MAX_LAG_SECONDS: float = 5
+    REPLICA_LAG_CHECK_INTERVAL: float = 2
+    READ_YOUR_WRITES_SECONDS: int = 10
+
     # Redis
     REDIS_URL: str | None = None
 
+    # Broker for account events; unset, events are only logged
+    RABBITMQ_URL: str | None = None
+    ACCOUNT_EVENTS_EXCHANGE: str = Field("account_events")
+    AUDIT_QUEUE: str = Field("audit_queue")
+
     # JWT / Auth (accounts verifies tokens, doesn’t issue them)
     AUTH_JWKS_URL: str
     JWT_ALGORITHM: str = Field("RS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # The auth service's redis, where it publishes revoked tokens; unset,
+    # revoked tokens are accepted here until they expire.
+    REVOCATION_REDIS_URL: str | None = None
+    REVOCATION_CHANNEL: str = Field("token_revocations")
+    # Service tokens (app.core.service_auth): the auth service's RS256 keys
+    # for them; unset, no service token is accepted.
+    SERVICE_JWKS_URL: str | None = None
+    SERVICE_TOKEN_AUDIENCE: str = Field("accounts")
+    SERVICE_TOKEN_CACHE_SIZE: int = 10_000
 
     # Logging
     LOG_FILE: str = Field("/app/logs/accounts.log")
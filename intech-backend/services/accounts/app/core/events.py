@@ -1,12 +1,86 @@
+import uuid
+from datetime import datetime, timezone
+
+import orjson
+from aio_pika import DeliveryMode, ExchangeType, Message, connect_robust
+
+from app.core.config import settings
 from app.core.logger import logging
 
 logger = logging.getLogger(__name__)
 
+_connection = None
+_channel = None
+_exchange = None
+
+
+async def _get_exchange():
+    """
+    Account events go to a fanout exchange: the audit queue is bound to it
+    here, and services keeping a copy of account state (cards) bind their
+    own queues.
+    """
+    global _connection, _channel, _exchange
+    if _channel and not _channel.is_closed:
+        return _exchange
+    _connection = await connect_robust(settings.RABBITMQ_URL)
+    _channel = await _connection.channel()
+    _exchange = await _channel.declare_exchange(
+        settings.ACCOUNT_EVENTS_EXCHANGE, ExchangeType.FANOUT, durable=True
+    )
+    queue = await _channel.declare_queue(settings.AUDIT_QUEUE, durable=True)
+    await queue.bind(_exchange)
+    return _exchange
+
+
+def account_state(account) -> dict:
+    """
+    The account as of this event. Consumers keep the newest state they
+    have seen by updated_at, so events may arrive late or twice.
+    """
+    return {
+        "external_id": account.external_id,
+        "owner_user_id": account.owner_user_id,
+        "currency": account.currency,
+        "balance": str(account.balance),
+        "is_frozen": account.is_frozen,
+        "is_active": account.is_active,
+        "updated_at": account.updated_at.isoformat() if account.updated_at else None,
+    }
+
 
-async def publish_event(event_type: str, payload: dict):
+async def publish_event(
+    event_type: str, payload: dict, actor: str | None = None, account=None
+):
     """
-    Stub for publishing events to your message broker.
-    Replace with Kafka / RabbitMQ / Redis Stream producer.
+    Publish an account event to the account events exchange. Without
+    RABBITMQ_URL (local runs, tests) the event is only logged. A failed
+    publish is logged rather than raised: the change it describes is
+    already committed.
     """
     logger.info("publish_event %s %s", event_type, payload)
-    # TODO: implement actual broker publish (async)
+    if not settings.RABBITMQ_URL:
+        return
+    event = {
+        "id": str(uuid.uuid4()),
+        "type": event_type,
+        "service": "accounts",
+        "actor": actor,
+        "resource_type": "account",
+        "resource_id": payload.get("external_id"),
+        "occurred_at": datetime.now(timezone.utc).isoformat(),
+        "data": payload,
+    }
+    if account is not None:
+        event["account"] = account_state(account)
+    try:
+        exchange = await _get_exchange()
+        await exchange.publish(
+            Message(
+                body=orjson.dumps(event, default=str),
+                delivery_mode=DeliveryMode.PERSISTENT,
+            ),
+            routing_key="",
+        )
+    except Exception as e:
+        logger.exception(f"Publishing {event_type} failed: {e}")
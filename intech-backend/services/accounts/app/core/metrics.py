@@ -0,0 +1,134 @@
+# app/core/metrics.py
+import time
+from typing import Dict, List
+
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# Upper bounds (seconds) of the checkout wait histogram buckets.
+CHECKOUT_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class PoolMetrics:
+    def __init__(self) -> None:
+        self.wait_buckets: List[int] = [0] * len(CHECKOUT_WAIT_BUCKETS)
+        self.wait_sum = 0.0
+        self.wait_count = 0
+        self.overflow_checkouts = 0
+        self.checkout_timeouts = 0
+
+    def observe_checkout_wait(self, seconds: float) -> None:
+        self.wait_sum += seconds
+        self.wait_count += 1
+        for i, bound in enumerate(CHECKOUT_WAIT_BUCKETS):
+            if seconds <= bound:
+                self.wait_buckets[i] += 1
+                break
+
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records checkout wait, overflow and timeouts."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            conn = super().connect()
+        except exc.TimeoutError:
+            self.metrics.checkout_timeouts += 1
+            raise
+        self.metrics.observe_checkout_wait(time.perf_counter() - start)
+        if self.checkedout() > self.size():
+            self.metrics.overflow_checkouts += 1
+        return conn
+
+
+_engines: Dict[str, AsyncEngine] = {}
+
+
+def register_engine(name: str, engine: AsyncEngine) -> None:
+    _engines[name] = engine
+
+
+def _metric(lines: List[str], name: str, kind: str, help_text: str) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+
+
+def render_pool_metrics() -> str:
+    """Render pool gauges and counters in the Prometheus text format."""
+    pools = [
+        (name, engine.sync_engine.pool)
+        for name, engine in _engines.items()
+        if isinstance(engine.sync_engine.pool, InstrumentedAsyncPool)
+    ]
+    lines: List[str] = []
+
+    gauges = (
+        ("db_pool_size", "Configured number of persistent connections", "size"),
+        ("db_pool_checked_out", "Connections currently in use", "checkedout"),
+        ("db_pool_checked_in", "Idle connections held by the pool", "checkedin"),
+        (
+            "db_pool_overflow",
+            "Current overflow (negative while below pool size)",
+            "overflow",
+        ),
+    )
+    for metric, help_text, attr in gauges:
+        _metric(lines, metric, "gauge", help_text)
+        for name, pool in pools:
+            lines.append(f'{metric}{{pool="{name}"}} {getattr(pool, attr)()}')
+
+    _metric(
+        lines,
+        "db_pool_overflow_checkouts_total",
+        "counter",
+        "Checkouts served by an overflow connection",
+    )
+    for name, pool in pools:
+        lines.append(
+            f'db_pool_overflow_checkouts_total{{pool="{name}"}} '
+            f"{pool.metrics.overflow_checkouts}"
+        )
+
+    _metric(
+        lines,
+        "db_pool_checkout_timeouts_total",
+        "counter",
+        "Checkouts that gave up after pool_timeout",
+    )
+    for name, pool in pools:
+        lines.append(
+            f'db_pool_checkout_timeouts_total{{pool="{name}"}} '
+            f"{pool.metrics.checkout_timeouts}"
+        )
+
+    _metric(
+        lines,
+        "db_pool_checkout_wait_seconds",
+        "histogram",
+        "Time spent waiting for a pooled connection",
+    )
+    for name, pool in pools:
+        m = pool.metrics
+        cumulative = 0
+        for bound, count in zip(CHECKOUT_WAIT_BUCKETS, m.wait_buckets):
+            cumulative += count
+            lines.append(
+                f'db_pool_checkout_wait_seconds_bucket{{pool="{name}",le="{bound}"}} '
+                f"{cumulative}"
+            )
+        lines.append(
+            f'db_pool_checkout_wait_seconds_bucket{{pool="{name}",le="+Inf"}} '
+            f"{m.wait_count}"
+        )
+        lines.append(f'db_pool_checkout_wait_seconds_sum{{pool="{name}"}} {m.wait_sum}')
+        lines.append(
+            f'db_pool_checkout_wait_seconds_count{{pool="{name}"}} {m.wait_count}'
+        )
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,116 @@
+"""
+Revoked access tokens, kept in memory.
+
+Tokens are verified here against the auth service's keys, without asking
+it anything, so a logged-out token would otherwise keep working until it
+expires. The auth service publishes "<sha256 of the token> <exp>" on
+REVOCATION_CHANNEL in its redis for every token it revokes, and records
+the same in the blacklist:index sorted set (hash scored by exp).
+
+RevocationListener subscribes to the channel and only then reads the
+sorted set, so nothing revoked while it was not listening is missed; it
+does the same after every reconnect. Checking a token is a hash and a dict
+lookup, with no network call. Entries are dropped once their token has
+expired, when it would be rejected anyway.
+"""
+
+import asyncio
+import hashlib
+import time
+from typing import Dict
+
+from redis.asyncio import Redis
+
+from app.core.logger import logging
+
+logger = logging.getLogger(__name__)
+
+INDEX_KEY = "blacklist:index"
+
+
+class RevokedTokens:
+    def __init__(self) -> None:
+        # Token hash -> the token's exp.
+        self._expiry: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._expiry)
+
+    def add(self, token_hash: str, exp: float) -> None:
+        self._expiry[token_hash] = exp
+
+    def is_revoked(self, token: str) -> bool:
+        if not self._expiry:
+            return False
+        return hashlib.sha256(token.encode()).hexdigest() in self._expiry
+
+    def purge(self, now: float) -> None:
+        self._expiry = {h: exp for h, exp in self._expiry.items() if exp > now}
+
+
+revoked_tokens = RevokedTokens()
+
+
+class RevocationListener:
+    def __init__(
+        self,
+        revoked: RevokedTokens,
+        url: str,
+        channel: str,
+        purge_interval: float = 60,
+        retry_delay: float = 1.0,
+    ) -> None:
+        self.revoked = revoked
+        self.url = url
+        self.channel = channel
+        self.purge_interval = purge_interval
+        self.retry_delay = retry_delay
+        self._task = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+
+    def handle(self, data: bytes) -> None:
+        try:
+            token_hash, exp = data.decode().split()
+            self.revoked.add(token_hash, float(exp))
+        except Exception as e:
+            logger.warning(f"Ignoring malformed revocation {data!r}: {e}")
+
+    async def _run(self) -> None:
+        while True:
+            redis = Redis.from_url(self.url)
+            try:
+                async with redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    now = time.time()
+                    for token_hash, exp in await redis.zrangebyscore(
+                        INDEX_KEY, now, "+inf", withscores=True
+                    ):
+                        self.revoked.add(token_hash.decode(), exp)
+                    logger.info(
+                        f"Listening for revocations; {len(self.revoked)} revoked"
+                    )
+                    purged_at = now
+                    while True:
+                        message = await pubsub.get_message(
+                            ignore_subscribe_messages=True,
+                            timeout=self.purge_interval,
+                        )
+                        if message is not None:
+                            self.handle(message["data"])
+                        now = time.time()
+                        if now - purged_at >= self.purge_interval:
+                            self.revoked.purge(now)
+                            purged_at = now
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Revocation listener failed; reconnecting: {e}")
+                await asyncio.sleep(self.retry_delay)
+            finally:
+                await redis.aclose()
@@ -1,9 +1,12 @@
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
 from app.core.config import settings
+from app.core.revocations import RevocationListener, revoked_tokens
+from app.core.service_auth import service_verifier
 from app.core.logger import configure_logging
 from app.core.redis import init_redis, _redis_client
 from app.api.v1 import accounts as accounts_router
+from app.api.v1 import metrics as metrics_router
 from app.db.db import engine, Base
 
 
@@ -14,12 +17,25 @@ async def lifespan(app: FastAPI):
     if settings.REDIS_URL:
         init_redis(settings.REDIS_URL)
 
+    revocations = None
+    if settings.REVOCATION_REDIS_URL:
+        revocations = RevocationListener(
+            revoked_tokens, settings.REVOCATION_REDIS_URL, settings.REVOCATION_CHANNEL
+        )
+        revocations.start()
+
+    if settings.SERVICE_JWKS_URL:
+        # So the first service call does not wait on the fetch.
+        await service_verifier.refresh_keys()
+
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
 
     try:
         yield
     finally:
+        if revocations is not None:
+            await revocations.close()
         try:
             if _redis_client:
                 await _redis_client.close()
@@ -31,3 +47,4 @@ app = FastAPI(title="Accounts service", lifespan=lifespan)
 
 
 app.include_router(accounts_router.router)
+app.include_router(metrics_router.router)
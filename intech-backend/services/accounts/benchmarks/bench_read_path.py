@@ -0,0 +1,112 @@
+"""
+Compare the ORM + Pydantic read path against column selection + orjson.
+
+    python -m benchmarks.bench_read_path --rows 500 --iterations 200
+
+Runs against an in-memory SQLite database so it needs no running services.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+import tracemalloc
+from decimal import Decimal
+from typing import List
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+os.environ.setdefault("DATABASE_URL_SYNC", "sqlite:///:memory:")
+os.environ.setdefault("AUTH_JWKS_URL", "http://localhost/.well-known/jwks.json")
+os.environ.setdefault("LOG_DIR", "/tmp/accounts-bench-logs")
+
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.db.db import Base
+from app.models.accounts import Account
+from app.schemas.account import AccountOut
+from app.core.serialization import columns_for, dumps_rows
+
+FIELDS = tuple(AccountOut.model_fields)
+COLUMNS = columns_for(Account, AccountOut)
+LIST_ADAPTER = TypeAdapter(List[AccountOut])
+
+
+async def orm_path(session) -> bytes:
+    result = await session.execute(select(Account))
+    accounts = result.scalars().all()
+    validated = LIST_ADAPTER.validate_python(accounts, from_attributes=True)
+    body = json.dumps(LIST_ADAPTER.dump_python(validated, mode="json"))
+    session.expunge_all()
+    return body.encode()
+
+
+async def row_path(session) -> bytes:
+    result = await session.execute(select(*COLUMNS))
+    return dumps_rows(FIELDS, result.all())
+
+
+async def measure(name, fn, maker, iterations):
+    async with maker() as session:
+        await fn(session)
+
+        cpu_start = time.process_time()
+        for _ in range(iterations):
+            async with maker() as session:
+                await fn(session)
+        cpu = (time.process_time() - cpu_start) / iterations
+
+        tracemalloc.start()
+        async with maker() as session:
+            await fn(session)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    print(
+        f"{name:<12} cpu/request={cpu * 1000:8.3f} ms  peak alloc={peak / 1024:9.1f} KiB"
+    )
+    return cpu, peak
+
+
+async def main(rows: int, iterations: int) -> None:
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    maker = async_sessionmaker(engine, expire_on_commit=False)
+
+    async with maker() as session:
+        session.add_all(
+            Account(
+                external_id=f"ACC-{i:08d}",
+                owner_user_id=f"user-{i % 50}",
+                account_number=f"627{i:07d}",
+                hashed_pin="",
+                currency="NGN",
+                balance=Decimal("1050.25"),
+            )
+            for i in range(rows)
+        )
+        await session.commit()
+
+    async with maker() as session:
+        assert json.loads(await orm_path(session)) == json.loads(
+            await row_path(session)
+        )
+
+    print(f"list response with {rows} rows, {iterations} iterations")
+    orm_cpu, orm_peak = await measure("orm+pydantic", orm_path, maker, iterations)
+    row_cpu, row_peak = await measure("rows+orjson", row_path, maker, iterations)
+    print(
+        f"speedup={orm_cpu / row_cpu:.2f}x  allocation ratio={orm_peak / row_peak:.2f}x"
+    )
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.iterations))
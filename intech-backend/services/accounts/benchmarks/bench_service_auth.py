@@ -0,0 +1,156 @@
+"""
+Cost of verifying a caller's token: user tokens today against service
+tokens.
+
+    python -m benchmarks.bench_service_auth --iterations 5000
+
+Measured, per token, in this process and without the network:
+
+- user token via verify_jwt: the path get_current_user takes today, with
+  the JWKS already cached (the key is still rebuilt from the JWK and
+  parsed on every call);
+- service token, first sight: ServiceTokenVerifier on a token it has not
+  seen, with its parsed key;
+- service token, cached: the same token again, as a caller sends it until
+  it expires;
+- rsa-2048 and ed25519 signature only: the bare checks, which is why
+  service tokens are RS256 and not EdDSA.
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+os.environ.setdefault("DATABASE_URL_SYNC", "sqlite:///:memory:")
+os.environ.setdefault("AUTH_JWKS_URL", "http://localhost/.well-known/jwks.json")
+os.environ.setdefault("LOG_DIR", "/tmp/accounts-bench-logs")
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+from jose import jwt
+from jose.utils import long_to_base64
+
+from app.core import jwks
+from app.core.service_auth import ServiceTokenVerifier
+
+
+def time_per_call(fn, iterations: int) -> float:
+    fn()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations
+
+
+def time_per_await(fn, iterations: int) -> float:
+    async def run() -> float:
+        await fn()
+        started = time.perf_counter()
+        for _ in range(iterations):
+            await fn()
+        return (time.perf_counter() - started) / iterations
+
+    return asyncio.run(run())
+
+
+def rsa_jwk(key, kid: str) -> dict:
+    numbers = key.public_key().public_numbers()
+    return {
+        "kty": "RSA",
+        "alg": "RS256",
+        "kid": kid,
+        "n": long_to_base64(numbers.n).decode(),
+        "e": long_to_base64(numbers.e).decode(),
+    }
+
+
+def main(iterations: int) -> None:
+    now = int(time.time())
+
+    user_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwks._jwks_cache["keys"] = [rsa_jwk(user_key, "auth-key-1")]
+    jwks._jwks_cache["fetched_at"] = now
+    # As the auth service signs them: no kid.
+    user_token = jwt.encode(
+        {
+            "sub": "0b9d7b8e-4c1a-4f4e-9a53-3f1f7f0e8a11",
+            "email": "user@example.com",
+            "is_superuser": False,
+            "iat": now,
+            "exp": now + 900,
+            "typ": "access",
+        },
+        user_key,
+        algorithm="RS256",
+    )
+
+    service_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    service_token = jwt.encode(
+        {
+            "sub": "cards",
+            "aud": "accounts",
+            "iat": now,
+            "exp": now + 300,
+            "typ": "service",
+        },
+        service_key,
+        algorithm="RS256",
+        headers={"kid": "service-key-1"},
+    )
+
+    async def fetch_keys():
+        return [rsa_jwk(service_key, "service-key-1")]
+
+    verifier = ServiceTokenVerifier("accounts", fetch_keys, 10_000)
+    asyncio.run(verifier.refresh_keys())
+
+    async def service_first_sight():
+        verifier._verified.clear()
+        await verifier.verify(service_token)
+
+    message = b"x" * 256
+    rsa_public = service_key.public_key()
+    rsa_signature = service_key.sign(message, padding.PKCS1v15(), hashes.SHA256())
+    ed_key = Ed25519PrivateKey.generate()
+    ed_public, ed_signature = ed_key.public_key(), ed_key.sign(message)
+
+    results = [
+        (
+            "user token, verify_jwt",
+            time_per_call(lambda: jwks.verify_jwt(user_token), iterations),
+        ),
+        ("service token, first", time_per_await(service_first_sight, iterations)),
+        (
+            "service token, cached",
+            time_per_await(lambda: verifier.verify(service_token), iterations),
+        ),
+        (
+            "rsa-2048 signature",
+            time_per_call(
+                lambda: rsa_public.verify(
+                    rsa_signature, message, padding.PKCS1v15(), hashes.SHA256()
+                ),
+                iterations,
+            ),
+        ),
+        (
+            "ed25519 signature",
+            time_per_call(lambda: ed_public.verify(ed_signature, message), iterations),
+        ),
+    ]
+    baseline = results[0][1]
+    print(f"{iterations} verifications each")
+    for name, seconds in results:
+        print(
+            f"  {name:<23} {seconds * 1e6:8.1f} us/token "
+            f"{1 / seconds:11,.0f}/s per core  {baseline / seconds:7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=5000)
+    main(parser.parse_args().iterations)
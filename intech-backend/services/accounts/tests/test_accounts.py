@@ -53,3 +53,20 @@ async def test_admin_can_list_all(client, async_app):
     resp = await client.get("/accounts")
     assert resp.status_code == 200
     assert isinstance(resp.json(), list)
+
+
+async def test_read_endpoints_match_account_schema(client, async_app):
+    async_app.dependency_overrides[auth.get_current_user] = (
+        override_get_current_user_user
+    )
+
+    payload = {"owner_user_id": "normal-user", "currency": "USD"}
+    created = (await client.post("/accounts", json=payload)).json()
+
+    r = await client.get(f"/accounts/{created['external_id']}")
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/json"
+    assert r.json() == created
+
+    listed = (await client.get("/accounts", params={"currency": "USD"})).json()
+    assert created in listed
@@ -0,0 +1,39 @@
+import pytest
+import pytest_asyncio
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core import metrics
+from app.core.metrics import InstrumentedAsyncPool, register_engine
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest_asyncio.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedAsyncPool,
+        pool_size=1,
+        max_overflow=1,
+    )
+    register_engine("test", engine)
+    yield engine
+    # Not left for /metrics in later tests to report on a disposed pool.
+    metrics._engines.pop("test", None)
+    await engine.dispose()
+
+
+async def test_pool_metrics_track_overflow_and_wait(client, engine):
+    async with engine.connect() as first, engine.connect() as second:
+        await first.execute(text("select 1"))
+        await second.execute(text("select 1"))
+
+    pool = engine.sync_engine.pool
+    assert pool.metrics.wait_count == 2
+    assert pool.metrics.overflow_checkouts == 1
+
+    resp = await client.get("/metrics")
+    assert resp.status_code == 200
+    assert 'db_pool_overflow_checkouts_total{pool="test"} 1' in resp.text
+    assert 'db_pool_checkout_wait_seconds_count{pool="test"} 2' in resp.text
@@ -0,0 +1,23 @@
+import fakeredis
+import pytest
+
+from app.db import replica
+from app.db.replica import WriteStickiness
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_superuser_change_pins_the_owners_reads_too(monkeypatch):
+    redis = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(replica, "get_redis_or_none", lambda: redis)
+    monkeypatch.setattr(replica, "stickiness", WriteStickiness(ttl=60))
+
+    await replica.mark_primary_write({"sub": "admin"}, "owner")
+    assert await replica.stickiness.is_sticky("admin")
+    assert await replica.stickiness.is_sticky("owner")
+    assert not await replica.stickiness.is_sticky("someone-else")
+
+    # The owner acting on their own account is pinned once.
+    await replica.mark_primary_write({"sub": "owner"}, "owner")
+    assert await replica.stickiness.is_sticky("owner")
+    await redis.aclose()
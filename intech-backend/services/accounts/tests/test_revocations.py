@@ -0,0 +1,36 @@
+import hashlib
+import time
+
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+from app.core import auth
+from app.core.revocations import RevocationListener, RevokedTokens, revoked_tokens
+
+
+@pytest.mark.asyncio
+async def test_revoked_token_is_rejected_without_a_network_call(monkeypatch):
+    monkeypatch.setattr(auth, "verify_jwt", lambda token: {"sub": "user-1"})
+    creds = HTTPAuthorizationCredentials(scheme="Bearer", credentials="token-a")
+    assert (await auth.get_current_user(creds))["sub"] == "user-1"
+
+    # As published by the auth service: sha256 of the token and its exp.
+    listener = RevocationListener(revoked_tokens, "redis://unused", "revocations")
+    token_hash = hashlib.sha256(b"token-a").hexdigest()
+    listener.handle(f"{token_hash} {int(time.time()) + 60}".encode())
+    listener.handle(b"garbage")
+    try:
+        with pytest.raises(HTTPException) as exc:
+            await auth.get_current_user(creds)
+        assert exc.value.detail == "Token has been revoked"
+    finally:
+        revoked_tokens.purge(float("inf"))
+
+
+def test_expired_entries_are_purged():
+    revoked = RevokedTokens()
+    revoked.add("a", 100)
+    revoked.add("b", 200)
+    revoked.purge(150)
+    assert len(revoked) == 1
@@ -0,0 +1,114 @@
+import asyncio
+import time
+
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwt
+from jose.utils import long_to_base64
+
+from app.core.service_auth import ServiceTokenError, ServiceTokenVerifier
+
+pytestmark = pytest.mark.asyncio
+
+
+def new_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def sign(key, claims, kid="service-key-1") -> str:
+    # As the auth service's create_service_token does.
+    return jwt.encode(claims, key, algorithm="RS256", headers={"kid": kid})
+
+
+def jwk(key, kid="service-key-1"):
+    numbers = key.public_key().public_numbers()
+    return {
+        "kty": "RSA",
+        "alg": "RS256",
+        "kid": kid,
+        "n": long_to_base64(numbers.n).decode(),
+        "e": long_to_base64(numbers.e).decode(),
+    }
+
+
+def claims(**overrides):
+    now = int(time.time())
+    return {
+        "sub": "cards",
+        "aud": "accounts",
+        "iat": now,
+        "exp": now + 300,
+        "typ": "service",
+        **overrides,
+    }
+
+
+async def test_service_token_is_verified_once_and_then_served_from_cache():
+    key = new_key()
+    fetches = []
+
+    async def fetch_keys():
+        fetches.append(1)
+        return [jwk(key)]
+
+    verifier = ServiceTokenVerifier("accounts", fetch_keys, max_entries=10)
+    token = sign(key, claims())
+    assert (await verifier.verify(token))["sub"] == "cards"
+    assert (await verifier.verify(token))["sub"] == "cards"
+    assert len(fetches) == 1
+    assert len(verifier._verified) == 1
+
+    # A token for another service, an expired one, a user token signed
+    # with the service key, a forged signature and garbage are refused.
+    for bad in (
+        sign(key, claims(aud="transactions")),
+        sign(key, claims(exp=int(time.time()) - 1)),
+        sign(key, claims(typ="access")),
+        sign(new_key(), claims()),
+        "not-a-token",
+    ):
+        with pytest.raises(ServiceTokenError):
+            await verifier.verify(bad)
+    assert len(verifier._verified) == 1
+
+
+async def test_unknown_key_refetches_at_most_once_per_interval():
+    old, new = new_key(), new_key()
+    published = [jwk(old)]
+    fetches = []
+
+    async def fetch_keys():
+        fetches.append(1)
+        return list(published)
+
+    verifier = ServiceTokenVerifier("accounts", fetch_keys, max_entries=10)
+    await verifier.refresh_keys()
+    with pytest.raises(ServiceTokenError):
+        await verifier.verify(sign(new, claims(), kid="service-key-2"))
+    with pytest.raises(ServiceTokenError):
+        await verifier.verify(sign(new, claims(), kid="service-key-2"))
+    assert len(fetches) == 1
+
+    # Once the interval has passed, a rotated key is picked up.
+    published.append(jwk(new, kid="service-key-2"))
+    verifier._keys_fetched_at -= 60
+    rotated = await verifier.verify(sign(new, claims(), kid="service-key-2"))
+    assert rotated["sub"] == "cards"
+    assert len(fetches) == 2
+
+
+async def test_concurrent_requests_share_one_key_fetch():
+    key = new_key()
+    fetches = []
+
+    async def fetch_keys():
+        fetches.append(1)
+        # Other requests are served meanwhile.
+        await asyncio.sleep(0.05)
+        return [jwk(key)]
+
+    verifier = ServiceTokenVerifier("accounts", fetch_keys, max_entries=10)
+    tokens = [sign(key, claims(jti=str(i))) for i in range(5)]
+    results = await asyncio.gather(*(verifier.verify(token) for token in tokens))
+    assert [r["jti"] for r in results] == [str(i) for i in range(5)]
+    assert len(fetches) == 1
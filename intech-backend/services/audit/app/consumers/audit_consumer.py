@@ -0,0 +1,51 @@
+import asyncio
+import logging
+from aio_pika import connect_robust, IncomingMessage
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal, Base, engine
+from app.core.ingest import AuditIngestor, AuditWriter
+from app.core.partitions import ensure_partitions
+import app.models.audit  # noqa: F401 - registers the tables
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("audit_consumer")
+
+ingestor = AuditIngestor(
+    AuditWriter(AsyncSessionLocal),
+    max_batch=settings.AUDIT_BATCH_SIZE,
+    window_seconds=settings.AUDIT_BATCH_WINDOW_SECONDS,
+    max_buffered=settings.AUDIT_BUFFER_EVENTS,
+    retry_delay=settings.AUDIT_RETRY_DELAY_SECONDS,
+)
+
+
+async def handle_audit_message(message: IncomingMessage):
+    """Buffer the event; it is acked once its batch is committed."""
+    await ingestor.put(message.body, message)
+
+
+async def main():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        if conn.dialect.name == "postgresql":
+            await ensure_partitions(conn, settings.AUDIT_PARTITION_MONTHS_AHEAD)
+
+    ingestor.start()
+    connection = await connect_robust(settings.RABBITMQ_URL)
+    channel = await connection.channel()
+    # Unacked deliveries are capped at the buffer size, so the broker stops
+    # sending while the writer is behind.
+    await channel.set_qos(prefetch_count=settings.AUDIT_BUFFER_EVENTS)
+    queue = await channel.declare_queue(settings.AUDIT_QUEUE, durable=True)
+    await queue.consume(handle_audit_message)
+    logger.info(f"Audit consumer listening on {settings.AUDIT_QUEUE}")
+    try:
+        await asyncio.Future()
+    finally:
+        await connection.close()
+        await ingestor.close()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,127 @@
+"""
+Audit events as they arrive from the broker, and the hash chain over them.
+
+Producers publish JSON objects to AUDIT_QUEUE:
+
+    {"id": "<uuid>", "type": "account.created", "service": "accounts",
+     "actor": "<user id>", "resource_type": "account",
+     "resource_id": "ACC-1f2e3d4c", "occurred_at": "<ISO 8601>",
+     "data": {...}}
+
+Only type is required. An event without an id gets one derived from its
+body, so a redelivered copy is still recognised as the same event.
+
+Entry n of the log stores hash_n = sha256(hash_{n-1} + encode(n, event)),
+with 32 zero bytes before the first entry. encode() is a JSON array of
+the stored columns, with data kept as the exact text that was hashed, so
+the chain can be recomputed from the table alone.
+"""
+
+import hashlib
+import uuid
+from datetime import datetime, timezone
+from typing import NamedTuple, Optional
+
+import orjson
+
+GENESIS = bytes(32)
+
+# Namespace for ids derived from the body of events published without one.
+EVENT_NAMESPACE = uuid.UUID("9b7f3f4e-5a0c-4f43-8a55-3c1d6f1b2a90")
+
+_LIMITS = {"type": 64, "service": 32, "actor": 64, "resource_type": 32}
+_RESOURCE_ID_LIMIT = 128
+
+
+class InvalidEvent(ValueError):
+    pass
+
+
+class AuditRecord(NamedTuple):
+    id: uuid.UUID
+    type: str
+    service: str
+    actor: Optional[str]
+    resource_type: Optional[str]
+    resource_id: Optional[str]
+    occurred_at: datetime
+    data: str
+
+
+def utc_isoformat(value: datetime) -> str:
+    # SQLite hands timestamps back naive; they were stored in UTC.
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat(timespec="microseconds")
+
+
+def parse_event(body: bytes) -> AuditRecord:
+    try:
+        message = orjson.loads(body)
+    except orjson.JSONDecodeError as e:
+        raise InvalidEvent(f"not JSON: {e}")
+    if not isinstance(message, dict) or not isinstance(message.get("type"), str):
+        raise InvalidEvent("expected an object with a type")
+
+    fields = {}
+    for name, limit in _LIMITS.items():
+        value = message.get(name)
+        if value is not None:
+            value = str(value)
+            if len(value) > limit:
+                raise InvalidEvent(f"{name} longer than {limit} characters")
+        fields[name] = value
+    resource_id = message.get("resource_id")
+    if resource_id is not None:
+        resource_id = str(resource_id)[:_RESOURCE_ID_LIMIT]
+
+    try:
+        if message.get("id"):
+            event_id = uuid.UUID(str(message["id"]))
+        else:
+            event_id = uuid.uuid5(EVENT_NAMESPACE, hashlib.sha256(body).hexdigest())
+        occurred_at = (
+            datetime.fromisoformat(message["occurred_at"])
+            if message.get("occurred_at")
+            else datetime.now(timezone.utc)
+        )
+    except (TypeError, ValueError) as e:
+        raise InvalidEvent(str(e))
+    if occurred_at.tzinfo is None:
+        occurred_at = occurred_at.replace(tzinfo=timezone.utc)
+    # Stored in UTC, which also decides the month partition it goes to.
+    occurred_at = occurred_at.astimezone(timezone.utc)
+
+    return AuditRecord(
+        id=event_id,
+        type=fields["type"],
+        service=fields["service"] or "unknown",
+        actor=fields["actor"],
+        resource_type=fields["resource_type"],
+        resource_id=resource_id,
+        occurred_at=occurred_at,
+        data=orjson.dumps(
+            message.get("data") or {}, option=orjson.OPT_SORT_KEYS
+        ).decode(),
+    )
+
+
+def encode(seq: int, record) -> bytes:
+    """Canonical bytes of an entry; `record` is an AuditRecord or a row."""
+    return orjson.dumps(
+        [
+            seq,
+            str(record.id),
+            record.type,
+            record.service,
+            record.actor,
+            record.resource_type,
+            record.resource_id,
+            utc_isoformat(record.occurred_at),
+            record.data,
+        ]
+    )
+
+
+def chain_hash(prev_hash: bytes, seq: int, record) -> bytes:
+    return hashlib.sha256(prev_hash + encode(seq, record)).digest()
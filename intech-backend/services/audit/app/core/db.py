@@ -0,0 +1,37 @@
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy.orm import declarative_base
+from app.core.config import settings
+
+
+def engine_options(url: str) -> dict:
+    """Pool settings for Postgres; other backends (SQLite in tests) keep defaults."""
+    if not url.startswith("postgresql"):
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+engine = create_async_engine(
+    settings.DATABASE_URL,
+    future=True,
+    echo=False,
+    **engine_options(settings.DATABASE_URL),
+)
+AsyncSessionLocal = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+Base = declarative_base()
+
+
+async def get_db() -> AsyncSession:
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
+def get_session_factory() -> async_sessionmaker:
+    """For handlers whose work outlives the request, like streamed responses."""
+    return AsyncSessionLocal
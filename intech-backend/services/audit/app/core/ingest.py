@@ -0,0 +1,332 @@
+"""
+Batched, hash-chained writes of broker events into audit_events.
+
+Deliveries go into a bounded buffer; a single writer task takes up to
+AUDIT_BATCH_SIZE of them at a time (or whatever arrived within
+AUDIT_BATCH_WINDOW_SECONDS), chains them onto the tail of the log and
+appends them with one COPY. The broker messages are acked only after
+that commit. When the buffer is full, put() waits, the broker's prefetch
+fills up and deliveries stop until the writer catches up, so memory stays
+bounded however far behind the database falls.
+
+The chain tail is read from audit_chain_head under a row lock, so several
+consumers can share the queue without forking the chain.
+
+Redeliveries are recognised by id within the month of their occurred_at:
+the id index is per partition, and a lookup across every month of the
+log would cost one probe per partition per event. A copy carries the
+original's occurred_at, so it lands in the same month; only an event
+published without occurred_at (stamped on receipt) and redelivered across
+a month boundary could be stored twice.
+
+A batch that fails for a transient reason (connection lost, database
+overloaded, serialization failure) is retried as it is. Any other failure
+is taken to be caused by the data, say a NUL byte Postgres will not store:
+the batch is split in halves until the event at fault is found, and that
+one is logged and rejected without requeueing.
+"""
+
+import asyncio
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from typing import List, Optional, Set, Tuple
+
+import asyncpg
+from sqlalchemy import any_, bindparam, column, insert, select, table, update
+from sqlalchemy import exc
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.chain import GENESIS, AuditRecord, InvalidEvent, chain_hash, parse_event
+from app.core.logger import logging
+from app.core.partitions import create_partitions, month_of, partition_name
+from app.models.audit import AuditChainHead, AuditEvent
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = (
+    "seq",
+    "id",
+    "type",
+    "service",
+    "actor",
+    "resource_type",
+    "resource_id",
+    "occurred_at",
+    "recorded_at",
+    "data",
+    "prev_hash",
+    "hash",
+)
+
+# SQLSTATE classes worth retrying: connection exception, transaction
+# rollback (serialization, deadlock), insufficient resources, operator
+# intervention (shutdown) and system error.
+TRANSIENT_SQLSTATE_CLASSES = {"08", "40", "53", "57", "58"}
+
+
+def is_transient(error: Exception) -> bool:
+    """Whether a failed write may succeed if retried unchanged."""
+    if isinstance(
+        error,
+        (OSError, asyncio.TimeoutError, asyncpg.InterfaceError, exc.TimeoutError),
+    ):
+        return True
+    if isinstance(error, exc.DBAPIError) and error.connection_invalidated:
+        return True
+    # asyncpg errors carry it directly, SQLAlchemy's wrap the driver's.
+    sqlstate = getattr(error, "sqlstate", None) or getattr(
+        getattr(error, "orig", None), "sqlstate", None
+    )
+    if sqlstate:
+        return sqlstate[:2] in TRANSIENT_SQLSTATE_CLASSES
+    return isinstance(error, (exc.OperationalError, exc.InterfaceError))
+
+
+class AuditWriter:
+    def __init__(self, session_factory: async_sessionmaker) -> None:
+        self._session_factory = session_factory
+        # Months whose partition is known to exist.
+        self._months: Set[date] = set()
+
+    async def _tail(self, conn) -> Tuple[Optional[int], bytes]:
+        """
+        Lock the chain head and return (seq, hash) of the last entry; seq
+        is None when the head row has yet to be created.
+        """
+        result = await conn.execute(
+            select(AuditChainHead.seq, AuditChainHead.hash)
+            .where(AuditChainHead.id == 1)
+            .with_for_update()
+        )
+        head = result.first()
+        if head is not None:
+            return head.seq, head.hash
+        # A log written before the head row existed: start from its tail.
+        result = await conn.execute(
+            select(AuditEvent.seq, AuditEvent.hash)
+            .order_by(AuditEvent.seq.desc())
+            .limit(1)
+        )
+        seq, prev_hash = result.first() or (0, GENESIS)
+        return None if seq == 0 else seq, prev_hash
+
+    async def _known_ids(self, conn, records: List[AuditRecord]) -> Set[uuid.UUID]:
+        """Ids of the records already in the log."""
+        if conn.dialect.name != "postgresql":
+            ids = [record.id for record in records]
+            result = await conn.execute(
+                select(AuditEvent.id).where(AuditEvent.id.in_(ids))
+            )
+            return set(result.scalars())
+        by_month = defaultdict(list)
+        for record in records:
+            by_month[month_of(record.occurred_at)].append(record.id)
+        known = set()
+        for month, ids in by_month.items():
+            # Each month's partition by name: given an occurred_at range on
+            # the parent instead, the planner tends to scan that range of a
+            # fresh, unanalysed partition rather than probe the id index.
+            partition = table(partition_name(month), column("id", AuditEvent.id.type))
+            # One array parameter instead of an IN list of thousands.
+            ids = bindparam("ids", ids, type_=ARRAY(AuditEvent.id.type))
+            result = await conn.execute(
+                select(partition.c.id).where(partition.c.id == any_(ids))
+            )
+            known.update(result.scalars())
+        return known
+
+    async def write(self, records: List[AuditRecord]) -> int:
+        """
+        Append the records not already in the log, in order, and commit.
+        Returns how many were appended.
+        """
+        unique = list({record.id: record for record in records}.values())
+        async with self._session_factory() as db:
+            conn = await db.connection()
+            postgres = conn.dialect.name == "postgresql"
+            head_seq, prev_hash = await self._tail(conn)
+            new_months = set()
+            if postgres:
+                new_months = {
+                    month_of(record.occurred_at) for record in unique
+                } - self._months
+                if new_months:
+                    await create_partitions(conn, new_months)
+
+            seen = await self._known_ids(conn, unique)
+            fresh = [record for record in unique if record.id not in seen]
+            if not fresh:
+                return 0
+
+            seq = head_seq or 0
+            now = datetime.now(timezone.utc)
+            rows = []
+            for record in fresh:
+                seq += 1
+                digest = chain_hash(prev_hash, seq, record)
+                rows.append(
+                    (
+                        seq,
+                        record.id,
+                        record.type,
+                        record.service,
+                        record.actor,
+                        record.resource_type,
+                        record.resource_id,
+                        record.occurred_at,
+                        now,
+                        record.data,
+                        prev_hash,
+                        digest,
+                    )
+                )
+                prev_hash = digest
+
+            if postgres:
+                raw = await conn.get_raw_connection()
+                await raw.driver_connection.copy_records_to_table(
+                    AuditEvent.__tablename__, records=rows, columns=COLUMNS
+                )
+            else:
+                await conn.execute(
+                    insert(AuditEvent), [dict(zip(COLUMNS, row)) for row in rows]
+                )
+            if head_seq is None:
+                await conn.execute(
+                    insert(AuditChainHead).values(id=1, seq=seq, hash=prev_hash)
+                )
+            else:
+                await conn.execute(
+                    update(AuditChainHead)
+                    .where(AuditChainHead.id == 1)
+                    .values(seq=seq, hash=prev_hash)
+                )
+            await db.commit()
+            self._months |= new_months
+            return len(rows)
+
+
+class AuditIngestor:
+    """
+    Feeds deliveries to an AuditWriter in batches. A delivery is anything
+    with async ack(multiple=...) and reject(requeue=...); acking the last
+    delivery of a batch with multiple=True acks the whole batch, which
+    holds because batches are taken from the buffer in delivery order.
+    """
+
+    def __init__(
+        self,
+        writer: AuditWriter,
+        max_batch: int,
+        window_seconds: float,
+        max_buffered: int,
+        retry_delay: float = 1.0,
+    ) -> None:
+        self.writer = writer
+        self.max_batch = max_batch
+        self.window_seconds = window_seconds
+        self.retry_delay = retry_delay
+        self.written = 0
+        self._buffer: asyncio.Queue = asyncio.Queue(max_buffered)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def put(self, body: bytes, delivery) -> None:
+        """Buffer one delivery, waiting while the buffer is full."""
+        await self._buffer.put((body, delivery))
+
+    async def close(self) -> None:
+        """Write everything buffered, then stop."""
+        await self._buffer.put(None)
+        if self._task is not None:
+            await self._task
+
+    async def _next_batch(self) -> Tuple[List[tuple], bool]:
+        loop = asyncio.get_running_loop()
+        item = await self._buffer.get()
+        if item is None:
+            return [], True
+        batch = [item]
+        deadline = loop.time() + self.window_seconds
+        while len(batch) < self.max_batch:
+            try:
+                item = self._buffer.get_nowait()
+            except asyncio.QueueEmpty:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._buffer.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _run(self) -> None:
+        closing = False
+        while not closing:
+            batch, closing = await self._next_batch()
+            if batch:
+                await self._write(batch)
+
+    async def _write(self, batch: List[tuple]) -> None:
+        records, deliveries = [], []
+        for body, delivery in batch:
+            try:
+                records.append(parse_event(body))
+            except InvalidEvent as e:
+                logger.warning(f"Dropping invalid audit event: {e}")
+                await delivery.reject(requeue=False)
+                continue
+            deliveries.append(delivery)
+        if not records:
+            return
+
+        refused = set(await self._store(records))
+        for i in refused:
+            await deliveries[i].reject(requeue=False)
+        kept = [d for i, d in enumerate(deliveries) if i not in refused]
+        if not kept:
+            return
+        try:
+            await kept[-1].ack(multiple=True)
+        except Exception as e:
+            # Redelivered copies are dropped by id, so this only costs work.
+            logger.warning(f"Acking audit batch failed: {e}")
+
+    async def _store(self, records: List[AuditRecord]) -> List[int]:
+        """
+        Write the records in order; return the positions of those that
+        cannot be stored at all.
+        """
+        # Retry in place rather than requeue: the buffer stays full
+        # meanwhile, which holds the broker back, and order is kept.
+        while True:
+            try:
+                self.written += await self.writer.write(records)
+                return []
+            except Exception as e:
+                if not is_transient(e):
+                    error = e
+                    break
+                logger.exception(
+                    f"Writing {len(records)} audit events failed; retrying: {e}"
+                )
+                await asyncio.sleep(self.retry_delay)
+        if len(records) == 1:
+            logger.error(
+                f"Rejecting audit event {records[0].id} that cannot be stored: {error}"
+            )
+            return [0]
+        logger.warning(
+            f"Writing {len(records)} audit events failed; splitting the batch: {error}"
+        )
+        middle = len(records) // 2
+        refused = await self._store(records[:middle])
+        return refused + [middle + i for i in await self._store(records[middle:])]
@@ -0,0 +1,95 @@
+"""
+Monthly range partitions of the `audit_events` table.
+
+Partitions are named audit_events_YYYY_MM and cover [first of month, first
+of next month) in UTC on occurred_at. The months ahead are created at startup;
+an event from any other month (a producer's clock, a replayed backlog)
+gets its partition from the writer just before it is copied in. The log
+is kept for good, so nothing is ever detached.
+"""
+
+from datetime import date, datetime, timezone
+from typing import Iterable, List
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.core.logger import logging
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "audit_events"
+
+
+def month_start(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+
+def add_months(d: date, months: int) -> date:
+    index = d.year * 12 + (d.month - 1) + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_of(value: datetime) -> date:
+    """The month whose partition holds a timestamp."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return date(value.year, value.month, 1)
+
+
+def month_bound(month: date) -> datetime:
+    return datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT_TABLE}_{month:%Y_%m}"
+
+
+async def list_partitions(conn: AsyncConnection) -> List[str]:
+    result = await conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i"
+            " JOIN pg_class c ON c.oid = i.inhrelid"
+            " JOIN pg_class p ON p.oid = i.inhparent"
+            " WHERE p.relname = :parent"
+        ),
+        {"parent": PARENT_TABLE},
+    )
+    return [row[0] for row in result]
+
+
+async def create_partitions(conn: AsyncConnection, months: Iterable[date]) -> List[str]:
+    """Create the partitions for `months` that do not exist yet."""
+    existing = set(await list_partitions(conn))
+    created = []
+    for month in sorted({month_start(m) for m in months}):
+        name = partition_name(month)
+        if name in existing:
+            continue
+        await conn.execute(
+            text(
+                f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF {PARENT_TABLE}'
+                f" FOR VALUES FROM ('{month_bound(month).isoformat()}')"
+                f" TO ('{month_bound(add_months(month, 1)).isoformat()}')"
+            )
+        )
+        # Statement triggers stay on the parent; see app.models.audit.
+        await conn.execute(
+            text(
+                "CREATE OR REPLACE TRIGGER audit_events_no_truncate"
+                f' BEFORE TRUNCATE ON "{name}"'
+                " FOR EACH STATEMENT EXECUTE FUNCTION audit_events_append_only()"
+            )
+        )
+        created.append(name)
+    if created:
+        logger.info("Created audit partitions: %s", ", ".join(created))
+    return created
+
+
+async def ensure_partitions(conn: AsyncConnection, months_ahead: int) -> List[str]:
+    """Create partitions for the current month and `months_ahead` after it."""
+    current = month_start(datetime.now(timezone.utc).date())
+    return await create_partitions(
+        conn, [add_months(current, n) for n in range(months_ahead + 1)]
+    )
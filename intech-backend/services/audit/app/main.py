@@ -0,0 +1,29 @@
+from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from app.core.config import settings
+from app.core.logger import configure_logging
+from app.api.v1 import audit as audit_router
+from app.core.db import engine, Base
+from app.core.partitions import ensure_partitions
+import app.models.audit  # noqa: F401 - registers the tables
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    configure_logging()
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        if conn.dialect.name == "postgresql":
+            await ensure_partitions(conn, settings.AUDIT_PARTITION_MONTHS_AHEAD)
+
+    try:
+        yield
+    finally:
+        await engine.dispose()
+
+
+app = FastAPI(title="Audit Service", lifespan=lifespan)
+
+
+app.include_router(audit_router.router)
@@ -0,0 +1,106 @@
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DDL,
+    DateTime,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    Text,
+    event,
+)
+from sqlalchemy.dialects.postgresql import UUID
+from datetime import datetime, timezone
+from app.core.db import Base
+
+
+class AuditEvent(Base):
+    """
+    One entry of the append-only audit log. seq orders the log without
+    gaps, and hash = sha256(prev_hash + the entry's canonical encoding) (see
+    app.core.chain), so editing, removing or reordering entries breaks the
+    chain from that point on.
+
+    On Postgres the table is range-partitioned by month on occurred_at (see
+    app.core.partitions), so queries bounded in time only touch the months
+    they cover. Keys on a partitioned table have to include the partition
+    column, hence occurred_at in the primary key and in the id index.
+    """
+
+    __tablename__ = "audit_events"
+    __table_args__ = (
+        # Every lookup the query API serves, newest first within a key.
+        Index("ix_audit_events_actor", "actor", "occurred_at", "seq"),
+        Index(
+            "ix_audit_events_resource",
+            "resource_id",
+            "occurred_at",
+            "seq",
+        ),
+        Index("ix_audit_events_type", "type", "occurred_at", "seq"),
+        Index("ix_audit_events_occurred_at", "occurred_at", "seq"),
+        Index("ix_audit_events_id", "id", "occurred_at", unique=True),
+        {"postgresql_partition_by": "RANGE (occurred_at)"},
+    )
+
+    seq = Column(BigInteger, primary_key=True, autoincrement=False)
+    # Assigned by the producer; a redelivered event is recognised by it.
+    id = Column(UUID(as_uuid=True), nullable=False)
+    type = Column(String(64), nullable=False)
+    service = Column(String(32), nullable=False)
+    actor = Column(String(64), nullable=True)
+    resource_type = Column(String(32), nullable=True)
+    resource_id = Column(String(128), nullable=True)
+    occurred_at = Column(DateTime(timezone=True), primary_key=True)
+    recorded_at = Column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+    # Canonical JSON text, stored as hashed.
+    data = Column(Text, nullable=False)
+    prev_hash = Column(LargeBinary(32), nullable=False)
+    hash = Column(LargeBinary(32), nullable=False)
+
+
+class AuditChainHead(Base):
+    """
+    The last entry of the chain, in a single row. Writers lock it to
+    append, which serialises them, and read the tail from it instead of
+    searching every partition for the highest seq.
+    """
+
+    __tablename__ = "audit_chain_head"
+
+    id = Column(Integer, primary_key=True, default=1)
+    seq = Column(BigInteger, nullable=False, default=0)
+    hash = Column(LargeBinary(32), nullable=False)
+
+
+# Enforced in the database as well, for anyone with a psql prompt. Row
+# triggers on the parent are cloned onto every partition, so updating a
+# partition directly is refused too; TRUNCATE triggers are not, and
+# app.core.partitions adds one to each partition it creates.
+for statement in (
+    """
+    CREATE OR REPLACE FUNCTION audit_events_append_only() RETURNS trigger AS $$
+    BEGIN
+        RAISE EXCEPTION 'audit_events is append-only';
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER audit_events_append_only
+        BEFORE UPDATE OR DELETE ON audit_events
+        FOR EACH ROW EXECUTE FUNCTION audit_events_append_only()
+    """,
+    """
+    CREATE TRIGGER audit_events_no_truncate
+        BEFORE TRUNCATE ON audit_events
+        FOR EACH STATEMENT EXECUTE FUNCTION audit_events_append_only()
+    """,
+):
+    event.listen(
+        AuditEvent.__table__,
+        "after_create",
+        DDL(statement).execute_if(dialect="postgresql"),
+    )
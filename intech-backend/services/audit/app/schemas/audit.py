@@ -0,0 +1,23 @@
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+from datetime import datetime
+
+
+class AuditEventOut(BaseModel):
+    seq: int
+    id: UUID
+    type: str
+    service: str
+    actor: Optional[str]
+    resource_type: Optional[str]
+    resource_id: Optional[str]
+    occurred_at: datetime
+    recorded_at: datetime
+    data: Dict[str, Any]
+    hash: str
+
+
+class AuditEventPage(BaseModel):
+    items: List[AuditEventOut]
+    next_cursor: Optional[str]
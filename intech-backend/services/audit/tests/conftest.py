@@ -0,0 +1,18 @@
+import os
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+os.environ["DATABASE_URL"] = "sqlite+aiosqlite:///:memory:"
+os.environ["AUTH_JWKS_URL"] = "http://testserver/.well-known/jwks.json"
+
+from app.core.db import Base
+import app.models.audit  # noqa: F401
+
+
+@pytest_asyncio.fixture(scope="function")
+async def session_factory():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
@@ -0,0 +1,162 @@
+import asyncio
+import uuid
+
+import asyncpg
+import orjson
+import pytest
+from sqlalchemy import select, update
+
+from app.core.ingest import AuditIngestor, AuditWriter
+from app.models.audit import AuditEvent
+from app.services.audit_service import verify_chain
+
+pytestmark = pytest.mark.asyncio
+
+
+class FakeDelivery:
+    def __init__(self, tag, acks):
+        self.tag = tag
+        self.acks = acks
+        self.rejected = False
+
+    async def ack(self, multiple=False):
+        self.acks.append((self.tag, multiple))
+
+    async def reject(self, requeue=False):
+        self.rejected = True
+
+
+def _event(n, **fields):
+    return orjson.dumps(
+        {
+            "id": str(uuid.uuid5(uuid.NAMESPACE_OID, str(n))),
+            "type": "account.updated",
+            "service": "accounts",
+            "actor": "admin",
+            "resource_type": "account",
+            "resource_id": f"ACC-{n}",
+            "occurred_at": "2025-01-01T00:00:00+00:00",
+            "data": {"n": n},
+            **fields,
+        }
+    )
+
+
+async def _ingest(ingestor, bodies, acks):
+    deliveries = [FakeDelivery(tag, acks) for tag in range(1, len(bodies) + 1)]
+    for body, delivery in zip(bodies, deliveries):
+        await ingestor.put(body, delivery)
+    return deliveries
+
+
+async def test_batches_extend_one_chain(session_factory):
+    acks = []
+    ingestor = AuditIngestor(
+        AuditWriter(session_factory), max_batch=4, window_seconds=0.01, max_buffered=8
+    )
+    ingestor.start()
+    first = [_event(n) for n in range(1, 7)]
+    # A redelivery, an invalid message and a duplicate within the batch.
+    second = [_event(3), b"not json", _event(7), _event(7), _event(8)]
+    await _ingest(ingestor, first, acks)
+    await asyncio.sleep(0.05)
+    deliveries = await _ingest(ingestor, second, acks)
+    await ingestor.close()
+
+    assert ingestor.written == 8
+    assert deliveries[1].rejected
+    # One multiple=True ack per batch, ending with the last delivery.
+    assert acks and all(multiple for _, multiple in acks)
+    assert acks[-1][0] == len(second)
+
+    async with session_factory() as db:
+        result = await db.execute(select(AuditEvent).order_by(AuditEvent.seq))
+        entries = result.scalars().all()
+    assert [e.seq for e in entries] == list(range(1, 9))
+    assert [e.resource_id for e in entries] == [f"ACC-{n}" for n in range(1, 9)]
+    assert await verify_chain(session_factory) == (8, None)
+
+
+async def test_tampering_breaks_the_chain(session_factory):
+    writer = AuditWriter(session_factory)
+    ingestor = AuditIngestor(writer, max_batch=10, window_seconds=0, max_buffered=10)
+    ingestor.start()
+    await _ingest(ingestor, [_event(n) for n in range(1, 6)], [])
+    await ingestor.close()
+
+    async with session_factory() as db:
+        await db.execute(
+            update(AuditEvent).where(AuditEvent.seq == 3).values(actor="someone-else")
+        )
+        await db.commit()
+    last, broken = await verify_chain(session_factory)
+    assert (last, broken.seq) == (2, 3)
+    # Checking from a later entry trusts what came before it.
+    assert await verify_chain(session_factory, after_seq=3) == (5, None)
+
+
+async def test_full_buffer_holds_back_deliveries(session_factory):
+    class StuckWriter:
+        def __init__(self):
+            self.release = asyncio.Event()
+            self.calls = 0
+
+        async def write(self, records):
+            self.calls += 1
+            if self.calls == 1:
+                raise ConnectionError("database unavailable")
+            await self.release.wait()
+            return len(records)
+
+    writer = StuckWriter()
+    acks = []
+    ingestor = AuditIngestor(
+        writer, max_batch=2, window_seconds=0, max_buffered=3, retry_delay=0
+    )
+    ingestor.start()
+    # The writer holds one batch of 2; the buffer takes 3 more.
+    await _ingest(ingestor, [_event(n) for n in range(1, 6)], acks)
+    blocked = asyncio.create_task(ingestor.put(_event(6), FakeDelivery(6, acks)))
+    await asyncio.sleep(0.05)
+    assert not blocked.done()
+    assert acks == []
+
+    writer.release.set()
+    await asyncio.wait_for(blocked, 1)
+    await ingestor.close()
+    # The failed batch was retried, not dropped.
+    assert ingestor.written == 6
+    assert acks[-1] == (6, True)
+
+
+async def test_event_the_database_refuses_is_rejected_alone(session_factory):
+    class PostgresLikeWriter(AuditWriter):
+        """Refuses what Postgres refuses: a NUL character in text."""
+
+        def __init__(self, session_factory):
+            super().__init__(session_factory)
+            self.attempts = 0
+
+        async def write(self, records):
+            self.attempts += 1
+            if any("\\u0000" in record.data for record in records):
+                raise asyncpg.CharacterNotInRepertoireError(
+                    'invalid byte sequence for encoding "UTF8": 0x00'
+                )
+            return await super().write(records)
+
+    writer = PostgresLikeWriter(session_factory)
+    acks = []
+    ingestor = AuditIngestor(writer, max_batch=8, window_seconds=0, max_buffered=8)
+    ingestor.start()
+    bodies = [_event(n) for n in range(1, 9)]
+    bodies[5] = _event(6, data={"note": "nul\x00byte"})
+    deliveries = await _ingest(ingestor, bodies, acks)
+    await ingestor.close()
+
+    assert [d.rejected for d in deliveries] == [n == 6 for n in range(1, 9)]
+    assert ingestor.written == 7
+    assert acks == [(8, True)]
+    # Found by halving: 8, then 4 + 4, then 2 + 2, then 1 + 1.
+    assert writer.attempts == 7
+    assert await verify_chain(session_factory) == (7, None)
@@ -0,0 +1,112 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import orjson
+import pytest
+import pytest_asyncio
+from httpx import ASGITransport, AsyncClient
+
+from app.core.chain import parse_event
+from app.core.db import get_db, get_session_factory
+from app.core.ingest import AuditWriter
+from app.core.security import require_superuser
+from app.main import app
+
+pytestmark = pytest.mark.asyncio
+
+START = datetime(2025, 1, 20, tzinfo=timezone.utc)
+
+
+def _event(n, **fields):
+    return parse_event(
+        orjson.dumps(
+            {
+                "id": str(uuid.uuid5(uuid.NAMESPACE_OID, str(n))),
+                "type": "account.updated",
+                "service": "accounts",
+                "actor": "admin",
+                "resource_type": "account",
+                "resource_id": "ACC-1",
+                # Two events a day, spanning a month boundary.
+                "occurred_at": (START + timedelta(hours=12 * n)).isoformat(),
+                "data": {"n": n},
+                **fields,
+            }
+        )
+    )
+
+
+@pytest_asyncio.fixture
+async def client(session_factory):
+    records = [
+        _event(n, actor="root" if n % 3 == 0 else "admin", resource_id=f"ACC-{n % 2}")
+        for n in range(30)
+    ]
+    await AuditWriter(session_factory).write(records)
+
+    async def override_get_db():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_session_factory] = lambda: session_factory
+    app.dependency_overrides[require_superuser] = lambda: {"sub": "auditor"}
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        yield ac
+    app.dependency_overrides.clear()
+
+
+async def test_cursor_pages_through_matching_events(client):
+    seen, cursor = [], None
+    while True:
+        params = {"actor": "root", "limit": 4}
+        if cursor:
+            params["cursor"] = cursor
+        resp = await client.get("/audit/events", params=params)
+        assert resp.status_code == 200
+        page = resp.json()
+        seen += [item["data"]["n"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    # Newest first, every match exactly once.
+    assert seen == list(range(27, -1, -3))
+
+    resp = await client.get("/audit/events", params={"cursor": "not a cursor"})
+    assert resp.status_code == 400
+
+
+async def test_filters_combine(client):
+    resp = await client.get(
+        "/audit/events",
+        params={
+            "resource_type": "account",
+            "resource_id": "ACC-1",
+            "since": "2025-02-01T00:00:00+00:00",
+            "until": "2025-02-03T00:00:00+00:00",
+        },
+    )
+    items = resp.json()["items"]
+    assert [item["data"]["n"] for item in items] == [27, 25]
+    assert items[0]["occurred_at"] == "2025-02-02T12:00:00.000000+00:00"
+    assert items[0]["resource_id"] == "ACC-1"
+
+    resp = await client.get(
+        "/audit/events",
+        params={"since": "2025-02-03T00:00:00Z", "until": "2025-02-01T00:00:00Z"},
+    )
+    assert resp.status_code == 400
+
+
+async def test_export_streams_ndjson(client):
+    async with client.stream(
+        "GET", "/audit/events/export", params={"resource_id": "ACC-0"}
+    ) as resp:
+        assert resp.status_code == 200
+        assert resp.headers["content-type"] == "application/x-ndjson"
+        lines = [orjson.loads(line) async for line in resp.aiter_lines() if line]
+    # Oldest first, and the full chain fields of each event.
+    assert [line["data"]["n"] for line in lines] == list(range(0, 30, 2))
+    assert all(len(line["hash"]) == 64 for line in lines)
@@ -2,9 +2,18 @@
 import logging
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.schemas.user_schema import RegisterIn, LoginIn, TokenOut, RefreshIn
+from app.schemas.user_schema import (
+    RegisterIn,
+    LoginIn,
+    TokenOut,
+    RefreshIn,
+    ServiceTokenIn,
+    ServiceTokenOut,
+)
 from app.db.db import get_db
 from app.core.rate_limiter import rate_limit_dependency
+from app.core.client_ip import client_ip
+from app.core.login_guard import login_guard
 from app.services.user_service import (
     create_user,
     authenticate,
@@ -12,7 +21,8 @@ from app.services.user_service import (
     revoke_refresh,
     rotate_refresh,
 )
-from app.core import security
+from app.core import security, service_tokens
+from app.core.config import settings
 from fastapi import Depends, Request
 
 logger = logging.getLogger(__name__)
@@ -46,13 +56,18 @@ async def register(
 
 
 @router.post("/login", response_model=TokenOut)
-async def login(payload: LoginIn, db: AsyncSession = Depends(get_db)):
+async def login(payload: LoginIn, request: Request, db: AsyncSession = Depends(get_db)):
+    ip = client_ip(request)
+    # Before any password is hashed; counts the attempt as a failure
+    # unless it succeeds.
+    await login_guard.check(payload.email, ip)
     user = await authenticate(db, payload.email, payload.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials"
         )
-    tokens = await create_tokens_and_store(db, user)
+    await login_guard.record_success(payload.email, ip)
+    tokens = await create_tokens_and_store(user)
     return TokenOut(
         access_token=tokens["access_token"],
         refresh_token=tokens["refresh_token"],
@@ -61,16 +76,17 @@ async def login(payload: LoginIn, db: AsyncSession = Depends(get_db)):
 
 
 @router.post("/refresh", response_model=TokenOut)
-async def refresh(payload: RefreshIn, db: AsyncSession = Depends(get_db)):
+async def refresh(payload: RefreshIn):
+    # No blacklist lookup: a revoked refresh token is no longer in redis,
+    # which rotate_refresh finds in the same round trip as the swap.
     try:
-
-        await security.verify_token(payload.refresh_token, expected_type="refresh")
+        claims = security.decode_token(payload.refresh_token, expected_type="refresh")
     except Exception:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token"
         )
 
-    tokens = await rotate_refresh(db, payload.refresh_token)
+    tokens = await rotate_refresh(payload.refresh_token, claims)
     if not tokens:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token"
@@ -83,12 +99,8 @@ async def refresh(payload: RefreshIn, db: AsyncSession = Depends(get_db)):
 
 
 @router.post("/logout")
-async def logout(
-    payload: RefreshIn,
-    request: Request,
-    db: AsyncSession = Depends(get_db),
-):
-    ok = await revoke_refresh(db, payload.refresh_token)
+async def logout(payload: RefreshIn, request: Request):
+    ok = await revoke_refresh(payload.refresh_token)
 
     blacklist_success = True
     try:
@@ -104,3 +116,27 @@ async def logout(
         blacklist_success = False
 
     return {"ok": ok, "blacklist_success": blacklist_success}
+
+
+@router.post("/service-token", response_model=ServiceTokenOut)
+async def service_token(payload: ServiceTokenIn):
+    """Client credentials: a short-lived token for one service to call another."""
+    if not service_tokens.enabled():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Service tokens are not configured",
+        )
+    if not service_tokens.check_client(payload.client_id, payload.client_secret):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid client"
+        )
+    if payload.audience not in settings.SERVICE_AUDIENCES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Unknown audience"
+        )
+    return ServiceTokenOut(
+        access_token=service_tokens.create_service_token(
+            payload.client_id, payload.audience
+        ),
+        expires_in=settings.SERVICE_TOKEN_EXPIRE_SECONDS,
+    )
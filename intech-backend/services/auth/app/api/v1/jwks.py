@@ -4,6 +4,8 @@ from cryptography.hazmat.backends import default_backend
 from jose.utils import base64url_encode
 import json
 
+from app.core.service_tokens import SERVICE_KEY_ID, service_public_key
+
 router = APIRouter()
 
 
@@ -35,3 +37,13 @@ async def jwks():
     public_key = load_public_key("/app/keys/jwt-public.pem")
     jwk = public_key_to_jwk(public_key, kid="auth-key-1")
     return {"keys": [jwk]}
+
+
+@router.get("/.well-known/service-jwks.json")
+async def service_jwks():
+    # Apart from the user token keys: verifiers of user tokens take the first
+    # key for a token without a kid, and must never take a service key.
+    public_key = service_public_key()
+    if public_key is None:
+        return {"keys": []}
+    return {"keys": [public_key_to_jwk(public_key, kid=SERVICE_KEY_ID)]}
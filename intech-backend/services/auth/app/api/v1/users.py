@@ -1,27 +1,66 @@
 # app/api/v1/users.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from jose import JWTError, jwt
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.core import security, service_tokens
+from app.core.config import settings
 from app.db.db import get_db
-from app.models.user import User
-from app.schemas.user_schema import UserOut
-from sqlalchemy import select
+from app.schemas.user_schema import UserBatchIn, UserOut
+from app.services.user_service import get_users
+from typing import List
 from uuid import UUID
 
-router = APIRouter(prefix="/users", tags=["users"])
+bearer = HTTPBearer(auto_error=False)
+
+
+async def require_user_reader(
+    creds: HTTPAuthorizationCredentials | None = Depends(bearer),
+) -> dict:
+    """Profiles are for superusers and for services holding a token for us."""
+    if creds is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated"
+        )
+    token = creds.credentials
+    try:
+        if jwt.get_unverified_header(token).get("kid") == service_tokens.SERVICE_KEY_ID:
+            return service_tokens.verify_service_token(
+                token, settings.SERVICE_TOKEN_AUDIENCE
+            )
+        claims = await security.verify_token(token, expected_type="access")
+    except JWTError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token"
+        )
+    if not claims.get("is_superuser"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Superuser access required"
+        )
+    return claims
+
+
+router = APIRouter(
+    prefix="/users", tags=["users"], dependencies=[Depends(require_user_reader)]
+)
 
 
 @router.get("/{user_id}", response_model=UserOut)
 async def get_user(user_id: UUID, db: AsyncSession = Depends(get_db)):
-    q = select(User).where(User.id == user_id)
-    res = await db.execute(q)
-    user = res.scalars().first()
+    user = (await get_users(db, [str(user_id)])).get(str(user_id))
     if not user:
         raise HTTPException(status_code=404, detail=f"User with id {user_id} not found")
-    return UserOut(
-        id=str(user.id),
-        email=user.email,
-        full_name=user.full_name,
-        is_active=user.is_active,
-        is_superuser=user.is_superuser,
-        created_at=user.created_at,
-    )
+    return user
+
+
+@router.post("/batch", response_model=List[UserOut])
+async def get_users_batch(payload: UserBatchIn, db: AsyncSession = Depends(get_db)):
+    """Users among `ids` that exist, in the order asked; unknown ids are left out."""
+    if len(payload.ids) > settings.USERS_BATCH_MAX:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.USERS_BATCH_MAX} ids per request",
+        )
+    ids = [str(user_id) for user_id in payload.ids]
+    found = await get_users(db, ids)
+    return [found[user_id] for user_id in dict.fromkeys(ids) if user_id in found]
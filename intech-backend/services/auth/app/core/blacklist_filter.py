@@ -0,0 +1,130 @@
+"""
+Local Bloom filter of blacklisted token hashes.
+
+Almost no token is ever revoked, yet every verify_token used to ask redis
+whether its token was. The filter answers "certainly not" locally for all
+but a small fraction of tokens; only on a hit is the exact blacklist key
+looked up, so a false positive costs the round trip that used to be paid
+every time and never lets a revoked token through.
+
+blacklist_token_in_redis also records each hash in the blacklist:index
+sorted set, scored by the token's expiry, and bumps blacklist:version.
+Every BLACKLIST_SYNC_SECONDS the filter reads the version and, only if it
+moved, drops expired members from the index and rebuilds from what is
+left. A token revoked by this process is added at once; one revoked by
+another instance is seen from the next sync. If syncing keeps failing the
+filter goes stale and every token is looked up exactly again.
+"""
+
+import asyncio
+import math
+import time
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+from redis.asyncio import Redis
+
+from app.core.logger import logging
+
+logger = logging.getLogger(__name__)
+
+INDEX_KEY = "blacklist:index"
+VERSION_KEY = "blacklist:version"
+
+
+class BloomFilter:
+    """Bit array over sha256 hex digests, which are already uniform."""
+
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        self.bits = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self._array = bytearray((self.bits + 7) // 8)
+
+    def _positions(self, token_hash: str):
+        # Double hashing from two independent slices of the digest.
+        h1 = int(token_hash[:16], 16)
+        h2 = int(token_hash[16:32], 16) | 1
+        return ((h1 + i * h2) % self.bits for i in range(self.hashes))
+
+    def add(self, token_hash: str) -> None:
+        for pos in self._positions(token_hash):
+            self._array[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, token_hash: str) -> bool:
+        return all(
+            self._array[pos >> 3] & (1 << (pos & 7))
+            for pos in self._positions(token_hash)
+        )
+
+
+class BlacklistFilter:
+    def __init__(self, min_capacity: int, error_rate: float, max_age: float) -> None:
+        self.min_capacity = min_capacity
+        self.error_rate = error_rate
+        self.max_age = max_age
+        self._bloom: Optional[BloomFilter] = None
+        self._version: Optional[bytes] = None
+        self._synced_at = 0.0
+        # Hashes added locally while a rebuild reads redis.
+        self._added_during_sync: Optional[list] = None
+
+    @property
+    def ready(self) -> bool:
+        return (
+            self._bloom is not None
+            and time.monotonic() - self._synced_at <= self.max_age
+        )
+
+    def might_contain(self, token_hash: str) -> bool:
+        """False only if the hash is certainly not blacklisted."""
+        if not self.ready:
+            return True
+        return token_hash in self._bloom
+
+    def add(self, token_hash: str) -> None:
+        if self._bloom is not None:
+            self._bloom.add(token_hash)
+        if self._added_during_sync is not None:
+            self._added_during_sync.append(token_hash)
+
+    def rebuild(self, token_hashes: Iterable[str], count: int) -> None:
+        # Twice what is there, so local adds until the next rebuild keep
+        # the error rate near its target.
+        bloom = BloomFilter(max(self.min_capacity, 2 * count), self.error_rate)
+        for token_hash in token_hashes:
+            bloom.add(token_hash)
+        self._bloom = bloom
+
+    async def sync(self, redis: Redis) -> bool:
+        """Rebuild from redis if the blacklist changed; returns whether it did."""
+        version = await redis.get(VERSION_KEY)
+        if self._bloom is not None and version == self._version:
+            self._synced_at = time.monotonic()
+            return False
+        now = datetime.now(timezone.utc).timestamp()
+        self._added_during_sync = added = []
+        try:
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.zremrangebyscore(INDEX_KEY, "-inf", now)
+                pipe.zrange(INDEX_KEY, 0, -1)
+                _, members = await pipe.execute()
+        finally:
+            self._added_during_sync = None
+        self.rebuild((m.decode() for m in members), len(members))
+        for token_hash in added:
+            self._bloom.add(token_hash)
+        self._version = version
+        self._synced_at = time.monotonic()
+        return True
+
+
+async def sync_blacklist_filter(
+    blacklist_filter: BlacklistFilter, redis: Redis, interval: float
+) -> None:
+    """Keep the filter in sync every `interval` seconds until cancelled."""
+    while True:
+        try:
+            await blacklist_filter.sync(redis)
+        except Exception as e:
+            logger.warning(f"Blacklist filter sync failed: {e}")
+        await asyncio.sleep(interval)
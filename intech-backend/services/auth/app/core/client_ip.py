@@ -0,0 +1,76 @@
+"""
+The address a request came from.
+
+Behind the gateway every request arrives from the gateway's own address,
+which would put all callers under one login throttle and one rate limit.
+When the peer is one of TRUSTED_PROXIES the client is read from
+X-Forwarded-For instead. Each proxy appends the address it received the
+request from, and anything to the left of that was sent by the client. So
+the client is the rightmost entry that is not itself a trusted proxy. A
+request from any other peer, such as one sent straight to the service's
+published port, is keyed by that peer and cannot choose its address.
+
+Entries are addresses, networks or host names. Host names are resolved
+once, at startup.
+"""
+
+import ipaddress
+import socket
+from typing import List, Optional
+
+from fastapi import Request
+
+from app.core.config import settings
+from app.core.logger import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TrustedProxies:
+    def __init__(self, entries: List[str]) -> None:
+        self.entries = entries
+        self._networks: Optional[list] = None
+
+    def resolve(self) -> None:
+        networks = []
+        for entry in self.entries:
+            try:
+                networks.append(ipaddress.ip_network(entry, strict=False))
+                continue
+            except ValueError:
+                pass
+            try:
+                infos = socket.getaddrinfo(entry, None)
+            except socket.gaierror as e:
+                logger.warning(f"Trusted proxy {entry} does not resolve: {e}")
+                continue
+            for info in infos:
+                networks.append(ipaddress.ip_network(info[4][0]))
+        self._networks = networks
+
+    def is_trusted(self, address: str) -> bool:
+        if self._networks is None:
+            self.resolve()
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            return False
+        return any(ip in network for network in self._networks)
+
+    def client_ip(self, request: Request) -> str:
+        peer = request.client.host if request.client else None
+        if not peer or not self.is_trusted(peer):
+            return peer or "anon"
+        forwarded = ",".join(request.headers.getlist("x-forwarded-for"))
+        hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+        for hop in reversed(hops):
+            if not self.is_trusted(hop):
+                return hop
+        return hops[0] if hops else peer
+
+
+trusted_proxies = TrustedProxies(settings.TRUSTED_PROXIES)
+
+
+def client_ip(request: Request) -> str:
+    return trusted_proxies.client_ip(request)
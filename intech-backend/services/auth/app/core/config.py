@@ -1,12 +1,19 @@
 # app/core/config.py
 from pydantic_settings import BaseSettings
 from pydantic import Field
+from typing import Dict, List
 
 
 class Settings(BaseSettings):
     ENV: str = Field("development")
     DATABASE_URL: str
     DATABASE_URL_SYNC: str
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 100
     REDIS_URL: str | None = None
 
     JWT_PRIVATE_KEY_PATH: str | None = None
@@ -15,6 +22,56 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
     REFRESH_TOKEN_EXPIRE_DAYS: int = 14
 
+    # Refresh tokens live in redis; refresh_tokens is a log written behind
+    # in batches, and expired rows are purged in batches.
+    REFRESH_LOG_FLUSH_INTERVAL_SECONDS: float = 0.5
+    REFRESH_LOG_BATCH: int = 500
+    REFRESH_LOG_MAX_PENDING: int = 100_000
+    REFRESH_PURGE_INTERVAL_SECONDS: float = 3600
+    REFRESH_PURGE_BATCH: int = 5000
+
+    # Local Bloom filter in front of the token blacklist in redis.
+    BLACKLIST_SYNC_SECONDS: float = 5
+    BLACKLIST_FILTER_MIN_CAPACITY: int = 10_000
+    BLACKLIST_FILTER_ERROR_RATE: float = 0.001
+    # Login throttling (app.core.login_guard). Failures per email and per
+    # client IP within the window; past *_DELAY_AFTER each failure delays
+    # the next attempt (doubling from LOGIN_DELAY_BASE_MS), past *_LOCKOUT
+    # attempts are refused until the window ends.
+    LOGIN_FAILURE_WINDOW_SECONDS: int = 900
+    LOGIN_ACCOUNT_DELAY_AFTER: int = 3
+    LOGIN_ACCOUNT_LOCKOUT: int = 10
+    LOGIN_IP_DELAY_AFTER: int = 20
+    LOGIN_IP_LOCKOUT: int = 100
+    LOGIN_DELAY_BASE_MS: int = 1000
+    LOGIN_DELAY_MAX_MS: int = 60_000
+    # Peers whose X-Forwarded-For is believed (app.core.client_ip), e.g.
+    # '["kong"]' or '["10.0.0.0/8"]'. Empty: the peer is the client.
+    TRUSTED_PROXIES: List[str] = []
+    # Argon2 verifications at once, and waiting for a slot.
+    LOGIN_MAX_CONCURRENT_HASHES: int = 2
+    LOGIN_MAX_QUEUED_HASHES: int = 32
+    # User profile cache (app.core.user_cache): local LRU, then redis.
+    USER_CACHE_MAX_ENTRIES: int = 10_000
+    USER_CACHE_LOCAL_TTL_SECONDS: float = 5
+    USER_CACHE_TTL_SECONDS: int = 300
+    USERS_BATCH_MAX: int = 500
+
+    # Service credentials (app.core.service_tokens): short-lived RS256
+    # tokens for calls between services. SERVICE_CLIENTS maps each client
+    # id to the sha256 hex of its secret, e.g. '{"cards": "9f86d0..."}'.
+    # The key is generated at deploy time or mounted as a secret (see
+    # keys/.gitignore); without one POST /auth/service-token answers 503.
+    SERVICE_TOKEN_PRIVATE_KEY_PATH: str | None = None
+    SERVICE_TOKEN_EXPIRE_SECONDS: int = 300
+    SERVICE_CLIENTS: Dict[str, str] = {}
+    SERVICE_AUDIENCES: List[str] = ["accounts", "transactions", "auth"]
+    # The audience of tokens for this service's own endpoints (/users).
+    SERVICE_TOKEN_AUDIENCE: str = "auth"
+
+    # Revoked tokens are published here for the other services.
+    REVOCATION_CHANNEL: str = Field("token_revocations")
+
     # Argon2 tuning (tune for your environment)
     ARGON2_TIME_COST: int = 2
     ARGON2_MEMORY_COST: int = 102400
@@ -0,0 +1,219 @@
+"""
+Login throttling and bounded password verification.
+
+A password check is an argon2 verification, hundreds of milliseconds of
+CPU by design, so unthrottled login attempts are both a way to guess
+passwords and a way to exhaust the service. Before anything is hashed,
+LoginGuard.check makes one script call. The script reads the recent
+failures of the email and of the client IP and, if the attempt is
+allowed, counts it as a failure in the same step:
+
+- past *_DELAY_AFTER failures each further failure sets a "next attempt"
+  key that expires after a delay doubling per failure, up to
+  LOGIN_DELAY_MAX_MS; an attempt while it exists is refused;
+- past *_LOCKOUT failures every attempt is refused until the failures age
+  out of LOGIN_FAILURE_WINDOW_SECONDS.
+
+Reserving the attempt up front means concurrent attempts cannot all pass
+the check before any of them is counted. A success hands the reservation
+back: it clears the email's count and takes the attempt off the IP's.
+Refusals are 429s with Retry-After and cost no hashing. Emails are keyed
+by their sha256, so addresses are not stored in redis. If redis is
+unavailable logins are let through unthrottled, as the rate limiter does.
+
+PasswordVerifier runs verifications in the thread pool, at most
+LOGIN_MAX_CONCURRENT_HASHES at a time, so that hashing uses a bounded
+share of the CPU whatever the request rate; past LOGIN_MAX_QUEUED_HASHES
+waiting attempts are refused outright. An unknown email is not hashed at
+all, but it is admitted the same way: it queues for a slot, or is refused
+when the queue is full, and then holds the slot for as long as a
+verification has recently taken. So neither response times nor 503s tell
+which emails exist. It counts as a failure like a wrong password.
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import math
+import time
+from typing import AsyncIterator, Optional
+
+from fastapi import HTTPException, status
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.logger import logging
+from app.core.redis import get_redis
+from app.core.security import hash_password, verify_password
+
+logger = logging.getLogger(__name__)
+
+# KEYS: email failures, IP failures, email next-attempt, IP next-attempt.
+# ARGV: window (s), email delay-after, IP delay-after, base delay (ms),
+# max delay (ms), email lockout, IP lockout. Returns 0 if the attempt is
+# allowed, and counted as a failure; else the milliseconds to wait.
+RESERVE_SCRIPT = """
+local function locked(key, lockout)
+    if tonumber(redis.call('GET', key) or '0') >= lockout then
+        return math.max(redis.call('PTTL', key), 1)
+    end
+    return 0
+end
+local wait = locked(KEYS[1], tonumber(ARGV[6]))
+if wait == 0 then
+    wait = locked(KEYS[2], tonumber(ARGV[7]))
+end
+if wait == 0 then
+    wait = math.max(redis.call('PTTL', KEYS[3]), redis.call('PTTL', KEYS[4]), 0)
+end
+if wait > 0 then
+    return wait
+end
+local window = tonumber(ARGV[1])
+local function count(key)
+    local n = redis.call('INCR', key)
+    if n == 1 then
+        redis.call('EXPIRE', key, window)
+    end
+    return n
+end
+local function pace(key, n, after)
+    if n > after then
+        local ms = math.min(tonumber(ARGV[5]), tonumber(ARGV[4]) * 2 ^ (n - after - 1))
+        redis.call('SET', key, '1', 'PX', math.floor(ms))
+    end
+end
+pace(KEYS[3], count(KEYS[1]), tonumber(ARGV[2]))
+pace(KEYS[4], count(KEYS[2]), tonumber(ARGV[3]))
+return 0
+"""
+
+# KEYS as above. Clears the email's failures and takes one off the IP's.
+REFUND_SCRIPT = """
+redis.call('DEL', KEYS[1], KEYS[3])
+if tonumber(redis.call('GET', KEYS[2]) or '0') > 0 then
+    redis.call('DECR', KEYS[2])
+end
+return 0
+"""
+
+
+def _too_many(retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many login attempts",
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+class LoginGuard:
+    def __init__(self) -> None:
+        self._reserve = None
+        self._refund = None
+
+    @staticmethod
+    def _keys(email: str, ip: str):
+        email_key = hashlib.sha256(email.strip().lower().encode()).hexdigest()
+        return (
+            f"login:fail:email:{email_key}",
+            f"login:fail:ip:{ip}",
+            f"login:next:email:{email_key}",
+            f"login:next:ip:{ip}",
+        )
+
+    async def check(self, email: str, ip: str) -> None:
+        """
+        Raise a 429 if this email or IP may not try to log in now; otherwise
+        count the attempt as a failure until record_success says otherwise.
+        """
+        try:
+            if self._reserve is None:
+                self._reserve = get_redis().register_script(RESERVE_SCRIPT)
+            wait_ms = await self._reserve(
+                keys=self._keys(email, ip),
+                args=[
+                    settings.LOGIN_FAILURE_WINDOW_SECONDS,
+                    settings.LOGIN_ACCOUNT_DELAY_AFTER,
+                    settings.LOGIN_IP_DELAY_AFTER,
+                    settings.LOGIN_DELAY_BASE_MS,
+                    settings.LOGIN_DELAY_MAX_MS,
+                    settings.LOGIN_ACCOUNT_LOCKOUT,
+                    settings.LOGIN_IP_LOCKOUT,
+                ],
+            )
+        except Exception as e:
+            logger.exception("Login guard check failed (redis): %s", e)
+            return
+        if wait_ms > 0:
+            raise _too_many(wait_ms / 1000)
+
+    async def record_success(self, email: str, ip: str) -> None:
+        try:
+            if self._refund is None:
+                self._refund = get_redis().register_script(REFUND_SCRIPT)
+            await self._refund(keys=self._keys(email, ip))
+        except Exception as e:
+            logger.exception("Login guard reset failed (redis): %s", e)
+
+
+class PasswordVerifier:
+    def __init__(self, max_concurrent: int, max_queued: int) -> None:
+        self.max_queued = max_queued
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._waiting = 0
+        self.verified = 0
+        # Recent verification time, for unknown emails to wait out.
+        self.typical_seconds: Optional[float] = None
+
+    @contextlib.asynccontextmanager
+    async def _slot(self) -> AsyncIterator[None]:
+        if self._waiting >= self.max_queued:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many login attempts in progress",
+                headers={"Retry-After": "1"},
+            )
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+    async def verify(self, hashed: str, password: str) -> bool:
+        async with self._slot():
+            started = time.perf_counter()
+            ok = await run_in_threadpool(verify_password, hashed, password)
+            self._observe(time.perf_counter() - started)
+            self.verified += 1
+            return ok
+
+    def _observe(self, seconds: float) -> None:
+        if self.typical_seconds is None:
+            self.typical_seconds = seconds
+        else:
+            self.typical_seconds += 0.1 * (seconds - self.typical_seconds)
+
+    async def calibrate(self) -> None:
+        """Time one verification, so unknown emails are paced from the start."""
+        hashed = await run_in_threadpool(hash_password, "calibration")
+        started = time.perf_counter()
+        await run_in_threadpool(verify_password, hashed, "calibration")
+        self._observe(time.perf_counter() - started)
+
+    async def pace(self) -> None:
+        """
+        Be admitted and take about as long as a verification, without
+        doing one.
+        """
+        async with self._slot():
+            await asyncio.sleep(self.typical_seconds or 0)
+
+
+login_guard = LoginGuard()
+password_verifier = PasswordVerifier(
+    settings.LOGIN_MAX_CONCURRENT_HASHES, settings.LOGIN_MAX_QUEUED_HASHES
+)
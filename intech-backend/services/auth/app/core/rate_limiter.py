@@ -1,6 +1,7 @@
 # app/services/rate_limiter.py
 from fastapi import Request, HTTPException
 from datetime import datetime, timezone
+from app.core.client_ip import client_ip
 from app.core.redis import get_redis
 from app.core.logger import logging
 
@@ -18,7 +19,7 @@ async def rate_limit_dependency(
     ts = int(datetime.now(timezone.utc).timestamp())
     window = ts - (ts % period)
     path = sanitize_path(request.url.path)
-    uid = user_id or request.client.host or "anon"
+    uid = user_id or client_ip(request)
     key = f"ratelimit:{uid}:{path}:{window}"
     try:
         val = await client.incr(key)
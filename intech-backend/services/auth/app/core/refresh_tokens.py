@@ -0,0 +1,315 @@
+"""
+Refresh token state.
+
+Redis holds one key per live refresh token, refresh:<sha256 of the token>,
+whose value carries the claims the next access token needs and whose TTL is
+the token's remaining life. Rotating a token is one script call: GETDEL the
+presented token's key and, only if it was there, SET the new token's key
+with the same value. A token can therefore be used once; a replay, a
+revoked token and an expired one all find nothing. Logout deletes the key.
+
+The claims are stamped with the user's claims version, claims:<user id>,
+which update_user increments after every change. If the stamp is not the
+current version, the script does not copy the entry. The claims are then
+read again from the database, and the new entry is stamped with the version
+the script saw, which was read before the database. Entries written at login
+carry no stamp, so a session's first refresh always re-reads the claims.
+This covers a change that lands while a login is hashing the password.
+
+The refresh_tokens table is the durable log of the same. Issuance and
+revocation are queued to RefreshTokenLog and written by one background
+task in batches, off the request path, and purge_expired deletes expired
+rows in batches. The table is not read when refreshing: Redis must be
+persistent, or losing it signs everyone out.
+"""
+
+import asyncio
+import json
+import uuid
+from datetime import datetime, timezone
+from typing import List, NamedTuple, Optional, Union
+
+import asyncpg
+from redis.asyncio import Redis
+from sqlalchemy import delete, exc, select, update
+
+from app.core.logger import logging
+from app.models.user import RefreshToken
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1]: the presented token, KEYS[2]: its replacement, KEYS[3]: the
+# user's claims version; ARGV[1]: TTL. Returns nil if the token is not live,
+# else {entry, current version, 1 if the entry was carried over else 0}.
+ROTATE_SCRIPT = """
+local value = redis.call('GETDEL', KEYS[1])
+if not value then
+    return nil
+end
+local version = redis.call('GET', KEYS[3]) or '0'
+if cjson.decode(value)['ver'] == version then
+    redis.call('SET', KEYS[2], value, 'EX', ARGV[1])
+    return {value, version, 1}
+end
+return {value, version, 0}
+"""
+
+
+def refresh_key(token_hash: str) -> str:
+    return f"refresh:{token_hash}"
+
+
+def claims_version_key(user_id: str) -> str:
+    return f"claims:{user_id}"
+
+
+class Rotated(NamedTuple):
+    claims: dict
+    # The user's claims version when the old token was swapped.
+    version: str
+    # False: the new token was not stored, as the claims may be stale.
+    stored: bool
+
+
+def token_claims(user) -> dict:
+    """What an access token issued on refresh says about the user."""
+    return {
+        "sub": str(user.id),
+        "email": user.email,
+        "is_superuser": user.is_superuser,
+    }
+
+
+class RefreshTokenStore:
+    def __init__(self, redis: Redis) -> None:
+        self.redis = redis
+        self._rotate = redis.register_script(ROTATE_SCRIPT)
+
+    async def add(self, token_hash: str, claims: dict, ttl: int) -> None:
+        await self.redis.set(refresh_key(token_hash), json.dumps(claims), ex=ttl)
+
+    async def rotate(
+        self, user_id: str, old_hash: str, new_hash: str, ttl: int
+    ) -> Optional[Rotated]:
+        """
+        Consume a live token and, if its claims are current, store the new
+        one with them; returns None if the old token is not live.
+        """
+        result = await self._rotate(
+            keys=[
+                refresh_key(old_hash),
+                refresh_key(new_hash),
+                claims_version_key(user_id),
+            ],
+            args=[ttl],
+        )
+        if result is None:
+            return None
+        value, version, stored = result
+        return Rotated(json.loads(value), version.decode(), bool(stored))
+
+    async def bump_claims_version(self, user_id: str) -> None:
+        """Mark the claims held for a user's refresh tokens as stale."""
+        await self.redis.incr(claims_version_key(user_id))
+
+    async def revoke(self, token_hash: str) -> bool:
+        return bool(await self.redis.delete(refresh_key(token_hash)))
+
+
+class Issued(NamedTuple):
+    token_hash: str
+    user_id: str
+    expires_at: datetime
+
+
+class Revoked(NamedTuple):
+    token_hash: str
+
+
+# SQLSTATE classes worth retrying: connection exception, transaction
+# rollback (serialization, deadlock), insufficient resources, operator
+# intervention (shutdown) and system error.
+TRANSIENT_SQLSTATE_CLASSES = {"08", "40", "53", "57", "58"}
+
+
+def is_transient(error: Exception) -> bool:
+    """Whether a failed write may succeed if retried unchanged."""
+    if isinstance(
+        error,
+        (OSError, asyncio.TimeoutError, asyncpg.InterfaceError, exc.TimeoutError),
+    ):
+        return True
+    if isinstance(error, exc.DBAPIError) and error.connection_invalidated:
+        return True
+    # asyncpg errors carry it directly, SQLAlchemy's wrap the driver's.
+    sqlstate = getattr(error, "sqlstate", None) or getattr(
+        getattr(error, "orig", None), "sqlstate", None
+    )
+    if sqlstate:
+        return sqlstate[:2] in TRANSIENT_SQLSTATE_CLASSES
+    return isinstance(error, (exc.OperationalError, exc.InterfaceError))
+
+
+class RefreshTokenLog:
+    """
+    Batched writes of issued and revoked tokens to refresh_tokens, at most
+    flush_interval apart. A batch that fails for a transient reason is
+    retried as it was. Any other failure is taken to be caused by the
+    data: the batch is split in halves until the entry at fault is found,
+    and that one is logged and dropped. Past max_pending queued entries new
+    ones are dropped and logged too: the log trails Redis and is not what
+    refreshing checks.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        flush_interval: float,
+        max_batch: int,
+        max_pending: int,
+        retry_delay: float = 1.0,
+    ) -> None:
+        self._session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.retry_delay = retry_delay
+        self._pending: List[Union[Issued, Revoked]] = []
+        self._wake = asyncio.Event()
+        self._closing = False
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._closing = False
+        self._task = asyncio.create_task(self._run())
+
+    def add(self, entry: Union[Issued, Revoked]) -> None:
+        if len(self._pending) >= self.max_pending:
+            logger.warning(f"Refresh token log is full; dropping {entry}")
+            return
+        self._pending.append(entry)
+        if len(self._pending) >= self.max_batch:
+            self._wake.set()
+
+    async def close(self) -> None:
+        """Write everything queued, then stop."""
+        self._closing = True
+        self._wake.set()
+        if self._task is not None:
+            await self._task
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            while self._pending:
+                batch = self._pending[: self.max_batch]
+                await self._store(batch)
+                del self._pending[: len(batch)]
+            if self._closing:
+                return
+
+    async def _store(self, batch: List[Union[Issued, Revoked]]) -> None:
+        """Write the entries in order, dropping those that cannot be written."""
+        while True:
+            try:
+                await self._write(batch)
+                return
+            except Exception as e:
+                if not is_transient(e):
+                    error = e
+                    break
+                logger.exception(
+                    f"Writing {len(batch)} refresh token entries failed; "
+                    f"retrying: {e}"
+                )
+                await asyncio.sleep(self.retry_delay)
+        if len(batch) == 1:
+            logger.error(
+                f"Dropping refresh token entry {batch[0]} that cannot be "
+                f"written: {error}"
+            )
+            return
+        logger.warning(
+            f"Writing {len(batch)} refresh token entries failed; "
+            f"splitting the batch: {error}"
+        )
+        middle = len(batch) // 2
+        await self._store(batch[:middle])
+        await self._store(batch[middle:])
+
+    async def _write(self, batch: List[Union[Issued, Revoked]]) -> None:
+        issued = [
+            RefreshToken(
+                user_id=uuid.UUID(entry.user_id),
+                token_hash=entry.token_hash,
+                expires_at=entry.expires_at,
+            )
+            for entry in batch
+            if isinstance(entry, Issued)
+        ]
+        revoked = [entry.token_hash for entry in batch if isinstance(entry, Revoked)]
+        async with self._session_factory() as db:
+            if issued:
+                # A batch retried after committing must not log a token twice.
+                existing = set(
+                    (
+                        await db.execute(
+                            select(RefreshToken.token_hash).where(
+                                RefreshToken.token_hash.in_(
+                                    [rt.token_hash for rt in issued]
+                                )
+                            )
+                        )
+                    ).scalars()
+                )
+                db.add_all(rt for rt in issued if rt.token_hash not in existing)
+                # Tokens revoked in this batch must be in the session's view.
+                await db.flush()
+            if revoked:
+                await db.execute(
+                    update(RefreshToken)
+                    .where(RefreshToken.token_hash.in_(revoked))
+                    .values(revoked=True)
+                )
+            await db.commit()
+
+
+async def purge_expired(session_factory, batch_size: int) -> int:
+    """Delete expired rows, batch_size per transaction; returns how many."""
+    now = datetime.now(timezone.utc)
+    purged = 0
+    while True:
+        expired = (
+            select(RefreshToken.id)
+            .where(RefreshToken.expires_at < now)
+            .limit(batch_size)
+            .scalar_subquery()
+        )
+        async with session_factory() as db:
+            result = await db.execute(
+                delete(RefreshToken).where(RefreshToken.id.in_(expired))
+            )
+            await db.commit()
+        purged += result.rowcount
+        if result.rowcount < batch_size:
+            return purged
+        # Let requests run between batches.
+        await asyncio.sleep(0)
+
+
+async def purge_refresh_tokens(
+    session_factory, interval: float, batch_size: int
+) -> None:
+    """Purge expired refresh tokens every `interval` seconds until cancelled."""
+    while True:
+        try:
+            purged = await purge_expired(session_factory, batch_size)
+            if purged:
+                logger.info(f"Purged {purged} expired refresh tokens")
+        except Exception as e:
+            logger.exception(f"Refresh token purge failed: {e}")
+        await asyncio.sleep(interval)
@@ -5,9 +5,19 @@ from typing import Optional
 from jose import jwt, JWTError
 from pathlib import Path
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from cryptography.hazmat.primitives import serialization
 import hashlib
+import uuid
 import os
 from app.core.redis import get_redis
+from app.core.blacklist_filter import INDEX_KEY, VERSION_KEY, BlacklistFilter
+
+blacklist_filter = BlacklistFilter(
+    min_capacity=settings.BLACKLIST_FILTER_MIN_CAPACITY,
+    error_rate=settings.BLACKLIST_FILTER_ERROR_RATE,
+    max_age=3 * settings.BLACKLIST_SYNC_SECONDS,
+)
 
 
 def hash_password(password: str) -> str:
@@ -45,6 +55,18 @@ def _get_private_key() -> str:
     return key
 
 
+@lru_cache(maxsize=2)
+def _parse_private_key(pem: str):
+    # Parsing and checking the key costs ~50x the signature; jose would
+    # otherwise do it on every encode. Keyed on the PEM, so a replaced key
+    # file still takes effect.
+    return serialization.load_pem_private_key(pem.encode(), password=None)
+
+
+def _signing_key():
+    return _parse_private_key(_get_private_key())
+
+
 def _get_public_key() -> str:
     key = _load_key(settings.JWT_PUBLIC_KEY_PATH)
     if not key:
@@ -74,14 +96,24 @@ async def blacklist_token_in_redis(token: str, token_type: str) -> None:
             return
         h = hashlib.sha256(token.encode()).hexdigest()
         key = _blacklist_key_for_token(token_type, h)
-        await r.set(key, b"1", ex=ttl)
+        async with r.pipeline(transaction=False) as pipe:
+            pipe.set(key, b"1", ex=ttl)
+            # Read by the blacklist filters of every instance.
+            pipe.zadd(INDEX_KEY, {h: int(exp)})
+            pipe.incr(VERSION_KEY)
+            # For the services that verify tokens without asking auth.
+            pipe.publish(settings.REVOCATION_CHANNEL, f"{h} {int(exp)}")
+            await pipe.execute()
+        blacklist_filter.add(h)
     except Exception as e:
         raise RuntimeError(f"Failed to blacklist token: {e}")
 
 
 async def is_token_blacklisted(token: str, token_type: str) -> bool:
-    r = get_redis()
     h = hashlib.sha256(token.encode()).hexdigest()
+    if not blacklist_filter.might_contain(h):
+        return False
+    r = get_redis()
     key = _blacklist_key_for_token(token_type, h)
     try:
         exists = await r.exists(key)
@@ -91,7 +123,7 @@ async def is_token_blacklisted(token: str, token_type: str) -> bool:
 
 
 def create_access_token(subject: str, extra_claims: dict | None = None) -> str:
-    private = _get_private_key()
+    private = _signing_key()
     now = datetime.now(timezone.utc)
     exp = now + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     payload = {
@@ -107,7 +139,7 @@ def create_access_token(subject: str, extra_claims: dict | None = None) -> str:
 
 
 def create_refresh_token(subject: str) -> str:
-    private = _get_private_key()
+    private = _signing_key()
     now = datetime.now(timezone.utc)
     exp = now + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
     payload = {
@@ -115,28 +147,36 @@ def create_refresh_token(subject: str) -> str:
         "iat": int(now.timestamp()),
         "exp": int(exp.timestamp()),
         "typ": "refresh",
+        # Tokens issued in the same second must still differ.
+        "jti": uuid.uuid4().hex,
     }
     token = jwt.encode(payload, private, algorithm="RS256")
     return token
 
 
-async def verify_token(token: str, expected_type: str | None = None) -> dict:
+def decode_token(token: str, expected_type: str | None = None) -> dict:
     """
-    Verifies token signature/exp and checks redis blacklist.
-    returns payload dict on success, raises JWTError on invalid signature/exp.
-    returns None if blacklisted (caller should treat as invalid).
+    Verifies token signature/exp and type, without the redis blacklist.
+    raises JWTError if invalid.
     """
     public = _get_public_key()
-    try:
-        payload = jwt.decode(token, public, algorithms=["RS256"])
-    except JWTError as e:
-        raise e
+    payload = jwt.decode(token, public, algorithms=["RS256"])
 
     if expected_type is not None:
         typ = payload.get("typ")
         if typ != expected_type:
 
             raise JWTError("Invalid token type")
+    return payload
+
+
+async def verify_token(token: str, expected_type: str | None = None) -> dict:
+    """
+    Verifies token signature/exp and checks redis blacklist.
+    returns payload dict on success, raises JWTError on invalid signature/exp.
+    returns None if blacklisted (caller should treat as invalid).
+    """
+    payload = decode_token(token, expected_type)
 
     blacklisted = await is_token_blacklisted(token, payload.get("typ", "access"))
     if blacklisted:
@@ -0,0 +1,97 @@
+"""
+Service credentials for calls between services.
+
+A service exchanges its client id and secret (SERVICE_CLIENTS) for a token
+naming the service it will call (aud), valid SERVICE_TOKEN_EXPIRE_SECONDS:
+the client credentials grant, without the form encoding. Tokens are signed
+with their own key, published at /auth/.well-known/service-jwks.json, so
+the receiving service verifies them locally and caches a verified token
+until it expires.
+
+They are RS256 rather than EdDSA: with e=65537 an RSA-2048 signature is
+several times cheaper to verify than an Ed25519 one, and only dearer to
+make, which happens once per token while the receiver verifies on every
+call (see accounts' benchmarks/bench_service_auth.py).
+
+Client secrets are random, not chosen by people, so a sha256 of each is
+stored rather than an argon2 hash. Service tokens are not revocable; their
+short life stands in for it.
+"""
+
+import hashlib
+import hmac
+import time
+import uuid
+from functools import lru_cache
+from typing import Optional
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.rsa import RSAPrivateKey
+from jose import JWTError, jwt
+
+from app.core.config import settings
+from app.core.security import _load_key
+
+SERVICE_KEY_ID = "service-key-1"
+
+
+@lru_cache(maxsize=2)
+def _parse_private_key(pem: str) -> RSAPrivateKey:
+    key = serialization.load_pem_private_key(pem.encode(), password=None)
+    if not isinstance(key, RSAPrivateKey):
+        raise RuntimeError("Service token key is not an RSA key")
+    return key
+
+
+def _signing_key() -> Optional[RSAPrivateKey]:
+    pem = _load_key(settings.SERVICE_TOKEN_PRIVATE_KEY_PATH)
+    return _parse_private_key(pem) if pem else None
+
+
+def enabled() -> bool:
+    return _signing_key() is not None
+
+
+def service_public_key():
+    key = _signing_key()
+    return key.public_key() if key is not None else None
+
+
+def check_client(client_id: str, client_secret: str) -> bool:
+    expected = settings.SERVICE_CLIENTS.get(client_id)
+    given = hashlib.sha256(client_secret.encode()).hexdigest()
+    # Compared even for unknown clients, so timing does not tell them apart.
+    return hmac.compare_digest(expected or "", given) and expected is not None
+
+
+def create_service_token(client_id: str, audience: str) -> str:
+    key = _signing_key()
+    if key is None:
+        raise RuntimeError("Service tokens are not configured")
+    now = int(time.time())
+    payload = {
+        "sub": client_id,
+        "aud": audience,
+        "iat": now,
+        "exp": now + settings.SERVICE_TOKEN_EXPIRE_SECONDS,
+        "jti": str(uuid.uuid4()),
+        "typ": "service",
+    }
+    return jwt.encode(payload, key, algorithm="RS256", headers={"kid": SERVICE_KEY_ID})
+
+
+def verify_service_token(token: str, audience: str) -> dict:
+    """Claims of a service token issued here for `audience`; raises JWTError."""
+    key = service_public_key()
+    if key is None:
+        raise JWTError("Service tokens are not configured")
+    claims = jwt.decode(
+        token,
+        key,
+        algorithms=["RS256"],
+        audience=audience,
+        options={"require_exp": True},
+    )
+    if claims.get("typ") != "service":
+        raise JWTError("Not a service token")
+    return claims
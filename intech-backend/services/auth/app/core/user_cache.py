@@ -0,0 +1,127 @@
+"""
+Read-through cache of user profiles.
+
+Profiles (UserOut, never the password hash) are looked up in a small
+in-process LRU, then in redis under user:<id>, and only then in the users
+table, with one query for all that are still missing. What the table
+returns is written back to both; ids it does not have are not cached.
+
+Redis entries live USER_CACHE_TTL_SECONDS and local ones
+USER_CACHE_LOCAL_TTL_SECONDS. invalidate deletes the redis entry and this
+process's local one, so after an update this instance answers from the
+table at once and other instances within the local TTL. Without redis the
+local LRU is used alone.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+from redis.asyncio import Redis
+
+from app.core.logger import logging
+from app.core.redis import get_redis
+from app.schemas.user_schema import UserOut
+
+logger = logging.getLogger(__name__)
+
+Loader = Callable[[List[str]], Awaitable[Iterable[UserOut]]]
+
+
+def user_key(user_id: str) -> str:
+    return f"user:{user_id}"
+
+
+class UserCache:
+    def __init__(self, max_entries: int, local_ttl: float, ttl: int) -> None:
+        self.max_entries = max_entries
+        self.local_ttl = local_ttl
+        self.ttl = ttl
+        # User id -> (monotonic expiry, profile), least recently used first.
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def _get_local(self, user_id: str) -> Optional[UserOut]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        expires_at, user = entry
+        if expires_at <= time.monotonic():
+            del self._entries[user_id]
+            return None
+        self._entries.move_to_end(user_id)
+        return user
+
+    def _put_local(self, user: UserOut) -> None:
+        self._entries[user.id] = (time.monotonic() + self.local_ttl, user)
+        self._entries.move_to_end(user.id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    @staticmethod
+    def _redis() -> Optional[Redis]:
+        try:
+            return get_redis()
+        except RuntimeError:
+            return None
+
+    async def get_many(
+        self, user_ids: Iterable[str], load: Loader
+    ) -> Dict[str, UserOut]:
+        """Profiles of those of `user_ids` that exist, by id."""
+        found: Dict[str, UserOut] = {}
+        missing = []
+        for user_id in dict.fromkeys(user_ids):
+            user = self._get_local(user_id)
+            if user is not None:
+                found[user_id] = user
+            else:
+                missing.append(user_id)
+        if not missing:
+            return found
+
+        redis = self._redis()
+        if redis is not None:
+            try:
+                values = await redis.mget([user_key(i) for i in missing])
+            except Exception as e:
+                logger.warning(f"User cache read failed (redis): {e}")
+                values = [None] * len(missing)
+            still_missing = []
+            for user_id, value in zip(missing, values):
+                if value is None:
+                    still_missing.append(user_id)
+                    continue
+                user = UserOut.model_validate_json(value)
+                self._put_local(user)
+                found[user_id] = user
+            missing = still_missing
+        if not missing:
+            return found
+
+        loaded = list(await load(missing))
+        for user in loaded:
+            self._put_local(user)
+            found[user.id] = user
+        if redis is not None and loaded:
+            try:
+                async with redis.pipeline(transaction=False) as pipe:
+                    for user in loaded:
+                        pipe.set(user_key(user.id), user.model_dump_json(), ex=self.ttl)
+                    await pipe.execute()
+            except Exception as e:
+                logger.warning(f"User cache write failed (redis): {e}")
+        return found
+
+    async def get(self, user_id: str, load: Loader) -> Optional[UserOut]:
+        return (await self.get_many([user_id], load)).get(user_id)
+
+    async def invalidate(self, user_id: str) -> None:
+        """Forget a user; call after committing a change to them."""
+        self._entries.pop(user_id, None)
+        redis = self._redis()
+        if redis is None:
+            return
+        try:
+            await redis.delete(user_key(user_id))
+        except Exception as e:
+            logger.warning(f"User cache invalidation failed (redis): {e}")
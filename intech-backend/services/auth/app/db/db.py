@@ -2,9 +2,35 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.core.config import settings
+from app.core.metrics import InstrumentedAsyncPool, register_engine
 
-engine = create_async_engine(settings.DATABASE_URL, future=True, echo=False)
+
+def engine_options(url: str) -> dict:
+    """Pool settings for Postgres; other backends keep SQLAlchemy defaults."""
+    if not url.startswith("postgresql"):
+        return {}
+    return {
+        "poolclass": InstrumentedAsyncPool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "connect_args": {
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        },
+    }
+
+
+engine = create_async_engine(
+    settings.DATABASE_URL,
+    future=True,
+    echo=False,
+    **engine_options(settings.DATABASE_URL)
+)
 AsyncSessionLocal = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+register_engine("primary", engine)
 
 Base = declarative_base()
 
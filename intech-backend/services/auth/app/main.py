@@ -1,12 +1,22 @@
 # app/main.py
+import asyncio
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
 
 from app.core.config import settings
-from app.core.redis import init_redis, _redis_client
+from app.core.blacklist_filter import sync_blacklist_filter
+from app.core.client_ip import trusted_proxies
+from app.core.login_guard import password_verifier
+from app.core.refresh_tokens import purge_refresh_tokens
+from app.core.security import blacklist_filter
+from app.db.db import AsyncSessionLocal
+from app.services.user_service import refresh_log
+from app.core.redis import get_redis, init_redis, _redis_client
 from app.core.logger import configure_logging
 from app.api.v1 import auth as auth_router
 from app.api.v1 import jwks as jwks
+from app.api.v1 import metrics as metrics_router
+from app.api.v1 import users as users_router
 
 
 @asynccontextmanager
@@ -19,9 +29,34 @@ async def lifespan(app: FastAPI):
 
     app.include_router(auth_router.router)
     app.include_router(jwks.router, prefix="/auth", tags=["jwks"])
+    app.include_router(metrics_router.router)
+    app.include_router(users_router.router)
+
+    await asyncio.to_thread(trusted_proxies.resolve)
+    await password_verifier.calibrate()
+    refresh_log.start()
+    purge = asyncio.create_task(
+        purge_refresh_tokens(
+            AsyncSessionLocal,
+            settings.REFRESH_PURGE_INTERVAL_SECONDS,
+            settings.REFRESH_PURGE_BATCH,
+        )
+    )
+
+    blacklist_sync = None
+    if settings.REDIS_URL:
+        blacklist_sync = asyncio.create_task(
+            sync_blacklist_filter(
+                blacklist_filter, get_redis(), settings.BLACKLIST_SYNC_SECONDS
+            )
+        )
 
     yield
 
+    if blacklist_sync is not None:
+        blacklist_sync.cancel()
+    purge.cancel()
+    await refresh_log.close()
     try:
         if _redis_client:
             await _redis_client.close()
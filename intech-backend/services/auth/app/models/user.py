@@ -36,5 +36,6 @@ class RefreshToken(Base):
     created_at = sa.Column(
         sa.DateTime(timezone=True), default=datetime.now(timezone.utc), nullable=False
     )
-    expires_at = sa.Column(sa.DateTime(timezone=True), nullable=False)
+    # Indexed for the purge of expired rows.
+    expires_at = sa.Column(sa.DateTime(timezone=True), nullable=False, index=True)
     meta = sa.Column(JSONB, nullable=True)
@@ -1,6 +1,7 @@
 # app/schemas.py
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional
+from typing import List, Optional
+from uuid import UUID
 from datetime import datetime
 
 
@@ -20,6 +21,16 @@ class RefreshIn(BaseModel):
     refresh_token: str
 
 
+class ServiceTokenIn(BaseModel):
+    client_id: str
+    client_secret: str
+    audience: str
+
+
+class UserBatchIn(BaseModel):
+    ids: List[UUID] = Field(min_length=1)
+
+
 # Responses
 class UserOut(BaseModel):
     id: str
@@ -35,3 +46,9 @@ class TokenOut(BaseModel):
     refresh_token: str
     token_type: str = "bearer"
     expires_in: int
+
+
+class ServiceTokenOut(BaseModel):
+    access_token: str
+    token_type: str = "bearer"
+    expires_in: int
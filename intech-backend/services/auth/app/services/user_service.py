@@ -1,15 +1,52 @@
 # app/services/user_service.py
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from app.models.user import User, RefreshToken
+from app.models.user import User
+from app.core.config import settings
+from app.core.login_guard import password_verifier
+from app.core.redis import get_redis
+from app.core.refresh_tokens import (
+    Issued,
+    RefreshTokenLog,
+    RefreshTokenStore,
+    Revoked,
+    token_claims,
+)
+from app.core.user_cache import UserCache
 from app.core.security import (
     hash_password,
-    verify_password,
     create_access_token,
     create_refresh_token,
     hash_refresh_token,
 )
+from app.db.db import AsyncSessionLocal
+from app.schemas.user_schema import UserOut
 from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+import uuid
+
+REFRESH_TTL = settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 3600
+
+refresh_log = RefreshTokenLog(
+    AsyncSessionLocal,
+    flush_interval=settings.REFRESH_LOG_FLUSH_INTERVAL_SECONDS,
+    max_batch=settings.REFRESH_LOG_BATCH,
+    max_pending=settings.REFRESH_LOG_MAX_PENDING,
+)
+_refresh_store: RefreshTokenStore | None = None
+
+user_cache = UserCache(
+    max_entries=settings.USER_CACHE_MAX_ENTRIES,
+    local_ttl=settings.USER_CACHE_LOCAL_TTL_SECONDS,
+    ttl=settings.USER_CACHE_TTL_SECONDS,
+)
+
+
+def get_refresh_store() -> RefreshTokenStore:
+    global _refresh_store
+    if _refresh_store is None:
+        _refresh_store = RefreshTokenStore(get_redis())
+    return _refresh_store
 
 
 async def create_user(
@@ -32,79 +69,120 @@ async def authenticate(db: AsyncSession, email: str, password: str) -> User | No
     q = select(User).where(User.email == email)
     res = await db.execute(q)
     user = res.scalars().first()
+    # Give the connection back before the slow part; the user's loaded
+    # attributes stay readable.
+    await db.close()
     if not user:
+        # Nothing to verify; take as long as if there were.
+        await password_verifier.pace()
         return None
-    if not verify_password(user.hashed_password, password):
+    if not await password_verifier.verify(user.hashed_password, password):
         return None
     return user
 
 
-async def create_tokens_and_store(db: AsyncSession, user) -> dict:
-    access = create_access_token(
-        str(user.id),
-        extra_claims={
-            "email": user.email,
-            "role": "user",
-            "is_superuser": user.is_superuser,
-        },
+def user_out(user: User) -> UserOut:
+    return UserOut(
+        id=str(user.id),
+        email=user.email,
+        full_name=user.full_name,
+        is_active=user.is_active,
+        is_superuser=user.is_superuser,
+        created_at=user.created_at,
     )
 
-    refresh = create_refresh_token(str(user.id))
-    hashed = hash_refresh_token(refresh)
 
-    expires_at = datetime.now(timezone.utc) + timedelta(days=14)
-    rt = RefreshToken(
-        user_id=user.id,
-        token_hash=hashed,
-        expires_at=expires_at,
-    )
+async def get_users(db: AsyncSession, user_ids: List[str]) -> Dict[str, UserOut]:
+    """Profiles of those of `user_ids` that exist, from the cache if there."""
 
-    db.add(rt)
-    await db.commit()
+    async def load(missing: List[str]) -> List[UserOut]:
+        res = await db.execute(
+            select(User).where(User.id.in_([uuid.UUID(i) for i in missing]))
+        )
+        return [user_out(user) for user in res.scalars()]
 
-    return {"access_token": access, "refresh_token": refresh}
+    return await user_cache.get_many(user_ids, load)
 
 
-async def revoke_refresh(db: AsyncSession, raw_token: str) -> bool:
-    hashed = hash_refresh_token(raw_token)
-    q = select(RefreshToken).where(RefreshToken.token_hash == hashed)
-    res = await db.execute(q)
-    rt = res.scalars().first()
-    if not rt:
-        return False
-    rt.revoked = True
+async def update_user(db: AsyncSession, user_id: str, **values) -> User | None:
+    """
+    Change a user's columns. Users must be updated through here, so that
+    their cached profile is dropped once the change is committed.
+    """
+    user = await db.get(User, user_id)
+    if user is None:
+        return None
+    for name, value in values.items():
+        setattr(user, name, value)
     await db.commit()
-    return True
+    await user_cache.invalidate(str(user_id))
+    # Refreshing re-reads the claims from here on.
+    await get_refresh_store().bump_claims_version(str(user_id))
+    return user
 
 
-async def rotate_refresh(db: AsyncSession, raw_token: str) -> dict | None:
+def _access_token(claims: dict) -> str:
+    return create_access_token(
+        claims["sub"],
+        extra_claims={
+            "email": claims["email"],
+            "role": "user",
+            "is_superuser": claims["is_superuser"],
+        },
+    )
 
-    from app.core.security import verify_token
 
-    try:
-        payload = verify_token(raw_token)
-    except Exception:
-        return None
-    if payload.get("typ") != "refresh":
-        return None
-    user_id = payload.get("sub")
-    if not user_id:
-        return None
+def _refresh_expires_at() -> datetime:
+    return datetime.now(timezone.utc) + timedelta(seconds=REFRESH_TTL)
 
-    hashed = hash_refresh_token(raw_token)
-    q = select(RefreshToken).where(RefreshToken.token_hash == hashed)
-    res = await db.execute(q)
-    rt = res.scalars().first()
-    if not rt or rt.revoked or rt.expires_at < datetime.now(timezone.utc):
-        return None
 
-    rt.revoked = True
+async def create_tokens_and_store(user) -> dict:
+    claims = token_claims(user)
+    access = _access_token(claims)
+    refresh = create_refresh_token(claims["sub"])
+    hashed = hash_refresh_token(refresh)
 
-    q2 = select(User).where(User.id == user_id)
-    res2 = await db.execute(q2)
-    user = res2.scalars().first()
-    if not user:
+    await get_refresh_store().add(hashed, claims, REFRESH_TTL)
+    refresh_log.add(Issued(hashed, claims["sub"], _refresh_expires_at()))
+    return {"access_token": access, "refresh_token": refresh}
+
+
+async def revoke_refresh(raw_token: str) -> bool:
+    hashed = hash_refresh_token(raw_token)
+    revoked = await get_refresh_store().revoke(hashed)
+    if revoked:
+        refresh_log.add(Revoked(hashed))
+    return revoked
+
+
+async def rotate_refresh(raw_token: str, payload: dict) -> dict | None:
+    """
+    Exchange a refresh token, already verified into `payload`, for a new
+    pair in one redis round trip. The user's claims come from the token's
+    entry rather than the database, unless the user has changed since
+    they were read.
+    """
+    user_id = payload.get("sub")
+    if payload.get("typ") != "refresh" or not user_id:
         return None
 
-    tokens = await create_tokens_and_store(db, user)
-    return tokens
+    # Signed before knowing the old token is live, so that swapping the
+    # two is a single script call.
+    refresh = create_refresh_token(user_id)
+    old_hash, new_hash = hash_refresh_token(raw_token), hash_refresh_token(refresh)
+    store = get_refresh_store()
+    rotated = await store.rotate(user_id, old_hash, new_hash, REFRESH_TTL)
+    if rotated is None:
+        return None
+    refresh_log.add(Revoked(old_hash))
+
+    claims = rotated.claims
+    if not rotated.stored:
+        async with AsyncSessionLocal() as db:
+            user = await db.get(User, uuid.UUID(user_id))
+        if user is None or not user.is_active:
+            return None
+        claims = {**token_claims(user), "ver": rotated.version}
+        await store.add(new_hash, claims, REFRESH_TTL)
+    refresh_log.add(Issued(new_hash, claims["sub"], _refresh_expires_at()))
+    return {"access_token": _access_token(claims), "refresh_token": refresh}
@@ -0,0 +1,176 @@
+"""
+Credential stuffing against POST /auth/login.
+
+    python -m benchmarks.bench_login --seconds 30
+    python -m benchmarks.bench_login --seconds 30 --unguarded
+    python -m benchmarks.bench_login --redis-url redis://localhost:6379/15
+
+Runs the app in process over ASGI, with users in a SQLite file in a temp
+directory and redis from --redis-url (a scratch database: login keys are
+written to it) or, without it, fakeredis. --attackers clients, each with
+its own IP, send logins as fast as they are answered for --seconds: most
+for emails that do not exist, the rest wrong passwords for real users. A
+real user logs in once a second from another IP throughout.
+
+Reported are the attempts and how they were answered, how many argon2
+verifications ran, the CPU the process used (all threads, so the client's
+share is included) as cores busy on average, and the real user's login
+latency. --unguarded turns off the throttling and the limit on concurrent
+verifications, for comparison with the service before them.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import httpx
+
+KEYS_DIR = os.path.join(os.path.dirname(__file__), "..", "keys")
+
+
+async def run(args, workdir: str) -> None:
+    # Imported late: app settings read the environment set up in main().
+    from sqlalchemy import insert
+
+    from app.api.v1 import auth as auth_router
+    from app.core import login_guard as guard
+    from app.core import redis as redis_module
+    from app.core.security import hash_password
+    from app.db.db import engine
+    from app.main import app
+    from app.models.user import User
+
+    # The app includes its routers in its lifespan, which is not run here:
+    # it would also start the refresh token log and purge on this database.
+    app.include_router(auth_router.router)
+    if args.redis_url:
+        redis_module.init_redis(args.redis_url)
+        await redis_module.get_redis().flushdb()
+    else:
+        import fakeredis
+
+        redis_module._redis_client = fakeredis.FakeAsyncRedis(max_connections=10_000)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(User.__table__.create)
+        hashed = hash_password("correct horse battery staple")
+        await conn.execute(
+            insert(User),
+            [
+                {"email": f"user{i}@example.com", "hashed_password": hashed}
+                for i in range(args.users)
+            ],
+        )
+
+    verifier = guard.password_verifier
+    if args.unguarded:
+
+        async def allow(*_):
+            return None
+
+        guard.login_guard.check = allow
+        guard.login_guard.record_success = allow
+        verifier._slots = asyncio.Semaphore(1_000_000)
+        verifier.max_queued = 1_000_000
+    await verifier.calibrate()
+    verifier.verified = 0
+
+    outcomes: Counter = Counter()
+    deadline = time.monotonic() + args.seconds
+
+    def client(ip: str) -> httpx.AsyncClient:
+        transport = httpx.ASGITransport(app=app, client=(ip, 40000))
+        return httpx.AsyncClient(transport=transport, base_url="http://auth")
+
+    async def attacker(n: int) -> None:
+        async with client(f"10.{n // 250}.{n % 250}.1") as c:
+            while time.monotonic() < deadline:
+                if random.random() < args.known_share:
+                    email = f"user{random.randrange(args.users)}@example.com"
+                else:
+                    email = f"victim{random.randrange(10**9)}@example.com"
+                resp = await c.post(
+                    "/auth/login", json={"email": email, "password": "hunter2"}
+                )
+                outcomes[resp.status_code] += 1
+                if resp.status_code == 429:
+                    # A patient attacker honours nothing; a naive one retries
+                    # at once. Either way the guard answers without hashing.
+                    await asyncio.sleep(0)
+
+    latencies = []
+
+    async def real_user() -> None:
+        async with client("192.0.2.10") as c:
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                resp = await c.post(
+                    "/auth/login",
+                    json={
+                        "email": "user0@example.com",
+                        "password": "correct horse battery staple",
+                    },
+                )
+                latencies.append((time.perf_counter() - started, resp.status_code))
+                await asyncio.sleep(1)
+
+    cpu, wall = time.process_time(), time.perf_counter()
+    await asyncio.gather(real_user(), *(attacker(n) for n in range(args.attackers)))
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+
+    attempts = sum(outcomes.values())
+    print(
+        f"{attempts} attempts in {wall:.1f}s ({attempts / wall:,.0f}/s) from "
+        f"{args.attackers} IPs, {'unguarded' if args.unguarded else 'guarded'}"
+    )
+    print("  answers: " + ", ".join(f"{k}: {v}" for k, v in sorted(outcomes.items())))
+    print(
+        f"  argon2 verifications: {verifier.verified} "
+        f"({verifier.typical_seconds * 1000:.0f}ms each)"
+    )
+    print(f"  CPU: {cpu:.1f}s, {cpu / wall:.2f} cores on average")
+    ok = sorted(t for t, code in latencies if code == 200)
+    failed = len(latencies) - len(ok)
+    if ok:
+        print(
+            f"  real user: {len(ok)} logins, p50 {ok[len(ok) // 2] * 1000:.0f}ms, "
+            f"max {ok[-1] * 1000:.0f}ms, {failed} refused"
+        )
+    else:
+        print(f"  real user: all {failed} logins refused")
+    await redis_module.get_redis().aclose()
+    await engine.dispose()
+
+
+def main(args) -> None:
+    workdir = tempfile.mkdtemp(prefix="bench-login-")
+    os.environ.update(
+        {
+            "DATABASE_URL": f"sqlite+aiosqlite:///{workdir}/auth.db",
+            "DATABASE_URL_SYNC": f"sqlite:///{workdir}/auth.db",
+            "JWT_PRIVATE_KEY_PATH": os.path.join(KEYS_DIR, "jwt-private.pem"),
+            "JWT_PUBLIC_KEY_PATH": os.path.join(KEYS_DIR, "jwt-public.pem"),
+            "LOG_DIR": workdir,
+        }
+    )
+    try:
+        asyncio.run(run(args, workdir))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--attackers", type=int, default=20)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--known-share", type=float, default=0.1)
+    parser.add_argument("--redis-url", help="scratch redis database")
+    parser.add_argument("--unguarded", action="store_true")
+    main(parser.parse_args(sys.argv[1:]))
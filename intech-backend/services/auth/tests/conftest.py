@@ -0,0 +1,49 @@
+import os
+import tempfile
+
+import pytest_asyncio
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.ext.compiler import compiles
+
+_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+_keys = tempfile.mkdtemp()
+with open(os.path.join(_keys, "private.pem"), "wb") as f:
+    f.write(
+        _key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+    )
+with open(os.path.join(_keys, "public.pem"), "wb") as f:
+    f.write(
+        _key.public_key().public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+    )
+
+os.environ["DATABASE_URL"] = "sqlite+aiosqlite:///:memory:"
+os.environ["DATABASE_URL_SYNC"] = "sqlite:///:memory:"
+os.environ["JWT_PRIVATE_KEY_PATH"] = os.path.join(_keys, "private.pem")
+os.environ["JWT_PUBLIC_KEY_PATH"] = os.path.join(_keys, "public.pem")
+
+from app.db.db import Base
+import app.models.user  # noqa: F401
+
+
+@compiles(JSONB, "sqlite")
+def _jsonb_on_sqlite(type_, compiler, **kw):
+    return "JSON"
+
+
+@pytest_asyncio.fixture(scope="function")
+async def session_factory():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
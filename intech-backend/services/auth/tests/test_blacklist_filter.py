@@ -0,0 +1,123 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+
+import fakeredis
+import pytest
+import pytest_asyncio
+
+from app.core.blacklist_filter import (
+    INDEX_KEY,
+    VERSION_KEY,
+    BlacklistFilter,
+    BloomFilter,
+)
+
+pytestmark = pytest.mark.asyncio
+
+
+def _hash(n) -> str:
+    return hashlib.sha256(str(n).encode()).hexdigest()
+
+
+def _expiry(seconds: float) -> int:
+    return int(datetime.now(timezone.utc).timestamp() + seconds)
+
+
+@pytest_asyncio.fixture
+async def redis():
+    client = fakeredis.FakeAsyncRedis()
+    yield client
+    await client.aclose()
+
+
+async def _revoke(redis, token_hash, expires_at):
+    await redis.zadd(INDEX_KEY, {token_hash: expires_at})
+    await redis.incr(VERSION_KEY)
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=5000, error_rate=0.01)
+    added = [_hash(i) for i in range(5000)]
+    for token_hash in added:
+        bloom.add(token_hash)
+    assert all(token_hash in bloom for token_hash in added)
+
+    others = [_hash(f"other-{i}") for i in range(20_000)]
+    false_positives = sum(token_hash in bloom for token_hash in others)
+    assert false_positives / len(others) < 0.03
+
+
+async def test_rebuilds_only_when_the_version_moves(redis):
+    blacklist = BlacklistFilter(min_capacity=100, error_rate=0.001, max_age=60)
+    # Never synced: everything must be looked up.
+    assert blacklist.might_contain(_hash("anything"))
+
+    await _revoke(redis, _hash("revoked"), _expiry(3600))
+    await _revoke(redis, _hash("expired"), _expiry(-1))
+    assert await blacklist.sync(redis)
+    assert blacklist.might_contain(_hash("revoked"))
+    assert not blacklist.might_contain(_hash("never revoked"))
+    # Expired members are dropped from the index as it is read.
+    assert await redis.zrange(INDEX_KEY, 0, -1) == [_hash("revoked").encode()]
+
+    # Unchanged version: nothing is read again.
+    await redis.zadd(INDEX_KEY, {_hash("unannounced"): _expiry(3600)})
+    assert not await blacklist.sync(redis)
+    assert not blacklist.might_contain(_hash("unannounced"))
+
+    # Another instance revokes a token and bumps the version.
+    await _revoke(redis, _hash("elsewhere"), _expiry(3600))
+    assert await blacklist.sync(redis)
+    assert blacklist.might_contain(_hash("elsewhere"))
+    assert blacklist.might_contain(_hash("unannounced"))
+
+
+async def test_stale_filter_answers_maybe(redis):
+    blacklist = BlacklistFilter(min_capacity=100, error_rate=0.001, max_age=60)
+    await blacklist.sync(redis)
+    assert not blacklist.might_contain(_hash("token"))
+    blacklist._synced_at = time.monotonic() - 61
+    assert not blacklist.ready
+    assert blacklist.might_contain(_hash("token"))
+
+
+class AddWhileReading:
+    """Redis whose index read lets a local revocation slip in first."""
+
+    def __init__(self, redis, blacklist, token_hash):
+        self.redis = redis
+        self.blacklist = blacklist
+        self.token_hash = token_hash
+
+    async def get(self, key):
+        return await self.redis.get(key)
+
+    def pipeline(self, **kwargs):
+        pipe = self.redis.pipeline(**kwargs)
+        execute = pipe.execute
+
+        async def execute_after_add():
+            self.blacklist.add(self.token_hash)
+            return await execute()
+
+        pipe.execute = execute_after_add
+        return pipe
+
+
+async def test_local_add_during_a_rebuild_is_kept(redis):
+    blacklist = BlacklistFilter(min_capacity=100, error_rate=0.001, max_age=60)
+    await _revoke(redis, _hash("old"), _expiry(3600))
+    await blacklist.sync(redis)
+
+    # Revoked here while the rebuild reads an index that does not list it.
+    await redis.incr(VERSION_KEY)
+    racing = AddWhileReading(redis, blacklist, _hash("new"))
+    assert await blacklist.sync(racing)
+    assert blacklist.might_contain(_hash("new"))
+    assert blacklist.might_contain(_hash("old"))
+    assert blacklist._added_during_sync is None
+
+    # Outside a sync, adds go straight into the filter.
+    blacklist.add(_hash("later"))
+    assert blacklist.might_contain(_hash("later"))
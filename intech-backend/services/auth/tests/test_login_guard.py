@@ -0,0 +1,116 @@
+import asyncio
+
+import fakeredis
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.core import login_guard as guard
+from app.core.client_ip import TrustedProxies
+from app.core.config import settings
+from app.core.login_guard import LoginGuard
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest_asyncio.fixture
+async def redis(monkeypatch):
+    client = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(guard, "get_redis", lambda: client)
+    yield client
+    await client.aclose()
+
+
+async def _admitted(login_guard, email, ip):
+    try:
+        await login_guard.check(email, ip)
+        return True
+    except HTTPException as e:
+        assert e.status_code == 429
+        assert int(e.headers["Retry-After"]) >= 1
+        return False
+
+
+async def test_concurrent_attempts_are_counted_before_any_is_checked(redis):
+    login_guard = LoginGuard()
+    admitted = await asyncio.gather(
+        *(_admitted(login_guard, "ada@example.com", "1.2.3.4") for _ in range(10))
+    )
+    # The attempt past LOGIN_ACCOUNT_DELAY_AFTER sets the delay that refuses
+    # all the others, though none of them had failed yet.
+    assert sum(admitted) == settings.LOGIN_ACCOUNT_DELAY_AFTER + 1
+    email_fail, ip_fail, _, _ = login_guard._keys("ada@example.com", "1.2.3.4")
+    assert int(await redis.get(email_fail)) == settings.LOGIN_ACCOUNT_DELAY_AFTER + 1
+    assert int(await redis.get(ip_fail)) == settings.LOGIN_ACCOUNT_DELAY_AFTER + 1
+
+
+async def test_success_refunds_the_attempt(redis):
+    login_guard = LoginGuard()
+    email_fail, ip_fail, email_next, _ = login_guard._keys("Ada@example.com ", "ip")
+    await login_guard.check("bob@example.com", "ip")
+    await login_guard.check("ada@example.com", "ip")
+    assert int(await redis.get(ip_fail)) == 2
+
+    await login_guard.record_success("ADA@example.com", "ip")
+    assert await redis.get(email_fail) is None
+    assert await redis.get(email_next) is None
+    # Only the successful attempt is taken off the IP's count.
+    assert int(await redis.get(ip_fail)) == 1
+    await login_guard.record_success("ada@example.com", "ip")
+    await login_guard.record_success("ada@example.com", "ip")
+    assert int(await redis.get(ip_fail)) == 0
+
+
+async def test_locked_out_email_is_refused_without_counting(redis):
+    login_guard = LoginGuard()
+    email_fail, ip_fail, _, _ = login_guard._keys("ada@example.com", "ip")
+    await redis.set(email_fail, settings.LOGIN_ACCOUNT_LOCKOUT, ex=60)
+
+    with pytest.raises(HTTPException) as refused:
+        await login_guard.check("ada@example.com", "ip")
+    assert 55 <= int(refused.value.headers["Retry-After"]) <= 60
+    assert int(await redis.get(email_fail)) == settings.LOGIN_ACCOUNT_LOCKOUT
+    assert await redis.get(ip_fail) is None
+
+
+async def test_logins_are_let_through_without_redis(monkeypatch):
+    def down():
+        raise RuntimeError("Redis client not initialized")
+
+    monkeypatch.setattr(guard, "get_redis", down)
+    login_guard = LoginGuard()
+    for _ in range(settings.LOGIN_ACCOUNT_LOCKOUT + 1):
+        await login_guard.check("ada@example.com", "ip")
+    await login_guard.record_success("ada@example.com", "ip")
+
+
+def _request(peer, *forwarded):
+    headers = [(b"x-forwarded-for", value.encode()) for value in forwarded]
+    return Request({"type": "http", "client": (peer, 40000), "headers": headers})
+
+
+def test_client_ip_is_the_rightmost_untrusted_hop():
+    proxies = TrustedProxies(["10.0.0.0/8", "192.168.1.5"])
+
+    # A peer that is not a proxy is the client, whatever it sends.
+    assert proxies.client_ip(_request("203.0.113.9", "1.1.1.1")) == "203.0.113.9"
+    # Without the header, the proxy itself.
+    assert proxies.client_ip(_request("10.0.0.1")) == "10.0.0.1"
+    # Spoofed entries to the left of what the proxies appended are ignored.
+    request = _request("10.0.0.1", "6.6.6.6, 198.51.100.7, 192.168.1.5")
+    assert proxies.client_ip(request) == "198.51.100.7"
+    # Repeated headers read as one list.
+    request = _request("10.0.0.1", "6.6.6.6", "198.51.100.7", "10.2.3.4")
+    assert proxies.client_ip(request) == "198.51.100.7"
+    # Garbage is not an address, so not a trusted one either.
+    assert proxies.client_ip(_request("10.0.0.1", "6.6.6.6, junk")) == "junk"
+    # Every hop a proxy: the leftmost is as close to the client as known.
+    assert proxies.client_ip(_request("10.0.0.1", "10.9.9.9, 10.0.0.2")) == "10.9.9.9"
+
+
+def test_trusted_proxies_by_host_name():
+    proxies = TrustedProxies(["localhost", "no-such-host.invalid"])
+    assert proxies.is_trusted("127.0.0.1")
+    assert not proxies.is_trusted("127.0.0.2")
+    assert proxies.client_ip(_request("127.0.0.1", "198.51.100.7")) == "198.51.100.7"
@@ -0,0 +1,121 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import fakeredis
+import pytest
+import pytest_asyncio
+from sqlalchemy import exc, select
+
+from app.core import security
+from app.core.refresh_tokens import (
+    Issued,
+    RefreshTokenLog,
+    RefreshTokenStore,
+    Revoked,
+    claims_version_key,
+)
+from app.models.user import RefreshToken, User
+from app.services import user_service
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest_asyncio.fixture
+async def tokens(session_factory, monkeypatch):
+    redis = fakeredis.FakeAsyncRedis()
+    log = RefreshTokenLog(session_factory, 0.01, max_batch=100, max_pending=100)
+    monkeypatch.setattr(user_service, "_refresh_store", RefreshTokenStore(redis))
+    monkeypatch.setattr(user_service, "refresh_log", log)
+    monkeypatch.setattr(user_service, "AsyncSessionLocal", session_factory)
+    async with session_factory() as db:
+        user = User(email="ada@example.com", hashed_password="x", full_name="Ada")
+        db.add(user)
+        await db.commit()
+    yield user, redis, log
+    await redis.aclose()
+
+
+async def _refresh(raw):
+    return await user_service.rotate_refresh(raw, security.decode_token(raw))
+
+
+async def test_rotation_is_single_use(tokens):
+    user, redis, log = tokens
+    first = await user_service.create_tokens_and_store(user)
+
+    second = await _refresh(first["refresh_token"])
+    assert second is not None
+    claims = security.decode_token(second["access_token"])
+    assert claims["sub"] == str(user.id)
+    assert claims["email"] == "ada@example.com"
+
+    # Replaying the consumed token finds nothing; its successor still works.
+    assert await _refresh(first["refresh_token"]) is None
+    assert await _refresh(second["refresh_token"]) is not None
+
+    old = security.hash_refresh_token(first["refresh_token"])
+    assert Revoked(old) in log._pending
+
+
+async def test_revoked_token_cannot_refresh(tokens):
+    user, redis, log = tokens
+    pair = await user_service.create_tokens_and_store(user)
+
+    assert await user_service.revoke_refresh(pair["refresh_token"])
+    assert not await user_service.revoke_refresh(pair["refresh_token"])
+    assert await _refresh(pair["refresh_token"]) is None
+
+
+async def test_claims_are_read_again_after_the_user_changes(tokens, session_factory):
+    user, redis, log = tokens
+    pair = await user_service.create_tokens_and_store(user)
+    # The login entry carries no stamp: the first refresh reads the user.
+    pair = await _refresh(pair["refresh_token"])
+
+    async with session_factory() as db:
+        await user_service.update_user(db, user.id, is_superuser=True)
+    assert await redis.get(claims_version_key(str(user.id))) == b"1"
+
+    pair = await _refresh(pair["refresh_token"])
+    assert security.decode_token(pair["access_token"])["is_superuser"] is True
+    # Stamped with the new version, the next refresh copies the entry.
+    pair = await _refresh(pair["refresh_token"])
+    assert security.decode_token(pair["access_token"])["is_superuser"] is True
+
+
+async def test_log_drops_only_the_entry_that_cannot_be_written(session_factory):
+    expires_at = datetime.now(timezone.utc) + timedelta(days=1)
+    user_id = str(uuid.uuid4())
+    log = RefreshTokenLog(session_factory, 0.01, max_batch=100, max_pending=100)
+    log.add(Issued("a", user_id, expires_at))
+    log.add(Issued("b", "not-a-uuid", expires_at))
+    log.add(Issued("c", user_id, expires_at))
+    log.add(Revoked("a"))
+    log.start()
+    await log.close()
+
+    async with session_factory() as db:
+        result = await db.execute(select(RefreshToken.token_hash, RefreshToken.revoked))
+        rows = dict(result.all())
+    assert rows == {"a": True, "c": False}
+    assert log._pending == []
+
+
+async def test_log_retries_a_transient_failure(session_factory):
+    class Flaky(RefreshTokenLog):
+        failures = 2
+
+        async def _write(self, batch):
+            if self.failures:
+                self.failures -= 1
+                raise exc.OperationalError("INSERT", {}, OSError("connection lost"))
+            await super()._write(batch)
+
+    log = Flaky(session_factory, 0.01, max_batch=100, max_pending=100, retry_delay=0)
+    log.add(Issued("a", str(uuid.uuid4()), datetime.now(timezone.utc)))
+    log.start()
+    await log.close()
+
+    async with session_factory() as db:
+        hashes = (await db.execute(select(RefreshToken.token_hash))).scalars().all()
+    assert hashes == ["a"]
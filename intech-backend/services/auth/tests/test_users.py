@@ -0,0 +1,156 @@
+import os
+from datetime import datetime, timezone
+
+import fakeredis
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from app.api.v1 import users as users_router
+from app.core import security, service_tokens
+from app.core import user_cache as user_cache_module
+from app.core.config import settings
+from app.core.user_cache import UserCache, user_key
+from app.db.db import get_db
+from app.models.user import User
+from app.schemas.user_schema import UserOut
+from app.services import user_service
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest_asyncio.fixture
+async def redis(monkeypatch):
+    client = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(security, "get_redis", lambda: client)
+    monkeypatch.setattr(user_cache_module, "get_redis", lambda: client)
+    yield client
+    await client.aclose()
+
+
+@pytest_asyncio.fixture
+async def client(session_factory, redis, monkeypatch):
+    monkeypatch.setattr(
+        settings, "SERVICE_TOKEN_PRIVATE_KEY_PATH", os.environ["JWT_PRIVATE_KEY_PATH"]
+    )
+    monkeypatch.setattr(user_service, "user_cache", UserCache(100, 5, 300))
+    async with session_factory() as db:
+        user = User(email="ada@example.com", hashed_password="x", full_name="Ada")
+        db.add(user)
+        await db.commit()
+
+    async def override_get_db():
+        async with session_factory() as session:
+            yield session
+
+    app = FastAPI()
+    app.include_router(users_router.router)
+    app.dependency_overrides[get_db] = override_get_db
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as c:
+        yield c, str(user.id)
+
+
+def _bearer(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def test_superusers_and_services_may_read_profiles(client):
+    c, user_id = client
+    superuser = security.create_access_token("admin", {"is_superuser": True})
+    resp = await c.get(f"/users/{user_id}", headers=_bearer(superuser))
+    assert resp.status_code == 200
+    assert resp.json()["email"] == "ada@example.com"
+
+    service = service_tokens.create_service_token("cards", "auth")
+    resp = await c.post(
+        "/users/batch", json={"ids": [user_id, user_id]}, headers=_bearer(service)
+    )
+    assert resp.status_code == 200
+    assert [u["id"] for u in resp.json()] == [user_id]
+
+
+async def test_other_callers_are_refused(client):
+    c, user_id = client
+    resp = await c.get(f"/users/{user_id}")
+    assert resp.status_code == 401
+
+    user = security.create_access_token(user_id, {"is_superuser": False})
+    resp = await c.get(f"/users/{user_id}", headers=_bearer(user))
+    assert resp.status_code == 403
+
+    # A service token for another service is not one for us.
+    service = service_tokens.create_service_token("cards", "accounts")
+    resp = await c.get(f"/users/{user_id}", headers=_bearer(service))
+    assert resp.status_code == 401
+
+    resp = await c.get(f"/users/{user_id}", headers=_bearer("not-a-token"))
+    assert resp.status_code == 401
+
+
+def _user(user_id: str, name: str = "Ada") -> UserOut:
+    return UserOut(
+        id=user_id,
+        email=f"{user_id}@example.com",
+        full_name=name,
+        is_active=True,
+        is_superuser=False,
+        created_at=datetime(2025, 1, 1, tzinfo=timezone.utc),
+    )
+
+
+class Loader:
+    def __init__(self, users):
+        self.users = users
+        self.calls = []
+
+    async def __call__(self, missing):
+        self.calls.append(list(missing))
+        return [self.users[i] for i in missing if i in self.users]
+
+
+async def test_user_cache_hits_misses_and_invalidation(redis):
+    cache = UserCache(max_entries=100, local_ttl=60, ttl=300)
+    load = Loader({"u1": _user("u1"), "u2": _user("u2")})
+
+    found = await cache.get_many(["u1", "u2", "u1", "ghost"], load)
+    assert sorted(found) == ["u1", "u2"]
+    assert load.calls == [["u1", "u2", "ghost"]]
+    assert await redis.get(user_key("u1")) is not None
+    # Ids the table does not have are not cached.
+    assert await redis.get(user_key("ghost")) is None
+
+    # Local hits: no redis read, no load.
+    found = await cache.get_many(["u1", "u2"], load)
+    assert found["u2"].full_name == "Ada"
+    assert len(load.calls) == 1
+
+    # Another process: redis answers, the table is not asked.
+    other = UserCache(max_entries=100, local_ttl=60, ttl=300)
+    assert (await other.get("u1", load)).email == "u1@example.com"
+    assert len(load.calls) == 1
+
+    # After a change, invalidate sends the next read to the table.
+    load.users["u1"] = _user("u1", name="Ada Lovelace")
+    await cache.invalidate("u1")
+    assert await redis.get(user_key("u1")) is None
+    assert (await cache.get("u1", load)).full_name == "Ada Lovelace"
+    assert load.calls[-1] == ["u1"]
+
+
+async def test_user_cache_local_entries_expire_and_are_bounded():
+    # Redis is not initialized: the local LRU is used alone.
+    cache = UserCache(max_entries=2, local_ttl=60, ttl=300)
+    load = Loader({i: _user(i) for i in ("u1", "u2", "u3")})
+    await cache.get_many(["u1", "u2"], load)
+    await cache.get("u1", load)
+    await cache.get("u3", load)
+    # u2 was least recently used.
+    assert list(cache._entries) == ["u1", "u3"]
+
+    expired = UserCache(max_entries=2, local_ttl=-1, ttl=300)
+    await expired.get("u1", load)
+    await expired.get("u1", load)
+    assert load.calls[-2:] == [["u1"], ["u1"]]
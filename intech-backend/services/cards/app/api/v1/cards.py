@@ -0,0 +1,230 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import AuthorizationCache
+from app.core.config import settings
+from app.core.db import get_db
+from app.core.holds import HoldClosed, HoldWriter
+from app.core.security import get_current_user, require_superuser
+from app.models.card import Card, CardStatus, HoldStatus
+from app.schemas.card import (
+    AuthorizationOut,
+    AuthorizationRequest,
+    CaptureRequest,
+    CardCreate,
+    CardLimitsUpdate,
+    CardOut,
+    HoldOut,
+)
+from app.services.card_service import get_cache, get_hold_writer
+from app.core.logger import logging
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/cards", tags=["cards"])
+
+HOLD_TTL = timedelta(seconds=settings.HOLD_TTL_SECONDS)
+
+
+async def _get_card(db: AsyncSession, card_id: uuid.UUID, user) -> Card:
+    card = await db.get(Card, card_id)
+    if not card:
+        raise HTTPException(status_code=404, detail="Card not found")
+    if card.owner_user_id != user["sub"] and not user.get("is_superuser"):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return card
+
+
+@router.post("", response_model=CardOut, status_code=status.HTTP_201_CREATED)
+async def create_card(
+    payload: CardCreate,
+    db: AsyncSession = Depends(get_db),
+    cache: AuthorizationCache = Depends(get_cache),
+    user=Depends(get_current_user),
+):
+    """Issue a card on one of the caller's accounts."""
+    account = cache.accounts.get(payload.account_external_id)
+    if account is None:
+        raise HTTPException(status_code=404, detail="Account not found")
+    if account.owner_user_id != user["sub"] and not user.get("is_superuser"):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    if account.is_frozen or not account.is_active:
+        raise HTTPException(status_code=409, detail="Account is not active")
+
+    card = Card(
+        account_external_id=account.external_id,
+        owner_user_id=account.owner_user_id,
+        currency=account.currency,
+        single_limit=payload.single_limit or settings.CARD_SINGLE_LIMIT,
+        daily_limit=payload.daily_limit or settings.CARD_DAILY_LIMIT,
+    )
+    db.add(card)
+    await db.commit()
+    await db.refresh(card)
+    cache.put_card(card)
+    logger.info(f"Card {card.id} issued on account {account.external_id}")
+    return card
+
+
+@router.get("", response_model=List[CardOut])
+async def list_cards(
+    db: AsyncSession = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    result = await db.execute(
+        select(Card)
+        .where(Card.owner_user_id == user["sub"])
+        .order_by(Card.created_at.desc())
+    )
+    return result.scalars().all()
+
+
+@router.post("/authorizations", response_model=AuthorizationOut)
+async def authorize(
+    payload: AuthorizationRequest,
+    cache: AuthorizationCache = Depends(get_cache),
+    holds: HoldWriter = Depends(get_hold_writer),
+    user=Depends(require_superuser),
+):
+    """
+    Approve or decline a card payment for the card processor. An approval
+    places a hold for the amount until it is captured or expires; the
+    decision is made from the in-process cache without calling the
+    accounts service. Retrying with the same reference returns the
+    original hold instead of placing another.
+    """
+    if holds.backlogged:
+        # The database has been away long enough that approving more
+        # would risk holds that are never written.
+        return AuthorizationOut(approved=False, reason="unavailable")
+    decision = cache.authorize(
+        payload.card_id,
+        payload.amount,
+        payload.currency.upper(),
+        payload.merchant,
+        payload.reference,
+        datetime.now(timezone.utc),
+        HOLD_TTL,
+    )
+    if not decision.approved:
+        logger.info(
+            f"Authorization on card {payload.card_id} declined: {decision.reason}"
+        )
+        return AuthorizationOut(
+            approved=False,
+            reason=decision.reason,
+            available_balance=decision.available,
+        )
+    if not decision.repeated:
+        holds.add(decision.hold)
+    return AuthorizationOut(
+        approved=True,
+        hold_id=decision.hold.id,
+        expires_at=decision.hold.expires_at,
+        available_balance=decision.available,
+    )
+
+
+def _active_hold(cache: AuthorizationCache, holds: HoldWriter, hold_id: uuid.UUID):
+    if holds.backlogged:
+        raise HTTPException(status_code=503, detail="Holds cannot be written now")
+    hold = cache.holds.get(hold_id)
+    if hold is None:
+        raise HTTPException(status_code=404, detail="No active hold")
+    return hold
+
+
+def _hold_out(cache: AuthorizationCache, hold, status: HoldStatus, captured=None):
+    account = cache.accounts.get(hold.account_external_id)
+    return HoldOut(
+        hold_id=hold.id,
+        status=status,
+        captured_amount=captured,
+        available_balance=cache.available(account) if account else None,
+    )
+
+
+@router.post("/holds/{hold_id}/capture", response_model=HoldOut)
+async def capture_hold(
+    hold_id: uuid.UUID,
+    payload: CaptureRequest,
+    cache: AuthorizationCache = Depends(get_cache),
+    holds: HoldWriter = Depends(get_hold_writer),
+    user=Depends(require_superuser),
+):
+    """
+    Settle a hold for the card processor, for its amount or less. The
+    capture is posted to the card ledger with others made at about the
+    same time, behind the response.
+    """
+    hold = _active_hold(cache, holds, hold_id)
+    amount = payload.amount or hold.amount
+    if amount > hold.amount:
+        raise HTTPException(status_code=422, detail="Capture exceeds the hold")
+    cache.capture(hold, amount)
+    holds.close_hold(
+        HoldClosed(hold, HoldStatus.captured, datetime.now(timezone.utc), amount)
+    )
+    return _hold_out(cache, hold, HoldStatus.captured, amount)
+
+
+@router.post("/holds/{hold_id}/release", response_model=HoldOut)
+async def release_hold(
+    hold_id: uuid.UUID,
+    cache: AuthorizationCache = Depends(get_cache),
+    holds: HoldWriter = Depends(get_hold_writer),
+    user=Depends(require_superuser),
+):
+    """Give a hold's funds back, e.g. for a reversed authorization."""
+    hold = _active_hold(cache, holds, hold_id)
+    cache.release(hold)
+    holds.close_hold(HoldClosed(hold, HoldStatus.released, datetime.now(timezone.utc)))
+    return _hold_out(cache, hold, HoldStatus.released)
+
+
+@router.get("/{card_id}", response_model=CardOut)
+async def get_card(
+    card_id: uuid.UUID,
+    db: AsyncSession = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    return await _get_card(db, card_id, user)
+
+
+@router.patch("/{card_id}/status", response_model=CardOut)
+async def set_card_status(
+    card_id: uuid.UUID,
+    card_status: CardStatus,
+    db: AsyncSession = Depends(get_db),
+    cache: AuthorizationCache = Depends(get_cache),
+    user=Depends(get_current_user),
+):
+    """Freeze, unfreeze or close a card. A closed card stays closed."""
+    card = await _get_card(db, card_id, user)
+    if card.status == CardStatus.closed and card_status != CardStatus.closed:
+        raise HTTPException(status_code=409, detail="Card is closed")
+    card.status = card_status
+    await db.commit()
+    await db.refresh(card)
+    cache.put_card(card)
+    return card
+
+
+@router.patch("/{card_id}/limits", response_model=CardOut)
+async def set_card_limits(
+    card_id: uuid.UUID,
+    payload: CardLimitsUpdate,
+    db: AsyncSession = Depends(get_db),
+    cache: AuthorizationCache = Depends(get_cache),
+    user=Depends(get_current_user),
+):
+    card = await _get_card(db, card_id, user)
+    for field, value in payload.dict(exclude_unset=True).items():
+        if value is not None:
+            setattr(card, field, value)
+    await db.commit()
+    await db.refresh(card)
+    cache.put_card(card)
+    return card
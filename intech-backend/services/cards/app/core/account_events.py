@@ -0,0 +1,99 @@
+"""
+Keeps the account cache current.
+
+The accounts service publishes every change with the account's full state
+to a fanout exchange. Each cards process binds its own exclusive queue to
+it, so every process sees every event. Listening starts before the initial
+load from the accounts database, so nothing changed in between is missed;
+since a state only replaces an older one (by updated_at), it does not
+matter which of the two delivers an account first. A periodic reload
+covers events lost while the broker connection was down.
+"""
+
+import asyncio
+from typing import Optional
+
+import orjson
+from aio_pika import ExchangeType, IncomingMessage, connect_robust
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.cache import AuthorizationCache
+from app.core.logger import logging
+from app.models.card import accounts_table
+
+logger = logging.getLogger(__name__)
+
+
+async def load_accounts(
+    engine: AsyncEngine, cache: AuthorizationCache, chunk_rows: int = 5000
+) -> int:
+    """Load every account from the accounts database; returns how many."""
+    query = select(
+        accounts_table.c.external_id,
+        accounts_table.c.owner_user_id,
+        accounts_table.c.currency,
+        accounts_table.c.balance,
+        accounts_table.c.is_frozen,
+        accounts_table.c.is_active,
+        accounts_table.c.updated_at,
+    ).execution_options(yield_per=chunk_rows)
+    loaded = 0
+    async with engine.connect() as conn:
+        result = await conn.stream(query)
+        async for rows in result.partitions():
+            for row in rows:
+                cache.apply_account(row._mapping)
+            loaded += len(rows)
+            # Let authorizations run between chunks.
+            await asyncio.sleep(0)
+    return loaded
+
+
+async def resync_accounts(
+    engine: AsyncEngine, cache: AuthorizationCache, interval: float
+) -> None:
+    """Reload the accounts every `interval` seconds until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            loaded = await load_accounts(engine, cache)
+            logger.info(f"Resynced {loaded} accounts")
+        except Exception as e:
+            logger.exception(f"Account resync failed: {e}")
+
+
+class AccountEventListener:
+    def __init__(self, cache: AuthorizationCache, url: str, exchange: str) -> None:
+        self.cache = cache
+        self.url = url
+        self.exchange = exchange
+        self._connection = None
+
+    async def start(self) -> None:
+        self._connection = await connect_robust(self.url)
+        channel = await self._connection.channel()
+        exchange = await channel.declare_exchange(
+            self.exchange, ExchangeType.FANOUT, durable=True
+        )
+        # Server-named and exclusive: one queue per process, gone with it.
+        queue = await channel.declare_queue(exclusive=True)
+        await queue.bind(exchange)
+        await queue.consume(self.handle, no_ack=True)
+        logger.info(f"Listening for account events on {self.exchange}")
+
+    async def handle(self, message: IncomingMessage) -> None:
+        self.handle_body(message.body)
+
+    def handle_body(self, body: bytes) -> Optional[bool]:
+        try:
+            state = orjson.loads(body).get("account")
+            if state:
+                return self.cache.apply_account(state)
+        except Exception as e:
+            logger.warning(f"Ignoring malformed account event: {e}")
+        return None
+
+    async def close(self) -> None:
+        if self._connection is not None:
+            await self._connection.close()
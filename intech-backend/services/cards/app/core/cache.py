@@ -0,0 +1,315 @@
+"""
+In-process state for card authorizations.
+
+An authorization needs the card, its limits and what it has spent today,
+and the account's balance minus what is already held on it. All of that
+is kept here in plain dicts, so deciding one is a few lookups and Decimal
+comparisons with no I/O:
+
+- accounts come from the accounts database at startup and are then kept
+  current by account events; each update carries the account's full state
+  and updated_at, and an older state never replaces a newer one, so
+  events and reloads may arrive in any order;
+- cards and their limits are loaded at startup and changed through this
+  service's own API;
+- holds are reserved here first and written to card_holds behind the
+  response (app.core.holds); a capture turns a hold into card spend,
+  posted to the card ledger (card_postings) the same way.
+
+Card postings are then debited from their accounts in the transactions
+ledger (app.core.postings), which account balances follow. Until an
+account's balance includes its captured card spend, what is available on
+it is its balance less its active holds and that spend. A posting counts
+until it is published, and after that until a state of the account
+updated after it was published arrives.
+
+Holds are also kept in a heap by expiry, so the sweeper finds the
+expired ones by popping the heap instead of scanning every hold. A
+captured or released hold stays in the heap, and its reference stays
+known, until it would have expired: a retried authorization within that
+time still gets the original hold. The heap is therefore as large as the
+number of holds placed within one HOLD_TTL_SECONDS, as the references are.
+
+Nothing awaits between checking the funds and reserving them, so
+concurrent authorizations on one event loop cannot overspend an account.
+Each process has its own copy: run one authorization process per set of
+cards, or holds placed by one are invisible to the others.
+"""
+
+import heapq
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+from app.models.card import CardStatus
+
+
+class AccountState:
+    __slots__ = (
+        "external_id",
+        "owner_user_id",
+        "currency",
+        "balance",
+        "is_frozen",
+        "is_active",
+        "updated_at",
+    )
+
+    def __init__(self, external_id: str) -> None:
+        self.external_id = external_id
+        self.updated_at: Optional[datetime] = None
+
+
+class CardState:
+    __slots__ = (
+        "id",
+        "account_external_id",
+        "owner_user_id",
+        "currency",
+        "status",
+        "single_limit",
+        "daily_limit",
+        "day",
+        "spent",
+    )
+
+    def __init__(self, card) -> None:
+        self.id = card.id
+        self.account_external_id = card.account_external_id
+        self.owner_user_id = card.owner_user_id
+        self.currency = card.currency
+        self.status = CardStatus(card.status)
+        self.single_limit = card.single_limit
+        self.daily_limit = card.daily_limit
+        # Authorized so far on `day` (UTC).
+        self.day: Optional[date] = None
+        self.spent = Decimal(0)
+
+
+class Hold(NamedTuple):
+    id: uuid.UUID
+    card_id: uuid.UUID
+    account_external_id: str
+    amount: Decimal
+    currency: str
+    merchant: Optional[str]
+    reference: Optional[str]
+    created_at: datetime
+    expires_at: datetime
+
+
+class Decision(NamedTuple):
+    approved: bool
+    reason: Optional[str] = None
+    hold: Optional[Hold] = None
+    available: Optional[Decimal] = None
+    # Approved earlier under the same reference; the hold already exists.
+    repeated: bool = False
+
+
+def _utc(value: datetime) -> datetime:
+    # SQLite hands timestamps back naive; they were stored in UTC.
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+class AuthorizationCache:
+    def __init__(self) -> None:
+        self.accounts: Dict[str, AccountState] = {}
+        self.cards: Dict[uuid.UUID, CardState] = {}
+        # Active holds, and the same holds by processor reference.
+        self.holds: Dict[uuid.UUID, Hold] = {}
+        self.references: Dict[str, Hold] = {}
+        # Sum of the active holds per account, kept apart from the account
+        # state so it does not matter which of the two is loaded first.
+        self.held: Dict[str, Decimal] = {}
+        # Captured card spend per account that its balance may not include
+        # yet: unpublished postings, and published ones the account's state
+        # predates, which are also kept as (published_at, amount).
+        self.captured: Dict[str, Decimal] = {}
+        self.posted: Dict[str, List[Tuple[datetime, Decimal]]] = {}
+        # (expires_at, id, hold) for every hold, active or not, whose
+        # reference is still remembered.
+        self._expiries: List[Tuple[datetime, uuid.UUID, Hold]] = []
+
+    def available(self, account: AccountState) -> Decimal:
+        key = account.external_id
+        return account.balance - self.held.get(key, 0) - self.captured.get(key, 0)
+
+    def apply_account(self, state: Mapping) -> bool:
+        """
+        Take an account's state, from an event or a database row, unless a
+        newer one is already cached. Returns whether it was taken.
+        """
+        updated_at = state.get("updated_at")
+        if isinstance(updated_at, str):
+            updated_at = datetime.fromisoformat(updated_at)
+        if updated_at is not None:
+            updated_at = _utc(updated_at)
+        account = self.accounts.get(state["external_id"])
+        if account is None:
+            account = AccountState(state["external_id"])
+        elif (
+            account.updated_at is not None
+            and updated_at is not None
+            and updated_at < account.updated_at
+        ):
+            return False
+        account.owner_user_id = state["owner_user_id"]
+        account.currency = state["currency"]
+        account.balance = Decimal(state["balance"])
+        account.is_frozen = bool(state["is_frozen"])
+        account.is_active = bool(state["is_active"])
+        account.updated_at = updated_at
+        self.accounts[account.external_id] = account
+        self._absorb(account)
+        return True
+
+    def put_card(self, card) -> CardState:
+        """Cache a card (a Card row), keeping what it has spent today."""
+        state = CardState(card)
+        previous = self.cards.get(state.id)
+        if previous is not None:
+            state.day, state.spent = previous.day, previous.spent
+        self.cards[state.id] = state
+        return state
+
+    def set_spent(self, card_id: uuid.UUID, day: date, spent: Decimal) -> None:
+        card = self.cards.get(card_id)
+        if card is not None:
+            card.day, card.spent = day, spent
+
+    def add_captured(self, account_external_id: str, amount: Decimal) -> None:
+        key = account_external_id
+        self.captured[key] = self.captured.get(key, 0) + amount
+
+    def posted_to_ledger(
+        self, account_external_id: str, amount: Decimal, published_at: datetime
+    ) -> None:
+        """
+        Captured spend of `amount` was published to the transactions ledger;
+        it stops counting once the account's state is newer.
+        """
+        key = account_external_id
+        self.posted.setdefault(key, []).append((_utc(published_at), amount))
+        account = self.accounts.get(key)
+        if account is not None:
+            self._absorb(account)
+
+    def _absorb(self, account: AccountState) -> None:
+        key = account.external_id
+        posted = self.posted.get(key)
+        if not posted or account.updated_at is None:
+            return
+        pending = []
+        for published_at, amount in posted:
+            if published_at <= account.updated_at:
+                self.captured[key] -= amount
+            else:
+                pending.append((published_at, amount))
+        if pending:
+            self.posted[key] = pending
+        else:
+            del self.posted[key]
+
+    def add_hold(self, hold: Hold, active: bool = True) -> None:
+        """
+        Reserve an existing hold's amount, e.g. one loaded at startup. An
+        inactive hold only has its reference remembered until it expires.
+        """
+        if active:
+            self.holds[hold.id] = hold
+            key = hold.account_external_id
+            self.held[key] = self.held.get(key, 0) + hold.amount
+        if hold.reference:
+            self.references[hold.reference] = hold
+        heapq.heappush(self._expiries, (_utc(hold.expires_at), hold.id, hold))
+
+    def _close(self, hold: Hold, refund: bool) -> None:
+        del self.holds[hold.id]
+        key = hold.account_external_id
+        self.held[key] -= hold.amount
+        card = self.cards.get(hold.card_id)
+        # A hold that never turned into spend gives back the daily limit.
+        if refund and card is not None and card.day == hold.created_at.date():
+            card.spent -= hold.amount
+
+    def capture(self, hold: Hold, amount: Decimal) -> None:
+        """Settle an active hold for `amount`, at most what it held."""
+        self._close(hold, refund=False)
+        self.add_captured(hold.account_external_id, amount)
+
+    def release(self, hold: Hold) -> None:
+        self._close(hold, refund=True)
+
+    def expire(self, now: datetime) -> List[Hold]:
+        """Release and return the active holds that expired by `now`."""
+        expired = []
+        while self._expiries and self._expiries[0][0] <= now:
+            _, hold_id, hold = heapq.heappop(self._expiries)
+            if hold.reference and self.references.get(hold.reference) is hold:
+                del self.references[hold.reference]
+            if self.holds.get(hold_id) is hold:
+                self._close(hold, refund=True)
+                expired.append(hold)
+        return expired
+
+    def authorize(
+        self,
+        card_id: uuid.UUID,
+        amount: Decimal,
+        currency: str,
+        merchant: Optional[str],
+        reference: Optional[str],
+        now: datetime,
+        hold_ttl: timedelta,
+    ) -> Decision:
+        """
+        Approve and reserve the amount, or say why not. A reference seen
+        before gets the hold it was given the first time.
+        """
+        if reference is not None:
+            hold = self.references.get(reference)
+            if hold is not None:
+                if hold.card_id != card_id or hold.amount != amount:
+                    return Decision(False, "duplicate_reference")
+                account = self.accounts.get(hold.account_external_id)
+                available = self.available(account) if account is not None else None
+                return Decision(True, hold=hold, available=available, repeated=True)
+
+        card = self.cards.get(card_id)
+        if card is None:
+            return Decision(False, "card_not_found")
+        if card.status != CardStatus.active:
+            return Decision(False, "card_inactive")
+        account = self.accounts.get(card.account_external_id)
+        if account is None or account.is_frozen or not account.is_active:
+            return Decision(False, "account_unavailable")
+        if currency != card.currency or currency != account.currency:
+            return Decision(False, "currency_mismatch")
+        if amount > card.single_limit:
+            return Decision(False, "over_single_limit")
+        today = now.date()
+        spent = card.spent if card.day == today else Decimal(0)
+        if spent + amount > card.daily_limit:
+            return Decision(False, "over_daily_limit")
+        available = self.available(account)
+        if amount > available:
+            return Decision(False, "insufficient_funds", available=available)
+
+        hold = Hold(
+            id=uuid.uuid4(),
+            card_id=card.id,
+            account_external_id=account.external_id,
+            amount=amount,
+            currency=currency,
+            merchant=merchant,
+            reference=reference,
+            created_at=now,
+            expires_at=now + hold_ttl,
+        )
+        card.day, card.spent = today, spent + amount
+        self.add_hold(hold)
+        return Decision(True, hold=hold, available=available - amount)
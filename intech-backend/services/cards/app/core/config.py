@@ -0,0 +1,61 @@
+from decimal import Decimal
+from pydantic_settings import BaseSettings
+from pydantic import Field
+
+
+class Settings(BaseSettings):
+
+    ENV: str = Field("development")
+
+    DATABASE_URL: str
+    # Read-only: account state is loaded from the accounts database at
+    # startup and kept current by account events.
+    ACCOUNTS_DATABASE_URL: str
+
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 5
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+
+    # Account events; unset, the account cache is only refreshed by resyncs.
+    RABBITMQ_URL: str | None = None
+    ACCOUNT_EVENTS_EXCHANGE: str = Field("account_events")
+    # Full reload of account state, catching anything missed while the
+    # broker connection was down.
+    ACCOUNT_RESYNC_SECONDS: float = 300
+
+    # Holds are written behind the authorization response, in batches of
+    # up to HOLD_FLUSH_BATCH at most HOLD_FLUSH_INTERVAL_SECONDS apart.
+    HOLD_FLUSH_INTERVAL_SECONDS: float = 0.05
+    HOLD_FLUSH_BATCH: int = 1000
+    HOLD_RETRY_DELAY_SECONDS: float = 1.0
+    # Unwritten holds past which authorizations are declined.
+    HOLD_MAX_PENDING: int = 50_000
+    HOLD_TTL_SECONDS: int = 7 * 24 * 3600
+    HOLD_SWEEP_INTERVAL_SECONDS: float = 1.0
+
+    # Card postings are debited from their accounts in the transactions
+    # ledger through this queue (app.core.postings), up to
+    # POSTING_PUBLISH_BATCH every POSTING_PUBLISH_INTERVAL_SECONDS. Needs
+    # RABBITMQ_URL; until published, captured spend is only held back here.
+    CARD_POSTINGS_QUEUE: str = Field("card_postings")
+    POSTING_PUBLISH_INTERVAL_SECONDS: float = 1.0
+    POSTING_PUBLISH_BATCH: int = 500
+
+    # Defaults for new cards, in the card's currency.
+    CARD_SINGLE_LIMIT: Decimal = Decimal("500000.00")
+    CARD_DAILY_LIMIT: Decimal = Decimal("2000000.00")
+
+    AUTH_JWKS_URL: str
+    JWT_ALGORITHM: str = Field("RS256")
+
+    LOG_FILE: str = Field("/app/logs/cards.log")
+    LOG_LEVEL: str = Field("info")
+
+    class Config:
+        env_file = ".env"
+        env_file_encoding = "utf-8"
+
+
+settings = Settings()
@@ -0,0 +1,257 @@
+"""
+Write-behind persistence of holds.
+
+The authorization response does not wait for the database: approved holds
+are queued here and a single task inserts them in batches, at most
+HOLD_FLUSH_INTERVAL_SECONDS apart or as soon as HOLD_FLUSH_BATCH are
+waiting. A batch that fails for a transient reason (connection lost,
+database overloaded, serialization failure) is retried as it was, before
+anything queued after it. While the database is away the queue grows; once
+it passes max_pending, authorizations are declined rather than approved
+against holds that may never be written. Any other failure is taken to be
+caused by the data: the batch is split in halves until the entry at fault
+is found, and that one is logged and dropped, so it cannot hold up the
+queue or shutdown.
+
+Captures, releases and expiries go through the same queue, so a hold is
+always inserted before it is closed. Within a batch, the captures on each
+account and currency become one posting in the card ledger and the holds
+they close are updated with one executemany, rather than a posting and an
+update per capture.
+
+Writing a batch again is harmless: inserts skip holds already stored (by
+id or reference), a posting's id is derived from the holds it captures,
+and only active holds are closed. So a batch that committed but raised on
+the way back is simply written again.
+
+Committed postings are handed to the posting publisher, if one is set,
+which debits them from their accounts in the transactions ledger
+(app.core.postings).
+"""
+
+import asyncio
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+import asyncpg
+from sqlalchemy import bindparam, exc, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.cache import AuthorizationCache, Hold
+from app.core.logger import logging
+from app.core.postings import PostingPublisher
+from app.models.card import CardHold, CardPosting, HoldStatus
+
+logger = logging.getLogger(__name__)
+
+POSTING_NAMESPACE = uuid.UUID("6f1c2a8e-3b7d-4d61-9a52-0c4e8b7f1d93")
+
+# SQLSTATE classes worth retrying: connection exception, transaction
+# rollback (serialization, deadlock), insufficient resources, operator
+# intervention (shutdown) and system error.
+TRANSIENT_SQLSTATE_CLASSES = {"08", "40", "53", "57", "58"}
+
+
+class HoldClosed(NamedTuple):
+    hold: Hold
+    status: HoldStatus
+    closed_at: datetime
+    # Only for captures.
+    amount: Optional[Decimal] = None
+
+
+def posting_id(hold_ids: List[uuid.UUID]) -> uuid.UUID:
+    return uuid.uuid5(POSTING_NAMESPACE, ",".join(sorted(map(str, hold_ids))))
+
+
+def is_transient(error: Exception) -> bool:
+    """Whether a failed write may succeed if retried unchanged."""
+    if isinstance(
+        error,
+        (OSError, asyncio.TimeoutError, asyncpg.InterfaceError, exc.TimeoutError),
+    ):
+        return True
+    if isinstance(error, exc.DBAPIError) and error.connection_invalidated:
+        return True
+    # asyncpg errors carry it directly, SQLAlchemy's wrap the driver's.
+    sqlstate = getattr(error, "sqlstate", None) or getattr(
+        getattr(error, "orig", None), "sqlstate", None
+    )
+    if sqlstate:
+        return sqlstate[:2] in TRANSIENT_SQLSTATE_CLASSES
+    return isinstance(error, (exc.OperationalError, exc.InterfaceError))
+
+
+class HoldWriter:
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        flush_interval: float,
+        max_batch: int,
+        max_pending: int,
+        retry_delay: float = 1.0,
+    ) -> None:
+        self._session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.retry_delay = retry_delay
+        self.written = 0
+        self.publisher: Optional[PostingPublisher] = None
+        self._pending: List[Union[Hold, HoldClosed]] = []
+        self._wake = asyncio.Event()
+        self._closing = False
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def backlogged(self) -> bool:
+        return len(self._pending) >= self.max_pending
+
+    def start(self) -> None:
+        self._closing = False
+        self._task = asyncio.create_task(self._run())
+
+    def add(self, hold: Hold) -> None:
+        """Queue a hold; it is written within flush_interval."""
+        self._queue(hold)
+
+    def close_hold(self, closed: HoldClosed) -> None:
+        """Queue a capture, release or expiry of a hold queued before."""
+        self._queue(closed)
+
+    def _queue(self, entry: Union[Hold, HoldClosed]) -> None:
+        self._pending.append(entry)
+        if len(self._pending) >= self.max_batch:
+            self._wake.set()
+
+    async def close(self) -> None:
+        """Write everything queued, then stop."""
+        self._closing = True
+        self._wake.set()
+        if self._task is not None:
+            await self._task
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            while self._pending:
+                batch = self._pending[: self.max_batch]
+                self.written += len(batch) - await self._store(batch)
+                # Entries queued meanwhile were appended after the batch.
+                del self._pending[: len(batch)]
+            if self._closing:
+                return
+
+    async def _store(self, batch: List[Union[Hold, HoldClosed]]) -> int:
+        """Write the entries in order; return how many had to be dropped."""
+        while True:
+            try:
+                await self._write(batch)
+                return 0
+            except Exception as e:
+                if not is_transient(e):
+                    error = e
+                    break
+                logger.exception(
+                    f"Writing {len(batch)} hold changes failed; retrying: {e}"
+                )
+                await asyncio.sleep(self.retry_delay)
+        if len(batch) == 1:
+            logger.error(
+                f"Dropping hold change {batch[0]} that cannot be written: {error}"
+            )
+            return 1
+        logger.warning(
+            f"Writing {len(batch)} hold changes failed; splitting the batch: {error}"
+        )
+        middle = len(batch) // 2
+        return await self._store(batch[:middle]) + await self._store(batch[middle:])
+
+    async def _write(self, batch: List[Union[Hold, HoldClosed]]) -> None:
+        holds, closes = [], []
+        captures: Dict[Tuple[str, str], List[HoldClosed]] = {}
+        for entry in batch:
+            if isinstance(entry, Hold):
+                holds.append({**entry._asdict(), "status": HoldStatus.active})
+            elif entry.status == HoldStatus.captured:
+                key = (entry.hold.account_external_id, entry.hold.currency)
+                captures.setdefault(key, []).append(entry)
+            else:
+                closes.append(_close_row(entry, None))
+
+        postings = []
+        now = datetime.now(timezone.utc)
+        for (account, currency), entries in captures.items():
+            posting = posting_id([entry.hold.id for entry in entries])
+            postings.append(
+                {
+                    "id": posting,
+                    "account_external_id": account,
+                    "currency": currency,
+                    "amount": sum(entry.amount for entry in entries),
+                    "captures": len(entries),
+                    "created_at": now,
+                }
+            )
+            closes.extend(_close_row(entry, posting) for entry in entries)
+
+        async with self._session_factory() as db:
+            conn = await db.connection()
+            postgres = conn.dialect.name == "postgresql"
+            insert = pg_insert if postgres else sqlite_insert
+            if holds:
+                await conn.execute(insert(CardHold).on_conflict_do_nothing(), holds)
+            if postings:
+                await conn.execute(
+                    insert(CardPosting).on_conflict_do_nothing(), postings
+                )
+            if closes:
+                await conn.execute(
+                    update(CardHold)
+                    .where(
+                        CardHold.id == bindparam("hold_id"),
+                        CardHold.status == HoldStatus.active,
+                    )
+                    .values(
+                        status=bindparam("new_status"),
+                        closed_at=bindparam("closed"),
+                        captured_amount=bindparam("captured"),
+                        posting_id=bindparam("posting"),
+                    ),
+                    closes,
+                )
+            await db.commit()
+        if postings and self.publisher is not None:
+            self.publisher.add(postings)
+
+
+def _close_row(entry: HoldClosed, posting: Optional[uuid.UUID]) -> dict:
+    return {
+        "hold_id": entry.hold.id,
+        "new_status": entry.status,
+        "closed": entry.closed_at,
+        "captured": entry.amount,
+        "posting": posting,
+    }
+
+
+async def expire_holds(
+    cache: AuthorizationCache, writer: HoldWriter, interval: float
+) -> None:
+    """Release holds as they expire, every `interval` seconds, until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        now = datetime.now(timezone.utc)
+        expired = cache.expire(now)
+        for hold in expired:
+            writer.close_hold(HoldClosed(hold, HoldStatus.expired, now))
+        if expired:
+            logger.info(f"Expired {len(expired)} holds")
@@ -0,0 +1,182 @@
+"""
+Debits card spend from its accounts in the transactions ledger.
+
+Each posting in the card ledger is published to the transactions service,
+which records it as a withdrawal by the account's owner; the posting's id
+is the withdrawal's, so publishing one again records nothing new. Postings
+are handed over by the hold writer once they are committed, and the ones
+left unpublished by an earlier run are picked up at start. published_at
+marks a posting as handed over, so card_postings doubles as the outbox.
+
+Once published, a posting stops counting against its account in the cache
+as soon as the account's state is newer than the publication (see
+app.core.cache). A failed publish is retried, in order, every
+interval; the postings stay counted meanwhile.
+"""
+
+import asyncio
+from datetime import datetime, timezone
+from typing import List, Optional
+
+import orjson
+from aio_pika import DeliveryMode, Message, connect_robust
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.cache import AuthorizationCache
+from app.core.logger import logging
+from app.models.card import CardPosting
+
+logger = logging.getLogger(__name__)
+
+
+class PostingPublisher:
+    def __init__(
+        self,
+        cache: AuthorizationCache,
+        session_factory: async_sessionmaker,
+        url: Optional[str],
+        queue: str,
+        interval: float,
+        max_batch: int,
+    ) -> None:
+        self.cache = cache
+        self._session_factory = session_factory
+        self.url = url
+        self.queue = queue
+        self.interval = interval
+        self.max_batch = max_batch
+        self.published = 0
+        self._pending: List[dict] = []
+        self._wake = asyncio.Event()
+        self._closing = False
+        self._task: Optional[asyncio.Task] = None
+        self._connection = None
+        self._channel = None
+
+    async def start(self) -> None:
+        """Queue the postings an earlier run left unpublished, then start."""
+        async with self._session_factory() as db:
+            result = await db.execute(
+                select(CardPosting)
+                .where(CardPosting.published_at.is_(None))
+                .order_by(CardPosting.created_at)
+            )
+            self._pending[:0] = [_posting_row(p) for p in result.scalars()]
+        self._closing = False
+        self._task = asyncio.create_task(self._run())
+
+    def add(self, postings: List[dict]) -> None:
+        """Queue committed postings, as rows of card_postings."""
+        self._pending.extend(postings)
+        if len(self._pending) >= self.max_batch:
+            self._wake.set()
+
+    async def close(self) -> None:
+        """Publish what is queued if the broker allows, then stop."""
+        self._closing = True
+        self._wake.set()
+        if self._task is not None:
+            await self._task
+        if self._connection is not None:
+            await self._connection.close()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                while self._pending:
+                    await self._flush()
+            except Exception as e:
+                logger.exception(
+                    f"Publishing {len(self._pending)} card postings failed; "
+                    f"retrying in {self.interval}s: {e}"
+                )
+                if self._closing:
+                    return
+            if self._closing:
+                return
+
+    async def _flush(self) -> None:
+        batch = self._pending[: self.max_batch]
+        messages, published = [], []
+        for posting in batch:
+            account = self.cache.accounts.get(posting["account_external_id"])
+            if account is None:
+                # Left unpublished; the next start tries it again.
+                logger.warning(
+                    f"Not publishing card posting {posting['id']}: "
+                    f"unknown account {posting['account_external_id']}"
+                )
+                continue
+            published.append(posting)
+            messages.append(
+                {
+                    "posting_id": str(posting["id"]),
+                    "account_external_id": posting["account_external_id"],
+                    "owner_user_id": account.owner_user_id,
+                    "currency": posting["currency"],
+                    "amount": str(posting["amount"]),
+                    "captures": posting["captures"],
+                    "created_at": _utc(posting["created_at"]).isoformat(),
+                }
+            )
+        if messages:
+            await self._publish(messages)
+            published_at = datetime.now(timezone.utc)
+            async with self._session_factory() as db:
+                await db.execute(
+                    update(CardPosting)
+                    .where(
+                        CardPosting.id.in_([p["id"] for p in published]),
+                        CardPosting.published_at.is_(None),
+                    )
+                    .values(published_at=published_at)
+                )
+                await db.commit()
+            for posting in published:
+                self.cache.posted_to_ledger(
+                    posting["account_external_id"], posting["amount"], published_at
+                )
+        # Postings queued meanwhile were appended after the batch.
+        del self._pending[: len(batch)]
+        self.published += len(published)
+
+    async def _publish(self, messages: List[dict]) -> None:
+        if self._channel is None or self._channel.is_closed:
+            self._connection = self._connection or await connect_robust(self.url)
+            self._channel = await self._connection.channel(publisher_confirms=True)
+            await self._channel.declare_queue(self.queue, durable=True)
+        # With publisher confirms, each publish returns once the broker
+        # has the message.
+        await asyncio.gather(
+            *(
+                self._channel.default_exchange.publish(
+                    Message(
+                        body=orjson.dumps(message),
+                        delivery_mode=DeliveryMode.PERSISTENT,
+                    ),
+                    routing_key=self.queue,
+                )
+                for message in messages
+            )
+        )
+
+
+def _posting_row(posting: CardPosting) -> dict:
+    return {
+        "id": posting.id,
+        "account_external_id": posting.account_external_id,
+        "currency": posting.currency,
+        "amount": posting.amount,
+        "captures": posting.captures,
+        "created_at": posting.created_at,
+    }
+
+
+def _utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
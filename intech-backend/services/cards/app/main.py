@@ -0,0 +1,70 @@
+import asyncio
+from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from app.core.config import settings
+from app.core.logger import configure_logging, logging
+from app.api.v1 import cards as cards_router
+from app.core.account_events import (
+    AccountEventListener,
+    load_accounts,
+    resync_accounts,
+)
+from app.core.holds import expire_holds
+from app.core.db import AsyncSessionLocal, accounts_engine, engine, Base
+from app.services.card_service import (
+    cache,
+    hold_writer,
+    load_cards,
+    posting_publisher,
+)
+import app.models.card  # noqa: F401 - registers the tables
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    configure_logging()
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    # Listen before loading, so no change made during the load is missed.
+    listener = None
+    if settings.RABBITMQ_URL:
+        listener = AccountEventListener(
+            cache, settings.RABBITMQ_URL, settings.ACCOUNT_EVENTS_EXCHANGE
+        )
+        await listener.start()
+    accounts = await load_accounts(accounts_engine, cache)
+    cards = await load_cards(AsyncSessionLocal, cache)
+    logger.info(f"Loaded {accounts} accounts, {cards} cards, {len(cache.holds)} holds")
+    if settings.RABBITMQ_URL:
+        await posting_publisher.start()
+        hold_writer.publisher = posting_publisher
+    hold_writer.start()
+    resync = asyncio.create_task(
+        resync_accounts(accounts_engine, cache, settings.ACCOUNT_RESYNC_SECONDS)
+    )
+    sweeper = asyncio.create_task(
+        expire_holds(cache, hold_writer, settings.HOLD_SWEEP_INTERVAL_SECONDS)
+    )
+
+    try:
+        yield
+    finally:
+        resync.cancel()
+        sweeper.cancel()
+        if listener is not None:
+            await listener.close()
+        await hold_writer.close()
+        if hold_writer.publisher is not None:
+            await posting_publisher.close()
+        await accounts_engine.dispose()
+        await engine.dispose()
+
+
+app = FastAPI(title="Cards Service", lifespan=lifespan)
+
+
+app.include_router(cards_router.router)
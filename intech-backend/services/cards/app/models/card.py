@@ -0,0 +1,123 @@
+import enum
+import uuid
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    Enum,
+    Index,
+    Integer,
+    MetaData,
+    Numeric,
+    String,
+    Table,
+)
+from sqlalchemy.dialects.postgresql import UUID
+from datetime import datetime, timezone
+from app.core.db import Base
+
+
+class CardStatus(str, enum.Enum):
+    active = "active"
+    frozen = "frozen"
+    closed = "closed"
+
+
+class HoldStatus(str, enum.Enum):
+    active = "active"
+    captured = "captured"
+    released = "released"
+    expired = "expired"
+
+
+class Card(Base):
+    """A card drawing on one account, identified to processors by its id."""
+
+    __tablename__ = "cards"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    account_external_id = Column(String, index=True, nullable=False)
+    owner_user_id = Column(String(64), index=True, nullable=False)
+    currency = Column(String(8), nullable=False)
+    status = Column(Enum(CardStatus), nullable=False, default=CardStatus.active)
+    # Largest single authorization, and total authorized per UTC day.
+    single_limit = Column(Numeric(18, 2), nullable=False)
+    daily_limit = Column(Numeric(18, 2), nullable=False)
+    created_at = Column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+    updated_at = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
+
+
+class CardHold(Base):
+    """
+    Funds reserved on an account by an approved authorization. Written
+    behind the response (see app.core.holds), so a hold may reach this
+    table a few milliseconds after the processor was told it exists.
+    """
+
+    __tablename__ = "card_holds"
+    __table_args__ = (
+        Index("ix_card_holds_status_expires_at", "status", "expires_at"),
+        Index("ix_card_holds_card_created_at", "card_id", "created_at"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    card_id = Column(UUID(as_uuid=True), nullable=False)
+    account_external_id = Column(String, nullable=False)
+    amount = Column(Numeric(18, 2), nullable=False)
+    currency = Column(String(8), nullable=False)
+    merchant = Column(String(128), nullable=True)
+    # The processor's reference; a retried authorization carries the same one.
+    reference = Column(String(64), unique=True, nullable=True)
+    status = Column(Enum(HoldStatus), nullable=False, default=HoldStatus.active)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    # Set when the hold is captured, released or expires.
+    closed_at = Column(DateTime(timezone=True), nullable=True)
+    captured_amount = Column(Numeric(18, 2), nullable=True)
+    posting_id = Column(UUID(as_uuid=True), nullable=True, index=True)
+
+
+class CardPosting(Base):
+    """
+    An entry in the card ledger: the captures on one account, in one
+    currency, that were written together. The account's card spend is the
+    sum of its postings; the holds captured by a posting carry its id.
+
+    Each posting is also debited from the account in the transactions
+    ledger (app.core.postings); published_at is set once it has been handed
+    to the transactions service, so this table is its outbox.
+    """
+
+    __tablename__ = "card_postings"
+
+    id = Column(UUID(as_uuid=True), primary_key=True)
+    account_external_id = Column(String, index=True, nullable=False)
+    currency = Column(String(8), nullable=False)
+    amount = Column(Numeric(18, 2), nullable=False)
+    captures = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    published_at = Column(DateTime(timezone=True), nullable=True, index=True)
+
+
+# Read-only view of the accounts service's table, for loading the account
+# cache. Kept out of Base so create_all never touches it.
+accounts_metadata = MetaData()
+
+accounts_table = Table(
+    "accounts",
+    accounts_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("external_id", String),
+    Column("owner_user_id", String(64)),
+    Column("currency", String(8)),
+    Column("balance", Numeric(18, 2)),
+    Column("is_frozen", Boolean),
+    Column("is_active", Boolean),
+    Column("updated_at", DateTime(timezone=True)),
+)
@@ -0,0 +1,60 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+from decimal import Decimal
+from uuid import UUID
+from datetime import datetime
+from app.models.card import CardStatus, HoldStatus
+
+
+class CardCreate(BaseModel):
+    account_external_id: str
+    single_limit: Optional[Decimal] = Field(None, gt=0)
+    daily_limit: Optional[Decimal] = Field(None, gt=0)
+
+
+class CardLimitsUpdate(BaseModel):
+    single_limit: Optional[Decimal] = Field(None, gt=0)
+    daily_limit: Optional[Decimal] = Field(None, gt=0)
+
+
+class CardOut(BaseModel):
+    id: UUID
+    account_external_id: str
+    owner_user_id: str
+    currency: str
+    status: CardStatus
+    single_limit: Decimal
+    daily_limit: Decimal
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+
+    class Config:
+        orm_mode = True
+
+
+class AuthorizationRequest(BaseModel):
+    card_id: UUID
+    amount: Decimal = Field(..., gt=0, max_digits=18, decimal_places=2)
+    currency: str = Field(..., min_length=3, max_length=8)
+    merchant: Optional[str] = Field(None, max_length=128)
+    reference: Optional[str] = Field(None, max_length=64)
+
+
+class AuthorizationOut(BaseModel):
+    approved: bool
+    reason: Optional[str] = None
+    hold_id: Optional[UUID] = None
+    expires_at: Optional[datetime] = None
+    available_balance: Optional[Decimal] = None
+
+
+class CaptureRequest(BaseModel):
+    # Defaults to the whole hold; less releases the rest.
+    amount: Optional[Decimal] = Field(None, gt=0, max_digits=18, decimal_places=2)
+
+
+class HoldOut(BaseModel):
+    hold_id: UUID
+    status: HoldStatus
+    captured_amount: Optional[Decimal] = None
+    available_balance: Optional[Decimal] = None
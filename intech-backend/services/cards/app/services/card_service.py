@@ -0,0 +1,106 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from sqlalchemy import func, or_, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.cache import AuthorizationCache, Hold
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal
+from app.core.holds import HoldWriter
+from app.core.postings import PostingPublisher
+from app.models.card import Card, CardHold, CardPosting, CardStatus, HoldStatus
+
+# Process-wide; see app.core.cache for why there is one per process.
+cache = AuthorizationCache()
+hold_writer = HoldWriter(
+    AsyncSessionLocal,
+    flush_interval=settings.HOLD_FLUSH_INTERVAL_SECONDS,
+    max_batch=settings.HOLD_FLUSH_BATCH,
+    max_pending=settings.HOLD_MAX_PENDING,
+    retry_delay=settings.HOLD_RETRY_DELAY_SECONDS,
+)
+posting_publisher = PostingPublisher(
+    cache,
+    AsyncSessionLocal,
+    settings.RABBITMQ_URL,
+    settings.CARD_POSTINGS_QUEUE,
+    interval=settings.POSTING_PUBLISH_INTERVAL_SECONDS,
+    max_batch=settings.POSTING_PUBLISH_BATCH,
+)
+
+
+# Async so FastAPI calls them inline rather than in its thread pool.
+async def get_cache() -> AuthorizationCache:
+    return cache
+
+
+async def get_hold_writer() -> HoldWriter:
+    return hold_writer
+
+
+async def load_cards(
+    session_factory: async_sessionmaker,
+    cache: AuthorizationCache,
+    now: datetime | None = None,
+) -> int:
+    """
+    Load the open cards, their holds, what each card has authorized today
+    and each account's captured card spend into the cache. Holds closed
+    but not yet past their expiry are loaded for their references only.
+    Published postings are loaded only if some cached account's state may
+    predate them, so load the accounts first. Returns the number of cards.
+    """
+    now = now or datetime.now(timezone.utc)
+    day_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    async with session_factory() as db:
+        result = await db.stream_scalars(
+            select(Card).where(Card.status != CardStatus.closed)
+        )
+        loaded = 0
+        async for card in result:
+            cache.put_card(card)
+            loaded += 1
+
+        result = await db.stream(
+            select(
+                CardHold.status, *(getattr(CardHold, name) for name in Hold._fields)
+            ).where(
+                or_(CardHold.status == HoldStatus.active, CardHold.expires_at > now)
+            )
+        )
+        async for status, *row in result:
+            cache.add_hold(Hold(*row), active=status == HoldStatus.active)
+
+        result = await db.execute(
+            select(CardPosting.account_external_id, func.sum(CardPosting.amount))
+            .where(CardPosting.published_at.is_(None))
+            .group_by(CardPosting.account_external_id)
+        )
+        for account_external_id, amount in result:
+            cache.add_captured(account_external_id, Decimal(amount))
+
+        states = [a.updated_at for a in cache.accounts.values() if a.updated_at]
+        if states:
+            result = await db.execute(
+                select(
+                    CardPosting.account_external_id,
+                    CardPosting.amount,
+                    CardPosting.published_at,
+                ).where(CardPosting.published_at > min(states))
+            )
+            for account_external_id, amount, published_at in result:
+                cache.add_captured(account_external_id, amount)
+                cache.posted_to_ledger(account_external_id, amount, published_at)
+
+        result = await db.execute(
+            select(CardHold.card_id, func.sum(CardHold.amount))
+            .where(
+                CardHold.created_at >= day_start,
+                CardHold.status.notin_([HoldStatus.released, HoldStatus.expired]),
+            )
+            .group_by(CardHold.card_id)
+        )
+        for card_id, spent in result:
+            cache.set_spent(card_id, now.date(), Decimal(spent))
+    return loaded
@@ -0,0 +1,306 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import orjson
+import pytest
+import pytest_asyncio
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import select
+
+from app.core.account_events import AccountEventListener
+from app.core.cache import AuthorizationCache, Hold
+from app.core.db import get_db
+from app.core.holds import HoldClosed, HoldWriter
+from app.core.postings import PostingPublisher
+from app.core.security import get_current_user, require_superuser
+from app.main import app
+from app.models.card import CardHold, CardPosting, HoldStatus
+from app.services.card_service import get_cache, get_hold_writer, load_cards
+
+pytestmark = pytest.mark.asyncio
+
+NOW = datetime(2025, 3, 1, 12, tzinfo=timezone.utc)
+
+
+def _account(balance, updated_at=NOW, **fields):
+    return {
+        "external_id": "ACC-1",
+        "owner_user_id": "user-1",
+        "currency": "NGN",
+        "balance": str(balance),
+        "is_frozen": False,
+        "is_active": True,
+        "updated_at": updated_at.isoformat(),
+        **fields,
+    }
+
+
+@pytest_asyncio.fixture
+async def service(session_factory):
+    cache = AuthorizationCache()
+    cache.apply_account(_account("1000.00"))
+    writer = HoldWriter(
+        session_factory, flush_interval=0.01, max_batch=100, max_pending=5
+    )
+    writer.start()
+
+    async def override_get_db():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_cache] = lambda: cache
+    app.dependency_overrides[get_hold_writer] = lambda: writer
+    app.dependency_overrides[get_current_user] = lambda: {"sub": "user-1"}
+    app.dependency_overrides[require_superuser] = lambda: {"sub": "processor"}
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        resp = await client.post(
+            "/cards",
+            json={
+                "account_external_id": "ACC-1",
+                "single_limit": "400.00",
+                "daily_limit": "700.00",
+            },
+        )
+        assert resp.status_code == 201
+        yield client, cache, writer, resp.json()["id"]
+    app.dependency_overrides.clear()
+    await writer.close()
+
+
+async def test_authorizations_hold_funds_and_respect_limits(service, session_factory):
+    client, cache, writer, card_id = service
+
+    async def authorize(amount, **fields):
+        resp = await client.post(
+            "/cards/authorizations",
+            json={"card_id": card_id, "amount": amount, "currency": "ngn", **fields},
+        )
+        assert resp.status_code == 200
+        return resp.json()
+
+    first = await authorize("300.00", reference="ref-1", merchant="Shop")
+    assert first["approved"] and first["available_balance"] == "700.00"
+    # A retry returns the same hold rather than holding twice.
+    retry = await authorize("300.00", reference="ref-1")
+    assert retry["hold_id"] == first["hold_id"]
+    assert (await authorize("450.00"))["reason"] == "over_single_limit"
+    assert (await authorize("350.00"))["approved"]
+    # 650 of the 700 daily limit is used.
+    assert (await authorize("100.00"))["reason"] == "over_daily_limit"
+    assert (await authorize("10.00", currency="USD"))["reason"] == "currency_mismatch"
+
+    # The account is frozen by an event; a stale one does not undo it.
+    listener = AccountEventListener(cache, "amqp://unused", "account_events")
+    frozen = _account("1000.00", NOW + timedelta(seconds=1), is_frozen=True)
+    assert listener.handle_body(orjson.dumps({"account": frozen}))
+    assert not listener.handle_body(orjson.dumps({"account": _account("1000.00")}))
+    assert (await authorize("10.00"))["reason"] == "account_unavailable"
+
+    await asyncio.sleep(0.05)
+    async with session_factory() as db:
+        holds = (await db.execute(select(CardHold))).scalars().all()
+    assert sorted(h.amount for h in holds) == [Decimal("300.00"), Decimal("350.00")]
+    assert writer.written == 2
+
+    # A restarted process gets the holds and today's spend back.
+    reloaded = AuthorizationCache()
+    reloaded.apply_account(_account("1000.00"))
+    await load_cards(session_factory, reloaded, now=datetime.now(timezone.utc))
+    assert reloaded.available(reloaded.accounts["ACC-1"]) == Decimal("350.00")
+    decision = reloaded.authorize(
+        uuid.UUID(card_id),
+        Decimal("100.00"),
+        "NGN",
+        None,
+        None,
+        datetime.now(timezone.utc),
+        timedelta(days=7),
+    )
+    assert decision.reason == "over_daily_limit"
+
+
+async def test_declines_while_holds_cannot_be_written(service):
+    client, cache, writer, card_id = service
+    await writer.close()
+    # The writer is stopped, as if the database were down: holds pile up.
+    for _ in range(5):
+        resp = await client.post(
+            "/cards/authorizations",
+            json={"card_id": card_id, "amount": "1.00", "currency": "NGN"},
+        )
+        assert resp.json()["approved"]
+    resp = await client.post(
+        "/cards/authorizations",
+        json={"card_id": card_id, "amount": "1.00", "currency": "NGN"},
+    )
+    assert resp.json() == {
+        "approved": False,
+        "reason": "unavailable",
+        "hold_id": None,
+        "expires_at": None,
+        "available_balance": None,
+    }
+    writer.start()
+
+
+async def test_captures_post_in_batches_and_expired_holds_are_swept(
+    service, session_factory
+):
+    client, cache, writer, card_id = service
+
+    async def authorize(amount):
+        resp = await client.post(
+            "/cards/authorizations",
+            json={"card_id": card_id, "amount": amount, "currency": "NGN"},
+        )
+        return resp.json()["hold_id"]
+
+    first, second, third, fourth = [await authorize("100.00") for _ in range(4)]
+    # Paused, so the changes below are written as one batch.
+    await writer.close()
+    resp = await client.post(f"/cards/holds/{first}/capture", json={})
+    assert resp.json()["captured_amount"] == "100.00"
+    resp = await client.post(f"/cards/holds/{second}/capture", json={"amount": "60.00"})
+    assert resp.json()["available_balance"] == "640.00"
+    resp = await client.post(f"/cards/holds/{third}/release")
+    assert resp.json()["available_balance"] == "740.00"
+    resp = await client.post(f"/cards/holds/{third}/release")
+    assert resp.status_code == 404
+
+    # Only the hold that is still active expires; the sweep pops just it.
+    expired = cache.expire(datetime.now(timezone.utc) + timedelta(days=8))
+    assert [str(hold.id) for hold in expired] == [fourth]
+    assert cache.expire(datetime.now(timezone.utc) + timedelta(days=9)) == []
+    for hold in expired:
+        writer.close_hold(
+            HoldClosed(hold, HoldStatus.expired, datetime.now(timezone.utc))
+        )
+    assert cache.available(cache.accounts["ACC-1"]) == Decimal("840.00")
+
+    writer.start()
+    await asyncio.sleep(0.05)
+    async with session_factory() as db:
+        postings = (await db.execute(select(CardPosting))).scalars().all()
+        statuses = dict((await db.execute(select(CardHold.id, CardHold.status))).all())
+    assert [(p.amount, p.captures) for p in postings] == [(Decimal("160.00"), 2)]
+    assert sorted(statuses.values()) == [
+        HoldStatus.captured,
+        HoldStatus.captured,
+        HoldStatus.expired,
+        HoldStatus.released,
+    ]
+
+    # A restarted process gets the captured spend from the card ledger.
+    reloaded = AuthorizationCache()
+    reloaded.apply_account(_account("1000.00"))
+    await load_cards(session_factory, reloaded, now=datetime.now(timezone.utc))
+    assert reloaded.holds == {}
+    assert reloaded.available(reloaded.accounts["ACC-1"]) == Decimal("840.00")
+
+
+class RecordingPublisher(PostingPublisher):
+    def __init__(self, *args, fail=0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fail = fail
+        self.messages = []
+
+    async def _publish(self, messages):
+        if self.fail:
+            self.fail -= 1
+            raise ConnectionError("broker down")
+        self.messages.extend(messages)
+
+
+async def test_captured_spend_is_published_and_absorbed_by_the_balance(
+    service, session_factory
+):
+    client, cache, writer, card_id = service
+    publisher = RecordingPublisher(
+        cache, session_factory, None, "card_postings", 0.01, 100, fail=1
+    )
+    await publisher.start()
+    writer.publisher = publisher
+
+    resp = await client.post(
+        "/cards/authorizations",
+        json={"card_id": card_id, "amount": "100.00", "currency": "NGN"},
+    )
+    hold_id = resp.json()["hold_id"]
+    await client.post(f"/cards/holds/{hold_id}/capture", json={})
+    # The first publish fails; the posting is published on the retry.
+    for _ in range(50):
+        if publisher.messages:
+            break
+        await asyncio.sleep(0.01)
+    await publisher.close()
+
+    [message] = publisher.messages
+    assert message["owner_user_id"] == "user-1"
+    assert message["amount"] == "100.00"
+    async with session_factory() as db:
+        [posting] = (await db.execute(select(CardPosting))).scalars().all()
+    assert str(posting.id) == message["posting_id"]
+    assert posting.published_at is not None
+
+    # Until the account's state includes the withdrawal, it is held back.
+    account = cache.accounts["ACC-1"]
+    assert cache.available(account) == Decimal("900.00")
+    later = datetime.now(timezone.utc) + timedelta(seconds=1)
+    cache.apply_account(_account("900.00", updated_at=later))
+    assert cache.available(account) == Decimal("900.00")
+    assert cache.posted == {}
+
+    # A restart counts the published posting only against older states.
+    reloaded = AuthorizationCache()
+    reloaded.apply_account(_account("1000.00"))
+    await load_cards(session_factory, reloaded)
+    assert reloaded.available(reloaded.accounts["ACC-1"]) == Decimal("900.00")
+    reloaded.apply_account(_account("900.00", updated_at=later))
+    assert reloaded.available(reloaded.accounts["ACC-1"]) == Decimal("900.00")
+
+    # Nothing is left for the next start to publish.
+    restarted = RecordingPublisher(
+        cache, session_factory, None, "card_postings", 1, 100
+    )
+    await restarted.start()
+    await restarted.close()
+    assert restarted.messages == []
+
+
+async def test_writer_drops_only_the_change_that_cannot_be_written(session_factory):
+    writer = HoldWriter(
+        session_factory, flush_interval=0.01, max_batch=100, max_pending=4
+    )
+
+    def hold(hold_id):
+        now = datetime.now(timezone.utc)
+        return Hold(
+            hold_id,
+            uuid.uuid4(),
+            "ACC-1",
+            Decimal("10.00"),
+            "NGN",
+            None,
+            None,
+            now,
+            now + timedelta(days=7),
+        )
+
+    good = [hold(uuid.uuid4()) for _ in range(3)]
+    # Not a UUID: no retry can store it.
+    for entry in (good[0], hold("not-a-uuid"), good[1], good[2]):
+        writer.add(entry)
+    assert writer.backlogged
+    writer.start()
+    await writer.close()
+
+    assert not writer.backlogged
+    assert writer.written == 3
+    async with session_factory() as db:
+        stored = set((await db.execute(select(CardHold.id))).scalars())
+    assert stored == {h.id for h in good}
@@ -0,0 +1,180 @@
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List, Literal
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import FileResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.db import get_db
+from app.core.security import require_superuser
+from app.core.config import settings
+from app.core.matching import CATEGORIES, report_path
+from app.models.balance_check import BalanceDrift
+from app.models.reconciliation import ReconciliationRun, ReconciliationStatus
+from app.schemas.reconciliation import BalanceDriftOut, ReconciliationRunOut
+from app.services.reconciliation_service import (
+    UploadTooLarge,
+    create_run,
+    report_dir,
+    resume_run,
+    run_pool,
+    spool_path,
+    spool_upload,
+)
+from app.core.logger import logging
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/reconciliations", tags=["reconciliations"])
+
+
+async def _get_run(db: AsyncSession, run_id: uuid.UUID) -> ReconciliationRun:
+    run = await db.get(ReconciliationRun, run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Reconciliation not found")
+    return run
+
+
+@router.post(
+    "",
+    response_model=ReconciliationRunOut,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def submit_statement(
+    request: Request,
+    bank: str = Query(..., min_length=1, max_length=64),
+    start: datetime = Query(..., description="Ledger period start (inclusive)"),
+    end: datetime = Query(..., description="Ledger period end (exclusive)"),
+    db: AsyncSession = Depends(get_db),
+    user=Depends(require_superuser),
+):
+    """
+    Upload a bank statement as the raw CSV request body (Content-Type:
+    text/csv). It needs a header row with reference and amount columns;
+    currency and value_date are optional. The statement is matched against
+    the bank's settled transactions created in [start, end) in the
+    background; poll GET /reconciliations/{id} for the outcome.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type.lower() != "text/csv":
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Expected text/csv",
+        )
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+
+    run_id = uuid.uuid4()
+    try:
+        size = await spool_upload(
+            request.stream(), run_id, settings.RECON_MAX_UPLOAD_BYTES
+        )
+    except UploadTooLarge as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e)
+        )
+    if size == 0:
+        os.remove(spool_path(run_id))
+        raise HTTPException(status_code=400, detail="Empty upload")
+
+    run = await create_run(db, run_id, bank, start, end, user["sub"], size)
+    run_pool.submit(run.id)
+    logger.info(
+        f"Reconciliation {run.id} for {bank} queued by {user['sub']} ({size} bytes)"
+    )
+    return run
+
+
+@router.get("", response_model=List[ReconciliationRunOut])
+async def list_runs(
+    bank: str | None = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_db),
+    user=Depends(require_superuser),
+):
+    query = select(ReconciliationRun)
+    if bank:
+        query = query.where(ReconciliationRun.bank == bank)
+    result = await db.execute(
+        query.order_by(ReconciliationRun.created_at.desc()).limit(limit)
+    )
+    return result.scalars().all()
+
+
+@router.get("/drifts", response_model=List[BalanceDriftOut])
+async def list_drifts(
+    currency: str | None = None,
+    min_age_seconds: int | None = Query(None, ge=0),
+    resolved: bool = False,
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_db),
+    user=Depends(require_superuser),
+):
+    """
+    Users whose account balances do not add up to their successful
+    transactions, as found by the balance checker. Drifts younger than
+    min_age_seconds (BALANCE_DRIFT_GRACE_SECONDS by default) are left out,
+    since a transfer in flight between the services looks the same.
+    """
+    if min_age_seconds is None:
+        min_age_seconds = settings.BALANCE_DRIFT_GRACE_SECONDS
+    seen_before = datetime.now(timezone.utc) - timedelta(seconds=min_age_seconds)
+    query = select(BalanceDrift).where(BalanceDrift.first_seen_at <= seen_before)
+    if resolved:
+        query = query.where(BalanceDrift.resolved_at.is_not(None))
+    else:
+        query = query.where(BalanceDrift.resolved_at.is_(None))
+    if currency:
+        query = query.where(BalanceDrift.currency == currency.upper())
+    result = await db.execute(query.order_by(BalanceDrift.first_seen_at).limit(limit))
+    return result.scalars().all()
+
+
+@router.get("/{run_id}", response_model=ReconciliationRunOut)
+async def get_run(
+    run_id: uuid.UUID,
+    db: AsyncSession = Depends(get_db),
+    user=Depends(require_superuser),
+):
+    return await _get_run(db, run_id)
+
+
+@router.post(
+    "/{run_id}/resume",
+    response_model=ReconciliationRunOut,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def resume(
+    run_id: uuid.UUID,
+    db: AsyncSession = Depends(get_db),
+    user=Depends(require_superuser),
+):
+    """Queue a failed run again. Units it already finished are not redone."""
+    run = await _get_run(db, run_id)
+    if not await resume_run(db, run):
+        raise HTTPException(
+            status_code=409, detail=f"Reconciliation is {run.status.value}"
+        )
+    run_pool.submit(run.id)
+    logger.info(f"Reconciliation {run.id} resumed by {user['sub']}")
+    return run
+
+
+@router.get("/{run_id}/reports/{category}")
+async def download_report(
+    run_id: uuid.UUID,
+    category: Literal[CATEGORIES],
+    db: AsyncSession = Depends(get_db),
+    user=Depends(require_superuser),
+):
+    run = await _get_run(db, run_id)
+    if run.status != ReconciliationStatus.completed:
+        raise HTTPException(
+            status_code=409, detail=f"Reconciliation is {run.status.value}"
+        )
+    path = report_path(report_dir(run_id), category)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Report not found")
+    return FileResponse(
+        path, media_type="text/csv", filename=f"{run_id}-{category}.csv"
+    )
@@ -0,0 +1,67 @@
+from pydantic_settings import BaseSettings
+from pydantic import Field
+
+
+class Settings(BaseSettings):
+
+    ENV: str = Field("development")
+
+    # Reconciliation runs and their summaries
+    DATABASE_URL: str
+
+    # Transactions database the ledger side is read from; point it at a
+    # replica to keep the scan off the primary.
+    TRANSACTIONS_DATABASE_URL: str
+
+    # Accounts database whose balances the balance checker compares against
+    # the ledger.
+    ACCOUNTS_DATABASE_URL: str
+
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 5
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+
+    RECON_SPOOL_DIR: str = Field("/app/spool/reconciliation")
+    RECON_REPORT_DIR: str = Field("/app/reports")
+    RECON_MAX_UPLOAD_BYTES: int = 8 * 1024 * 1024 * 1024
+    # Statement bytes per hash partition; each partition's ledger rows are
+    # held in memory while its statement lines are matched.
+    RECON_PARTITION_BYTES: int = 8 * 1024 * 1024
+    RECON_MAX_PARTITIONS: int = 256
+    RECON_LEDGER_CHUNK_ROWS: int = 20_000
+    # The ledger scan is split into slices of the period, one cursor each.
+    RECON_LEDGER_SHARD_HOURS: float = 6
+    # Worker processes shared by all runs; 0 means one per CPU.
+    RECON_PROCESSES: int = 0
+    RECON_WORKERS: int = 2
+    RECON_HEARTBEAT_SECONDS: int = 30
+    RECON_STALE_SECONDS: int = 300
+    RECON_SWEEP_INTERVAL_SECONDS: float = 60
+
+    BALANCE_CHECK_INTERVAL_SECONDS: int = 30
+    # Transactions changed less than this long ago are left for the next
+    # pass, so rows committed late (updated_at is set before the commit)
+    # are not skipped by the watermark.
+    BALANCE_CHECK_LAG_SECONDS: int = 60
+    BALANCE_CHECK_CHUNK_ROWS: int = 5000
+    # Accounts re-checked per pass whether or not they moved; the whole
+    # book is covered every (accounts / this) passes.
+    BALANCE_CHECK_SWEEP_ACCOUNTS: int = 2000
+    # A drift younger than this may just be a transfer in flight between
+    # the two services and is not reported by default.
+    BALANCE_DRIFT_GRACE_SECONDS: int = 300
+
+    AUTH_JWKS_URL: str
+    JWT_ALGORITHM: str = Field("RS256")
+
+    LOG_FILE: str = Field("/app/logs/reconciliation.log")
+    LOG_LEVEL: str = Field("info")
+
+    class Config:
+        env_file = ".env"
+        env_file_encoding = "utf-8"
+
+
+settings = Settings()
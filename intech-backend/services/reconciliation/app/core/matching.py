@@ -0,0 +1,439 @@
+"""
+Streaming match of a bank statement against the ledger.
+
+Both sides are far larger than memory, so the match is a grace hash join
+on the bank reference:
+
+1. The statement file is read line by line and each line is appended to
+   one of P spill files picked by crc32(reference) % P. Lines without a
+   reference or amount go straight to the invalid report.
+2. At the same time, the bank's transactions for the period are streamed
+   from server-side cursors, one per ledger shard (a slice of the period),
+   and spilled to P files per shard the same way.
+3. For each partition, the ledger files are loaded into a dict keyed by
+   reference. The statement file is then streamed against it. References
+   left unclaimed in the dict are missing from the statement.
+4. The per-partition reports are concatenated into one CSV per category.
+
+Steps 1-3 are independent units of work. Each one reads and writes only
+its own files, and each is a module-level function that can run in a
+worker process. Re-running a unit overwrites its output, which is what
+makes a run resumable (see app.services.reconciliation_service).
+
+P is picked from the statement size (RECON_PARTITION_BYTES per
+partition). So peak memory per worker is one partition of ledger rows,
+each held as a single string, whatever the file size.
+
+Amounts are compared as absolute values to the cent. Banks disagree on
+whether an outbound payment is signed. A line whose amount agrees is
+matched only if the ledger has the transfer as successful; a payment the
+ledger still has as pending or failed is a status mismatch.
+"""
+
+import asyncio
+import csv
+import io
+import math
+import os
+import shutil
+import zlib
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.models.reconciliation import ledger_transactions
+
+CENT = Decimal("0.01")
+# The ledger status of a transfer the bank has paid.
+SUCCESS = "success"
+
+CATEGORIES = (
+    "matched",
+    "amount_mismatch",
+    "status_mismatch",
+    "missing_internal",
+    "missing_statement",
+    "duplicate",
+    "invalid",
+)
+
+REPORT_COLUMNS = {
+    "matched": ("reference", "transaction_id", "amount", "currency", "line"),
+    "amount_mismatch": (
+        "reference",
+        "transaction_id",
+        "ledger_amount",
+        "ledger_currency",
+        "statement_amount",
+        "statement_currency",
+        "line",
+    ),
+    "status_mismatch": (
+        "reference",
+        "transaction_id",
+        "amount",
+        "currency",
+        "ledger_status",
+        "line",
+    ),
+    "missing_internal": ("reference", "amount", "currency", "value_date", "line"),
+    "missing_statement": (
+        "reference",
+        "transaction_id",
+        "amount",
+        "currency",
+        "status",
+        "created_at",
+    ),
+    "duplicate": ("reference", "amount", "currency", "value_date", "line"),
+    "invalid": ("line", "error", "record"),
+}
+
+# Accepted statement header names, matched case-insensitively.
+STATEMENT_COLUMNS = {
+    "reference": ("reference", "external_reference", "bank_reference", "ref"),
+    "amount": ("amount", "value"),
+    "currency": ("currency", "ccy"),
+    "value_date": ("value_date", "date", "posted_at"),
+}
+
+
+class StatementError(ValueError):
+    pass
+
+
+def partition_of(reference: str, partitions: int) -> int:
+    return zlib.crc32(reference.encode()) % partitions
+
+
+def partition_count(statement_bytes: int, partition_bytes: int, limit: int) -> int:
+    return max(1, min(limit, math.ceil(statement_bytes / partition_bytes)))
+
+
+def parse_amount(text: str) -> Decimal:
+    return abs(Decimal(text.strip().replace(",", ""))).quantize(CENT)
+
+
+def resolve_columns(header: Sequence[str]) -> Dict[str, Optional[int]]:
+    names = [name.strip().lower() for name in header]
+    columns = {}
+    for key, aliases in STATEMENT_COLUMNS.items():
+        columns[key] = next(
+            (names.index(alias) for alias in aliases if alias in names), None
+        )
+    missing = [key for key in ("reference", "amount") if columns[key] is None]
+    if missing:
+        raise StatementError(f"Statement header has no {', '.join(missing)} column")
+    return columns
+
+
+def _field(value) -> str:
+    # Spill files are tab-separated, one row per line.
+    return str(value).replace("\t", " ").replace("\n", " ").replace("\r", " ")
+
+
+class SpillFiles:
+    """
+    P append-only files, one per hash partition. Rows are stored as
+    reference<TAB>rest so the match can index the rest of the line as a
+    single string.
+    """
+
+    def __init__(self, workdir: str, prefix: str, partitions: int) -> None:
+        self.paths = [spill_path(workdir, prefix, p) for p in range(partitions)]
+        self._files = [open(path, "w") for path in self.paths]
+        self.partitions = partitions
+
+    def write(self, reference: str, fields: Iterable) -> None:
+        reference = _field(reference)
+        self._files[partition_of(reference, self.partitions)].write(
+            "\t".join([reference, *map(_field, fields)]) + "\n"
+        )
+
+    def close(self) -> None:
+        for f in self._files:
+            f.close()
+
+
+def spill_path(workdir: str, prefix: str, partition: int) -> str:
+    return os.path.join(workdir, f"{prefix}-{partition:04d}.tsv")
+
+
+def ledger_prefix(shard: int) -> str:
+    return f"ledger-{shard:03d}"
+
+
+class ReportWriter:
+    """
+    One unit's share of the reports: a headerless CSV per category under
+    `workdir`, opened on first write, plus running counts.
+    """
+
+    def __init__(self, workdir: str, name: str) -> None:
+        self.workdir = workdir
+        self.name = name
+        self.counts = {category: 0 for category in CATEGORIES}
+        self.matched_amount = Decimal(0)
+        self._files = {}
+        self._writers = {}
+        for category in CATEGORIES:
+            # Drop what an interrupted attempt at this unit left behind.
+            if os.path.exists(part_path(workdir, category, name)):
+                os.remove(part_path(workdir, category, name))
+
+    def write(self, category: str, row: Sequence) -> None:
+        writer = self._writers.get(category)
+        if writer is None:
+            f = open(part_path(self.workdir, category, self.name), "w", newline="")
+            self._files[category] = f
+            writer = self._writers[category] = csv.writer(f)
+        writer.writerow(row)
+        self.counts[category] += 1
+
+    def close(self) -> None:
+        for f in self._files.values():
+            f.close()
+
+
+def part_path(workdir: str, category: str, name: str) -> str:
+    return os.path.join(workdir, f"{category}.{name}.csv")
+
+
+def report_path(directory: str, category: str) -> str:
+    return os.path.join(directory, f"{category}.csv")
+
+
+def merge_reports(workdir: str, names: Sequence[str], directory: str) -> None:
+    """Concatenate the units' report parts, in `names` order, under `directory`."""
+    os.makedirs(directory, exist_ok=True)
+    for category in CATEGORIES:
+        with open(report_path(directory, category), "w", newline="") as out:
+            csv.writer(out).writerow(REPORT_COLUMNS[category])
+            for name in names:
+                path = part_path(workdir, category, name)
+                if os.path.exists(path):
+                    with open(path, newline="") as part:
+                        shutil.copyfileobj(part, out, 1024 * 1024)
+
+
+def ledger_shards(start: datetime, end: datetime, shard_hours: float) -> int:
+    return max(1, math.ceil((end - start) / timedelta(hours=shard_hours)))
+
+
+def shard_range(
+    start: datetime, end: datetime, shards: int, shard: int
+) -> Tuple[datetime, datetime]:
+    step = (end - start) / shards
+    return (
+        start + step * shard,
+        end if shard == shards - 1 else start + step * (shard + 1),
+    )
+
+
+def split_statement(path: str, workdir: str, partitions: int) -> dict:
+    """
+    Partition a statement CSV into `workdir`. Returns the number of data
+    lines and the invalid count.
+    """
+    spill = SpillFiles(workdir, "statement", partitions)
+    reports = ReportWriter(workdir, "statement")
+    try:
+        lines = _split(path, spill, reports)
+    finally:
+        spill.close()
+        reports.close()
+    return {"rows": lines, "counts": reports.counts}
+
+
+def _split(path: str, spill: SpillFiles, reports: ReportWriter) -> int:
+    lines = 0
+    with io.TextIOWrapper(open(path, "rb"), encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            raise StatementError("Statement is empty")
+        columns = resolve_columns(header)
+        ref_col, amount_col = columns["reference"], columns["amount"]
+        currency_col, date_col = columns["currency"], columns["value_date"]
+        width = max(i for i in columns.values() if i is not None) + 1
+        for record in reader:
+            if not record:
+                continue
+            lines += 1
+            # Rows are numbered as a spreadsheet shows them, header first,
+            # so quoted newlines do not shift the numbering.
+            line = lines + 1
+            if len(record) < width:
+                reports.write("invalid", (line, "missing columns", ",".join(record)))
+                continue
+            reference = record[ref_col].strip()
+            if not reference:
+                reports.write("invalid", (line, "empty reference", ",".join(record)))
+                continue
+            try:
+                amount = parse_amount(record[amount_col])
+            except InvalidOperation:
+                reports.write("invalid", (line, "bad amount", ",".join(record)))
+                continue
+            spill.write(
+                reference,
+                (
+                    amount,
+                    (
+                        record[currency_col].strip().upper()
+                        if currency_col is not None
+                        else ""
+                    ),
+                    record[date_col].strip() if date_col is not None else "",
+                    line,
+                ),
+            )
+    return lines
+
+
+def ledger_query(bank: str, start: datetime, end: datetime):
+    t = ledger_transactions.c
+    return (
+        select(t.external_reference, t.id, t.amount, t.currency, t.status, t.created_at)
+        .where(t.external_bank == bank)
+        .where(t.created_at >= start)
+        .where(t.created_at < end)
+        .where(t.external_reference.is_not(None))
+    )
+
+
+def spill_ledger_rows(spill: SpillFiles, rows: List[Tuple]) -> None:
+    for reference, txn_id, amount, currency, status, created_at in rows:
+        spill.write(
+            reference,
+            (
+                txn_id,
+                abs(amount).quantize(CENT),
+                currency.upper(),
+                status,
+                created_at.isoformat(),
+            ),
+        )
+
+
+def scan_ledger_shard(
+    url: str,
+    bank: str,
+    start: datetime,
+    end: datetime,
+    workdir: str,
+    shard: int,
+    partitions: int,
+    chunk_rows: int,
+) -> dict:
+    """Spill the bank's transactions created in [start, end) into `workdir`."""
+    return asyncio.run(
+        _scan(url, bank, start, end, workdir, shard, partitions, chunk_rows)
+    )
+
+
+async def _scan(url, bank, start, end, workdir, shard, partitions, chunk_rows):
+    # A worker process cannot share the parent's pool; one connection will do.
+    engine = create_async_engine(url, poolclass=NullPool)
+    spill = SpillFiles(workdir, ledger_prefix(shard), partitions)
+    rows_read = 0
+    try:
+        async with engine.connect() as conn:
+            result = await conn.stream(
+                ledger_query(bank, start, end).execution_options(yield_per=chunk_rows)
+            )
+            async for rows in result.partitions(chunk_rows):
+                spill_ledger_rows(spill, rows)
+                rows_read += len(rows)
+    finally:
+        spill.close()
+        await engine.dispose()
+    return {"rows": rows_read, "counts": {}}
+
+
+def match_partition(workdir: str, partition: int, shards: int) -> dict:
+    """
+    Match one partition's statement lines against its ledger rows from every
+    shard. Returns the ledger row count, category counts and matched amount.
+    """
+    reports = ReportWriter(workdir, f"p{partition:04d}")
+    try:
+        ledger_rows = _match(workdir, partition, shards, reports)
+    finally:
+        reports.close()
+    return {
+        "rows": ledger_rows,
+        "counts": reports.counts,
+        "matched_amount": str(reports.matched_amount),
+    }
+
+
+def _match(workdir: str, partition: int, shards: int, reports: ReportWriter) -> int:
+    # reference -> rest of the ledger line, or None once claimed.
+    index: Dict[str, Optional[str]] = {}
+    # A reference booked twice in the ledger is rare; extra rows wait here.
+    extra: Dict[str, List[str]] = {}
+    ledger_rows = 0
+    for shard in range(shards):
+        with open(spill_path(workdir, ledger_prefix(shard), partition)) as f:
+            for line in f:
+                ledger_rows += 1
+                reference, _, rest = line.partition("\t")
+                if reference in index:
+                    extra.setdefault(reference, []).append(rest)
+                else:
+                    index[reference] = rest
+
+    with open(spill_path(workdir, "statement", partition)) as f:
+        for line in f:
+            fields = line.rstrip("\n").split("\t")
+            reference, amount, currency = fields[:3]
+            booked = index.get(reference, False)
+            if booked is None and reference in extra:
+                booked = extra[reference].pop()
+                if not extra[reference]:
+                    del extra[reference]
+            if booked is False:
+                reports.write("missing_internal", fields)
+                continue
+            if booked is None:
+                reports.write("duplicate", fields)
+                continue
+            index[reference] = None
+            txn_id, ledger_amount, ledger_currency, status, _ = booked.split("\t", 4)
+            if (
+                amount != ledger_amount and Decimal(amount) != Decimal(ledger_amount)
+            ) or (currency and currency != ledger_currency):
+                reports.write(
+                    "amount_mismatch",
+                    (
+                        reference,
+                        txn_id,
+                        ledger_amount,
+                        ledger_currency,
+                        amount,
+                        currency,
+                        fields[4],
+                    ),
+                )
+                continue
+            if status != SUCCESS:
+                reports.write(
+                    "status_mismatch",
+                    (reference, txn_id, amount, currency, status, fields[4]),
+                )
+                continue
+            reports.write("matched", (reference, txn_id, amount, currency, fields[4]))
+            reports.matched_amount += Decimal(amount)
+
+    for reference, rest in index.items():
+        if rest is not None:
+            reports.write("missing_statement", [reference, *rest[:-1].split("\t")])
+    for reference, rests in extra.items():
+        for rest in rests:
+            reports.write("missing_statement", [reference, *rest[:-1].split("\t")])
+    return ledger_rows
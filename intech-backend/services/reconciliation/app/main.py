@@ -0,0 +1,35 @@
+from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from app.core.config import settings
+from app.core.logger import configure_logging
+from app.api.v1 import reconciliation as reconciliation_router
+from app.core.db import engine, Base
+from app.services.reconciliation_service import run_pool
+import app.models.reconciliation  # noqa: F401 - registers the tables
+import app.models.balance_check  # noqa: F401
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    configure_logging()
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    await run_pool.start(
+        settings.RECON_WORKERS,
+        settings.RECON_PROCESSES,
+        settings.RECON_SWEEP_INTERVAL_SECONDS,
+    )
+
+    try:
+        yield
+    finally:
+        await run_pool.stop()
+        await engine.dispose()
+
+
+app = FastAPI(title="Reconciliation Service", lifespan=lifespan)
+
+
+app.include_router(reconciliation_router.router)
@@ -0,0 +1,96 @@
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    Integer,
+    MetaData,
+    Numeric,
+    String,
+    Table,
+)
+from datetime import datetime, timezone
+from app.core.db import Base
+
+
+class BalanceCheckState(Base):
+    """
+    Where the balance checker has got to: the (updated_at, id) of the last
+    transaction applied to the running sums, and the last account id of the
+    rolling sweep. There is a single row.
+    """
+
+    __tablename__ = "balance_check_state"
+
+    id = Column(Integer, primary_key=True, default=1)
+    watermark_at = Column(DateTime(timezone=True), nullable=True)
+    watermark_id = Column(String(36), nullable=True)
+    sweep_account_id = Column(Integer, nullable=False, default=0)
+    transactions_applied = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
+
+
+class LedgerBalance(Base):
+    """Net of a user's successful transactions in one currency."""
+
+    __tablename__ = "ledger_balances"
+
+    user_id = Column(String(64), primary_key=True)
+    currency = Column(String(10), primary_key=True)
+    balance = Column(Numeric(precision=20, scale=2), nullable=False, default=0)
+    updated_at = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
+
+
+class LedgerPosting(Base):
+    """
+    A successful transaction as it was added to the ledger balances, so it
+    can be taken out again exactly if its status later changes.
+    """
+
+    __tablename__ = "ledger_postings"
+
+    transaction_id = Column(String(36), primary_key=True)
+    type = Column(String(16), nullable=False)
+    sender_user_id = Column(String(64), nullable=False)
+    recipient_user_id = Column(String(64), nullable=True)
+    amount = Column(Numeric(precision=12, scale=2), nullable=False)
+    currency = Column(String(10), nullable=False)
+
+
+class BalanceDrift(Base):
+    """
+    A user and currency whose account balances do not add up to the ledger
+    balance. The row stays while the difference persists and is marked
+    resolved when a later check finds them equal again.
+    """
+
+    __tablename__ = "balance_drifts"
+
+    user_id = Column(String(64), primary_key=True)
+    currency = Column(String(10), primary_key=True)
+    ledger_balance = Column(Numeric(precision=20, scale=2), nullable=False)
+    account_balance = Column(Numeric(precision=20, scale=2), nullable=False)
+    first_seen_at = Column(DateTime(timezone=True), nullable=False)
+    last_seen_at = Column(DateTime(timezone=True), nullable=False)
+    resolved_at = Column(DateTime(timezone=True), nullable=True)
+
+
+# The accounts service owns this table; only the columns read here are
+# declared, on metadata of their own so create_all never touches it.
+accounts_metadata = MetaData()
+
+accounts_table = Table(
+    "accounts",
+    accounts_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("owner_user_id", String(64)),
+    Column("currency", String(8)),
+    Column("balance", Numeric(18, 2)),
+)
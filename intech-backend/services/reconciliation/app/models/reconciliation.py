@@ -0,0 +1,118 @@
+import enum
+import uuid
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    Enum,
+    ForeignKey,
+    Index,
+    Integer,
+    MetaData,
+    Numeric,
+    String,
+    Table,
+    JSON,
+)
+from sqlalchemy.dialects.postgresql import UUID
+from datetime import datetime, timezone
+from app.core.db import Base
+
+
+class ReconciliationStatus(str, enum.Enum):
+    queued = "queued"
+    running = "running"
+    completed = "completed"
+    failed = "failed"
+
+
+class ReconciliationRun(Base):
+    """One bank statement matched against the ledger for a date range."""
+
+    __tablename__ = "reconciliation_runs"
+    __table_args__ = (
+        Index("ix_reconciliation_runs_bank_period", "bank", "period_start"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    bank = Column(String(64), nullable=False)
+    period_start = Column(DateTime(timezone=True), nullable=False)
+    period_end = Column(DateTime(timezone=True), nullable=False)
+    requested_by = Column(String(64), nullable=False)
+    status = Column(
+        Enum(ReconciliationStatus),
+        default=ReconciliationStatus.queued,
+        nullable=False,
+    )
+    # Set when the statement is read in place rather than uploaded.
+    statement_path = Column(String(1024), nullable=True)
+    statement_bytes = Column(BigInteger, nullable=False, default=0)
+    partitions = Column(BigInteger, nullable=False, default=0)
+    ledger_shards = Column(Integer, nullable=False, default=1)
+    # Statement split + ledger shards + partitions; see checkpoints.
+    units_total = Column(Integer, nullable=False, default=0)
+    units_done = Column(Integer, nullable=False, default=0)
+    statement_rows = Column(BigInteger, nullable=False, default=0)
+    ledger_rows = Column(BigInteger, nullable=False, default=0)
+    matched = Column(BigInteger, nullable=False, default=0)
+    amount_mismatch = Column(BigInteger, nullable=False, default=0)
+    status_mismatch = Column(BigInteger, nullable=False, default=0)
+    missing_internal = Column(BigInteger, nullable=False, default=0)
+    missing_statement = Column(BigInteger, nullable=False, default=0)
+    duplicate = Column(BigInteger, nullable=False, default=0)
+    invalid = Column(BigInteger, nullable=False, default=0)
+    matched_amount = Column(Numeric(precision=18, scale=2), nullable=False, default=0)
+    error = Column(String(1024), nullable=True)
+    created_at = Column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+    updated_at = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class ReconciliationCheckpoint(Base):
+    """
+    A finished unit of a run: the statement split (shard 0), a ledger shard
+    or a partition match. A resumed run skips units recorded here.
+    """
+
+    __tablename__ = "reconciliation_checkpoints"
+
+    run_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("reconciliation_runs.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    stage = Column(String(16), primary_key=True)  # statement | ledger | match
+    shard = Column(Integer, primary_key=True)
+    rows = Column(BigInteger, nullable=False, default=0)
+    counts = Column(JSON, nullable=False, default=dict)
+    matched_amount = Column(Numeric(precision=18, scale=2), nullable=False, default=0)
+    created_at = Column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+
+
+# The transactions service owns this table; only the columns read here are
+# declared, on metadata of their own so create_all never touches it.
+ledger_metadata = MetaData()
+
+ledger_transactions = Table(
+    "transactions",
+    ledger_metadata,
+    Column("id", String),
+    Column("sender_user_id", String(64)),
+    Column("recipient_user_id", String(64)),
+    Column("type", String),
+    Column("external_bank", String(64)),
+    Column("external_reference", String(128)),
+    Column("amount", Numeric(precision=12, scale=2)),
+    Column("currency", String(10)),
+    Column("status", String),
+    Column("created_at", DateTime(timezone=True)),
+    Column("updated_at", DateTime(timezone=True)),
+)
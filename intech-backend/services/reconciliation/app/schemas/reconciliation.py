@@ -0,0 +1,50 @@
+from pydantic import BaseModel
+from typing import Optional
+from decimal import Decimal
+from uuid import UUID
+from app.models.reconciliation import ReconciliationStatus
+from datetime import datetime
+
+
+class ReconciliationRunOut(BaseModel):
+    id: UUID
+    bank: str
+    period_start: datetime
+    period_end: datetime
+    requested_by: str
+    status: ReconciliationStatus
+    statement_bytes: int
+    partitions: int
+    ledger_shards: int
+    units_total: int
+    units_done: int
+    statement_rows: int
+    ledger_rows: int
+    matched: int
+    amount_mismatch: int
+    status_mismatch: int
+    missing_internal: int
+    missing_statement: int
+    duplicate: int
+    invalid: int
+    matched_amount: Decimal
+    error: Optional[str]
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime]
+
+    class Config:
+        orm_mode = True
+
+
+class BalanceDriftOut(BaseModel):
+    user_id: str
+    currency: str
+    ledger_balance: Decimal
+    account_balance: Decimal
+    first_seen_at: datetime
+    last_seen_at: datetime
+    resolved_at: Optional[datetime]
+
+    class Config:
+        orm_mode = True
@@ -0,0 +1,330 @@
+"""
+Continuous check that account balances add up to the ledger.
+
+The ledger balance of a user in a currency is the net of their successful
+transactions: a transfer debits the sender and credits the recipient (if
+internal), a deposit credits and a withdrawal debits the sender. Those nets
+are kept as running sums in ledger_balances, fed incrementally from the
+transactions changed since a watermark on (updated_at, id), which
+ix_transactions_updated_at serves without scanning the table.
+
+Statuses change after a transaction is created (fraud, settlement), so a
+row can come past the watermark more than once; ledger_postings remembers
+what each successful transaction contributed so a later change replaces
+that contribution instead of adding to it.
+
+Each pass compares the users touched by the new transactions against the
+summed balances of their accounts, then re-checks the next slice of the
+accounts table so balances that changed without a transaction are caught
+too. Differences are recorded in balance_drifts until they go away.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Dict, Iterable, List, Set, Tuple
+
+from sqlalchemy import bindparam, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+from sqlalchemy.types import NullType
+
+from app.core.config import settings
+from app.core.logger import logging
+from app.models.balance_check import (
+    BalanceCheckState,
+    BalanceDrift,
+    LedgerBalance,
+    LedgerPosting,
+    accounts_table,
+)
+from app.models.reconciliation import ledger_transactions
+
+logger = logging.getLogger(__name__)
+
+# Users per IN (...) list, well under the bind parameter limits.
+LOOKUP_BATCH = 1000
+# Catching up a long backlog touches most users; past this many they are
+# left to the sweep rather than held in memory for the end of the pass.
+MAX_TOUCHED_USERS = 100_000
+
+ZERO = Decimal(0)
+
+
+def postings_of(
+    txn_type: str,
+    sender_user_id: str,
+    recipient_user_id: str | None,
+    amount: Decimal,
+    currency: str,
+) -> List[Tuple[str, str, Decimal]]:
+    """(user_id, currency, signed amount) for each balance a transaction moves."""
+    currency = currency.upper()
+    if txn_type == "deposit":
+        return [(sender_user_id, currency, amount)]
+    if txn_type == "withdrawal":
+        return [(sender_user_id, currency, -amount)]
+    postings = [(sender_user_id, currency, -amount)]
+    if recipient_user_id:
+        postings.append((recipient_user_id, currency, amount))
+    return postings
+
+
+def _batches(items: Iterable, size: int = LOOKUP_BATCH):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+async def _state(db) -> BalanceCheckState:
+    # FOR UPDATE keeps two checkers from applying the same rows twice.
+    state = await db.get(BalanceCheckState, 1, with_for_update=True)
+    if state is None:
+        state = BalanceCheckState(id=1, sweep_account_id=0, transactions_applied=0)
+        db.add(state)
+        await db.flush()
+    return state
+
+
+def changed_transactions(
+    watermark_at: datetime | None, watermark_id: str | None, until: datetime
+):
+    t = ledger_transactions.c
+    query = select(
+        t.id,
+        t.type,
+        t.status,
+        t.sender_user_id,
+        t.recipient_user_id,
+        t.amount,
+        t.currency,
+        t.updated_at,
+    ).where(t.updated_at <= until)
+    if watermark_at is not None:
+        # Untyped, so Postgres reads the id as the column's uuid rather
+        # than a varchar it cannot compare with.
+        watermark_id = bindparam("watermark_id", watermark_id, type_=NullType())
+        query = query.where(
+            tuple_(t.updated_at, t.id) > tuple_(watermark_at, watermark_id)
+        )
+    return query.order_by(t.updated_at, t.id)
+
+
+async def apply_transactions(
+    session_factory: async_sessionmaker,
+    ledger_engine: AsyncEngine,
+    until: datetime,
+    limit: int,
+) -> Tuple[int, Set[str]]:
+    """
+    Apply up to `limit` transactions changed after the watermark and no
+    later than `until` to the ledger balances, and move the watermark past
+    them, in one transaction. Returns the number of rows read and the users
+    whose ledger balance changed.
+    """
+    async with session_factory() as db:
+        state = await _state(db)
+        async with ledger_engine.connect() as conn:
+            result = await conn.execute(
+                changed_transactions(
+                    state.watermark_at, state.watermark_id, until
+                ).limit(limit)
+            )
+            rows = result.all()
+        if not rows:
+            await db.rollback()
+            return 0, set()
+
+        ids = [str(row.id) for row in rows]
+        result = await db.execute(
+            select(LedgerPosting).where(LedgerPosting.transaction_id.in_(ids))
+        )
+        posted = {p.transaction_id: p for p in result.scalars()}
+
+        deltas: Dict[Tuple[str, str], Decimal] = defaultdict(Decimal)
+        for txn_id, row in zip(ids, rows):
+            old = posted.get(txn_id)
+            if old is not None:
+                for user_id, currency, amount in postings_of(
+                    old.type,
+                    old.sender_user_id,
+                    old.recipient_user_id,
+                    old.amount,
+                    old.currency,
+                ):
+                    deltas[user_id, currency] -= amount
+            if row.status != "success":
+                if old is not None:
+                    await db.delete(old)
+                    del posted[txn_id]
+                continue
+            for user_id, currency, amount in postings_of(
+                row.type,
+                row.sender_user_id,
+                row.recipient_user_id,
+                row.amount,
+                row.currency,
+            ):
+                deltas[user_id, currency] += amount
+            values = dict(
+                type=row.type,
+                sender_user_id=row.sender_user_id,
+                recipient_user_id=row.recipient_user_id,
+                amount=row.amount,
+                currency=row.currency,
+            )
+            if old is None:
+                posted[txn_id] = LedgerPosting(transaction_id=txn_id, **values)
+                db.add(posted[txn_id])
+            else:
+                for key, value in values.items():
+                    setattr(old, key, value)
+
+        changed = {key: delta for key, delta in deltas.items() if delta != ZERO}
+        users = {user_id for user_id, _ in changed}
+        balances = {}
+        for batch in _batches(users):
+            result = await db.execute(
+                select(LedgerBalance).where(LedgerBalance.user_id.in_(batch))
+            )
+            balances.update({(b.user_id, b.currency): b for b in result.scalars()})
+        for key, delta in changed.items():
+            balance = balances.get(key)
+            if balance is None:
+                db.add(LedgerBalance(user_id=key[0], currency=key[1], balance=delta))
+            else:
+                balance.balance += delta
+
+        state.watermark_at = rows[-1].updated_at
+        state.watermark_id = ids[-1]
+        state.transactions_applied += len(rows)
+        await db.commit()
+        return len(rows), users
+
+
+async def check_users(
+    session_factory: async_sessionmaker,
+    accounts_engine: AsyncEngine,
+    users: Iterable[str],
+    now: datetime,
+) -> int:
+    """
+    Compare the ledger balances of `users` with the sum of their account
+    balances per currency and record or resolve drifts. Returns the number
+    of (user, currency) pairs found out of balance.
+    """
+    a = accounts_table.c
+    drifted = 0
+    for batch in _batches(set(users)):
+        async with accounts_engine.connect() as conn:
+            result = await conn.execute(
+                select(a.owner_user_id, a.currency, func.sum(a.balance))
+                .where(a.owner_user_id.in_(batch))
+                .group_by(a.owner_user_id, a.currency)
+            )
+            actual: Dict[Tuple[str, str], Decimal] = defaultdict(Decimal)
+            for user_id, currency, balance in result:
+                actual[user_id, currency.upper()] += balance or ZERO
+
+        async with session_factory() as db:
+            result = await db.execute(
+                select(LedgerBalance).where(LedgerBalance.user_id.in_(batch))
+            )
+            expected = {(b.user_id, b.currency): b.balance for b in result.scalars()}
+            result = await db.execute(
+                select(BalanceDrift).where(BalanceDrift.user_id.in_(batch))
+            )
+            drifts = {(d.user_id, d.currency): d for d in result.scalars()}
+
+            for key in expected.keys() | actual.keys() | drifts.keys():
+                ledger_balance = expected.get(key, ZERO)
+                account_balance = actual.get(key, ZERO)
+                drift = drifts.get(key)
+                if ledger_balance == account_balance:
+                    if drift is not None and drift.resolved_at is None:
+                        drift.resolved_at = now
+                        logger.info(f"Balance drift for {key[0]} {key[1]} resolved")
+                    continue
+                drifted += 1
+                if drift is None:
+                    drift = BalanceDrift(user_id=key[0], currency=key[1])
+                    db.add(drift)
+                if drift.first_seen_at is None or drift.resolved_at is not None:
+                    drift.first_seen_at = now
+                    drift.resolved_at = None
+                    logger.warning(
+                        f"Balance drift for {key[0]} {key[1]}: accounts "
+                        f"{account_balance}, ledger {ledger_balance}"
+                    )
+                drift.ledger_balance = ledger_balance
+                drift.account_balance = account_balance
+                drift.last_seen_at = now
+            await db.commit()
+    return drifted
+
+
+async def sweep_accounts(
+    session_factory: async_sessionmaker,
+    accounts_engine: AsyncEngine,
+    limit: int,
+    now: datetime,
+) -> Tuple[int, int]:
+    """
+    Check the owners of the next `limit` accounts after the sweep cursor,
+    wrapping around at the end of the table. Returns (accounts, drifted).
+    """
+    a = accounts_table.c
+    async with session_factory() as db:
+        state = await _state(db)
+        async with accounts_engine.connect() as conn:
+            result = await conn.execute(
+                select(a.id, a.owner_user_id)
+                .where(a.id > state.sweep_account_id)
+                .order_by(a.id)
+                .limit(limit)
+            )
+            rows = result.all()
+        state.sweep_account_id = rows[-1].id if len(rows) == limit else 0
+        await db.commit()
+    drifted = await check_users(
+        session_factory, accounts_engine, {row.owner_user_id for row in rows}, now
+    )
+    return len(rows), drifted
+
+
+async def check_balances(
+    session_factory: async_sessionmaker,
+    ledger_engine: AsyncEngine,
+    accounts_engine: AsyncEngine,
+    now: datetime | None = None,
+) -> dict:
+    """
+    One pass: catch the ledger balances up to BALANCE_CHECK_LAG_SECONDS ago,
+    check every user they moved, then sweep the next slice of accounts.
+    """
+    now = now or datetime.now(timezone.utc)
+    until = now - timedelta(seconds=settings.BALANCE_CHECK_LAG_SECONDS)
+    chunk = settings.BALANCE_CHECK_CHUNK_ROWS
+    transactions = drifted = 0
+    touched: Set[str] | None = set()
+    while True:
+        count, users = await apply_transactions(
+            session_factory, ledger_engine, until, chunk
+        )
+        transactions += count
+        if touched is not None:
+            touched |= users
+            if len(touched) > MAX_TOUCHED_USERS:
+                touched = None
+        if count < chunk:
+            break
+    touched = touched or set()
+    drifted += await check_users(session_factory, accounts_engine, touched, now)
+    swept, swept_drifted = await sweep_accounts(
+        session_factory, accounts_engine, settings.BALANCE_CHECK_SWEEP_ACCOUNTS, now
+    )
+    return {
+        "transactions": transactions,
+        "users_checked": len(touched),
+        "accounts_swept": swept,
+        "drifted": drifted + swept_drifted,
+    }
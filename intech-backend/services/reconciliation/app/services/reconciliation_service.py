@@ -0,0 +1,528 @@
+"""
+Reconciliation runs: spooling uploaded statements, running the match off
+the request path and recording the outcome.
+
+A run's statement is spooled to RECON_SPOOL_DIR. A worker in the API
+process then drives it through app.core.matching, in two waves of units
+on a process pool shared by all runs:
+- the statement split and the ledger shards, side by side;
+- then the partition matches.
+The per-unit reports are then merged into RECON_REPORT_DIR/<run id>/.
+
+Every finished unit is checkpointed in reconciliation_checkpoints. Its
+files stay in the run's work directory until the run completes. A failed
+run can be resumed (POST /reconciliations/{id}/resume), and a resumed run
+re-does only the units with no checkpoint. While a run is in progress its
+updated_at is refreshed every RECON_HEARTBEAT_SECONDS; a worker that cannot
+refresh it stops the run before it could be taken for abandoned. Every
+RECON_SWEEP_INTERVAL_SECONDS the pool looks for queued runs and for running
+ones not updated for RECON_STALE_SECONDS, whose process has died, and
+resumes those the same way.
+"""
+
+import asyncio
+import concurrent.futures
+import contextlib
+import multiprocessing
+import os
+import shutil
+import uuid
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from sqlalchemy import or_, select, update
+
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal
+from app.core.logger import logging
+from app.core.matching import (
+    CATEGORIES,
+    ledger_shards,
+    match_partition,
+    merge_reports,
+    partition_count,
+    scan_ledger_shard,
+    shard_range,
+    split_statement,
+)
+from app.models.reconciliation import (
+    ReconciliationCheckpoint,
+    ReconciliationRun,
+    ReconciliationStatus,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def spool_path(run_id: uuid.UUID) -> str:
+    return os.path.join(settings.RECON_SPOOL_DIR, f"{run_id}.csv")
+
+
+def report_dir(run_id: uuid.UUID) -> str:
+    return os.path.join(settings.RECON_REPORT_DIR, str(run_id))
+
+
+def work_dir(run_id: uuid.UUID) -> str:
+    return os.path.join(settings.RECON_SPOOL_DIR, f"{run_id}.parts")
+
+
+async def spool_upload(
+    chunks: AsyncIterator[bytes], run_id: uuid.UUID, max_bytes: int
+) -> int:
+    """Write a request body to the spool directory; returns its size."""
+    path = spool_path(run_id)
+    await asyncio.to_thread(os.makedirs, settings.RECON_SPOOL_DIR, exist_ok=True)
+    f = await asyncio.to_thread(open, path, "wb")
+    size = 0
+    try:
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(f"Upload exceeds {max_bytes} bytes")
+            await asyncio.to_thread(f.write, chunk)
+    except BaseException:
+        f.close()
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+        raise
+    f.close()
+    return size
+
+
+async def _checkpoints(
+    session_factory, run_id: uuid.UUID
+) -> Dict[Tuple[str, int], ReconciliationCheckpoint]:
+    async with session_factory() as db:
+        result = await db.execute(
+            select(ReconciliationCheckpoint).where(
+                ReconciliationCheckpoint.run_id == run_id
+            )
+        )
+        return {(c.stage, c.shard): c for c in result.scalars()}
+
+
+async def _checkpoint(
+    session_factory, run_id: uuid.UUID, stage: str, shard: int, result: dict
+) -> None:
+    async with session_factory() as db:
+        db.add(
+            ReconciliationCheckpoint(
+                run_id=run_id,
+                stage=stage,
+                shard=shard,
+                rows=result["rows"],
+                counts=result["counts"],
+                matched_amount=Decimal(result.get("matched_amount", 0)),
+            )
+        )
+        await db.execute(
+            update(ReconciliationRun)
+            .where(ReconciliationRun.id == run_id)
+            .values(
+                units_done=ReconciliationRun.units_done + 1,
+                updated_at=datetime.now(timezone.utc),
+            )
+        )
+        await db.commit()
+
+
+async def _run_units(
+    session_factory,
+    run_id: uuid.UUID,
+    executor: concurrent.futures.Executor,
+    units: List[tuple],
+) -> None:
+    """
+    Run (stage, shard, fn, args) units on `executor`, checkpointing each as
+    it finishes. After a failure, units not yet started are dropped and the
+    running ones are still checkpointed. The first error is then raised.
+    """
+    futures = {
+        executor.submit(fn, *args): (stage, shard) for stage, shard, fn, args in units
+    }
+    pending = {asyncio.wrap_future(future): key for future, key in futures.items()}
+    error = None
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                stage, shard = pending.pop(future)
+                if future.cancelled():
+                    continue
+                if future.exception() is not None:
+                    if error is None:
+                        error = future.exception()
+                        for queued in futures:
+                            queued.cancel()
+                    continue
+                await _checkpoint(
+                    session_factory, run_id, stage, shard, future.result()
+                )
+    finally:
+        # A unit already in a worker cannot be interrupted. Wait for it, so a
+        # resumed attempt does not race it for its files.
+        running = [future for future in futures if not future.cancel()]
+        await asyncio.to_thread(concurrent.futures.wait, running)
+    if error is not None:
+        raise error
+
+
+async def reconcile(
+    session_factory,
+    run: ReconciliationRun,
+    statement_path: str,
+    ledger_url: str,
+    executor: concurrent.futures.Executor,
+) -> dict:
+    """Run the units of `run` that have no checkpoint; returns its summary."""
+    workdir = work_dir(run.id)
+    await asyncio.to_thread(os.makedirs, workdir, exist_ok=True)
+    done = await _checkpoints(session_factory, run.id)
+    if done:
+        logger.info("Resuming reconciliation %s: %d units done", run.id, len(done))
+
+    scans = []
+    if ("statement", 0) not in done:
+        scans.append(
+            ("statement", 0, split_statement, (statement_path, workdir, run.partitions))
+        )
+    for shard in range(run.ledger_shards):
+        if ("ledger", shard) not in done:
+            start, end = shard_range(
+                run.period_start, run.period_end, run.ledger_shards, shard
+            )
+            args = (
+                ledger_url,
+                run.bank,
+                start,
+                end,
+                workdir,
+                shard,
+                run.partitions,
+                settings.RECON_LEDGER_CHUNK_ROWS,
+            )
+            scans.append(("ledger", shard, scan_ledger_shard, args))
+    await _run_units(session_factory, run.id, executor, scans)
+
+    matches = [
+        ("match", p, match_partition, (workdir, p, run.ledger_shards))
+        for p in range(run.partitions)
+        if ("match", p) not in done
+    ]
+    await _run_units(session_factory, run.id, executor, matches)
+
+    names = ["statement"] + [f"p{p:04d}" for p in range(run.partitions)]
+    await asyncio.to_thread(merge_reports, workdir, names, report_dir(run.id))
+
+    summary = {category: 0 for category in CATEGORIES}
+    summary.update(statement_rows=0, ledger_rows=0, matched_amount=Decimal(0))
+    for (stage, _), checkpoint in (await _checkpoints(session_factory, run.id)).items():
+        for category, count in checkpoint.counts.items():
+            summary[category] += count
+        if stage == "statement":
+            summary["statement_rows"] += checkpoint.rows
+        elif stage == "ledger":
+            summary["ledger_rows"] += checkpoint.rows
+        summary["matched_amount"] += checkpoint.matched_amount
+    return summary
+
+
+async def _claim(db, run_id: uuid.UUID) -> bool:
+    """Mark a queued (or abandoned running) run as ours."""
+    now = datetime.now(timezone.utc)
+    stale = now - timedelta(seconds=settings.RECON_STALE_SECONDS)
+    result = await db.execute(
+        update(ReconciliationRun)
+        .where(ReconciliationRun.id == run_id)
+        .where(
+            or_(
+                ReconciliationRun.status == ReconciliationStatus.queued,
+                (ReconciliationRun.status == ReconciliationStatus.running)
+                & (ReconciliationRun.updated_at < stale),
+            )
+        )
+        .values(status=ReconciliationStatus.running, updated_at=now)
+    )
+    await db.commit()
+    return result.rowcount == 1
+
+
+class HeartbeatLost(Exception):
+    pass
+
+
+async def _heartbeat(session_factory, run_id: uuid.UUID) -> None:
+    """
+    Refresh the run's updated_at until cancelled. A failed beat is logged
+    and retried at the next one; once none has landed for so long that the
+    sweep could take the run for abandoned before the next, HeartbeatLost
+    is raised.
+    """
+    last_beat = asyncio.get_running_loop().time()
+    while True:
+        await asyncio.sleep(settings.RECON_HEARTBEAT_SECONDS)
+        try:
+            async with session_factory() as db:
+                await db.execute(
+                    update(ReconciliationRun)
+                    .where(ReconciliationRun.id == run_id)
+                    .values(updated_at=datetime.now(timezone.utc))
+                )
+                await db.commit()
+        except Exception as e:
+            silent = asyncio.get_running_loop().time() - last_beat
+            if (
+                silent + settings.RECON_HEARTBEAT_SECONDS
+                >= settings.RECON_STALE_SECONDS
+            ):
+                raise HeartbeatLost(
+                    f"no heartbeat recorded for {silent:.0f}s: {e}"
+                ) from e
+            logger.warning("Heartbeat of reconciliation %s failed: %s", run_id, e)
+        else:
+            last_beat = asyncio.get_running_loop().time()
+
+
+async def _finish(
+    db,
+    run_id: uuid.UUID,
+    status: ReconciliationStatus,
+    error: Optional[str] = None,
+    **summary,
+) -> None:
+    now = datetime.now(timezone.utc)
+    await db.execute(
+        update(ReconciliationRun)
+        .where(ReconciliationRun.id == run_id)
+        .values(status=status, error=error, updated_at=now, finished_at=now, **summary)
+    )
+    await db.commit()
+
+
+async def run_reconciliation(
+    session_factory,
+    run_id: uuid.UUID,
+    executor: concurrent.futures.Executor,
+    ledger_url: Optional[str] = None,
+) -> None:
+    """
+    Run (or resume) a reconciliation. A spooled upload is removed once the
+    run completes; a statement read in place is left alone.
+    """
+    async with session_factory() as db:
+        if not await _claim(db, run_id):
+            return
+        run = await db.get(ReconciliationRun, run_id)
+        path = run.statement_path or spool_path(run_id)
+        logger.info(
+            "Reconciling %s for %s, %s to %s (%d ledger shards, %d partitions)",
+            run_id,
+            run.bank,
+            run.period_start.isoformat(),
+            run.period_end.isoformat(),
+            run.ledger_shards,
+            run.partitions,
+        )
+        heartbeat = asyncio.create_task(_heartbeat(session_factory, run_id))
+        work = asyncio.create_task(
+            reconcile(
+                session_factory,
+                run,
+                path,
+                ledger_url or settings.TRANSACTIONS_DATABASE_URL,
+                executor,
+            )
+        )
+        try:
+            await asyncio.wait({work, heartbeat}, return_when=asyncio.FIRST_COMPLETED)
+            if not work.done():
+                # The run is about to look abandoned: stop, and leave it
+                # running for the sweep to resume from its checkpoints,
+                # here or on another worker.
+                work.cancel()
+                await asyncio.gather(work, return_exceptions=True)
+                logger.error(
+                    "Reconciliation %s stopped: %s", run_id, heartbeat.exception()
+                )
+                return
+            summary = work.result()
+        except Exception as e:
+            logger.exception("Reconciliation %s failed: %s", run_id, e)
+            await db.rollback()
+            await _finish(db, run_id, ReconciliationStatus.failed, str(e)[:1024])
+            if isinstance(e, BrokenProcessPool):
+                raise
+            return
+        finally:
+            work.cancel()
+            heartbeat.cancel()
+            await asyncio.gather(work, heartbeat, return_exceptions=True)
+
+        await _finish(db, run_id, ReconciliationStatus.completed, **summary)
+        logger.info(
+            "Reconciliation %s completed: %d matched, %d mismatched, "
+            "%d not successful in the ledger, %d missing internally, "
+            "%d missing from statement",
+            run_id,
+            summary["matched"],
+            summary["amount_mismatch"],
+            summary["status_mismatch"],
+            summary["missing_internal"],
+            summary["missing_statement"],
+        )
+    # Only now: until the run is marked completed, a resume needs the parts.
+    await asyncio.to_thread(shutil.rmtree, work_dir(run_id), True)
+    if run.statement_path is None:
+        with contextlib.suppress(FileNotFoundError):
+            await asyncio.to_thread(os.remove, path)
+
+
+async def create_run(
+    db,
+    run_id: uuid.UUID,
+    bank: str,
+    start: datetime,
+    end: datetime,
+    requested_by: str,
+    statement_bytes: int,
+    statement_path: Optional[str] = None,
+) -> ReconciliationRun:
+    partitions = partition_count(
+        statement_bytes, settings.RECON_PARTITION_BYTES, settings.RECON_MAX_PARTITIONS
+    )
+    shards = ledger_shards(start, end, settings.RECON_LEDGER_SHARD_HOURS)
+    run = ReconciliationRun(
+        id=run_id,
+        bank=bank,
+        period_start=start,
+        period_end=end,
+        requested_by=requested_by,
+        statement_path=statement_path,
+        statement_bytes=statement_bytes,
+        partitions=partitions,
+        ledger_shards=shards,
+        units_total=1 + shards + partitions,
+    )
+    db.add(run)
+    await db.commit()
+    await db.refresh(run)
+    return run
+
+
+async def resume_run(db, run: ReconciliationRun) -> bool:
+    """Queue a failed run again; its checkpointed units are kept."""
+    result = await db.execute(
+        update(ReconciliationRun)
+        .where(ReconciliationRun.id == run.id)
+        .where(ReconciliationRun.status == ReconciliationStatus.failed)
+        .values(
+            status=ReconciliationStatus.queued,
+            error=None,
+            finished_at=None,
+            updated_at=datetime.now(timezone.utc),
+        )
+    )
+    await db.commit()
+    await db.refresh(run)
+    return result.rowcount == 1
+
+
+def process_pool(processes: int) -> concurrent.futures.ProcessPoolExecutor:
+    # Spawned rather than forked: the parent has an event loop, threads and
+    # open connections that a forked child would inherit half-copied.
+    return concurrent.futures.ProcessPoolExecutor(
+        max_workers=processes or os.cpu_count(),
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+
+class RunWorkerPool:
+    """A fixed set of asyncio workers pulling run ids from a local queue."""
+
+    def __init__(self, session_factory=AsyncSessionLocal) -> None:
+        self._session_factory = session_factory
+        self._queue: asyncio.Queue = asyncio.Queue()
+        # Ids in the queue, so a sweep does not queue a run twice.
+        self._queued: set = set()
+        self._tasks: List[asyncio.Task] = []
+        self._processes = 0
+        self._executor: Optional[concurrent.futures.Executor] = None
+
+    def submit(self, run_id: uuid.UUID) -> None:
+        if run_id in self._queued:
+            return
+        self._queued.add(run_id)
+        self._queue.put_nowait(run_id)
+
+    async def start(
+        self, workers: int, processes: int, sweep_interval: float = 60
+    ) -> None:
+        self._processes = processes
+        self._executor = process_pool(processes)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(workers)]
+        self._tasks.append(asyncio.create_task(self._sweep_every(sweep_interval)))
+
+    async def sweep(self) -> None:
+        """Queue runs not yet started and running runs whose worker died."""
+        stale = datetime.now(timezone.utc) - timedelta(
+            seconds=settings.RECON_STALE_SECONDS
+        )
+        async with self._session_factory() as db:
+            result = await db.execute(
+                select(ReconciliationRun.id)
+                .where(
+                    or_(
+                        ReconciliationRun.status == ReconciliationStatus.queued,
+                        (ReconciliationRun.status == ReconciliationStatus.running)
+                        & (ReconciliationRun.updated_at < stale),
+                    )
+                )
+                .order_by(ReconciliationRun.created_at)
+            )
+            for run_id in result.scalars():
+                self.submit(run_id)
+
+    async def _sweep_every(self, interval: float) -> None:
+        # The first sweep picks up what a restart left behind.
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.exception("Reconciliation sweep failed: %s", e)
+            await asyncio.sleep(interval)
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._executor is not None:
+            await asyncio.to_thread(self._executor.shutdown, True, cancel_futures=True)
+            self._executor = None
+
+    async def _work(self) -> None:
+        while True:
+            run_id = await self._queue.get()
+            self._queued.discard(run_id)
+            executor = self._executor
+            try:
+                await run_reconciliation(self._session_factory, run_id, executor)
+            except BrokenProcessPool:
+                # A worker died (OOM kill, say); the run is marked failed and
+                # can be resumed once a fresh pool is in place.
+                if self._executor is executor:
+                    logger.error("Reconciliation process pool broke; restarting it")
+                    self._executor = process_pool(self._processes)
+            except Exception as e:
+                logger.exception("Reconciliation worker error on %s: %s", run_id, e)
+            finally:
+                self._queue.task_done()
+
+
+run_pool = RunWorkerPool()
@@ -0,0 +1,64 @@
+"""
+Keep checking that account balances add up to the ledger:
+
+    python -m app.workers.balance_checker [--once]
+
+Every BALANCE_CHECK_INTERVAL_SECONDS it applies the transactions changed
+since the last pass to the running ledger balances, compares the users they
+touched with their account balances and sweeps the next
+BALANCE_CHECK_SWEEP_ACCOUNTS accounts (see app.services.balance_check).
+Drifts are served by GET /reconciliations/drifts.
+"""
+
+import argparse
+import asyncio
+import logging
+
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal, Base, engine, engine_options
+from app.services.balance_check import check_balances
+import app.models.balance_check  # noqa: F401 - registers the tables
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("balance_checker")
+
+
+async def main(once: bool) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    ledger_engine = create_async_engine(
+        settings.TRANSACTIONS_DATABASE_URL,
+        **engine_options(settings.TRANSACTIONS_DATABASE_URL),
+    )
+    accounts_engine = create_async_engine(
+        settings.ACCOUNTS_DATABASE_URL,
+        **engine_options(settings.ACCOUNTS_DATABASE_URL),
+    )
+    try:
+        while True:
+            try:
+                stats = await check_balances(
+                    AsyncSessionLocal, ledger_engine, accounts_engine
+                )
+                logger.info(
+                    "Applied %(transactions)d transactions, checked "
+                    "%(users_checked)d users and swept %(accounts_swept)d "
+                    "accounts; %(drifted)d balances out" % stats
+                )
+            except Exception as e:
+                logger.exception("Balance check failed: %s", e)
+            if once:
+                break
+            await asyncio.sleep(settings.BALANCE_CHECK_INTERVAL_SECONDS)
+    finally:
+        await ledger_engine.dispose()
+        await accounts_engine.dispose()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--once", action="store_true", help="run a single pass")
+    asyncio.run(main(parser.parse_args().once))
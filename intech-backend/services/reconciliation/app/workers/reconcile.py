@@ -0,0 +1,105 @@
+"""
+Reconcile statement files already on disk, e.g. from a nightly SFTP drop:
+
+    python -m app.workers.reconcile \\
+        --start 2025-01-01T00:00:00+00:00 --end 2025-01-02T00:00:00+00:00 \\
+        gtb=/data/statements/gtb-2025-01-01.csv \\
+        zenith=/data/statements/zenith-2025-01-01.csv
+
+    python -m app.workers.reconcile --resume <run id> [<run id> ...]
+
+One run per bank, all sharing one pool of RECON_PROCESSES worker processes
+(--processes to override). Runs are recorded like uploaded ones and their
+reports are served by the API. The files are read in place and left where
+they are, so a failed run can be resumed from here or through the API.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import uuid
+from datetime import datetime
+
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal, Base, engine
+from app.models.reconciliation import ReconciliationRun, ReconciliationStatus
+from app.services.reconciliation_service import (
+    create_run,
+    process_pool,
+    report_dir,
+    resume_run,
+    run_reconciliation,
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("reconcile")
+
+
+async def _queue_runs(args) -> list:
+    run_ids = []
+    async with AsyncSessionLocal() as db:
+        if args.resume:
+            for run_id in args.resume:
+                run = await db.get(ReconciliationRun, uuid.UUID(run_id))
+                if run is None or not await resume_run(db, run):
+                    logger.error("Run %s is not a failed run; skipping", run_id)
+                    continue
+                run_ids.append(run.id)
+            return run_ids
+        for spec in args.statements:
+            bank, _, path = spec.partition("=")
+            path = os.path.abspath(path)
+            run = await create_run(
+                db,
+                uuid.uuid4(),
+                bank,
+                args.start,
+                args.end,
+                args.requested_by,
+                os.path.getsize(path),
+                path,
+            )
+            run_ids.append(run.id)
+    return run_ids
+
+
+async def main(args) -> int:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    run_ids = await _queue_runs(args)
+    with process_pool(args.processes) as executor:
+        await asyncio.gather(
+            *(
+                run_reconciliation(AsyncSessionLocal, run_id, executor)
+                for run_id in run_ids
+            )
+        )
+    failed = 0
+    async with AsyncSessionLocal() as db:
+        for run_id in run_ids:
+            run = await db.get(ReconciliationRun, run_id)
+            logger.info(
+                "Run %s (%s) %s; reports in %s",
+                run_id,
+                run.bank,
+                run.status.value,
+                report_dir(run_id),
+            )
+            failed += run.status != ReconciliationStatus.completed
+    return 1 if failed or not run_ids else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconcile bank statement files")
+    parser.add_argument("statements", nargs="*", metavar="BANK=PATH")
+    parser.add_argument("--start", type=datetime.fromisoformat)
+    parser.add_argument("--end", type=datetime.fromisoformat)
+    parser.add_argument("--resume", nargs="+", metavar="RUN_ID")
+    parser.add_argument("--processes", type=int, default=settings.RECON_PROCESSES)
+    parser.add_argument("--requested-by", default="scheduler")
+    args = parser.parse_args()
+    if not args.resume and not (args.statements and args.start and args.end):
+        parser.error("give BANK=PATH statements with --start and --end, or --resume")
+    sys.exit(asyncio.run(main(args)))
@@ -0,0 +1,31 @@
+import os
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+os.environ["DATABASE_URL"] = "sqlite+aiosqlite:///:memory:"
+os.environ["TRANSACTIONS_DATABASE_URL"] = "sqlite+aiosqlite:///:memory:"
+os.environ["ACCOUNTS_DATABASE_URL"] = "sqlite+aiosqlite:///:memory:"
+os.environ["AUTH_JWKS_URL"] = "http://testserver/.well-known/jwks.json"
+
+from app.core.db import Base
+from app.models.reconciliation import ledger_metadata
+
+
+@pytest_asyncio.fixture(scope="function")
+async def session_factory():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture(scope="function")
+async def ledger(tmp_path):
+    """URL of a file-backed ledger, so worker processes can open it too."""
+    url = f"sqlite+aiosqlite:///{tmp_path / 'ledger.db'}"
+    engine = create_async_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(ledger_metadata.create_all)
+    await engine.dispose()
+    yield url
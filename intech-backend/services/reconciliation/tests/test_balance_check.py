@@ -0,0 +1,170 @@
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.models.balance_check import (
+    BalanceDrift,
+    LedgerBalance,
+    accounts_metadata,
+    accounts_table,
+)
+from app.models.reconciliation import ledger_transactions
+from app.services.balance_check import check_balances
+
+pytestmark = pytest.mark.asyncio
+
+NOW = datetime(2025, 3, 1, 12, tzinfo=timezone.utc)
+
+
+@pytest_asyncio.fixture
+async def engines(ledger):
+    ledger_engine = create_async_engine(ledger)
+    accounts_engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with accounts_engine.begin() as conn:
+        await conn.run_sync(accounts_metadata.create_all)
+    yield ledger_engine, accounts_engine
+    await ledger_engine.dispose()
+    await accounts_engine.dispose()
+
+
+async def _book(ledger_engine, *rows):
+    async with ledger_engine.begin() as conn:
+        for txn_id, txn_type, sender, recipient, amount, status, age in rows:
+            await conn.execute(
+                insert(ledger_transactions).values(
+                    id=txn_id,
+                    type=txn_type,
+                    sender_user_id=sender,
+                    recipient_user_id=recipient,
+                    amount=Decimal(amount),
+                    currency="NGN",
+                    status=status,
+                    created_at=NOW - age,
+                    updated_at=NOW - age,
+                )
+            )
+
+
+async def _set_status(ledger_engine, txn_id, status, age):
+    async with ledger_engine.begin() as conn:
+        await conn.execute(
+            update(ledger_transactions)
+            .where(ledger_transactions.c.id == txn_id)
+            .values(status=status, updated_at=NOW - age)
+        )
+
+
+async def _accounts(accounts_engine, balances):
+    async with accounts_engine.begin() as conn:
+        await conn.execute(accounts_table.delete())
+        for i, (user_id, balance) in enumerate(balances, 1):
+            await conn.execute(
+                insert(accounts_table).values(
+                    id=i,
+                    owner_user_id=user_id,
+                    currency="ngn",
+                    balance=Decimal(balance),
+                )
+            )
+
+
+async def _drifts(session_factory):
+    async with session_factory() as db:
+        result = await db.execute(
+            select(BalanceDrift).where(BalanceDrift.resolved_at.is_(None))
+        )
+        return {
+            (d.user_id, d.ledger_balance, d.account_balance) for d in result.scalars()
+        }
+
+
+async def _ledger(session_factory):
+    async with session_factory() as db:
+        result = await db.execute(select(LedgerBalance))
+        return {b.user_id: b.balance for b in result.scalars()}
+
+
+async def test_balances_follow_the_ledger_incrementally(session_factory, engines):
+    ledger_engine, accounts_engine = engines
+    hour = timedelta(hours=1)
+    await _book(
+        ledger_engine,
+        ("t1", "deposit", "ada", None, "100.00", "success", 3 * hour),
+        ("t2", "transfer", "ada", "bola", "30.00", "success", 2 * hour),
+        ("t3", "withdrawal", "bola", None, "5.00", "success", 2 * hour),
+        ("t4", "transfer", "ada", "bola", "50.00", "pending", hour),
+        ("t5", "transfer", "ada", None, "20.00", "failed", hour),
+    )
+    # bola holds the balance in two accounts.
+    await _accounts(accounts_engine, [("ada", "70.00"), ("bola", "20"), ("bola", "5")])
+
+    stats = await check_balances(session_factory, ledger_engine, accounts_engine, NOW)
+    assert stats["transactions"] == 5
+    assert await _ledger(session_factory) == {"ada": Decimal("70.00"), "bola": 25}
+    assert await _drifts(session_factory) == set()
+
+    # Nothing new: the watermark keeps the second pass from re-reading rows.
+    stats = await check_balances(session_factory, ledger_engine, accounts_engine, NOW)
+    assert stats["transactions"] == 0
+
+    # t4 settles, but the accounts service never moved the money.
+    await _set_status(ledger_engine, "t4", "success", timedelta(minutes=10))
+    stats = await check_balances(session_factory, ledger_engine, accounts_engine, NOW)
+    assert stats["transactions"] == 1
+    assert await _drifts(session_factory) == {
+        ("ada", Decimal("20.00"), Decimal("70.00")),
+        ("bola", Decimal("75.00"), Decimal("25.00")),
+    }
+
+    # A fraud reversal of t4 replaces its contribution rather than adding
+    # to it, and the drifts resolve.
+    await _set_status(ledger_engine, "t4", "failed", timedelta(minutes=5))
+    await check_balances(session_factory, ledger_engine, accounts_engine, NOW)
+    assert await _ledger(session_factory) == {"ada": Decimal("70.00"), "bola": 25}
+    assert await _drifts(session_factory) == set()
+
+
+async def test_recent_changes_wait_for_the_lag(session_factory, engines):
+    ledger_engine, accounts_engine = engines
+    await _book(
+        ledger_engine,
+        ("t1", "deposit", "ada", None, "10.00", "success", timedelta(seconds=5)),
+    )
+    stats = await check_balances(session_factory, ledger_engine, accounts_engine, NOW)
+    assert stats["transactions"] == 0
+    stats = await check_balances(
+        session_factory, ledger_engine, accounts_engine, NOW + timedelta(minutes=5)
+    )
+    assert stats["transactions"] == 1
+
+
+async def test_sweep_catches_balances_changed_without_a_transaction(
+    session_factory, engines, monkeypatch
+):
+    ledger_engine, accounts_engine = engines
+    monkeypatch.setattr(
+        "app.services.balance_check.settings.BALANCE_CHECK_SWEEP_ACCOUNTS", 2
+    )
+    await _book(
+        ledger_engine,
+        ("t1", "deposit", "ada", None, "10.00", "success", timedelta(hours=1)),
+    )
+    await _accounts(accounts_engine, [("ada", "10"), ("bola", "0"), ("chidi", "0")])
+    await check_balances(session_factory, ledger_engine, accounts_engine, NOW)
+    assert await _drifts(session_factory) == set()
+
+    # chidi's balance is edited in place; no transaction touches them, so
+    # only the sweep (accounts 1-2, then 3) can notice.
+    async with accounts_engine.begin() as conn:
+        await conn.execute(
+            update(accounts_table)
+            .where(accounts_table.c.owner_user_id == "chidi")
+            .values(balance=Decimal("99.00"))
+        )
+    stats = await check_balances(session_factory, ledger_engine, accounts_engine, NOW)
+    assert stats["accounts_swept"] == 1
+    assert await _drifts(session_factory) == {("chidi", 0, Decimal("99.00"))}
@@ -0,0 +1,228 @@
+import concurrent.futures
+import csv
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.matching import report_path
+from app.models.reconciliation import (
+    ReconciliationCheckpoint,
+    ReconciliationRun,
+    ReconciliationStatus,
+    ledger_transactions,
+)
+from app.services import reconciliation_service
+from app.services.reconciliation_service import (
+    create_run,
+    process_pool,
+    resume_run,
+    run_reconciliation,
+    work_dir,
+)
+
+pytestmark = pytest.mark.asyncio
+
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+END = START + timedelta(days=1)
+
+
+@pytest.fixture(autouse=True)
+def dirs(tmp_path, monkeypatch):
+    settings = reconciliation_service.settings
+    monkeypatch.setattr(settings, "RECON_REPORT_DIR", str(tmp_path / "reports"))
+    monkeypatch.setattr(settings, "RECON_SPOOL_DIR", str(tmp_path / "spool"))
+    return settings
+
+
+@pytest.fixture
+def threads():
+    with concurrent.futures.ThreadPoolExecutor(4) as executor:
+        yield executor
+
+
+async def _book(ledger, rows):
+    engine = create_async_engine(ledger)
+    async with engine.begin() as conn:
+        await conn.execute(
+            insert(ledger_transactions),
+            [
+                {
+                    "id": f"txn-{reference}",
+                    "external_bank": bank,
+                    "external_reference": reference,
+                    "amount": Decimal(amount),
+                    "currency": "NGN",
+                    "status": status[0] if status else "success",
+                    "created_at": START + timedelta(hours=hour),
+                }
+                for reference, amount, bank, hour, *status in rows
+            ],
+        )
+    await engine.dispose()
+
+
+def _statement(path, lines):
+    path.write_text(
+        "\ufeffDate,Reference,Amount,Currency\n"
+        + "".join(f"2025-01-01,{line}\n" for line in lines)
+    )
+    return str(path)
+
+
+def _report(run_id, category):
+    directory = os.path.join(
+        reconciliation_service.settings.RECON_REPORT_DIR, str(run_id)
+    )
+    with open(report_path(directory, category), newline="") as f:
+        return [row[0] for row in list(csv.reader(f))[1:]]
+
+
+async def _start(session_factory, path, partitions=1, shards=1):
+    async with session_factory() as db:
+        run = await create_run(
+            db, uuid.uuid4(), "gtb", START, END, "ops", os.path.getsize(path), path
+        )
+        run.partitions = partitions
+        run.ledger_shards = shards
+        run.units_total = 1 + shards + partitions
+        await db.commit()
+    return run.id
+
+
+async def _get(session_factory, run_id):
+    async with session_factory() as db:
+        return await db.get(ReconciliationRun, run_id)
+
+
+@pytest.mark.parametrize("partitions,shards", [(1, 1), (7, 3)])
+async def test_categories(
+    tmp_path, ledger, session_factory, threads, partitions, shards
+):
+    await _book(
+        ledger,
+        [
+            ("R1", "100.00", "gtb", 1),
+            ("R2", "250.50", "gtb", 9),
+            ("R3", "75.00", "gtb", 13),
+            ("R4", "10.00", "gtb", 23),
+            ("R5", "10.00", "zenith", 5),  # another bank
+            ("R6", "10.00", "gtb", 30),  # outside the period
+            ("R10", "20.00", "gtb", 3, "failed"),
+            ("R11", "30.00", "gtb", 4, "pending"),
+        ],
+    )
+    statement = _statement(
+        tmp_path / "statement.csv",
+        [
+            "R1,100.00,NGN",
+            'R2,"-250.5",ngn',  # signed debit, lower-case currency
+            "R3,80.00,NGN",
+            "R1,100.00,NGN",
+            "R9,5.00,NGN",
+            ",5.00,NGN",
+            "R8,abc,NGN",
+            "R10,20.00,NGN",  # paid, though the ledger says it failed
+            "R11,30.00,NGN",
+        ],
+    )
+    run_id = await _start(session_factory, statement, partitions, shards)
+
+    await run_reconciliation(session_factory, run_id, threads, ledger)
+
+    run = await _get(session_factory, run_id)
+    assert run.status == ReconciliationStatus.completed
+    assert (run.statement_rows, run.ledger_rows) == (9, 6)
+    assert run.units_done == run.units_total == 1 + shards + partitions
+    assert run.matched_amount == Decimal("350.50")
+    assert sorted(_report(run_id, "matched")) == ["R1", "R2"]
+    assert _report(run_id, "amount_mismatch") == ["R3"]
+    assert sorted(_report(run_id, "status_mismatch")) == ["R10", "R11"]
+    assert run.status_mismatch == 2
+    assert _report(run_id, "duplicate") == ["R1"]
+    assert _report(run_id, "missing_internal") == ["R9"]
+    assert _report(run_id, "missing_statement") == ["R4"]
+    assert _report(run_id, "invalid") == ["7", "8"]
+    assert not os.path.exists(work_dir(run_id))
+    # Files given explicitly are left in place.
+    assert os.path.exists(statement)
+
+
+async def test_failed_run_resumes_from_checkpoints(
+    tmp_path, ledger, session_factory, threads, monkeypatch
+):
+    await _book(ledger, [(f"R{i}", "1.00", "gtb", i % 24) for i in range(50)])
+    statement = _statement(
+        tmp_path / "statement.csv", [f"R{i},1.00,NGN" for i in range(1, 51)]
+    )
+    run_id = await _start(session_factory, statement, partitions=4, shards=2)
+
+    calls = []
+    failures = [2]
+    real_split = reconciliation_service.split_statement
+    real_match = reconciliation_service.match_partition
+
+    def split(*args):
+        calls.append("split")
+        return real_split(*args)
+
+    def flaky_match(workdir, partition, shards):
+        calls.append(partition)
+        if partition in failures:
+            failures.remove(partition)
+            raise OSError("disk full")
+        return real_match(workdir, partition, shards)
+
+    monkeypatch.setattr(reconciliation_service, "split_statement", split)
+    monkeypatch.setattr(reconciliation_service, "match_partition", flaky_match)
+
+    await run_reconciliation(session_factory, run_id, threads, ledger)
+    run = await _get(session_factory, run_id)
+    assert run.status == ReconciliationStatus.failed
+    assert "disk full" in run.error
+    async with session_factory() as db:
+        matched = set(
+            await db.scalars(
+                select(ReconciliationCheckpoint.shard).where(
+                    ReconciliationCheckpoint.stage == "match"
+                )
+            )
+        )
+    # The split and both ledger shards finished before the matches started.
+    assert run.units_done == 3 + len(matched)
+    assert 2 not in matched
+
+    calls.clear()
+    async with session_factory() as db:
+        assert await resume_run(db, await db.get(ReconciliationRun, run_id))
+    await run_reconciliation(session_factory, run_id, threads, ledger)
+
+    run = await _get(session_factory, run_id)
+    assert run.status == ReconciliationStatus.completed
+    # Only the partitions without a checkpoint were redone.
+    assert sorted(calls) == sorted(set(range(4)) - matched)
+    assert (run.matched, run.missing_internal, run.missing_statement) == (49, 1, 1)
+    async with session_factory() as db:
+        checkpoints = await db.scalar(
+            select(func.count()).select_from(ReconciliationCheckpoint)
+        )
+    assert checkpoints == run.units_total
+
+
+async def test_runs_on_a_process_pool(tmp_path, ledger, session_factory):
+    await _book(ledger, [(f"R{i}", "1.00", "gtb", i % 24) for i in range(20)])
+    statement = _statement(
+        tmp_path / "statement.csv", [f"R{i},1.00,NGN" for i in range(20)]
+    )
+    run_id = await _start(session_factory, statement, partitions=3, shards=2)
+
+    with process_pool(2) as executor:
+        await run_reconciliation(session_factory, run_id, executor, ledger)
+
+    run = await _get(session_factory, run_id)
+    assert run.status == ReconciliationStatus.completed
+    assert run.matched == 20
@@ -0,0 +1,135 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import exc
+
+from app.core.config import settings
+from app.models.reconciliation import ReconciliationRun, ReconciliationStatus
+from app.services import reconciliation_service
+from app.services.reconciliation_service import (
+    HeartbeatLost,
+    RunWorkerPool,
+    _heartbeat,
+    run_reconciliation,
+)
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_sweep_queues_waiting_and_abandoned_runs_once(session_factory):
+    now = datetime.now(timezone.utc)
+    stale = now - timedelta(seconds=settings.RECON_STALE_SECONDS + 1)
+    runs = {
+        "queued": (ReconciliationStatus.queued, now),
+        "abandoned": (ReconciliationStatus.running, stale),
+        "live": (ReconciliationStatus.running, now),
+        "done": (ReconciliationStatus.completed, stale),
+    }
+    ids = {}
+    async with session_factory() as db:
+        for i, (name, (status, updated_at)) in enumerate(runs.items()):
+            run = ReconciliationRun(
+                bank="gtb",
+                period_start=now,
+                period_end=now,
+                requested_by="admin",
+                status=status,
+                created_at=now + timedelta(seconds=i),
+                updated_at=updated_at,
+            )
+            db.add(run)
+            await db.flush()
+            ids[run.id] = name
+        await db.commit()
+
+    # Without workers, so the queue shows what each sweep picked up.
+    pool = RunWorkerPool(session_factory)
+    await pool.sweep()
+    await pool.sweep()
+
+    queued = [pool._queue.get_nowait() for _ in range(pool._queue.qsize())]
+    assert [ids[run_id] for run_id in queued] == ["queued", "abandoned"]
+
+
+class FlakySessions:
+    """Session factory whose sessions fail while `down` is set."""
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+        self.down = False
+        self.failures = 0
+
+    def __call__(self):
+        if self.down:
+            self.failures += 1
+            raise exc.OperationalError("UPDATE", {}, OSError("connection lost"))
+        return self.session_factory()
+
+
+async def _run(session_factory, status, updated_at):
+    async with session_factory() as db:
+        run = ReconciliationRun(
+            bank="gtb",
+            period_start=updated_at,
+            period_end=updated_at,
+            requested_by="admin",
+            status=status,
+            updated_at=updated_at,
+        )
+        db.add(run)
+        await db.commit()
+    return run.id
+
+
+async def test_heartbeat_outlives_failed_beats(session_factory, monkeypatch):
+    monkeypatch.setattr(settings, "RECON_HEARTBEAT_SECONDS", 0.01)
+    monkeypatch.setattr(settings, "RECON_STALE_SECONDS", 0.2)
+    then = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    run_id = await _run(session_factory, ReconciliationStatus.running, then)
+    sessions = FlakySessions(session_factory)
+    sessions.down = True
+    beating = asyncio.create_task(_heartbeat(sessions, run_id))
+
+    await asyncio.sleep(0.05)
+    assert sessions.failures >= 2 and not beating.done()
+    sessions.down = False
+    await asyncio.sleep(0.05)
+    async with session_factory() as db:
+        run = await db.get(ReconciliationRun, run_id)
+    assert run.updated_at.replace(tzinfo=timezone.utc) > then
+
+    # Down for good: it gives up before the run could be taken for abandoned.
+    sessions.down = True
+    with pytest.raises(HeartbeatLost):
+        await asyncio.wait_for(beating, 1)
+
+
+async def test_run_stops_when_its_heartbeat_is_lost(session_factory, monkeypatch):
+    cancelled = asyncio.Event()
+
+    async def reconcile(*args):
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    async def heartbeat(session_factory, run_id):
+        raise HeartbeatLost("no heartbeat recorded for 300s")
+
+    monkeypatch.setattr(reconciliation_service, "reconcile", reconcile)
+    monkeypatch.setattr(reconciliation_service, "_heartbeat", heartbeat)
+    run_id = await _run(
+        session_factory, ReconciliationStatus.queued, datetime.now(timezone.utc)
+    )
+
+    await asyncio.wait_for(
+        run_reconciliation(session_factory, run_id, None, "sqlite://"), 1
+    )
+    assert cancelled.is_set()
+    # Left running, for the sweep to resume once it looks abandoned.
+    async with session_factory() as db:
+        run = await db.get(ReconciliationRun, run_id)
+    assert run.status == ReconciliationStatus.running
+    assert run.finished_at is None
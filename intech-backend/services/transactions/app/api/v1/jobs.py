@@ -0,0 +1,119 @@
+import os
+import uuid
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.db import get_db
+from app.core.jwks import get_current_user
+from app.core.config import settings
+from app.core.jobs import (
+    JOB_FORMATS,
+    UploadTooLarge,
+    job_pool,
+    spool_path,
+    spool_upload,
+)
+from app.api.v1.transaction import rate_limit_dep
+from app.models.transaction import TransactionJob, TransactionJobRow
+from app.schemas.transaction import TransactionJobOut, TransactionJobRowOut
+from app.core.logger import logging
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/transactions/jobs", tags=["transaction jobs"])
+
+
+async def _get_own_job(db: AsyncSession, job_id: uuid.UUID, user) -> TransactionJob:
+    job = await db.get(TransactionJob, job_id)
+    if not job or job.user_id != user["sub"]:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post(
+    "",
+    response_model=TransactionJobOut,
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(rate_limit_dep)],
+)
+async def submit_disbursement_job(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    """
+    Upload a disbursement file as the raw request body: CSV with a header row
+    (Content-Type: text/csv) or one JSON object per line (application/x-ndjson).
+    Columns/keys are those of a single transaction. The file is processed in
+    the background; poll GET /transactions/jobs/{id} for progress.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    fmt = JOB_FORMATS.get(content_type.lower())
+    if fmt is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Expected one of: {', '.join(JOB_FORMATS)}",
+        )
+
+    job_id = uuid.uuid4()
+    try:
+        size = await spool_upload(
+            request.stream(), job_id, settings.JOB_MAX_UPLOAD_BYTES
+        )
+    except UploadTooLarge as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e)
+        )
+    if size == 0:
+        os.remove(spool_path(job_id))
+        raise HTTPException(status_code=400, detail="Empty upload")
+
+    job = TransactionJob(id=job_id, user_id=user["sub"], format=fmt, total_bytes=size)
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    job_pool.submit(job.id)
+    logger.info(
+        f"Disbursement job {job.id} queued by user {user['sub']} ({size} bytes)"
+    )
+    return job
+
+
+@router.get(
+    "/{job_id}",
+    response_model=TransactionJobOut,
+    dependencies=[Depends(rate_limit_dep)],
+)
+async def get_disbursement_job(
+    job_id: uuid.UUID,
+    db: AsyncSession = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    # Progress is read from the primary; a lagging replica would show it
+    # moving backwards between polls.
+    return await _get_own_job(db, job_id, user)
+
+
+@router.get(
+    "/{job_id}/rows",
+    response_model=List[TransactionJobRowOut],
+    dependencies=[Depends(rate_limit_dep)],
+)
+async def list_disbursement_job_rows(
+    job_id: uuid.UUID,
+    row_status: Optional[Literal["accepted", "rejected"]] = Query(None, alias="status"),
+    after: int = Query(0, ge=0, description="Return rows after this row number"),
+    limit: int = Query(500, ge=1, le=5000),
+    db: AsyncSession = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    await _get_own_job(db, job_id, user)
+    query = (
+        select(TransactionJobRow)
+        .where(TransactionJobRow.job_id == job_id)
+        .where(TransactionJobRow.row_number > after)
+    )
+    if row_status:
+        query = query.where(TransactionJobRow.status == row_status)
+    result = await db.execute(query.order_by(TransactionJobRow.row_number).limit(limit))
+    return result.scalars().all()
@@ -1,24 +1,86 @@
+from collections import namedtuple
+from datetime import datetime
 from typing import List, Optional
-from fastapi import APIRouter, Body, Depends, HTTPException, Request, status
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    status,
+)
+from sqlalchemy import or_, select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.db import get_db
+from app.db.replica import get_read_db, mark_primary_write
 from app.core.jwks import get_current_user, require_superuser
-from app.core.transaction import create_transaction, update_transaction_status
-from app.schemas.transaction import TransactionCreate, TransactionOut
+from app.core.transaction import (
+    audit_message,
+    create_transaction,
+    create_transactions_bulk,
+    decode_cursor,
+    encode_cursor,
+    fraud_message,
+    settlement_message,
+    transaction_lookup,
+    update_transaction_status,
+)
+from app.schemas.transaction import (
+    TransactionBatchCreate,
+    TransactionBatchOut,
+    TransactionCreate,
+    TransactionOut,
+)
 from app.models.transaction import (
     Transaction,
     TransactionLimit,
     TransactionStatus,
     TransactionType,
 )
-from app.core.queue import publish_message
+from app.core.queue import publish_message, publish_messages
 from app.core.rate_limiter import rate_limit_dependency
-from app.core.transaction_limit import check_transaction_limit
+from app.core.transaction_limit import (
+    check_transaction_limit,
+    get_daily_limit_usage,
+)
+from app.core.archive import TransactionArchive, find_archived_transaction
+from app.core.config import settings
+from app.core.idempotency import IdempotentRequest, raise_unstored_response
+from app.core.serialization import (
+    RawJSONResponse,
+    columns_for,
+    dumps,
+    dumps_row,
+    dumps_rows,
+)
 from app.core.logger import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/transactions", tags=["transactions"])
 
+TRANSACTION_OUT_FIELDS = tuple(TransactionOut.model_fields)
+TRANSACTION_OUT_COLUMNS = columns_for(Transaction, TransactionOut)
+ArchivedTransactionRow = namedtuple("ArchivedTransactionRow", TRANSACTION_OUT_FIELDS)
+
+archive = TransactionArchive(settings.ARCHIVE_URI) if settings.ARCHIVE_URI else None
+
+
+async def _fetch_transaction_row(db: AsyncSession, txn_id: str):
+    """Live row by id, falling back to cold storage for archived ones."""
+    result = await db.execute(
+        select(*TRANSACTION_OUT_COLUMNS).where(*transaction_lookup(txn_id))
+    )
+    row = result.first()
+    if row is None and archive is not None:
+        record = await find_archived_transaction(db, archive, txn_id)
+        if record is not None:
+            row = ArchivedTransactionRow(
+                *(record[name] for name in TRANSACTION_OUT_FIELDS)
+            )
+    return row
+
 
 def rate_limit_dep(
     request: Request, user=Depends(get_current_user), limit: int = 60, period: int = 60
@@ -38,81 +100,219 @@ async def initiate_transaction(
     payload: TransactionCreate,
     db: AsyncSession = Depends(get_db),
     user=Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(
+        None, alias="Idempotency-Key", max_length=255
+    ),
 ):
+    idem = None
+    if idempotency_key:
+        idem = IdempotentRequest(
+            "transactions",
+            user["sub"],
+            idempotency_key,
+            payload.model_dump_json().encode(),
+        )
+        replay = await idem.begin()
+        if replay is not None:
+            logger.info(f"Replayed idempotent transaction for user {user['sub']}")
+            return replay
 
     try:
-        await check_transaction_limit(db, user["sub"], float(payload.amount))
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    txn = await create_transaction(db, user["sub"], payload)
+        try:
+            await check_transaction_limit(db, user["sub"], float(payload.amount))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        txn = await create_transaction(db, user["sub"], payload)
+    except BaseException:
+        if idem:
+            await idem.release()
+        raise
+    await mark_primary_write(user)
     logger.info(f"Transaction initiated: {txn.reference} by user {user['sub']}")
 
+    # Store the response before publishing: once the row is committed a retry
+    # must replay it, even if a publish below fails.
+    row = {name: getattr(txn, name) for name in TRANSACTION_OUT_FIELDS}
+    body = dumps_row(TRANSACTION_OUT_FIELDS, row.values())
+    stored = await idem.complete(status.HTTP_201_CREATED, body) if idem else True
+
+    # An external transfer is settled only once the fraud check clears it.
     await publish_message(
-        queue="fraud_queue",
-        message={
-            "transaction_id": str(txn.id),
-            "sender_user_id": txn.sender_user_id,
-            "recipient_user_id": txn.recipient_user_id,
-            "amount": str(txn.amount),
-            "currency": txn.currency,
-            "type": txn.type.value,
-        },
+        queue=settings.RABBITMQ_QUEUE_FRAUD, message=fraud_message(row)
+    )
+    await publish_message(
+        settings.RABBITMQ_QUEUE_AUDIT,
+        audit_message("transaction.created", user["sub"], row),
     )
 
-    if txn.external_bank:
-        await publish_message(
-            queue="settlement_queue",
-            message={
-                "transaction_id": str(txn.id),
-                "external_bank": txn.external_bank,
-                "recipient_user_id": txn.recipient_user_id,
-                "amount": str(txn.amount),
-                "currency": txn.currency,
-            },
+    if not stored:
+        raise_unstored_response()
+    return RawJSONResponse(body, status_code=status.HTTP_201_CREATED)
+
+
+@router.post(
+    "/batch",
+    response_model=TransactionBatchOut,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(rate_limit_dep)],
+)
+async def initiate_transaction_batch(
+    payload: TransactionBatchCreate,
+    db: AsyncSession = Depends(get_db),
+    user=Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(
+        None, alias="Idempotency-Key", max_length=255
+    ),
+):
+    """
+    Submit up to 10,000 transfers at once. The daily limit is read once for
+    the sender and consumed in item order; items that would exceed it are
+    rejected and the rest are inserted with one multi-row INSERT.
+    """
+    idem = None
+    if idempotency_key:
+        idem = IdempotentRequest(
+            "transactions-batch",
+            user["sub"],
+            idempotency_key,
+            payload.model_dump_json().encode(),
         )
+        replay = await idem.begin()
+        if replay is not None:
+            return replay
 
-    return txn
+    results = [None] * len(payload.items)
+    try:
+        spent, limit = await get_daily_limit_usage(db, user["sub"])
+        accepted = []
+        for index, item in enumerate(payload.items):
+            amount = float(item.amount)
+            if amount + spent > limit:
+                results[index] = {
+                    "index": index,
+                    "status": "rejected",
+                    "error": f"Daily transaction limit exceeded: {spent}/{limit}",
+                }
+                continue
+            spent += amount
+            accepted.append((index, item))
+        rows = await create_transactions_bulk(
+            db, user["sub"], [item for _, item in accepted]
+        )
+    except BaseException:
+        if idem:
+            await idem.release()
+        raise
+    if rows:
+        await mark_primary_write(user)
+
+    for (index, _), row in zip(accepted, rows):
+        results[index] = {
+            "index": index,
+            "status": "accepted",
+            "id": row["id"],
+            "reference": row["reference"],
+        }
+    body = dumps(
+        {
+            "accepted": len(rows),
+            "rejected": len(results) - len(rows),
+            "results": results,
+        }
+    )
+    stored = await idem.complete(status.HTTP_201_CREATED, body) if idem else True
+    logger.info(
+        f"Transaction batch by user {user['sub']}: "
+        f"{len(rows)} accepted, {len(results) - len(rows)} rejected"
+    )
+
+    await publish_messages(
+        settings.RABBITMQ_QUEUE_FRAUD, [fraud_message(row) for row in rows]
+    )
+    await publish_messages(
+        settings.RABBITMQ_QUEUE_AUDIT,
+        [audit_message("transaction.created", user["sub"], row) for row in rows],
+    )
+
+    if not stored:
+        raise_unstored_response()
+    return RawJSONResponse(body, status_code=status.HTTP_201_CREATED)
 
 
 @router.get(
     "", response_model=List[TransactionOut], dependencies=[Depends(rate_limit_dep)]
 )
 async def list_transactions(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     user=Depends(get_current_user),
     type: Optional[TransactionType] = None,
     status: Optional[TransactionStatus] = None,
+    since: Optional[datetime] = None,
+    before: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
 ):
-    query = "SELECT * FROM transactions WHERE sender_user_id = :user_id OR recipient_user_id = :user_id"
-    params = {"user_id": user["sub"]}
+    """
+    Newest first, `limit` at a time. When there are more, the X-Next-Cursor
+    header holds the cursor to pass back for the next page; it is the
+    (created_at, id) of the last transaction returned, so rows of a batch,
+    which share a created_at, are not skipped. `since`/`before` bound
+    created_at, which limits the scan to the matching monthly partitions.
+    """
+    query = select(*TRANSACTION_OUT_COLUMNS).where(
+        or_(
+            Transaction.sender_user_id == user["sub"],
+            Transaction.recipient_user_id == user["sub"],
+        )
+    )
 
     if type:
-        query += " AND type = :type"
-        params["type"] = type.value
+        query = query.where(Transaction.type == type)
     if status:
-        query += " AND status = :status"
-        params["status"] = status.value
+        query = query.where(Transaction.status == status)
+    if since:
+        query = query.where(Transaction.created_at >= since)
+    if before:
+        query = query.where(Transaction.created_at < before)
+    if cursor:
+        try:
+            created_at, txn_id = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        query = query.where(
+            tuple_(Transaction.created_at, Transaction.id) < (created_at, txn_id),
+            # Implied by the line above, but only this form prunes partitions.
+            Transaction.created_at <= created_at,
+        )
 
-    result = await db.execute(query, params)
-    transactions = result.fetchall()
+    query = query.order_by(Transaction.created_at.desc(), Transaction.id.desc())
+    result = await db.execute(query.limit(limit + 1))
+    transactions = result.all()
+    headers = {}
+    if len(transactions) > limit:
+        transactions = transactions[:limit]
+        last = transactions[-1]
+        headers["X-Next-Cursor"] = encode_cursor(last.created_at, last.id)
     logger.info(f"{len(transactions)} transactions listed for user {user['sub']}")
-    return transactions
+    return RawJSONResponse(
+        dumps_rows(TRANSACTION_OUT_FIELDS, transactions), headers=headers
+    )
 
 
 @router.get(
     "/{txn_id}", response_model=TransactionOut, dependencies=[Depends(rate_limit_dep)]
 )
 async def get_transaction(
-    txn_id: str, db: AsyncSession = Depends(get_db), user=Depends(get_current_user)
+    txn_id: str, db: AsyncSession = Depends(get_read_db), user=Depends(get_current_user)
 ):
-    txn = await db.get(Transaction, txn_id)
+    txn = await _fetch_transaction_row(db, txn_id)
     if not txn:
         logger.warning(f"Transaction {txn_id} not found for user {user['sub']}")
         raise HTTPException(status_code=404, detail="Transaction not found")
     if txn.sender_user_id != user["sub"] and txn.recipient_user_id != user["sub"]:
         raise HTTPException(status_code=403, detail="Forbidden")
     logger.info(f"Transaction {txn_id} fetched for user {user['sub']}")
-    return txn
+    return RawJSONResponse(dumps_row(TRANSACTION_OUT_FIELDS, txn))
 
 
 @router.patch(
@@ -130,6 +330,12 @@ async def patch_transaction_status(
     if not txn:
         logger.warning(f"Transaction {txn_id} status update failed")
         raise HTTPException(status_code=404, detail="Transaction not found")
+    # The owners read the new status next, not only the superuser.
+    await mark_primary_write(user, txn.sender_user_id, txn.recipient_user_id)
+    await publish_message(
+        settings.RABBITMQ_QUEUE_AUDIT,
+        audit_message("transaction.status_changed", user["sub"], txn),
+    )
     logger.info(f"Transaction {txn_id} status updated to {status}")
     return txn
 
@@ -142,10 +348,30 @@ async def patch_transaction_status(
 async def approve_transaction(
     txn_id: str, db: AsyncSession = Depends(get_db), user=Depends(require_superuser)
 ):
-    txn = await update_transaction_status(db, txn_id, TransactionStatus.success)
+    result = await db.execute(select(Transaction).where(*transaction_lookup(txn_id)))
+    txn = result.scalars().first()
     if not txn:
         logger.warning(f"Transaction {txn_id} approval failed")
         raise HTTPException(status_code=404, detail="Transaction not found")
+    if txn.external_bank:
+        # Released to the bank, which sets the final status.
+        if txn.status != TransactionStatus.pending:
+            raise HTTPException(
+                status_code=409, detail=f"Transaction is already {txn.status.value}"
+            )
+        await publish_message(
+            settings.RABBITMQ_QUEUE_SETTLEMENT, settlement_message(txn)
+        )
+    else:
+        txn = await update_transaction_status(
+            db, txn_id, TransactionStatus.success, created_at=txn.created_at
+        )
+    # The owners read the new status next, not only the superuser.
+    await mark_primary_write(user, txn.sender_user_id, txn.recipient_user_id)
+    await publish_message(
+        settings.RABBITMQ_QUEUE_AUDIT,
+        audit_message("transaction.approved", user["sub"], txn),
+    )
     logger.info(f"Transaction {txn_id} approved by superuser")
     return txn
 
@@ -162,10 +388,19 @@ async def flag_transaction(
     if not txn:
         logger.warning(f"Transaction {txn_id} flag failed")
         raise HTTPException(status_code=404, detail="Transaction not found")
+    # The owners read the new status next, not only the superuser.
+    await mark_primary_write(user, txn.sender_user_id, txn.recipient_user_id)
 
     await publish_message(
         queue="fraud_review_queue",
-        message={"transaction_id": str(txn.id)},
+        message={
+            "transaction_id": str(txn.id),
+            "created_at": txn.created_at.isoformat(),
+        },
+    )
+    await publish_message(
+        settings.RABBITMQ_QUEUE_AUDIT,
+        audit_message("transaction.flagged", user["sub"], txn),
     )
     logger.info(f"Transaction {txn_id} flagged for review")
     return txn
@@ -177,16 +412,16 @@ async def flag_transaction(
     dependencies=[Depends(rate_limit_dep)],
 )
 async def check_settlement_status(
-    txn_id: str, db: AsyncSession = Depends(get_db), user=Depends(get_current_user)
+    txn_id: str, db: AsyncSession = Depends(get_read_db), user=Depends(get_current_user)
 ):
-    txn = await db.get(Transaction, txn_id)
+    txn = await _fetch_transaction_row(db, txn_id)
     if not txn:
         logger.warning(f"Settlement check failed for transaction {txn_id}")
         raise HTTPException(status_code=404, detail="Transaction not found")
     if txn.sender_user_id != user["sub"] and txn.recipient_user_id != user["sub"]:
         raise HTTPException(status_code=403, detail="Forbidden")
     logger.info(f"Settlement status fetched for transaction {txn_id}")
-    return txn
+    return RawJSONResponse(dumps_row(TRANSACTION_OUT_FIELDS, txn))
 
 
 @router.post("/limits/{user_id}", dependencies=[Depends(require_superuser)])
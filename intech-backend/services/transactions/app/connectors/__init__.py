@@ -0,0 +1,18 @@
+from app.connectors.base import (
+    BankConnector,
+    BankRequestError,
+    SettlementItem,
+    SettlementResult,
+    get_connector,
+    register_connector,
+)
+from app.connectors import fake, http  # noqa: F401 - register "fake", "http"
+
+__all__ = [
+    "BankConnector",
+    "BankRequestError",
+    "SettlementItem",
+    "SettlementResult",
+    "get_connector",
+    "register_connector",
+]
@@ -0,0 +1,63 @@
+"""
+Interface between the settlement batcher and the interbank rails.
+
+A connector receives every transfer queued for one destination bank in a
+single call, and answers with one result per item in the same order.
+`deadline` is a time.monotonic() instant the call must finish by. Raising
+means there is no answer (network error, timeout, bank down): the bank may
+or may not have acted, and the transfers will be submitted again, possibly
+grouped into other batches. A connector must therefore have the bank
+deduplicate each transfer by its transaction_id, not only the batch. The
+exception is BankRequestError: the bank or the configuration refused the
+request itself, and every item in it fails. A per-item failure is reported
+as a result with success=False and is final.
+"""
+
+from decimal import Decimal
+from typing import Callable, Dict, List, NamedTuple, Optional, Protocol
+
+
+class BankRequestError(Exception):
+    """The bank refused the request itself (4xx); retrying will not help."""
+
+
+class SettlementItem(NamedTuple):
+    transaction_id: str
+    recipient_user_id: Optional[str]
+    amount: Decimal
+    currency: str
+
+
+class SettlementResult(NamedTuple):
+    transaction_id: str
+    success: bool
+    external_reference: Optional[str] = None
+    error: Optional[str] = None
+
+
+class BankConnector(Protocol):
+    async def submit_batch(
+        self,
+        bank: str,
+        items: List[SettlementItem],
+        deadline: Optional[float] = None,
+    ) -> List[SettlementResult]: ...
+
+    async def close(self) -> None: ...
+
+
+_CONNECTORS: Dict[str, Callable[[], BankConnector]] = {}
+
+
+def register_connector(name: str):
+    def decorator(factory):
+        _CONNECTORS[name] = factory
+        return factory
+
+    return decorator
+
+
+def get_connector(name: str) -> BankConnector:
+    if name not in _CONNECTORS:
+        raise ValueError(f"Unknown settlement connector: {name}")
+    return _CONNECTORS[name]()
@@ -0,0 +1,55 @@
+import asyncio
+import uuid
+from typing import Dict, List, Optional, Set
+
+from app.connectors.base import SettlementItem, SettlementResult, register_connector
+
+
+@register_connector("fake")
+class FakeBankConnector:
+    """
+    Settles everything locally. Transactions listed in `reject` fail
+    individually; banks listed in `down` reject whole batches. Submitted
+    batches are recorded for inspection. A transfer submitted again is
+    answered with its first result, as a bank deduplicating by transaction
+    id would.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        reject: Optional[Set[str]] = None,
+        down: Optional[Set[str]] = None,
+    ) -> None:
+        self.latency = latency
+        self.reject = reject or set()
+        self.down = down or set()
+        self.batches: Dict[str, List[List[SettlementItem]]] = {}
+        self.results: Dict[str, SettlementResult] = {}
+
+    async def submit_batch(
+        self,
+        bank: str,
+        items: List[SettlementItem],
+        deadline: Optional[float] = None,
+    ) -> List[SettlementResult]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if bank in self.down:
+            raise ConnectionError(f"{bank} unavailable")
+        self.batches.setdefault(bank, []).append(list(items))
+        batch_ref = uuid.uuid4().hex[:12]
+        for i, item in enumerate(items):
+            if item.transaction_id in self.results:
+                continue
+            self.results[item.transaction_id] = (
+                SettlementResult(item.transaction_id, False, error="Rejected by bank")
+                if item.transaction_id in self.reject
+                else SettlementResult(
+                    item.transaction_id, True, f"{bank}-{batch_ref}-{i}"
+                )
+            )
+        return [self.results[item.transaction_id] for item in items]
+
+    async def close(self) -> None:
+        pass
@@ -0,0 +1,236 @@
+"""
+Connector for banks exposing a JSON batch API:
+
+    POST {base_url}/batches
+    {"batch_id": ..., "items": [{"transaction_id", "idempotency_key",
+                                 "recipient_user_id", "amount",
+                                 "currency"}, ...]}
+    -> {"results": [{"transaction_id", "status": "settled" | "rejected",
+                     "reference", "error"}, ...]}
+
+Each bank gets its own httpx connection pool (SETTLEMENT_BANKS[bank]), a
+semaphore capping requests in flight to it, and a circuit breaker. So a
+slow or failing bank ties up only its own slots, and a dead one is
+rejected immediately rather than waited on.
+
+Requests run until the caller's deadline. Each attempt's timeout is cut to
+the time left, and the budget is sent to the bank as X-Request-Deadline-Ms.
+Timeouts, transport errors, 429 and 5xx are retried with full-jitter
+backoff while time and attempts remain. The batch_id doubles as the
+Idempotency-Key, so a retried request is answered from the first one.
+
+A batch whose outcome is unknown (timeout, bank unavailable) is requeued
+by the batcher and its transfers may come back grouped differently, under
+another batch_id. So every item also carries its own idempotency_key, the
+transaction id, and the bank pays each transfer once whatever batch it
+arrives in.
+"""
+
+import asyncio
+import hashlib
+import time
+from typing import Dict, List, Optional
+
+import httpx
+from pydantic import BaseModel
+
+from app.connectors.base import (
+    BankRequestError,
+    SettlementItem,
+    SettlementResult,
+    register_connector,
+)
+from app.connectors.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    DeadlineExceeded,
+    backoff_delay,
+    remaining,
+)
+from app.core.config import settings
+from app.core.metrics import bank_metrics
+
+
+class BankUnavailable(Exception):
+    pass
+
+
+class _Retryable(Exception):
+    pass
+
+
+class BankConfig(BaseModel):
+    base_url: str
+    api_key: Optional[str] = None
+    timeout: float = settings.SETTLEMENT_HTTP_TIMEOUT_SECONDS
+    max_connections: int = settings.SETTLEMENT_HTTP_MAX_CONNECTIONS
+    max_concurrency: int = settings.SETTLEMENT_BANK_CONCURRENCY
+
+
+class BankClient:
+    def __init__(
+        self,
+        bank: str,
+        config: BankConfig,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ) -> None:
+        self.bank = bank
+        self.config = config
+        headers = (
+            {"Authorization": f"Bearer {config.api_key}"} if config.api_key else {}
+        )
+        self.http = httpx.AsyncClient(
+            base_url=config.base_url,
+            headers=headers,
+            timeout=config.timeout,
+            limits=httpx.Limits(
+                max_connections=config.max_connections,
+                max_keepalive_connections=config.max_connections,
+            ),
+            transport=transport,
+        )
+        self.semaphore = asyncio.Semaphore(config.max_concurrency)
+        self.breaker = CircuitBreaker(
+            settings.SETTLEMENT_CIRCUIT_FAILURES,
+            settings.SETTLEMENT_CIRCUIT_RESET_SECONDS,
+        )
+        self.metrics = bank_metrics(bank)
+
+    async def submit(
+        self, items: List[SettlementItem], deadline: Optional[float]
+    ) -> List[SettlementResult]:
+        ids = sorted(item.transaction_id for item in items)
+        batch_id = hashlib.sha256("|".join(ids).encode()).hexdigest()[:32]
+        payload = {
+            "batch_id": batch_id,
+            "items": [
+                {
+                    "transaction_id": item.transaction_id,
+                    "idempotency_key": item.transaction_id,
+                    "recipient_user_id": item.recipient_user_id,
+                    "amount": str(item.amount),
+                    "currency": item.currency,
+                }
+                for item in items
+            ],
+        }
+        attempt = 0
+        while True:
+            try:
+                return await self._attempt(batch_id, payload, deadline)
+            except _Retryable as e:
+                attempt += 1
+                if attempt >= settings.SETTLEMENT_RETRY_ATTEMPTS:
+                    raise BankUnavailable(f"{self.bank}: {e}") from e
+                delay = backoff_delay(
+                    attempt - 1,
+                    settings.SETTLEMENT_RETRY_BASE_SECONDS,
+                    settings.SETTLEMENT_RETRY_MAX_SECONDS,
+                )
+                left = remaining(deadline)
+                if left is not None and delay >= left:
+                    raise DeadlineExceeded(f"{self.bank}: {e}") from e
+                await asyncio.sleep(delay)
+
+    async def _attempt(
+        self, batch_id: str, payload: dict, deadline: Optional[float]
+    ) -> List[SettlementResult]:
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), remaining(deadline))
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(f"{self.bank}: no request slot before deadline")
+        try:
+            try:
+                self.breaker.before_call()
+            except CircuitOpenError:
+                self.metrics.count("circuit_open")
+                raise
+            try:
+                return await self._post(batch_id, payload, deadline)
+            except BaseException:
+                # Cancelled or unexpected: free a half-open trial slot.
+                self.breaker.abandon()
+                raise
+        finally:
+            self.metrics.circuit_state = self.breaker.state
+            self.semaphore.release()
+
+    async def _post(
+        self, batch_id: str, payload: dict, deadline: Optional[float]
+    ) -> List[SettlementResult]:
+        timeout = self.config.timeout
+        headers = {"Idempotency-Key": batch_id}
+        left = remaining(deadline)
+        if left is not None:
+            timeout = min(timeout, left)
+            headers["X-Request-Deadline-Ms"] = str(int(timeout * 1000))
+
+        start = time.perf_counter()
+        try:
+            # httpx timeouts bound each read/write, not the whole exchange.
+            response = await asyncio.wait_for(
+                self.http.post(
+                    "/batches", json=payload, headers=headers, timeout=timeout
+                ),
+                timeout,
+            )
+        except (httpx.TimeoutException, asyncio.TimeoutError) as e:
+            self._failure(start, "timeout")
+            raise _Retryable(f"timed out after {timeout:.2f}s") from e
+        except httpx.TransportError as e:
+            self._failure(start, "error")
+            raise _Retryable(str(e) or type(e).__name__) from e
+
+        outcome = f"http_{response.status_code}"
+        if response.status_code == 429 or response.status_code >= 500:
+            self._failure(start, outcome)
+            raise _Retryable(f"answered {response.status_code}")
+        # A 4xx still means the bank is up.
+        self.breaker.record_success()
+        if response.status_code >= 400:
+            self.metrics.observe(time.perf_counter() - start, outcome)
+            raise BankRequestError(
+                f"{self.bank} answered {response.status_code}: {response.text[:200]}"
+            )
+        self.metrics.observe(time.perf_counter() - start, "ok")
+        return [
+            SettlementResult(
+                transaction_id=result["transaction_id"],
+                success=result["status"] == "settled",
+                external_reference=result.get("reference"),
+                error=result.get("error"),
+            )
+            for result in response.json()["results"]
+        ]
+
+    def _failure(self, start: float, outcome: str) -> None:
+        self.metrics.observe(time.perf_counter() - start, outcome)
+        self.breaker.record_failure()
+
+
+@register_connector("http")
+class HttpBankConnector:
+    def __init__(
+        self,
+        banks: Optional[Dict[str, dict]] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ) -> None:
+        banks = settings.SETTLEMENT_BANKS if banks is None else banks
+        self.clients = {
+            name: BankClient(name, BankConfig(**config), transport)
+            for name, config in banks.items()
+        }
+
+    async def submit_batch(
+        self,
+        bank: str,
+        items: List[SettlementItem],
+        deadline: Optional[float] = None,
+    ) -> List[SettlementResult]:
+        client = self.clients.get(bank)
+        if client is None:
+            raise BankRequestError(f"No connector configured for bank {bank}")
+        return await client.submit(items, deadline)
+
+    async def close(self) -> None:
+        await asyncio.gather(*(c.http.aclose() for c in self.clients.values()))
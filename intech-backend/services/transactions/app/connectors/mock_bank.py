@@ -0,0 +1,103 @@
+"""
+Local stand-in for a bank's batch API (see app.connectors.http).
+
+    MOCK_BANK_LATENCY=0.2 MOCK_BANK_FAILURE_RATE=0.1 \\
+        uvicorn app.connectors.mock_bank:app --port 9100
+
+Latency, the share of requests answered 503, and the share of items
+rejected are configurable; tests build instances with create_mock_bank().
+Batches are remembered by Idempotency-Key and replayed on retry, and
+each item by its idempotency_key: a transfer seen before, in any batch, is
+answered with its first result and not paid again.
+"""
+
+import asyncio
+import os
+import random
+import uuid
+from typing import Dict, List, Optional, Set
+
+from fastapi import FastAPI, Header, Response
+from pydantic import BaseModel
+
+
+class MockBatchItem(BaseModel):
+    transaction_id: str
+    idempotency_key: Optional[str] = None
+    recipient_user_id: Optional[str] = None
+    amount: str
+    currency: str
+
+
+class MockBatch(BaseModel):
+    batch_id: str
+    items: List[MockBatchItem]
+
+
+def create_mock_bank(
+    latency: float = 0.0,
+    failure_rate: float = 0.0,
+    reject_rate: float = 0.0,
+    fail_first: int = 0,
+    reject: Optional[Set[str]] = None,
+) -> FastAPI:
+    app = FastAPI(title="Mock bank")
+    app.state.requests = 0
+    app.state.deadlines = []
+    # Transaction ids in the order they were paid, once each.
+    app.state.payments = []
+    settled: Dict[str, dict] = {}
+    items_seen: Dict[str, dict] = {}
+    reject = reject or set()
+
+    @app.post("/batches")
+    async def submit_batch(
+        batch: MockBatch,
+        response: Response,
+        idempotency_key: Optional[str] = Header(None),
+        x_request_deadline_ms: Optional[int] = Header(None),
+    ):
+        app.state.requests += 1
+        app.state.deadlines.append(x_request_deadline_ms)
+        if latency:
+            await asyncio.sleep(latency)
+        if app.state.requests <= fail_first or random.random() < failure_rate:
+            response.status_code = 503
+            return {"detail": "Service unavailable"}
+        if idempotency_key and idempotency_key in settled:
+            return settled[idempotency_key]
+
+        results = []
+        for item in batch.items:
+            if item.idempotency_key and item.idempotency_key in items_seen:
+                results.append(items_seen[item.idempotency_key])
+                continue
+            if item.transaction_id in reject or random.random() < reject_rate:
+                result = {
+                    "transaction_id": item.transaction_id,
+                    "status": "rejected",
+                    "error": "Beneficiary account invalid",
+                }
+            else:
+                result = {
+                    "transaction_id": item.transaction_id,
+                    "status": "settled",
+                    "reference": uuid.uuid4().hex,
+                }
+                app.state.payments.append(item.transaction_id)
+            if item.idempotency_key:
+                items_seen[item.idempotency_key] = result
+            results.append(result)
+        body = {"batch_id": batch.batch_id, "results": results}
+        if idempotency_key:
+            settled[idempotency_key] = body
+        return body
+
+    return app
+
+
+app = create_mock_bank(
+    latency=float(os.getenv("MOCK_BANK_LATENCY", "0")),
+    failure_rate=float(os.getenv("MOCK_BANK_FAILURE_RATE", "0")),
+    reject_rate=float(os.getenv("MOCK_BANK_REJECT_RATE", "0")),
+)
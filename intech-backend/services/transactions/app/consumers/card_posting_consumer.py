@@ -0,0 +1,71 @@
+import asyncio
+import json
+import logging
+from aio_pika import connect_robust, IncomingMessage
+from app.core.config import settings
+from app.core.queue import publish_message
+from app.core.transaction import audit_message, record_card_posting
+from app.db.db import get_db
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("card_posting_consumer")
+
+RABBITMQ_QUEUE = settings.RABBITMQ_QUEUE_CARD_POSTINGS
+
+
+async def handle_card_posting_message(message: IncomingMessage):
+    """
+    Record a card posting as a withdrawal. A malformed posting is dropped;
+    one that could not be stored is requeued, and recording it again later
+    is harmless.
+    """
+    try:
+        posting = json.loads(message.body.decode())
+    except Exception as e:
+        logger.exception("Dropping malformed card posting: %s", e)
+        await message.reject(requeue=False)
+        return
+
+    try:
+        async for db in get_db():
+            row = await record_card_posting(db, posting)
+    except (KeyError, TypeError, ValueError, ArithmeticError) as e:
+        logger.exception("Dropping malformed card posting: %s", e)
+        await message.reject(requeue=False)
+        return
+    except Exception as e:
+        logger.exception(
+            "Recording card posting %s failed; requeued: %s",
+            posting.get("posting_id"),
+            e,
+        )
+        await message.nack(requeue=True)
+        return
+
+    if row is not None:
+        logger.info(
+            f"Recorded card posting {posting['posting_id']} on "
+            f"{posting['account_external_id']}"
+        )
+        await publish_message(
+            settings.RABBITMQ_QUEUE_AUDIT,
+            audit_message("transaction.created", "cards", row),
+        )
+    await message.ack()
+
+
+async def main():
+    connection = await connect_robust(settings.RABBITMQ_URL)
+    channel = await connection.channel()
+    await channel.set_qos(prefetch_count=100)
+    queue = await channel.declare_queue(RABBITMQ_QUEUE, durable=True)
+    await queue.consume(handle_card_posting_message)
+    logger.info(f"Card posting consumer listening on {RABBITMQ_QUEUE}")
+    try:
+        await asyncio.Future()
+    finally:
+        await connection.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
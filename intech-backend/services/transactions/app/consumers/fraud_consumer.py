@@ -1,10 +1,15 @@
 import asyncio
-import json
+import orjson
 import logging
-from aio_pika import IncomingMessage
+from typing import Tuple
+from aio_pika import connect_robust, IncomingMessage
 from app.core.config import settings
-from app.db.db import get_db
-from app.core.transaction import update_transaction_status
+from app.core.fraud import FraudEngine, Transfer, Verdict, build_engine, parse_transfer
+from app.core.fraud_features import ProfileCache
+from app.core.queue import publish_message
+from app.core.redis import get_redis, init_redis
+from app.db.db import AsyncSessionLocal, get_db
+from app.core.transaction import settlement_message, update_transaction_status
 from app.models.transaction import TransactionStatus
 
 logging.basicConfig(level=logging.INFO)
@@ -13,22 +18,83 @@ logger = logging.getLogger("fraud_consumer")
 RABBITMQ_QUEUE = settings.RABBITMQ_QUEUE_FRAUD
 
 
+def _engine_from_settings() -> FraudEngine:
+    if settings.FRAUD_WINDOW_BACKEND == "redis":
+        if not settings.REDIS_URL:
+            raise RuntimeError("FRAUD_WINDOW_BACKEND=redis needs REDIS_URL")
+        init_redis(settings.REDIS_URL)
+        return build_engine(get_redis())
+    return build_engine()
+
+
+engine = _engine_from_settings()
+engine.profiles = ProfileCache(
+    AsyncSessionLocal,
+    settings.FRAUD_PROFILE_CACHE_SIZE,
+    settings.FRAUD_PROFILE_TTL_SECONDS,
+)
+
+
+async def score_fraud_message(body: bytes) -> Tuple[Transfer, Verdict]:
+    txn = parse_transfer(orjson.loads(body))
+    return txn, await engine.ascore(txn)
+
+
 async def handle_fraud_message(message: IncomingMessage):
     async with message.process():
         try:
-            data = json.loads(message.body.decode())
-            txn_id = data.get("transaction_id")
-            amount = float(data.get("amount", 0))
-
-            status = (
-                TransactionStatus.pending
-                if amount > 1_000_000
-                else TransactionStatus.success
+            txn, verdict = await score_fraud_message(message.body)
+            # A cleared external transfer stays pending until the bank has
+            # paid it; the settlement result sets its final status.
+            settle = verdict.status == TransactionStatus.success and bool(
+                txn.external_bank
             )
+            status = TransactionStatus.pending if settle else verdict.status
 
             async for db in get_db():
-                txn = await update_transaction_status(db, txn_id, status)
-                if txn:
-                    logger.info(f"Fraud check completed for txn {txn_id}: {status}")
+                # Only a transaction nobody has decided yet, so a superuser's
+                # decision or a settlement result is never overwritten.
+                updated = await update_transaction_status(
+                    db,
+                    txn.transaction_id,
+                    status,
+                    created_at=txn.created_at,
+                    expected=TransactionStatus.pending,
+                )
+                if updated:
+                    logger.info(
+                        f"Fraud check completed for txn {txn.transaction_id}: "
+                        f"{verdict.status} (score {verdict.score})"
+                    )
+                    if settle:
+                        await publish_message(
+                            settings.RABBITMQ_QUEUE_SETTLEMENT,
+                            settlement_message(updated),
+                        )
+            if verdict.reasons:
+                logger.warning(
+                    f"Fraud rules fired for txn {txn.transaction_id}: "
+                    + "; ".join(verdict.reasons)
+                )
         except Exception as e:
             logger.exception("Failed to process fraud message: %s", e)
+
+
+async def main():
+    connection = await connect_robust(settings.RABBITMQ_URL)
+    channel = await connection.channel()
+    await channel.set_qos(prefetch_count=100)
+    queue = await channel.declare_queue(RABBITMQ_QUEUE, durable=True)
+    await queue.consume(handle_fraud_message)
+    logger.info(
+        f"Fraud consumer listening on {RABBITMQ_QUEUE} "
+        f"({len(engine.rules)} rules, {settings.FRAUD_WINDOW_BACKEND} windows)"
+    )
+    try:
+        await asyncio.Future()
+    finally:
+        await connection.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,40 +1,79 @@
 import asyncio
 import json
 import logging
+from datetime import datetime
+from decimal import Decimal
 from aio_pika import connect_robust, IncomingMessage
+from app.connectors import SettlementItem, get_connector
 from app.core.config import settings
-from app.db.db import get_db
-from app.core.transaction import update_transaction_status
-from app.models.transaction import TransactionStatus
+from app.core.metrics import render_bank_metrics, serve_metrics
+from app.core.settlement import PendingSettlement, SettlementBatcher
+from app.db.db import AsyncSessionLocal
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("settlement_consumer")
 
 RABBITMQ_QUEUE = settings.RABBITMQ_QUEUE_SETTLEMENT
 
+batcher = SettlementBatcher(
+    get_connector(settings.SETTLEMENT_CONNECTOR),
+    AsyncSessionLocal,
+    max_batch=settings.SETTLEMENT_BATCH_SIZE,
+    window_seconds=settings.SETTLEMENT_BATCH_WINDOW_SECONDS,
+    retry_delay=settings.SETTLEMENT_RETRY_DELAY_SECONDS,
+    deadline_seconds=settings.SETTLEMENT_BATCH_DEADLINE_SECONDS,
+    record_attempts=settings.SETTLEMENT_RECORD_ATTEMPTS,
+)
+
 
 async def handle_settlement_message(message: IncomingMessage):
-    async with message.process():
-        try:
-            data = json.loads(message.body.decode())
-            txn_id = data.get("transaction_id")
-            external_bank = data.get("external_bank")
-
-            logger.info(f"Processing settlement for txn {txn_id} to {external_bank}")
-
-            settlement_success = True  # TODO: Replace with real bank connector API call
-            status = (
-                TransactionStatus.success
-                if settlement_success
-                else TransactionStatus.failed
-            )
-            external_ref = f"{external_bank}-{txn_id}"
-
-            async for db in get_db():
-                txn = await update_transaction_status(
-                    db, txn_id, status, external_reference=external_ref
-                )
-                if txn:
-                    logger.info(f"Settlement completed for txn {txn_id}: {status}")
-        except Exception as e:
-            logger.exception("Failed to process settlement message: %s", e)
+    """
+    Queue the transfer on its bank's batch. The message is acked by the
+    batcher once the batch result is stored, or nacked for redelivery.
+    """
+    try:
+        data = json.loads(message.body.decode())
+        txn_id = data["transaction_id"]
+        created_at = data.get("created_at")
+        created_at = datetime.fromisoformat(created_at) if created_at else None
+        external_bank = data["external_bank"]
+        item = SettlementItem(
+            transaction_id=txn_id,
+            recipient_user_id=data.get("recipient_user_id"),
+            amount=Decimal(data["amount"]),
+            currency=data["currency"],
+        )
+    except Exception as e:
+        logger.exception("Dropping malformed settlement message: %s", e)
+        await message.reject(requeue=False)
+        return
+
+    logger.info(f"Queued settlement for txn {txn_id} to {external_bank}")
+    batcher.add(external_bank, PendingSettlement(item, created_at, message))
+
+
+async def main():
+    metrics_server = None
+    if settings.SETTLEMENT_METRICS_PORT:
+        metrics_server = await serve_metrics(
+            "0.0.0.0", settings.SETTLEMENT_METRICS_PORT, render_bank_metrics
+        )
+    connection = await connect_robust(settings.RABBITMQ_URL)
+    channel = await connection.channel()
+    # Enough unacked deliveries in hand for full batches to form.
+    await channel.set_qos(prefetch_count=settings.SETTLEMENT_PREFETCH)
+    queue = await channel.declare_queue(RABBITMQ_QUEUE, durable=True)
+    await queue.consume(handle_settlement_message)
+    logger.info(f"Settlement consumer listening on {RABBITMQ_QUEUE}")
+    try:
+        await asyncio.Future()
+    finally:
+        await batcher.close()
+        await batcher.connector.close()
+        await connection.close()
+        if metrics_server is not None:
+            metrics_server.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,158 @@
+"""
+Cold storage for settled transactions.
+
+Settled (success/failed) rows older than ARCHIVE_AFTER_DAYS are copied in
+created_at order into zstd-compressed Parquet files under ARCHIVE_URI (a
+local path or any URI pyarrow.fs understands, e.g. s3://bucket/prefix).
+Then, in one database transaction, their ids are recorded in
+transaction_archive_index and the rows are deleted. A crash between the file
+write and the commit leaves an unreferenced file; the rows are archived
+again on the next run.
+"""
+
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import pyarrow as pa
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+from sqlalchemy import delete, insert, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.logger import logging
+from app.models.transaction import (
+    Transaction,
+    TransactionArchiveEntry,
+    TransactionStatus,
+)
+
+logger = logging.getLogger(__name__)
+
+SETTLED_STATUSES = (TransactionStatus.success, TransactionStatus.failed)
+
+ARCHIVE_SCHEMA = pa.schema(
+    [
+        ("id", pa.string()),
+        ("reference", pa.string()),
+        ("sender_user_id", pa.string()),
+        ("recipient_user_id", pa.string()),
+        ("amount", pa.decimal128(12, 2)),
+        ("currency", pa.string()),
+        ("type", pa.string()),
+        ("status", pa.string()),
+        ("created_at", pa.timestamp("us", tz="UTC")),
+        ("updated_at", pa.timestamp("us", tz="UTC")),
+        ("external_bank", pa.string()),
+        ("external_reference", pa.string()),
+    ]
+)
+ARCHIVE_COLUMNS = tuple(getattr(Transaction, name) for name in ARCHIVE_SCHEMA.names)
+
+
+class TransactionArchive:
+    def __init__(self, uri: str):
+        self.fs, self.root = pafs.FileSystem.from_uri(uri)
+
+    def _path_for(self, first_created_at: datetime) -> str:
+        return (
+            f"{self.root}/transactions/{first_created_at:%Y/%m}/"
+            f"{first_created_at:%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:12]}.parquet"
+        )
+
+    def write_batch(self, rows: List) -> str:
+        """Write rows (in ARCHIVE_SCHEMA column order) to a new file."""
+        columns = list(zip(*rows))
+        arrays = []
+        for field, values in zip(ARCHIVE_SCHEMA, columns):
+            if field.name in ("id", "type", "status"):
+                values = [
+                    None if v is None else str(getattr(v, "value", v)) for v in values
+                ]
+            arrays.append(pa.array(values, type=field.type))
+        table = pa.Table.from_arrays(arrays, schema=ARCHIVE_SCHEMA)
+
+        path = self._path_for(rows[0].created_at)
+        self.fs.create_dir(path.rsplit("/", 1)[0], recursive=True)
+        with self.fs.open_output_stream(path) as sink:
+            pq.write_table(table, sink, compression="zstd")
+        return path
+
+    def read_transaction(self, location: str, txn_id: str) -> Optional[Dict]:
+        table = pq.read_table(
+            location, filesystem=self.fs, filters=[("id", "=", str(txn_id))]
+        )
+        if table.num_rows == 0:
+            return None
+        record = table.slice(0, 1).to_pylist()[0]
+        record["id"] = uuid.UUID(record["id"])
+        return record
+
+
+async def archive_batch(
+    db: AsyncSession, archive: TransactionArchive, cutoff: datetime, batch_size: int
+) -> int:
+    """Archive up to batch_size settled rows created before cutoff."""
+    result = await db.execute(
+        select(*ARCHIVE_COLUMNS)
+        .where(Transaction.created_at < cutoff)
+        .where(Transaction.status.in_(SETTLED_STATUSES))
+        .order_by(Transaction.created_at, Transaction.id)
+        .limit(batch_size)
+    )
+    rows = result.all()
+    if not rows:
+        return 0
+
+    location = await asyncio.to_thread(archive.write_batch, rows)
+    await db.execute(
+        insert(TransactionArchiveEntry),
+        [
+            {"id": row.id, "created_at": row.created_at, "location": location}
+            for row in rows
+        ],
+    )
+    await db.execute(
+        delete(Transaction).where(
+            tuple_(Transaction.id, Transaction.created_at).in_(
+                [(row.id, row.created_at) for row in rows]
+            )
+        )
+    )
+    await db.commit()
+    logger.info("Archived %d transactions to %s", len(rows), location)
+    return len(rows)
+
+
+async def archive_settled_transactions(
+    db: AsyncSession,
+    archive: TransactionArchive,
+    older_than_days: int,
+    batch_size: int,
+) -> int:
+    cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+    total = 0
+    while True:
+        count = await archive_batch(db, archive, cutoff, batch_size)
+        total += count
+        if count < batch_size:
+            return total
+
+
+async def find_archived_transaction(
+    db: AsyncSession, archive: TransactionArchive, txn_id: str
+) -> Optional[Dict]:
+    try:
+        archived_id = uuid.UUID(str(txn_id))
+    except ValueError:
+        return None
+    result = await db.execute(
+        select(TransactionArchiveEntry.location).where(
+            TransactionArchiveEntry.id == archived_id
+        )
+    )
+    location = result.scalar()
+    if location is None:
+        return None
+    return await asyncio.to_thread(archive.read_transaction, location, txn_id)
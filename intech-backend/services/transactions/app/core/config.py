@@ -9,17 +9,101 @@ class Settings(BaseSettings):
     DATABASE_URL: str
     DATABASE_URL_SYNC: str
 
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 100
+
+    DATABASE_REPLICA_URL: str | None = None
+    REPLICA_MAX_LAG_SECONDS: float = 5
+    REPLICA_LAG_CHECK_INTERVAL: float = 2
+    READ_YOUR_WRITES_SECONDS: int = 10
+
+    TRANSACTION_PARTITION_MONTHS_AHEAD: int = 3
+    TRANSACTION_PARTITION_RETENTION_MONTHS: int = 24
+    TRANSACTION_ARCHIVE_SCHEMA: str = Field("archive")
+    PARTITION_MAINTENANCE_INTERVAL_SECONDS: int = 6 * 60 * 60
+
+    ARCHIVE_URI: str | None = None
+    ARCHIVE_AFTER_DAYS: int = 180
+    ARCHIVE_BATCH_SIZE: int = 5000
+    ARCHIVE_INTERVAL_SECONDS: int = 60 * 60
+
+    IDEMPOTENCY_TTL_SECONDS: int = 24 * 60 * 60
+    IDEMPOTENCY_LOCK_SECONDS: int = 30
+    IDEMPOTENCY_WAIT_SECONDS: float = 10
+    IDEMPOTENCY_STORE_ATTEMPTS: int = 5
+
+    JOB_SPOOL_DIR: str = Field("/app/spool/jobs")
+    JOB_WORKERS: int = 2
+    JOB_CHUNK_SIZE: int = 1000
+    JOB_MAX_UPLOAD_BYTES: int = 256 * 1024 * 1024
+    JOB_STALE_SECONDS: int = 300
+    JOB_SWEEP_INTERVAL_SECONDS: float = 60
+
+    # Fraud rule specs (see app.core.fraud.DEFAULT_RULES for the format).
+    FRAUD_RULES: list[dict] | None = None
+    FRAUD_REVIEW_SCORE: int = 50
+    FRAUD_BLOCK_SCORE: int = 100
+    FRAUD_WINDOW_BACKEND: str = Field("memory")  # memory | redis
+    FRAUD_WINDOW_BUCKETS: int = 60
+    FRAUD_MAX_TRACKED_SENDERS: int = 200_000
+    FRAUD_MAX_RECIPIENTS_PER_SENDER: int = 256
+    FRAUD_FEATURE_LOOKBACK_DAYS: int = 30
+    FRAUD_FEATURE_CHUNK_ROWS: int = 50_000
+    FRAUD_FEATURE_INTERVAL_SECONDS: int = 6 * 60 * 60
+    FRAUD_PROFILE_CACHE_SIZE: int = 100_000
+    FRAUD_PROFILE_TTL_SECONDS: int = 15 * 60
+
+    SETTLEMENT_CONNECTOR: str = Field("fake")
+    SETTLEMENT_BATCH_SIZE: int = 500
+    SETTLEMENT_BATCH_WINDOW_SECONDS: float = 2.0
+    SETTLEMENT_PREFETCH: int = 2000
+    SETTLEMENT_RETRY_DELAY_SECONDS: float = 5.0
+    SETTLEMENT_BATCH_DEADLINE_SECONDS: float = 30.0
+    SETTLEMENT_RECORD_ATTEMPTS: int = 5
+    SETTLEMENT_METRICS_PORT: int | None = 9102
+
+    # Per-bank HTTP settings for the "http" connector, e.g.
+    # {"gtb": {"base_url": "https://...", "api_key": "...", "timeout": 5}}
+    SETTLEMENT_BANKS: dict[str, dict] = {}
+    SETTLEMENT_HTTP_TIMEOUT_SECONDS: float = 10.0
+    SETTLEMENT_HTTP_MAX_CONNECTIONS: int = 20
+    SETTLEMENT_BANK_CONCURRENCY: int = 4
+    SETTLEMENT_RETRY_ATTEMPTS: int = 3
+    SETTLEMENT_RETRY_BASE_SECONDS: float = 0.2
+    SETTLEMENT_RETRY_MAX_SECONDS: float = 5.0
+    SETTLEMENT_CIRCUIT_FAILURES: int = 5
+    SETTLEMENT_CIRCUIT_RESET_SECONDS: float = 30.0
+
     REDIS_URL: str | None = None
 
     AUTH_JWKS_URL: str
     JWT_ALGORITHM: str = Field("RS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # The auth service's redis, where it publishes revoked tokens; unset,
+    # revoked tokens are accepted here until they expire.
+    REVOCATION_REDIS_URL: str | None = None
+    REVOCATION_CHANNEL: str = Field("token_revocations")
+    # Service tokens (app.core.service_auth): the auth service's RS256 keys
+    # for them; unset, no service token is accepted.
+    SERVICE_JWKS_URL: str | None = None
+    SERVICE_TOKEN_AUDIENCE: str = Field("transactions")
+    SERVICE_TOKEN_CACHE_SIZE: int = 10_000
 
     RABBITMQ_URL: str
     RABBITMQ_EXCHANGE: str = Field("transactions")
     RABBITMQ_QUEUE_TRANSACTIONS: str = Field("new")
-    RABBITMQ_QUEUE_SETTLEMENT: str = Field("settlement")
-    RABBITMQ_QUEUE_FRAUD: str = Field("fraud")
+    # Published by the fraud consumer once a transfer is cleared.
+    RABBITMQ_QUEUE_SETTLEMENT: str = Field("settlement_queue")
+    # New transfers to be scored, consumed by the fraud consumer.
+    RABBITMQ_QUEUE_FRAUD: str = Field("fraud_queue")
+    # Card spend posted by the cards service, recorded as withdrawals.
+    RABBITMQ_QUEUE_CARD_POSTINGS: str = Field("card_postings")
+    # Consumed by the audit service
+    RABBITMQ_QUEUE_AUDIT: str = Field("audit_queue")
 
     LOG_FILE: str = Field("/app/logs/transactions.log")
     LOG_LEVEL: str = Field("info")
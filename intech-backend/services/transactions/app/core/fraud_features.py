@@ -0,0 +1,301 @@
+"""
+Offline per-sender fraud features.
+
+Successful transactions from the last FRAUD_FEATURE_LOOKBACK_DAYS are
+streamed from a server-side cursor ordered by (sender, recipient). They
+arrive in chunks of FRAUD_FEATURE_CHUNK_ROWS. Each chunk is turned into
+NumPy columns and reduced per sender with reduceat over the group
+boundaries.
+
+Every feature is a mergeable partial aggregate: counts, sums, sums of
+squares, max, hour histograms, and distinct recipients counted at pair
+boundaries. So a sender split across two chunks is carried over as a
+single row, not as its transactions. Memory is O(chunk) whatever the
+table size.
+
+Finished senders are upserted into user_fraud_features as they complete.
+Rows not refreshed by a run belong to senders with no recent activity and
+are deleted at the end.
+
+The fraud consumer reads the table through ProfileCache.
+"""
+
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import Float, cast, delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.fraud import UserProfile
+from app.core.logger import logging
+from app.models.transaction import Transaction, TransactionStatus, UserFraudFeatures
+
+logger = logging.getLogger(__name__)
+
+DAY = 86400.0
+
+# Additive per-sender columns; amount_max and hours are merged separately.
+_SUM_FIELDS = (
+    "txn_count",
+    "amount_sum",
+    "amount_sq",
+    "count_1d",
+    "amount_1d",
+    "count_7d",
+    "amount_7d",
+    "distinct_recipients",
+)
+
+
+def chunk_features(
+    senders: np.ndarray,
+    recipients: np.ndarray,
+    amounts: np.ndarray,
+    epochs: np.ndarray,
+    as_of: float,
+) -> Dict[str, np.ndarray]:
+    """
+    Aggregate one chunk sorted by (sender, recipient). Returns one entry per
+    sender in the chunk, plus the first and last recipient of each so that
+    a pair split between chunks is counted once.
+    """
+    n = len(senders)
+    new_sender = np.empty(n, dtype=bool)
+    new_sender[0] = True
+    np.not_equal(senders[1:], senders[:-1], out=new_sender[1:])
+    starts = np.flatnonzero(new_sender)
+
+    new_pair = new_sender.copy()
+    new_pair[1:] |= recipients[1:] != recipients[:-1]
+    new_pair &= recipients != None  # noqa: E711 - elementwise on object array
+
+    age = as_of - epochs
+    in_1d = age <= DAY
+    in_7d = age <= 7 * DAY
+    group = np.cumsum(new_sender) - 1
+    hours = np.zeros((len(starts), 24), dtype=np.int64)
+    np.add.at(hours, (group, (epochs // 3600).astype(np.int64) % 24), 1)
+
+    ends = np.append(starts[1:], n) - 1
+    return {
+        "user_id": senders[starts],
+        "txn_count": np.diff(np.append(starts, n)),
+        "amount_sum": np.add.reduceat(amounts, starts),
+        "amount_sq": np.add.reduceat(amounts * amounts, starts),
+        "amount_max": np.maximum.reduceat(amounts, starts),
+        "count_1d": np.add.reduceat(in_1d.astype(np.int64), starts),
+        "amount_1d": np.add.reduceat(np.where(in_1d, amounts, 0.0), starts),
+        "count_7d": np.add.reduceat(in_7d.astype(np.int64), starts),
+        "amount_7d": np.add.reduceat(np.where(in_7d, amounts, 0.0), starts),
+        "distinct_recipients": np.add.reduceat(new_pair.astype(np.int64), starts),
+        "hours": hours,
+        "first_recipient": recipients[starts],
+        "last_recipient": recipients[ends],
+    }
+
+
+def _merge_carry(block: Dict[str, np.ndarray], carry: Dict[str, np.ndarray]) -> None:
+    """Fold the previous chunk's unfinished sender into row 0 of `block`."""
+    for field in _SUM_FIELDS:
+        block[field][0] += carry[field][0]
+    block["amount_max"][0] = max(block["amount_max"][0], carry["amount_max"][0])
+    block["hours"][0] += carry["hours"][0]
+    if (
+        carry["last_recipient"][0] is not None
+        and carry["last_recipient"][0] == block["first_recipient"][0]
+    ):
+        block["distinct_recipients"][0] -= 1
+    # Row 0 now spans both chunks; keep its first recipient from the carry.
+    block["first_recipient"][0] = carry["first_recipient"][0]
+
+
+def _take(block: Dict[str, np.ndarray], index) -> Dict[str, np.ndarray]:
+    return {field: values[index] for field, values in block.items()}
+
+
+def feature_rows(block: Dict[str, np.ndarray], computed_at: datetime) -> List[dict]:
+    count = block["txn_count"].astype(np.float64)
+    mean = block["amount_sum"] / count
+    std = np.sqrt(np.maximum(block["amount_sq"] / count - mean * mean, 0.0))
+    columns = (
+        block["user_id"].tolist(),
+        block["txn_count"].tolist(),
+        block["amount_sum"].tolist(),
+        mean.tolist(),
+        std.tolist(),
+        block["amount_max"].tolist(),
+        block["count_1d"].tolist(),
+        block["amount_1d"].tolist(),
+        block["count_7d"].tolist(),
+        block["amount_7d"].tolist(),
+        block["distinct_recipients"].tolist(),
+        block["hours"].tolist(),
+    )
+    names = (
+        "user_id",
+        "txn_count",
+        "amount_sum",
+        "amount_mean",
+        "amount_std",
+        "amount_max",
+        "count_1d",
+        "amount_1d",
+        "count_7d",
+        "amount_7d",
+        "distinct_recipients",
+        "hour_histogram",
+    )
+    return [
+        dict(zip(names, values), computed_at=computed_at) for values in zip(*columns)
+    ]
+
+
+class FeatureAggregator:
+    """
+    Folds chunks of (sender, recipient, amount, epoch) rows sorted by
+    (sender, recipient) into blocks of finished senders.
+    """
+
+    def __init__(self, as_of: float) -> None:
+        self.as_of = as_of
+        self._carry: Optional[Dict[str, np.ndarray]] = None
+
+    def feed(self, rows) -> Optional[Dict[str, np.ndarray]]:
+        if not rows:
+            return None
+        senders, recipients, amounts, epochs = zip(*rows)
+        block = chunk_features(
+            np.array(senders, dtype=object),
+            np.array(recipients, dtype=object),
+            np.array(amounts, dtype=np.float64),
+            np.array(epochs, dtype=np.float64),
+            self.as_of,
+        )
+        finished = []
+        carry = self._carry
+        if carry is not None:
+            if block["user_id"][0] == carry["user_id"][0]:
+                _merge_carry(block, carry)
+            else:
+                finished.append(carry)
+        # The last sender may continue in the next chunk.
+        if len(block["user_id"]) > 1:
+            finished.append(_take(block, slice(0, -1)))
+        self._carry = {field: values[-1:].copy() for field, values in block.items()}
+        if not finished:
+            return None
+        return {
+            field: np.concatenate([part[field] for part in finished]) for field in block
+        }
+
+    def finish(self) -> Optional[Dict[str, np.ndarray]]:
+        carry, self._carry = self._carry, None
+        return carry
+
+
+async def _upsert(db: AsyncSession, rows: List[dict]) -> None:
+    if db.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(UserFraudFeatures)
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[UserFraudFeatures.user_id],
+            set_={
+                name: stmt.excluded[name]
+                for name in rows[0]
+                if name != UserFraudFeatures.user_id.key
+            },
+        ),
+        rows,
+    )
+
+
+async def _write(db: AsyncSession, block, computed_at: datetime) -> int:
+    rows = feature_rows(block, computed_at)
+    await _upsert(db, rows)
+    await db.commit()
+    return len(rows)
+
+
+async def compute_user_features(
+    db: AsyncSession, lookback_days: int, chunk_rows: int
+) -> int:
+    """Rebuild user_fraud_features; returns the number of senders written."""
+    now = datetime.now(timezone.utc)
+    started = time.perf_counter()
+    query = (
+        select(
+            Transaction.sender_user_id,
+            Transaction.recipient_user_id,
+            cast(Transaction.amount, Float),
+            cast(func.extract("epoch", Transaction.created_at), Float),
+        )
+        .where(Transaction.created_at >= now - timedelta(days=lookback_days))
+        .where(Transaction.status == TransactionStatus.success)
+        .order_by(Transaction.sender_user_id, Transaction.recipient_user_id)
+        .execution_options(yield_per=chunk_rows)
+    )
+    aggregator = FeatureAggregator(now.timestamp())
+    written = 0
+    # Stream on a connection of its own so commits of the feature writes do
+    # not close the cursor.
+    async with db.bind.connect() as conn:
+        result = await conn.stream(query)
+        async for rows in result.partitions(chunk_rows):
+            block = aggregator.feed(rows)
+            if block is not None:
+                written += await _write(db, block, now)
+    block = aggregator.finish()
+    if block is not None:
+        written += await _write(db, block, now)
+
+    await db.execute(
+        delete(UserFraudFeatures).where(UserFraudFeatures.computed_at < now)
+    )
+    await db.commit()
+    logger.info(
+        "Fraud features for %d senders computed in %.1fs",
+        written,
+        time.perf_counter() - started,
+    )
+    return written
+
+
+class ProfileCache:
+    """UserProfile per sender from user_fraud_features, LRU with a TTL."""
+
+    def __init__(self, session_factory, max_size: int, ttl_seconds: float) -> None:
+        self._session_factory = session_factory
+        self._max_size = max_size
+        self._ttl = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    async def get(self, user_id: str) -> Optional[UserProfile]:
+        now = time.monotonic()
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[0] > now:
+            self._entries.move_to_end(user_id)
+            return entry[1]
+        async with self._session_factory() as db:
+            row = await db.get(UserFraudFeatures, user_id)
+        profile = None
+        if row is not None:
+            total = sum(row.hour_histogram) or 1
+            profile = UserProfile(
+                txn_count=row.txn_count,
+                amount_mean=row.amount_mean,
+                amount_std=row.amount_std,
+                amount_max=row.amount_max,
+                distinct_recipients=row.distinct_recipients,
+                hour_share=tuple(count / total for count in row.hour_histogram),
+            )
+        self._entries[user_id] = (now + self._ttl, profile)
+        self._entries.move_to_end(user_id)
+        if len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+        return profile
@@ -0,0 +1,217 @@
+"""
+Idempotency-Key handling for POST endpoints.
+
+The first request with a key claims it in Redis with SET NX and an
+in-flight marker that expires after IDEMPOTENCY_LOCK_SECONDS, so a crashed
+worker cannot block the key forever. While the request runs the claim is
+refreshed every third of that, so a slow request keeps it. Concurrent
+duplicates poll the key until the original stores its response (kept for
+IDEMPOTENCY_TTL_SECONDS) and replay it. A key reused with a different body
+is rejected. Without Redis the request fails closed rather than risk a
+double post.
+
+Storing the response is retried for IDEMPOTENCY_STORE_ATTEMPTS, the claim
+still held. If it cannot be stored, the claim is kept for the response's
+TTL instead, so retries get a 409 rather than run again, and complete()
+returns False for the caller to fail the request.
+"""
+
+import asyncio
+import hashlib
+import time
+import uuid
+from typing import Optional
+
+import orjson
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.core.logger import logging
+from app.core.redis import get_redis_or_none
+from app.core.serialization import RawJSONResponse
+
+logger = logging.getLogger(__name__)
+
+# Delete the key only while it still holds our in-flight marker.
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Extend the key's TTL (ARGV[2], ms) only while it holds our marker.
+_REFRESH_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Store the response (ARGV[2], for ARGV[3] s) unless another request has
+# claimed the key since ours lapsed.
+_COMPLETE_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if current == ARGV[1] or not current then
+    redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    return 1
+end
+return 0
+"""
+
+
+class IdempotentRequest:
+    def __init__(self, scope: str, user_id: str, key: str, body: bytes):
+        self.redis_key = f"idem:{scope}:{user_id}:{key}"
+        self.fingerprint = hashlib.sha256(body).hexdigest()
+        self._marker = orjson.dumps(
+            {
+                "state": "in_flight",
+                "fingerprint": self.fingerprint,
+                "owner": uuid.uuid4().hex,
+            }
+        )
+        self._client = get_redis_or_none()
+        if self._client is None:
+            raise HTTPException(503, "Idempotency store unavailable")
+        self._heartbeat: Optional[asyncio.Task] = None
+
+    async def begin(self) -> Optional[RawJSONResponse]:
+        """
+        Claim the key. Returns None if this request should run, or the
+        stored response if an identical request already completed.
+        """
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+        delay = 0.02
+        while True:
+            try:
+                if await self._client.set(
+                    self.redis_key,
+                    self._marker,
+                    nx=True,
+                    ex=settings.IDEMPOTENCY_LOCK_SECONDS,
+                ):
+                    self._heartbeat = asyncio.create_task(self._keep_claim())
+                    return None
+                raw = await self._client.get(self.redis_key)
+            except Exception as e:
+                logger.exception("Idempotency store error: %s", e)
+                raise HTTPException(503, "Idempotency store unavailable")
+
+            if raw is not None:
+                entry = orjson.loads(raw)
+                if entry["fingerprint"] != self.fingerprint:
+                    raise HTTPException(
+                        422, "Idempotency-Key was already used for a different request"
+                    )
+                if entry["state"] == "done":
+                    response = RawJSONResponse(
+                        entry["body"].encode(), status_code=entry["status"]
+                    )
+                    response.headers["Idempotent-Replayed"] = "true"
+                    return response
+            # Either in flight or released between SET and GET: wait and retry.
+            if time.monotonic() >= deadline:
+                raise HTTPException(
+                    409, "A request with this Idempotency-Key is still in progress"
+                )
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.25)
+
+    async def _keep_claim(self) -> None:
+        interval = settings.IDEMPOTENCY_LOCK_SECONDS / 3
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                held = await self._client.eval(
+                    _REFRESH_SCRIPT,
+                    1,
+                    self.redis_key,
+                    self._marker,
+                    int(settings.IDEMPOTENCY_LOCK_SECONDS * 1000),
+                )
+            except Exception as e:
+                logger.warning("Failed to refresh idempotency claim: %s", e)
+                continue
+            if not held:
+                logger.error("Lost idempotency claim on %s", self.redis_key)
+                return
+
+    def _stop_heartbeat(self) -> None:
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+
+    async def complete(self, status_code: int, body: bytes) -> bool:
+        """
+        Store the response for replays. Returns False if it could not be
+        stored; the request must then fail rather than report success.
+        """
+        entry = orjson.dumps(
+            {
+                "state": "done",
+                "fingerprint": self.fingerprint,
+                "status": status_code,
+                "body": body.decode(),
+            }
+        )
+        try:
+            for attempt in range(settings.IDEMPOTENCY_STORE_ATTEMPTS):
+                try:
+                    stored = await self._client.eval(
+                        _COMPLETE_SCRIPT,
+                        1,
+                        self.redis_key,
+                        self._marker,
+                        entry,
+                        settings.IDEMPOTENCY_TTL_SECONDS,
+                    )
+                    if not stored:
+                        logger.error(
+                            "Idempotency key %s was claimed by another request",
+                            self.redis_key,
+                        )
+                        return False
+                    return True
+                except Exception as e:
+                    logger.warning(
+                        "Failed to store idempotent response (attempt %d): %s",
+                        attempt + 1,
+                        e,
+                    )
+                    await asyncio.sleep(min(0.05 * 2**attempt, 1.0))
+            # Hold the claim as long as a response would have been kept,
+            # so a retry is refused instead of posting again.
+            try:
+                await self._client.eval(
+                    _REFRESH_SCRIPT,
+                    1,
+                    self.redis_key,
+                    self._marker,
+                    settings.IDEMPOTENCY_TTL_SECONDS * 1000,
+                )
+            except Exception as e:
+                logger.exception("Failed to hold idempotency claim: %s", e)
+            return False
+        finally:
+            self._stop_heartbeat()
+
+    async def release(self) -> None:
+        """Drop our claim so a retry can run the request again."""
+        self._stop_heartbeat()
+        try:
+            await self._client.eval(_RELEASE_SCRIPT, 1, self.redis_key, self._marker)
+        except Exception as e:
+            logger.exception("Failed to release idempotency key: %s", e)
+
+
+def raise_unstored_response() -> None:
+    """
+    For a request that took effect but whose response complete() could not
+    store: fail it, since a client told of success could not replay it.
+    """
+    raise HTTPException(
+        503,
+        "The request took effect but its response could not be stored; "
+        "do not repeat it under a new Idempotency-Key",
+    )
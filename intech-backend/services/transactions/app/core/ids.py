@@ -0,0 +1,40 @@
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+# A v7 id carries its creation time in milliseconds; the row's created_at is
+# taken from the same clock reading, so this window always contains it.
+CREATED_AT_SLACK = timedelta(seconds=1)
+
+
+def uuid7(ts: Optional[datetime] = None) -> uuid.UUID:
+    """Time-ordered UUID (RFC 9562 version 7) for the given or current time."""
+    ts = ts or datetime.now(timezone.utc)
+    ms = int(ts.timestamp() * 1000)
+    rand = int.from_bytes(os.urandom(10), "big")
+    value = (ms & ((1 << 48) - 1)) << 80
+    value |= 0x7 << 76
+    value |= (rand >> 68) << 64  # 12 bits rand_a
+    value |= 0b10 << 62
+    value |= rand & ((1 << 62) - 1)  # 62 bits rand_b
+    return uuid.UUID(int=value)
+
+
+def uuid7_timestamp(value: uuid.UUID) -> datetime:
+    return datetime.fromtimestamp((value.int >> 80) / 1000, tz=timezone.utc)
+
+
+def created_at_bounds(txn_id) -> Optional[Tuple[datetime, datetime]]:
+    """
+    created_at range implied by a transaction id, so lookups by id can be
+    pruned to a single partition. Legacy uuid4 ids carry no time: None.
+    """
+    try:
+        value = txn_id if isinstance(txn_id, uuid.UUID) else uuid.UUID(str(txn_id))
+    except ValueError:
+        return None
+    if value.version != 7:
+        return None
+    ts = uuid7_timestamp(value)
+    return ts - CREATED_AT_SLACK, ts + CREATED_AT_SLACK
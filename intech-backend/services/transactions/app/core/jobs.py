@@ -0,0 +1,362 @@
+"""
+Disbursement files processed off the request path.
+
+An upload is streamed to JOB_SPOOL_DIR as it arrives and a transaction_jobs
+row is queued for it. Workers in the API process read the spooled file
+JOB_CHUNK_SIZE rows at a time. For each chunk they validate rows and apply
+the sender's daily limit. In one database transaction they then insert the
+accepted transactions, the per-row outcomes and the job's new offset. The
+fraud and audit messages are published after the commit.
+
+Each chunk commit records the byte offset reached and refreshes the job's
+updated_at. Every JOB_SWEEP_INTERVAL_SECONDS the pool looks for queued jobs
+and for running ones not updated for JOB_STALE_SECONDS, whose worker has
+died, and resumes those from the recorded offset, so no row is submitted
+twice. The spool directory has to be shared if several
+API replicas serve uploads.
+"""
+
+import asyncio
+import contextlib
+import csv
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import AsyncIterator, List, Optional
+
+import orjson
+from pydantic import ValidationError
+from sqlalchemy import insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.logger import logging
+from app.core.queue import publish_messages
+from app.core.transaction import (
+    audit_message,
+    create_transactions_bulk,
+    fraud_message,
+)
+from app.core.transaction_limit import get_daily_limit_usage, get_job_pending_spent
+from app.db.db import AsyncSessionLocal
+from app.models.transaction import (
+    TransactionJob,
+    TransactionJobRow,
+    TransactionJobStatus,
+)
+from app.schemas.transaction import TransactionCreate
+
+logger = logging.getLogger(__name__)
+
+JOB_FORMATS = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def spool_path(job_id: uuid.UUID) -> str:
+    return os.path.join(settings.JOB_SPOOL_DIR, f"{job_id}.upload")
+
+
+async def spool_upload(
+    chunks: AsyncIterator[bytes], job_id: uuid.UUID, max_bytes: int
+) -> int:
+    """Write a request body to the spool directory; returns its size."""
+    path = spool_path(job_id)
+    await asyncio.to_thread(os.makedirs, settings.JOB_SPOOL_DIR, exist_ok=True)
+    f = await asyncio.to_thread(open, path, "wb")
+    size = 0
+    try:
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(f"Upload exceeds {max_bytes} bytes")
+            await asyncio.to_thread(f.write, chunk)
+    except BaseException:
+        f.close()
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+        raise
+    f.close()
+    return size
+
+
+class DisbursementReader:
+    """
+    Reads rows from a spooled CSV (with header) or NDJSON file, keeping the
+    byte offset of the last row returned. Blocking; run it in a thread.
+    """
+
+    def __init__(self, path: str, fmt: str, offset: int = 0) -> None:
+        self._file = open(path, "rb")
+        self.offset = 0
+        self._lines = self._read_lines()
+        if fmt == "csv":
+            header = next(csv.reader(self._lines), None) or []
+            self._header = [name.strip() for name in header]
+        if offset:
+            self._file.seek(offset)
+            self.offset = offset
+        if fmt == "csv":
+            self._rows = (
+                dict(zip(self._header, record))
+                for record in csv.reader(self._lines)
+                if record
+            )
+        else:
+            self._rows = (
+                self._parse_json(line) for line in self._lines if line.strip()
+            )
+
+    def _read_lines(self):
+        while True:
+            line = self._file.readline()
+            if not line:
+                return
+            self.offset += len(line)
+            yield line.decode("utf-8-sig" if self.offset == len(line) else "utf-8")
+
+    @staticmethod
+    def _parse_json(line: str):
+        try:
+            return orjson.loads(line)
+        except orjson.JSONDecodeError as e:
+            return ValueError(f"Invalid JSON: {e}")
+
+    def read(self, count: int) -> list:
+        rows = []
+        for row in self._rows:
+            rows.append(row)
+            if len(rows) == count:
+                break
+        return rows
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def _validate_row(raw) -> tuple:
+    """(TransactionCreate, None) or (None, error message)."""
+    if isinstance(raw, Exception):
+        return None, str(raw)
+    if not isinstance(raw, dict):
+        return None, "Row must be an object"
+    # CSV has no null; an empty optional column means "not set".
+    raw = {key: value for key, value in raw.items() if value not in ("", None)}
+    try:
+        return TransactionCreate.model_validate(raw), None
+    except ValidationError as e:
+        return None, "; ".join(
+            f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}"
+            for err in e.errors()
+        )
+
+
+async def _process_chunk(
+    db: AsyncSession, job: TransactionJob, raw_rows: list, offset: int
+) -> List[dict]:
+    spent, limit = await get_daily_limit_usage(db, job.user_id)
+    # Earlier chunks' transfers that the fraud check has passed are already
+    # in `spent`; only those still pending are added.
+    spent += await get_job_pending_spent(db, job.user_id, job.id)
+    outcomes = []
+    accepted = []
+    for i, raw in enumerate(raw_rows):
+        row_number = job.processed_rows + i + 1
+        payload, error = _validate_row(raw)
+        if payload is not None:
+            amount = float(payload.amount)
+            if amount + spent > limit:
+                payload, error = None, (
+                    f"Daily transaction limit exceeded: {spent}/{limit}"
+                )
+            else:
+                spent += amount
+        outcome = {
+            "job_id": job.id,
+            "row_number": row_number,
+            "status": "accepted" if payload else "rejected",
+            "transaction_id": None,
+            "error": error[:512] if error else None,
+        }
+        outcomes.append(outcome)
+        if payload is not None:
+            accepted.append((outcome, payload))
+
+    created = await create_transactions_bulk(
+        db, job.user_id, [payload for _, payload in accepted], commit=False
+    )
+    for (outcome, _), txn in zip(accepted, created):
+        outcome["transaction_id"] = txn["id"]
+    await db.execute(insert(TransactionJobRow), outcomes)
+
+    job.processed_rows += len(raw_rows)
+    job.processed_bytes = offset
+    job.accepted_rows += len(created)
+    job.rejected_rows += len(raw_rows) - len(created)
+    job.accepted_amount += sum((txn["amount"] for txn in created), Decimal(0))
+    job.updated_at = datetime.now(timezone.utc)
+    await db.commit()
+    return created
+
+
+async def _claim(db: AsyncSession, job_id: uuid.UUID) -> bool:
+    """Mark a queued (or abandoned running) job as ours."""
+    now = datetime.now(timezone.utc)
+    stale = now - timedelta(seconds=settings.JOB_STALE_SECONDS)
+    result = await db.execute(
+        update(TransactionJob)
+        .where(TransactionJob.id == job_id)
+        .where(
+            or_(
+                TransactionJob.status == TransactionJobStatus.queued,
+                (TransactionJob.status == TransactionJobStatus.running)
+                & (TransactionJob.updated_at < stale),
+            )
+        )
+        .values(status=TransactionJobStatus.running, updated_at=now)
+    )
+    await db.commit()
+    return result.rowcount == 1
+
+
+async def _finish(
+    db: AsyncSession,
+    job_id: uuid.UUID,
+    status: TransactionJobStatus,
+    error: Optional[str] = None,
+) -> None:
+    now = datetime.now(timezone.utc)
+    await db.execute(
+        update(TransactionJob)
+        .where(TransactionJob.id == job_id)
+        .values(status=status, error=error, updated_at=now, finished_at=now)
+    )
+    await db.commit()
+
+
+async def run_job(session_factory, job_id: uuid.UUID, chunk_size: int) -> None:
+    async with session_factory() as db:
+        if not await _claim(db, job_id):
+            return
+        job = await db.get(TransactionJob, job_id)
+        path = spool_path(job_id)
+        logger.info("Processing job %s from offset %d", job_id, job.processed_bytes)
+        try:
+            reader = await asyncio.to_thread(
+                DisbursementReader, path, job.format, job.processed_bytes
+            )
+            try:
+                while True:
+                    raw_rows = await asyncio.to_thread(reader.read, chunk_size)
+                    if not raw_rows:
+                        break
+                    created = await _process_chunk(db, job, raw_rows, reader.offset)
+                    await publish_messages(
+                        settings.RABBITMQ_QUEUE_FRAUD,
+                        [fraud_message(txn) for txn in created],
+                    )
+                    await publish_messages(
+                        settings.RABBITMQ_QUEUE_AUDIT,
+                        [
+                            audit_message("transaction.created", job.user_id, txn)
+                            for txn in created
+                        ],
+                    )
+            finally:
+                reader.close()
+        except Exception as e:
+            logger.exception("Job %s failed: %s", job_id, e)
+            await db.rollback()
+            await _finish(db, job_id, TransactionJobStatus.failed, str(e)[:512])
+        else:
+            await _finish(db, job_id, TransactionJobStatus.completed)
+            logger.info(
+                "Job %s completed: %d accepted, %d rejected",
+                job_id,
+                job.accepted_rows,
+                job.rejected_rows,
+            )
+        with contextlib.suppress(FileNotFoundError):
+            await asyncio.to_thread(os.remove, path)
+
+
+class JobWorkerPool:
+    """A fixed set of asyncio workers pulling job ids from a local queue."""
+
+    def __init__(self, session_factory=AsyncSessionLocal) -> None:
+        self._session_factory = session_factory
+        self._queue: asyncio.Queue = asyncio.Queue()
+        # Ids in the queue, so a sweep does not queue a job twice.
+        self._queued: set = set()
+        self._tasks: List[asyncio.Task] = []
+
+    def submit(self, job_id: uuid.UUID) -> None:
+        if job_id in self._queued:
+            return
+        self._queued.add(job_id)
+        self._queue.put_nowait(job_id)
+
+    async def start(
+        self, workers: int, chunk_size: int, sweep_interval: float = 60
+    ) -> None:
+        self._tasks = [
+            asyncio.create_task(self._work(chunk_size)) for _ in range(workers)
+        ]
+        self._tasks.append(asyncio.create_task(self._sweep_every(sweep_interval)))
+
+    async def sweep(self) -> None:
+        """Queue jobs not yet started and running jobs whose worker died."""
+        stale = datetime.now(timezone.utc) - timedelta(
+            seconds=settings.JOB_STALE_SECONDS
+        )
+        async with self._session_factory() as db:
+            result = await db.execute(
+                select(TransactionJob.id)
+                .where(
+                    or_(
+                        TransactionJob.status == TransactionJobStatus.queued,
+                        (TransactionJob.status == TransactionJobStatus.running)
+                        & (TransactionJob.updated_at < stale),
+                    )
+                )
+                .order_by(TransactionJob.created_at)
+            )
+            for job_id in result.scalars():
+                self.submit(job_id)
+
+    async def _sweep_every(self, interval: float) -> None:
+        # The first sweep picks up what a restart left behind.
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.exception("Job sweep failed: %s", e)
+            await asyncio.sleep(interval)
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _work(self, chunk_size: int) -> None:
+        while True:
+            job_id = await self._queue.get()
+            self._queued.discard(job_id)
+            try:
+                await run_job(self._session_factory, job_id, chunk_size)
+            except Exception as e:
+                logger.exception("Job worker error on %s: %s", job_id, e)
+            finally:
+                self._queue.task_done()
+
+
+job_pool = JobWorkerPool()
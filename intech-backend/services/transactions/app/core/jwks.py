@@ -11,7 +11,7 @@ from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer
 
 from app.core.config import settings
-
+from app.core.revocations import revoked_tokens
 
 _jwks_cache: Dict[str, Any] = {"keys": [], "fetched_at": 0}
 _lock = threading.Lock()
@@ -100,6 +100,11 @@ async def get_current_user(creds=Depends(security)) -> Dict[str, Any]:
             status_code=status.HTTP_401_UNAUTHORIZED, detail=f"Invalid token: {e}"
         )
 
+    if revoked_tokens.is_revoked(token):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has been revoked"
+        )
+
     payload["is_superuser"] = payload.get("is_superuser", False)
     return payload
 
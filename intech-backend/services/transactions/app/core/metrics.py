@@ -0,0 +1,242 @@
+import asyncio
+import time
+from typing import Callable, Dict, List
+
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# Upper bounds (seconds) of the checkout wait histogram buckets.
+CHECKOUT_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class PoolMetrics:
+    def __init__(self) -> None:
+        self.wait_buckets: List[int] = [0] * len(CHECKOUT_WAIT_BUCKETS)
+        self.wait_sum = 0.0
+        self.wait_count = 0
+        self.overflow_checkouts = 0
+        self.checkout_timeouts = 0
+
+    def observe_checkout_wait(self, seconds: float) -> None:
+        self.wait_sum += seconds
+        self.wait_count += 1
+        for i, bound in enumerate(CHECKOUT_WAIT_BUCKETS):
+            if seconds <= bound:
+                self.wait_buckets[i] += 1
+                break
+
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records checkout wait, overflow and timeouts."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            conn = super().connect()
+        except exc.TimeoutError:
+            self.metrics.checkout_timeouts += 1
+            raise
+        self.metrics.observe_checkout_wait(time.perf_counter() - start)
+        if self.checkedout() > self.size():
+            self.metrics.overflow_checkouts += 1
+        return conn
+
+
+# Upper bounds (seconds) of the bank request latency histogram buckets.
+BANK_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class BankMetrics:
+    def __init__(self) -> None:
+        self.latency_buckets: List[int] = [0] * len(BANK_LATENCY_BUCKETS)
+        self.latency_sum = 0.0
+        self.latency_count = 0
+        # Requests by outcome: ok, http_<status>, timeout, error, circuit_open.
+        self.requests: Dict[str, int] = {}
+        # 0 closed, 1 half-open, 2 open.
+        self.circuit_state = 0
+
+    def observe(self, seconds: float, outcome: str) -> None:
+        self.latency_sum += seconds
+        self.latency_count += 1
+        for i, bound in enumerate(BANK_LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.latency_buckets[i] += 1
+                break
+        self.count(outcome)
+
+    def count(self, outcome: str) -> None:
+        self.requests[outcome] = self.requests.get(outcome, 0) + 1
+
+
+_banks: Dict[str, BankMetrics] = {}
+
+
+def bank_metrics(bank: str) -> BankMetrics:
+    if bank not in _banks:
+        _banks[bank] = BankMetrics()
+    return _banks[bank]
+
+
+def render_bank_metrics() -> str:
+    """Render per-bank connector metrics in the Prometheus text format."""
+    lines: List[str] = []
+    _metric(lines, "bank_requests_total", "counter", "Bank API requests by outcome")
+    for bank, m in _banks.items():
+        for outcome, count in sorted(m.requests.items()):
+            lines.append(
+                f'bank_requests_total{{bank="{bank}",outcome="{outcome}"}} {count}'
+            )
+
+    _metric(
+        lines,
+        "bank_circuit_state",
+        "gauge",
+        "Circuit breaker state (0 closed, 1 half-open, 2 open)",
+    )
+    for bank, m in _banks.items():
+        lines.append(f'bank_circuit_state{{bank="{bank}"}} {m.circuit_state}')
+
+    _metric(
+        lines,
+        "bank_request_duration_seconds",
+        "histogram",
+        "Latency of bank API requests",
+    )
+    for bank, m in _banks.items():
+        cumulative = 0
+        for bound, count in zip(BANK_LATENCY_BUCKETS, m.latency_buckets):
+            cumulative += count
+            lines.append(
+                f'bank_request_duration_seconds_bucket{{bank="{bank}",le="{bound}"}} '
+                f"{cumulative}"
+            )
+        lines.append(
+            f'bank_request_duration_seconds_bucket{{bank="{bank}",le="+Inf"}} '
+            f"{m.latency_count}"
+        )
+        lines.append(
+            f'bank_request_duration_seconds_sum{{bank="{bank}"}} {m.latency_sum}'
+        )
+        lines.append(
+            f'bank_request_duration_seconds_count{{bank="{bank}"}} {m.latency_count}'
+        )
+
+    return "\n".join(lines) + "\n"
+
+
+async def serve_metrics(host: str, port: int, render: Callable[[], str]):
+    """
+    Minimal /metrics endpoint for worker processes that have no ASGI app.
+    Every request gets the current rendering of `render()`.
+    """
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            await reader.readuntil(b"\r\n\r\n")
+            body = render().encode()
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: text/plain; version=0.0.4\r\n"
+                b"Content-Length: " + str(len(body)).encode() + b"\r\n"
+                b"Connection: close\r\n\r\n" + body
+            )
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+_engines: Dict[str, AsyncEngine] = {}
+
+
+def register_engine(name: str, engine: AsyncEngine) -> None:
+    _engines[name] = engine
+
+
+def _metric(lines: List[str], name: str, kind: str, help_text: str) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+
+
+def render_pool_metrics() -> str:
+    """Render pool gauges and counters in the Prometheus text format."""
+    pools = [
+        (name, engine.sync_engine.pool)
+        for name, engine in _engines.items()
+        if isinstance(engine.sync_engine.pool, InstrumentedAsyncPool)
+    ]
+    lines: List[str] = []
+
+    gauges = (
+        ("db_pool_size", "Configured number of persistent connections", "size"),
+        ("db_pool_checked_out", "Connections currently in use", "checkedout"),
+        ("db_pool_checked_in", "Idle connections held by the pool", "checkedin"),
+        (
+            "db_pool_overflow",
+            "Current overflow (negative while below pool size)",
+            "overflow",
+        ),
+    )
+    for metric, help_text, attr in gauges:
+        _metric(lines, metric, "gauge", help_text)
+        for name, pool in pools:
+            lines.append(f'{metric}{{pool="{name}"}} {getattr(pool, attr)()}')
+
+    _metric(
+        lines,
+        "db_pool_overflow_checkouts_total",
+        "counter",
+        "Checkouts served by an overflow connection",
+    )
+    for name, pool in pools:
+        lines.append(
+            f'db_pool_overflow_checkouts_total{{pool="{name}"}} '
+            f"{pool.metrics.overflow_checkouts}"
+        )
+
+    _metric(
+        lines,
+        "db_pool_checkout_timeouts_total",
+        "counter",
+        "Checkouts that gave up after pool_timeout",
+    )
+    for name, pool in pools:
+        lines.append(
+            f'db_pool_checkout_timeouts_total{{pool="{name}"}} '
+            f"{pool.metrics.checkout_timeouts}"
+        )
+
+    _metric(
+        lines,
+        "db_pool_checkout_wait_seconds",
+        "histogram",
+        "Time spent waiting for a pooled connection",
+    )
+    for name, pool in pools:
+        m = pool.metrics
+        cumulative = 0
+        for bound, count in zip(CHECKOUT_WAIT_BUCKETS, m.wait_buckets):
+            cumulative += count
+            lines.append(
+                f'db_pool_checkout_wait_seconds_bucket{{pool="{name}",le="{bound}"}} '
+                f"{cumulative}"
+            )
+        lines.append(
+            f'db_pool_checkout_wait_seconds_bucket{{pool="{name}",le="+Inf"}} '
+            f"{m.wait_count}"
+        )
+        lines.append(f'db_pool_checkout_wait_seconds_sum{{pool="{name}"}} {m.wait_sum}')
+        lines.append(
+            f'db_pool_checkout_wait_seconds_count{{pool="{name}"}} {m.wait_count}'
+        )
+
+    return "\n".join(lines) + "\n"
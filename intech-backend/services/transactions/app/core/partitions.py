@@ -0,0 +1,115 @@
+"""
+Monthly range partitions of the `transactions` table.
+
+Partitions are named transactions_YYYY_MM and cover [first of month, first of
+next month) on created_at. Future partitions are created ahead of time so
+inserts never hit a missing range; partitions older than the retention
+window are detached and moved to an archive schema, where they stay
+queryable (or can be dumped and dropped) without bloating the live table.
+"""
+
+import re
+from datetime import date, datetime, timezone
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.core.logger import logging
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "transactions"
+_PARTITION_RE = re.compile(rf"^{PARENT_TABLE}_(\d{{4}})_(\d{{2}})$")
+
+
+def month_start(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+
+def add_months(d: date, months: int) -> date:
+    index = d.year * 12 + (d.month - 1) + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT_TABLE}_{month:%Y_%m}"
+
+
+def partition_month(name: str) -> date | None:
+    match = _PARTITION_RE.match(name)
+    if not match:
+        return None
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+async def list_partitions(conn: AsyncConnection) -> List[str]:
+    result = await conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i"
+            " JOIN pg_class c ON c.oid = i.inhrelid"
+            " JOIN pg_class p ON p.oid = i.inhparent"
+            " WHERE p.relname = :parent"
+        ),
+        {"parent": PARENT_TABLE},
+    )
+    return [row[0] for row in result]
+
+
+async def ensure_partitions(
+    conn: AsyncConnection, months_ahead: int, start: date | None = None
+) -> List[str]:
+    """
+    Create monthly partitions from `start` (default: the current month)
+    through `months_ahead` months after the current month.
+    """
+    current = month_start(datetime.now(timezone.utc).date())
+    month = month_start(start) if start else current
+    last = add_months(current, months_ahead)
+    existing = set(await list_partitions(conn))
+    created = []
+    while month <= last:
+        name = partition_name(month)
+        if name not in existing:
+            await conn.execute(
+                text(
+                    f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF {PARENT_TABLE}'
+                    f" FOR VALUES FROM ('{month.isoformat()}')"
+                    f" TO ('{add_months(month, 1).isoformat()}')"
+                )
+            )
+            created.append(name)
+        month = add_months(month, 1)
+    if created:
+        logger.info("Created transaction partitions: %s", ", ".join(created))
+    return created
+
+
+async def detach_expired_partitions(
+    conn: AsyncConnection, retention_months: int, archive_schema: str
+) -> List[str]:
+    """
+    Detach partitions whose whole range is older than `retention_months`
+    and move them into `archive_schema`.
+    """
+    cutoff = add_months(
+        month_start(datetime.now(timezone.utc).date()), -retention_months
+    )
+    await conn.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{archive_schema}"'))
+    detached = []
+    for name in sorted(await list_partitions(conn)):
+        month = partition_month(name)
+        if month is None or add_months(month, 1) > cutoff:
+            continue
+        await conn.execute(
+            text(f'ALTER TABLE {PARENT_TABLE} DETACH PARTITION "{name}"')
+        )
+        await conn.execute(text(f'ALTER TABLE "{name}" SET SCHEMA "{archive_schema}"'))
+        detached.append(name)
+    if detached:
+        logger.info(
+            "Detached transaction partitions into %s: %s",
+            archive_schema,
+            ", ".join(detached),
+        )
+    return detached
@@ -1,3 +1,4 @@
+import asyncio
 import json
 from aio_pika import connect_robust, Message, DeliveryMode
 from app.core.config import settings
@@ -33,6 +34,29 @@ async def publish_message(queue: str, message: dict):
     await channel.default_exchange.publish(msg, routing_key=queue)
 
 
+async def publish_messages(queue: str, messages: list, chunk_size: int = 500):
+    """
+    Publish many messages to one queue: the queue is declared once and
+    publishes are pipelined in chunks instead of awaited one by one.
+    """
+    channel = await get_channel()
+    await channel.declare_queue(queue, durable=True)
+
+    for start in range(0, len(messages), chunk_size):
+        await asyncio.gather(
+            *(
+                channel.default_exchange.publish(
+                    Message(
+                        body=json.dumps(message).encode("utf-8"),
+                        delivery_mode=DeliveryMode.PERSISTENT,
+                    ),
+                    routing_key=queue,
+                )
+                for message in messages[start : start + chunk_size]
+            )
+        )
+
+
 # Convenience wrappers for standard queues
 async def publish_transaction_message(message: dict):
     await publish_message(settings.RABBITMQ_QUEUE_TRANSACTIONS, message)
@@ -18,3 +18,8 @@ def get_redis() -> Redis:
             "Redis client not initialized. Call init_redis() on startup."
         )
     return _redis_client
+
+
+def get_redis_or_none() -> Optional[Redis]:
+    """The shared client if init_redis() has run, for callers that can degrade."""
+    return _redis_client
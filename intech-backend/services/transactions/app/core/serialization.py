@@ -0,0 +1,39 @@
+from decimal import Decimal
+from typing import Any, Iterable, Sequence
+
+import orjson
+from fastapi import Response
+
+_OPTIONS = orjson.OPT_UTC_Z
+
+
+def _default(obj: Any):
+    # Pydantic v2 renders Decimal as a string in JSON mode; keep the wire format.
+    if isinstance(obj, Decimal):
+        return str(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def columns_for(model, schema) -> tuple:
+    """Model columns matching the fields of an output schema, in field order."""
+    return tuple(getattr(model, name) for name in schema.model_fields)
+
+
+def dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj, default=_default, option=_OPTIONS)
+
+
+def dumps_row(fields: Sequence[str], row: Iterable) -> bytes:
+    return orjson.dumps(dict(zip(fields, row)), default=_default, option=_OPTIONS)
+
+
+def dumps_rows(fields: Sequence[str], rows: Iterable[Iterable]) -> bytes:
+    return orjson.dumps(
+        [dict(zip(fields, row)) for row in rows], default=_default, option=_OPTIONS
+    )
+
+
+class RawJSONResponse(Response):
+    """Response for bodies that are already encoded JSON bytes."""
+
+    media_type = "application/json"
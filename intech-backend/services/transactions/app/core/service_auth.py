@@ -0,0 +1,149 @@
+"""
+Service credentials from the auth service, verified and cached locally.
+
+Other services call this one with a token from the auth service's
+client credentials endpoint (POST /auth/service-token): an RS256 JWT
+signed with a key of its own, naming its caller (sub) and this service
+(aud), valid for a few minutes. The keys are at SERVICE_JWKS_URL, fetched
+on first use and again, at most every KEY_REFRESH_SECONDS, when a token
+names an unknown one, and kept parsed. The fetch is awaited, not run on the
+event loop's thread, and requests arriving during it wait for that one
+fetch rather than starting their own.
+
+A caller sends the same token until it expires, so a verified token is
+kept (in an LRU, by the token itself) until its exp and a repeat costs a
+dict lookup rather than a signature check. Service tokens are not
+revocable; they are short-lived instead.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from jose import JWTError, jwt
+from jose.utils import base64_to_long
+
+from app.core.config import settings
+from app.core.logger import logging
+
+logger = logging.getLogger(__name__)
+
+KEY_REFRESH_SECONDS = 30
+
+
+class ServiceTokenError(Exception):
+    pass
+
+
+async def fetch_service_keys() -> List[Dict[str, Any]]:
+    if not settings.SERVICE_JWKS_URL:
+        return []
+    async with httpx.AsyncClient(timeout=5) as client:
+        r = await client.get(settings.SERVICE_JWKS_URL)
+    r.raise_for_status()
+    return r.json().get("keys", [])
+
+
+class ServiceTokenVerifier:
+    def __init__(
+        self,
+        audience: str,
+        fetch_keys: Callable[[], Awaitable[List[Dict[str, Any]]]],
+        max_entries: int,
+    ) -> None:
+        self.audience = audience
+        self.fetch_keys = fetch_keys
+        self.max_entries = max_entries
+        self._keys: Dict[str, rsa.RSAPublicKey] = {}
+        self._keys_fetched_at = float("-inf")
+        self._fetching = asyncio.Lock()
+        # Token -> its claims, least recently used first.
+        self._verified: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    async def refresh_keys(self) -> None:
+        self._keys_fetched_at = time.monotonic()
+        try:
+            self._keys = {
+                jwk["kid"]: rsa.RSAPublicNumbers(
+                    base64_to_long(jwk["e"]), base64_to_long(jwk["n"])
+                ).public_key()
+                for jwk in await self.fetch_keys()
+                if jwk.get("kty") == "RSA"
+            }
+        except Exception as e:
+            logger.warning(f"Fetching service token keys failed: {e}")
+
+    def _may_refresh(self) -> bool:
+        return time.monotonic() - self._keys_fetched_at >= KEY_REFRESH_SECONDS
+
+    async def _key(self, kid: Optional[str]):
+        key = self._keys.get(kid)
+        # Also wait for a fetch under way, which may bring the key.
+        if key is None and (self._may_refresh() or self._fetching.locked()):
+            async with self._fetching:
+                # Unless a fetch finished while this one waited.
+                if self._may_refresh():
+                    await self.refresh_keys()
+            key = self._keys.get(kid)
+        return key
+
+    async def verify(self, token: str) -> Dict[str, Any]:
+        """Claims of a valid token for this service; ServiceTokenError if not."""
+        claims = self._verified.get(token)
+        if claims is not None:
+            if claims["exp"] > time.time():
+                self._verified.move_to_end(token)
+                return dict(claims)
+            del self._verified[token]
+
+        try:
+            key = await self._key(jwt.get_unverified_header(token).get("kid"))
+            if key is None:
+                raise ServiceTokenError("Unknown signing key")
+            claims = jwt.decode(
+                token,
+                key,
+                algorithms=["RS256"],
+                audience=self.audience,
+                options={"require_exp": True},
+            )
+        except JWTError as e:
+            raise ServiceTokenError(str(e))
+        if claims.get("typ") != "service":
+            raise ServiceTokenError("Not a service token")
+
+        self._verified[token] = claims
+        while len(self._verified) > self.max_entries:
+            self._verified.popitem(last=False)
+        return dict(claims)
+
+
+service_verifier = ServiceTokenVerifier(
+    settings.SERVICE_TOKEN_AUDIENCE,
+    fetch_service_keys,
+    settings.SERVICE_TOKEN_CACHE_SIZE,
+)
+
+service_bearer = HTTPBearer(auto_error=False)
+
+
+async def require_service(
+    creds: HTTPAuthorizationCredentials = Depends(service_bearer),
+) -> Dict[str, Any]:
+    """FastAPI dependency for endpoints other services call; returns the claims."""
+    if not creds:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated"
+        )
+    try:
+        return await service_verifier.verify(creds.credentials)
+    except ServiceTokenError as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=f"Invalid service token: {e}",
+        )
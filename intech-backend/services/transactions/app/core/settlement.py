@@ -0,0 +1,282 @@
+"""
+Settlement batching.
+
+Settlement messages are buffered per external_bank. A bank's buffer is
+submitted through the configured connector as one batch when it reaches
+SETTLEMENT_BATCH_SIZE items or SETTLEMENT_BATCH_WINDOW_SECONDS after its
+first item arrived, whichever comes first, and must be answered within
+SETTLEMENT_BATCH_DEADLINE_SECONDS. The per-item results are written
+back with one bulk UPDATE, and only then are the broker messages acked.
+
+Transfers are queued here only once the fraud check has cleared them, and
+a transfer is submitted only while it is still pending: one already
+settled, failed or decided otherwise is acked without going to the bank.
+Results are written only over a pending status for the same reason.
+
+If the submission fails without an answer, the bank may already have
+acted on it: the whole batch is nacked and requeued after
+SETTLEMENT_RETRY_DELAY_SECONDS, and the redelivered transfers may be
+batched differently. That is safe only because connectors have the bank
+deduplicate every transfer by its transaction id (see
+app.connectors.base). A batch the bank refuses outright (BankRequestError)
+is final instead: its transactions are marked failed and the messages
+acked. Once the bank has answered, its transfers are never submitted
+again. Items it returned no
+result for are requeued. Writing the results is retried up to
+SETTLEMENT_RECORD_ATTEMPTS times. If it still fails, the messages are acked
+anyway and the results logged, leaving the transactions pending for
+reconciliation rather than paying them twice.
+"""
+
+import asyncio
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Set
+
+from sqlalchemy import select
+
+from app.connectors import (
+    BankConnector,
+    BankRequestError,
+    SettlementItem,
+    SettlementResult,
+)
+from app.core.logger import logging
+from app.core.transaction import update_transaction_status, update_transaction_statuses
+from app.models.transaction import Transaction, TransactionStatus
+
+logger = logging.getLogger(__name__)
+
+
+class PendingSettlement(NamedTuple):
+    item: SettlementItem
+    created_at: Optional[datetime]
+    # Broker delivery; anything with async ack() and nack(requeue=...).
+    message: object
+
+
+class SettlementBatcher:
+    def __init__(
+        self,
+        connector: BankConnector,
+        session_factory,
+        max_batch: int,
+        window_seconds: float,
+        retry_delay: float = 0.0,
+        deadline_seconds: Optional[float] = None,
+        record_attempts: int = 1,
+    ) -> None:
+        self.connector = connector
+        self._session_factory = session_factory
+        self.max_batch = max_batch
+        self.window_seconds = window_seconds
+        self.retry_delay = retry_delay
+        self.deadline_seconds = deadline_seconds
+        self.record_attempts = record_attempts
+        self._buffers: Dict[str, List[PendingSettlement]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._inflight: Set[asyncio.Task] = set()
+
+    def add(self, bank: str, pending: PendingSettlement) -> None:
+        buffer = self._buffers.setdefault(bank, [])
+        buffer.append(pending)
+        if len(buffer) >= self.max_batch:
+            self.flush(bank)
+        elif len(buffer) == 1:
+            self._timers[bank] = asyncio.get_running_loop().call_later(
+                self.window_seconds, self.flush, bank
+            )
+
+    def flush(self, bank: str) -> None:
+        timer = self._timers.pop(bank, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._buffers.pop(bank, None)
+        if batch:
+            task = asyncio.create_task(self._settle(bank, batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def close(self) -> None:
+        """Submit everything buffered and wait for batches in flight."""
+        for bank in list(self._buffers):
+            self.flush(bank)
+        while self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+    async def _settle(self, bank: str, batch: List[PendingSettlement]) -> None:
+        try:
+            batch = await self._still_pending(bank, batch)
+        except Exception as e:
+            logger.exception(
+                "Checking settlement batch of %d to %s failed, requeueing: %s",
+                len(batch),
+                bank,
+                e,
+            )
+            await self._requeue(batch)
+            return
+        if not batch:
+            return
+
+        deadline = None
+        if self.deadline_seconds:
+            deadline = time.monotonic() + self.deadline_seconds
+        try:
+            results = await self.connector.submit_batch(
+                bank, [pending.item for pending in batch], deadline
+            )
+        except BankRequestError as e:
+            # Refused as a whole; a redelivery would be refused again.
+            logger.error(
+                "Settlement batch of %d to %s refused, failing it: %s",
+                len(batch),
+                bank,
+                e,
+            )
+            results = [
+                SettlementResult(p.item.transaction_id, False, error=str(e))
+                for p in batch
+            ]
+        except Exception as e:
+            logger.exception(
+                "Settlement batch of %d to %s failed, requeueing: %s",
+                len(batch),
+                bank,
+                e,
+            )
+            await self._requeue(batch)
+            return
+
+        # From here on the bank has acted on the batch: no transfer in it
+        # goes back to the connector.
+        by_id = {result.transaction_id: result for result in results}
+        answered = [p for p in batch if p.item.transaction_id in by_id]
+        unanswered = [p for p in batch if p.item.transaction_id not in by_id]
+        if unanswered:
+            logger.warning(
+                "%s returned no result for %d transfers, requeueing: %s",
+                bank,
+                len(unanswered),
+                [p.item.transaction_id for p in unanswered[:5]],
+            )
+            for pending in unanswered:
+                await pending.message.nack(requeue=True)
+        if not answered:
+            return
+        await self._record_with_retries(bank, answered, by_id)
+        for pending in answered:
+            await pending.message.ack()
+        logger.info("Settled batch of %d to %s", len(answered), bank)
+
+    async def _requeue(self, batch: List[PendingSettlement]) -> None:
+        if self.retry_delay:
+            await asyncio.sleep(self.retry_delay)
+        for pending in batch:
+            await pending.message.nack(requeue=True)
+
+    async def _still_pending(
+        self, bank: str, batch: List[PendingSettlement]
+    ) -> List[PendingSettlement]:
+        """The transfers in `batch` still pending; the others are acked."""
+        query = select(Transaction.id).where(
+            Transaction.id.in_([uuid.UUID(p.item.transaction_id) for p in batch]),
+            Transaction.status == TransactionStatus.pending,
+        )
+        created = [p.created_at for p in batch if p.created_at is not None]
+        if len(created) == len(batch):
+            query = query.where(
+                Transaction.created_at.between(min(created), max(created))
+            )
+        async with self._session_factory() as db:
+            pending_ids = {
+                str(txn_id) for txn_id in (await db.execute(query)).scalars()
+            }
+
+        kept = []
+        for pending in batch:
+            if pending.item.transaction_id in pending_ids:
+                kept.append(pending)
+                continue
+            logger.warning(
+                "Not settling txn %s to %s: no longer pending",
+                pending.item.transaction_id,
+                bank,
+            )
+            await pending.message.ack()
+        return kept
+
+    async def _record_with_retries(
+        self,
+        bank: str,
+        batch: List[PendingSettlement],
+        by_id: Dict[str, SettlementResult],
+    ) -> None:
+        for attempt in range(1, self.record_attempts + 1):
+            try:
+                await self._record(batch, by_id)
+                return
+            except Exception as e:
+                logger.warning(
+                    "Recording settlement batch of %d to %s failed "
+                    "(attempt %d/%d): %s",
+                    len(batch),
+                    bank,
+                    attempt,
+                    self.record_attempts,
+                    e,
+                )
+                if attempt < self.record_attempts and self.retry_delay:
+                    await asyncio.sleep(self.retry_delay)
+        for pending in batch:
+            result = by_id[pending.item.transaction_id]
+            logger.error(
+                "Unrecorded settlement of txn %s at %s: success=%s reference=%s "
+                "error=%s",
+                result.transaction_id,
+                bank,
+                result.success,
+                result.external_reference,
+                result.error,
+            )
+
+    async def _record(
+        self, batch: List[PendingSettlement], by_id: Dict[str, SettlementResult]
+    ) -> None:
+        updates = []
+        async with self._session_factory() as db:
+            for pending in batch:
+                result = by_id[pending.item.transaction_id]
+                status = (
+                    TransactionStatus.success
+                    if result.success
+                    else TransactionStatus.failed
+                )
+                if not result.success:
+                    logger.warning(
+                        "Settlement of txn %s rejected: %s",
+                        result.transaction_id,
+                        result.error,
+                    )
+                if pending.created_at is None:
+                    # Messages published before created_at was added.
+                    await update_transaction_status(
+                        db,
+                        result.transaction_id,
+                        status,
+                        external_reference=result.external_reference,
+                        expected=TransactionStatus.pending,
+                    )
+                    continue
+                updates.append(
+                    {
+                        "id": uuid.UUID(result.transaction_id),
+                        "created_at": pending.created_at,
+                        "status": status,
+                        "external_reference": result.external_reference,
+                    }
+                )
+            await update_transaction_statuses(
+                db, updates, expected=TransactionStatus.pending
+            )
@@ -1,13 +1,118 @@
+import base64
 import uuid
 from datetime import datetime, timezone
+from decimal import Decimal
+from sqlalchemy import insert, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.models.transaction import Transaction, TransactionStatus
+from app.core.ids import created_at_bounds, uuid7
+from app.models.transaction import Transaction, TransactionStatus, TransactionType
+
+
+def transaction_lookup(txn_id, created_at: datetime | None = None) -> list:
+    """
+    WHERE clauses selecting one transaction by id, with a created_at
+    predicate whenever one is known so Postgres prunes to one partition.
+    """
+    if not isinstance(txn_id, uuid.UUID):
+        try:
+            txn_id = uuid.UUID(str(txn_id))
+        except ValueError:
+            pass
+    clauses = [Transaction.id == txn_id]
+    if created_at is not None:
+        clauses.append(Transaction.created_at == created_at)
+    else:
+        bounds = created_at_bounds(txn_id)
+        if bounds:
+            clauses.append(Transaction.created_at.between(*bounds))
+    return clauses
+
+
+def encode_cursor(created_at: datetime, txn_id) -> str:
+    """Opaque position after the transaction (created_at, id) in a listing."""
+    raw = f"{created_at.isoformat()}|{txn_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, txn_id = raw.split("|")
+        return datetime.fromisoformat(created_at), uuid.UUID(txn_id)
+    except ValueError as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
+
+def fraud_message(txn: dict) -> dict:
+    return {
+        "transaction_id": str(txn["id"]),
+        "sender_user_id": txn["sender_user_id"],
+        "recipient_user_id": txn["recipient_user_id"],
+        "amount": str(txn["amount"]),
+        "currency": txn["currency"],
+        "type": txn["type"].value,
+        "external_bank": txn["external_bank"],
+        "created_at": txn["created_at"].isoformat(),
+    }
+
+
+def settlement_message(txn) -> dict:
+    """
+    Settlement of a transfer the fraud check has cleared; `txn` is a
+    Transaction or a row dict. Only the fraud consumer and a superuser's
+    approval publish these, never the request that creates the transfer.
+    """
+    row = txn
+    if not isinstance(txn, dict):
+        row = {
+            column.key: getattr(txn, column.key) for column in Transaction.__table__.c
+        }
+    return {
+        "transaction_id": str(row["id"]),
+        "external_bank": row["external_bank"],
+        "recipient_user_id": row["recipient_user_id"],
+        "amount": str(row["amount"]),
+        "currency": row["currency"],
+        "created_at": row["created_at"].isoformat(),
+    }
+
+
+def audit_message(event_type: str, actor: str, txn) -> dict:
+    """Event for the audit service; `txn` is a Transaction or a row dict."""
+    row = txn
+    if not isinstance(txn, dict):
+        row = {
+            column.key: getattr(txn, column.key) for column in Transaction.__table__.c
+        }
+    return {
+        "id": str(uuid.uuid4()),
+        "type": event_type,
+        "service": "transactions",
+        "actor": actor,
+        "resource_type": "transaction",
+        "resource_id": str(row["id"]),
+        "occurred_at": datetime.now(timezone.utc).isoformat(),
+        "data": {
+            "reference": row["reference"],
+            "sender_user_id": row["sender_user_id"],
+            "recipient_user_id": row["recipient_user_id"],
+            "amount": str(row["amount"]),
+            "currency": row["currency"],
+            "type": row["type"].value,
+            "status": row["status"].value,
+            "external_bank": row["external_bank"],
+        },
+    }
 
 
 async def create_transaction(
     db: AsyncSession, sender_user_id: str, payload
 ) -> Transaction:
+    now = datetime.now(timezone.utc)
     txn = Transaction(
+        id=uuid7(now),
         reference=str(uuid.uuid4()),
         sender_user_id=sender_user_id,
         recipient_user_id=payload.recipient_user_id,
@@ -16,6 +121,8 @@ async def create_transaction(
         type=payload.type,
         status=TransactionStatus.pending,
         external_bank=payload.external_bank,
+        created_at=now,
+        updated_at=now,
     )
     db.add(txn)
     await db.commit()
@@ -23,13 +130,91 @@ async def create_transaction(
     return txn
 
 
+async def create_transactions_bulk(
+    db: AsyncSession, sender_user_id: str, payloads: list, commit: bool = True
+) -> list[dict]:
+    """
+    Insert many transactions with a single multi-row INSERT and commit,
+    unless the caller commits them together with its own writes.
+    Returns the inserted rows as dicts keyed by column name.
+    """
+    now = datetime.now(timezone.utc)
+    rows = [
+        {
+            "id": uuid7(now),
+            "reference": str(uuid.uuid4()),
+            "sender_user_id": sender_user_id,
+            "recipient_user_id": payload.recipient_user_id,
+            "amount": payload.amount,
+            "currency": payload.currency,
+            "type": payload.type,
+            "status": TransactionStatus.pending,
+            "external_bank": payload.external_bank,
+            "created_at": now,
+            "updated_at": now,
+            "external_reference": None,
+        }
+        for payload in payloads
+    ]
+    if rows:
+        await db.execute(insert(Transaction), rows)
+        if commit:
+            await db.commit()
+    return rows
+
+
+async def record_card_posting(db: AsyncSession, posting: dict) -> dict | None:
+    """
+    Record a card posting from the cards service as a settled withdrawal
+    by the account's owner. The posting's id is the transaction's, so a
+    posting delivered again is not recorded twice; returns the row if it
+    was inserted, None if it already was.
+    """
+    created_at = datetime.fromisoformat(posting["created_at"])
+    row = {
+        "id": uuid.UUID(posting["posting_id"]),
+        "reference": f"card:{posting['posting_id']}",
+        "sender_user_id": posting["owner_user_id"],
+        "recipient_user_id": None,
+        "amount": Decimal(posting["amount"]),
+        "currency": posting["currency"],
+        "type": TransactionType.withdrawal,
+        "status": TransactionStatus.success,
+        "external_bank": None,
+        "created_at": created_at,
+        "updated_at": datetime.now(timezone.utc),
+        "external_reference": None,
+    }
+    conn = await db.connection()
+    dialect_insert = pg_insert if conn.dialect.name == "postgresql" else sqlite_insert
+    result = await db.execute(
+        dialect_insert(Transaction)
+        .values(**row)
+        .on_conflict_do_nothing()
+        .returning(Transaction.id)
+    )
+    inserted = result.first() is not None
+    await db.commit()
+    return row if inserted else None
+
+
 async def update_transaction_status(
     db: AsyncSession,
     txn_id: str,
     status: TransactionStatus,
     external_reference: str = None,
+    created_at: datetime | None = None,
+    expected: TransactionStatus | None = None,
 ):
-    txn = await db.get(Transaction, txn_id)
+    """
+    Set a transaction's status. With `expected`, only a transaction still
+    in that status is changed; any other is left alone and None returned.
+    """
+    query = select(Transaction).where(*transaction_lookup(txn_id, created_at))
+    if expected is not None:
+        query = query.where(Transaction.status == expected).with_for_update()
+    result = await db.execute(query)
+    txn = result.scalars().first()
     if not txn:
         return None
     txn.status = status
@@ -39,3 +224,24 @@ async def update_transaction_status(
     await db.commit()
     await db.refresh(txn)
     return txn
+
+
+async def update_transaction_statuses(
+    db: AsyncSession, updates: list, expected: TransactionStatus | None = None
+) -> None:
+    """
+    Apply many status changes with one executemany UPDATE keyed by the full
+    primary key (id, created_at), so each row is found in its partition.
+    Each update is a dict with id, created_at, status and external_reference.
+    With `expected`, rows no longer in that status are left unchanged.
+    """
+    if not updates:
+        return
+    now = datetime.now(timezone.utc)
+    statement = update(Transaction)
+    if expected is not None:
+        statement = statement.where(Transaction.status == expected).execution_options(
+            synchronize_session=None
+        )
+    await db.execute(statement, [dict(values, updated_at=now) for values in updates])
+    await db.commit()
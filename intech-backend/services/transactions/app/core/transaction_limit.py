@@ -1,27 +1,50 @@
 from datetime import datetime, timezone, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
-from app.models.transaction import Transaction
+from app.models.transaction import Transaction, TransactionJobRow
 from app.models.transaction import TransactionLimit
 
 
+def _today_start() -> datetime:
+    return datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
 async def get_daily_spent(db: AsyncSession, user_id: str):
-    today_start = datetime.now(timezone.utc).replace(
-        hour=0, minute=0, second=0, microsecond=0
-    )
     result = await db.execute(
         select(func.coalesce(func.sum(Transaction.amount), 0))
         .where(Transaction.sender_user_id == user_id)
-        .where(Transaction.created_at >= today_start)
+        .where(Transaction.created_at >= _today_start())
         .where(Transaction.status == "success")
     )
     return float(result.scalar() or 0)
 
 
-async def check_transaction_limit(db: AsyncSession, user_id: str, amount: float):
+async def get_job_pending_spent(db: AsyncSession, user_id: str, job_id):
+    """
+    What a disbursement job submitted today that is still pending, so not
+    yet counted by get_daily_spent.
+    """
+    result = await db.execute(
+        select(func.coalesce(func.sum(Transaction.amount), 0))
+        .join(TransactionJobRow, TransactionJobRow.transaction_id == Transaction.id)
+        .where(TransactionJobRow.job_id == job_id)
+        .where(Transaction.sender_user_id == user_id)
+        .where(Transaction.created_at >= _today_start())
+        .where(Transaction.status == "pending")
+    )
+    return float(result.scalar() or 0)
+
+
+async def get_daily_limit_usage(db: AsyncSession, user_id: str):
+    """(spent today, daily limit) for a user."""
     result = await db.get(TransactionLimit, user_id)
     limit = float(result.daily_limit) if result else 20000
     spent = await get_daily_spent(db, user_id)
+    return spent, limit
+
+
+async def check_transaction_limit(db: AsyncSession, user_id: str, amount: float):
+    spent, limit = await get_daily_limit_usage(db, user_id)
     if amount + spent > limit:
         raise ValueError(f"Daily transaction limit exceeded: {spent}/{limit}")
     return True
@@ -1,11 +1,50 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from app.core.config import settings
+from app.core.metrics import InstrumentedAsyncPool, register_engine
 
 DATABASE_URL = settings.DATABASE_URL
 
-engine = create_async_engine(DATABASE_URL, future=True, echo=False)
+
+def engine_options(url: str) -> dict:
+    """Pool settings for Postgres; other backends (SQLite in tests) keep defaults."""
+    if not url.startswith("postgresql"):
+        return {}
+    return {
+        "poolclass": InstrumentedAsyncPool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "connect_args": {
+            # SQLAlchemy's prepared statement cache and asyncpg's own cache;
+            # set DB_STATEMENT_CACHE_SIZE=0 behind pgbouncer transaction pooling.
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        },
+    }
+
+
+engine = create_async_engine(
+    DATABASE_URL, future=True, echo=False, **engine_options(DATABASE_URL)
+)
 AsyncSessionLocal = async_sessionmaker(bind=engine, expire_on_commit=False)
+register_engine("primary", engine)
+
+replica_engine = None
+ReplicaSessionLocal = None
+if settings.DATABASE_REPLICA_URL:
+    replica_engine = create_async_engine(
+        settings.DATABASE_REPLICA_URL,
+        future=True,
+        echo=False,
+        **engine_options(settings.DATABASE_REPLICA_URL),
+    )
+    ReplicaSessionLocal = async_sessionmaker(
+        bind=replica_engine, expire_on_commit=False
+    )
+    register_engine("replica", replica_engine)
 
 Base = declarative_base()
 
@@ -0,0 +1,144 @@
+import asyncio
+import time
+from typing import Dict, Optional
+
+from fastapi import Depends
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from app.core.jwks import get_current_user
+from app.core.config import settings
+from app.core.logger import logging
+from app.core.redis import get_redis_or_none
+from app.db.db import ReplicaSessionLocal, get_db, replica_engine
+
+logger = logging.getLogger(__name__)
+
+# Seconds the replica is behind; 0 when it has replayed everything it received,
+# so an idle primary does not read as lag.
+REPLICA_LAG_SQL = text(
+    "SELECT CASE"
+    " WHEN NOT pg_is_in_recovery() THEN 0"
+    " WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+    " ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)"
+    " END"
+)
+
+
+class ReplicaLagMonitor:
+    """Caches the replica's replication lag for a short interval."""
+
+    def __init__(self, engine: AsyncEngine, max_lag: float, interval: float):
+        self.engine = engine
+        self.max_lag = max_lag
+        self.interval = interval
+        self._healthy = False
+        self._checked_at = float("-inf")
+        self._lock = asyncio.Lock()
+
+    async def is_healthy(self) -> bool:
+        if time.monotonic() - self._checked_at < self.interval:
+            return self._healthy
+        async with self._lock:
+            if time.monotonic() - self._checked_at < self.interval:
+                return self._healthy
+            try:
+                async with self.engine.connect() as conn:
+                    lag = float(await conn.scalar(REPLICA_LAG_SQL))
+                healthy = lag <= self.max_lag
+                if not healthy:
+                    logger.warning("Replica lag %.1fs, reading from primary", lag)
+            except Exception as e:
+                logger.warning("Replica lag check failed: %s", e)
+                healthy = False
+            self._healthy = healthy
+            self._checked_at = time.monotonic()
+        return self._healthy
+
+
+class WriteStickiness:
+    """
+    Remembers users who recently wrote so their reads go to the primary.
+    Uses Redis when configured so every replica of the service agrees,
+    otherwise a per-process map.
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._local: Dict[str, float] = {}
+
+    @staticmethod
+    def _key(user_id: str) -> str:
+        return f"ryw:{user_id}"
+
+    async def mark(self, user_id: Optional[str]) -> None:
+        if not user_id:
+            return
+        client = get_redis_or_none()
+        if client is not None:
+            try:
+                await client.set(self._key(user_id), b"1", ex=self.ttl)
+                return
+            except Exception as e:
+                logger.warning("Failed to record write stickiness in redis: %s", e)
+        self._local[user_id] = time.monotonic() + self.ttl
+
+    async def is_sticky(self, user_id: Optional[str]) -> bool:
+        if not user_id:
+            return False
+        client = get_redis_or_none()
+        if client is not None:
+            try:
+                return bool(await client.exists(self._key(user_id)))
+            except Exception:
+                # Without the shared marker we cannot rule out a recent write.
+                return True
+        until = self._local.get(user_id)
+        if until is None:
+            return False
+        if until < time.monotonic():
+            self._local.pop(user_id, None)
+            return False
+        return True
+
+
+stickiness = WriteStickiness(settings.READ_YOUR_WRITES_SECONDS)
+lag_monitor = (
+    ReplicaLagMonitor(
+        replica_engine,
+        settings.REPLICA_MAX_LAG_SECONDS,
+        settings.REPLICA_LAG_CHECK_INTERVAL,
+    )
+    if replica_engine is not None
+    else None
+)
+
+
+async def mark_primary_write(user: dict, *affected: Optional[str]) -> None:
+    """
+    Pin the user's reads to the primary for READ_YOUR_WRITES_SECONDS, and
+    those of `affected`: the users whose data the write changed, when that
+    is not (only) the writer, as when a superuser changes someone's
+    transaction.
+    """
+    for user_id in dict.fromkeys((user.get("sub"), *affected)):
+        await stickiness.mark(user_id)
+
+
+async def get_read_db(
+    user=Depends(get_current_user),
+    primary: AsyncSession = Depends(get_db),
+) -> AsyncSession:
+    """
+    Session for read-only endpoints. Uses the replica unless none is
+    configured, it is lagging, or the user wrote recently.
+    """
+    if (
+        ReplicaSessionLocal is None
+        or await stickiness.is_sticky(user.get("sub"))
+        or not await lag_monitor.is_healthy()
+    ):
+        yield primary
+        return
+    async with ReplicaSessionLocal() as session:
+        yield session
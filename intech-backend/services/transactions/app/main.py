@@ -1,11 +1,17 @@
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
 from app.core.config import settings
+from app.core.revocations import RevocationListener, revoked_tokens
+from app.core.service_auth import service_verifier
 from app.core.logger import configure_logging
 from app.core.redis import init_redis, _redis_client
 from app.api.v1 import transaction as transactions_router
+from app.api.v1 import jobs as jobs_router
+from app.api.v1 import metrics as metrics_router
 from app.db.db import engine, Base
 from app.core.queue import get_channel
+from app.core.partitions import ensure_partitions
+from app.core.jobs import job_pool
 
 
 @asynccontextmanager
@@ -15,14 +21,35 @@ async def lifespan(app: FastAPI):
     if settings.REDIS_URL:
         init_redis(settings.REDIS_URL)
 
+    revocations = None
+    if settings.REVOCATION_REDIS_URL:
+        revocations = RevocationListener(
+            revoked_tokens, settings.REVOCATION_REDIS_URL, settings.REVOCATION_CHANNEL
+        )
+        revocations.start()
+
+    if settings.SERVICE_JWKS_URL:
+        # So the first service call does not wait on the fetch.
+        await service_verifier.refresh_keys()
+
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        if conn.dialect.name == "postgresql":
+            await ensure_partitions(conn, settings.TRANSACTION_PARTITION_MONTHS_AHEAD)
 
     await get_channel()
+    await job_pool.start(
+        settings.JOB_WORKERS,
+        settings.JOB_CHUNK_SIZE,
+        settings.JOB_SWEEP_INTERVAL_SECONDS,
+    )
 
     try:
         yield
     finally:
+        if revocations is not None:
+            await revocations.close()
+        await job_pool.stop()
 
         try:
             if _redis_client:
@@ -34,4 +61,6 @@ async def lifespan(app: FastAPI):
 app = FastAPI(title="Transactions Service", lifespan=lifespan)
 
 
+app.include_router(jobs_router.router)
 app.include_router(transactions_router.router)
+app.include_router(metrics_router.router)
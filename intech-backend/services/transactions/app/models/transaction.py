@@ -1,11 +1,23 @@
 import enum
 import uuid
-from sqlalchemy import Column, String, Enum, Numeric, ForeignKey, DateTime
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    String,
+    Enum,
+    ForeignKey,
+    Integer,
+    Numeric,
+    DateTime,
+    Index,
+    UniqueConstraint,
+    Float,
+    JSON,
+)
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime, timezone
-
-Base = declarative_base()
+from app.core.ids import uuid7
+from app.db.db import Base
 
 
 class TransactionStatus(str, enum.Enum):
@@ -21,10 +33,27 @@ class TransactionType(str, enum.Enum):
 
 
 class Transaction(Base):
+    """
+    Range-partitioned by month on created_at (see app.core.partitions).
+    Postgres requires the partition key in every unique constraint, so it is
+    part of the primary key and of the reference constraint.
+    """
+
     __tablename__ = "transactions"
+    __table_args__ = (
+        UniqueConstraint("reference", "created_at", name="uq_transactions_reference"),
+        Index("ix_transactions_sender_created_at", "sender_user_id", "created_at"),
+        Index(
+            "ix_transactions_recipient_created_at", "recipient_user_id", "created_at"
+        ),
+        # Lets the balance checker in the reconciliation service read only
+        # rows changed since its watermark.
+        Index("ix_transactions_updated_at", "updated_at", "id"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    reference = Column(String(64), unique=True, index=True, nullable=False)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
+    reference = Column(String(64), index=True, nullable=False)
     sender_user_id = Column(String(64), nullable=False)
     recipient_user_id = Column(String(64), nullable=True)
     amount = Column(Numeric(precision=12, scale=2), nullable=False)
@@ -34,7 +63,9 @@ class Transaction(Base):
         Enum(TransactionStatus), default=TransactionStatus.pending, nullable=False
     )
     created_at = Column(
-        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+        DateTime(timezone=True),
+        primary_key=True,
+        default=lambda: datetime.now(timezone.utc),
     )
     updated_at = Column(
         DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
@@ -48,3 +79,91 @@ class TransactionLimit(Base):
 
     user_id = Column(String(64), primary_key=True)
     daily_limit = Column(Numeric(precision=12, scale=2), nullable=False, default=20000)
+
+
+class TransactionArchiveEntry(Base):
+    """Where an archived transaction's row lives in cold storage."""
+
+    __tablename__ = "transaction_archive_index"
+
+    id = Column(UUID(as_uuid=True), primary_key=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    location = Column(String(512), nullable=False)
+
+
+class TransactionJobStatus(str, enum.Enum):
+    queued = "queued"
+    running = "running"
+    completed = "completed"
+    failed = "failed"
+
+
+class TransactionJob(Base):
+    """
+    A disbursement file processed off the request path (see app.core.jobs).
+    processed_bytes is the offset in the spooled upload up to which rows have
+    been committed, so an interrupted job resumes where it stopped.
+    """
+
+    __tablename__ = "transaction_jobs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(String(64), nullable=False, index=True)
+    format = Column(String(16), nullable=False)
+    status = Column(
+        Enum(TransactionJobStatus), default=TransactionJobStatus.queued, nullable=False
+    )
+    total_bytes = Column(BigInteger, nullable=False)
+    processed_bytes = Column(BigInteger, default=0, nullable=False)
+    processed_rows = Column(Integer, default=0, nullable=False)
+    accepted_rows = Column(Integer, default=0, nullable=False)
+    rejected_rows = Column(Integer, default=0, nullable=False)
+    accepted_amount = Column(Numeric(precision=14, scale=2), default=0, nullable=False)
+    error = Column(String(512), nullable=True)
+    created_at = Column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+    updated_at = Column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class TransactionJobRow(Base):
+    """Outcome of one data row of a disbursement file (1-based, header excluded)."""
+
+    __tablename__ = "transaction_job_rows"
+
+    job_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("transaction_jobs.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    row_number = Column(Integer, primary_key=True)
+    status = Column(String(16), nullable=False)
+    transaction_id = Column(UUID(as_uuid=True), nullable=True)
+    error = Column(String(512), nullable=True)
+
+
+class UserFraudFeatures(Base):
+    """
+    Per-sender behaviour over the last FRAUD_FEATURE_LOOKBACK_DAYS of
+    successful transactions, rebuilt by app.workers.fraud_features and read
+    by the fraud consumer.
+    """
+
+    __tablename__ = "user_fraud_features"
+
+    user_id = Column(String(64), primary_key=True)
+    txn_count = Column(Integer, nullable=False)
+    amount_sum = Column(Float, nullable=False)
+    amount_mean = Column(Float, nullable=False)
+    amount_std = Column(Float, nullable=False)
+    amount_max = Column(Float, nullable=False)
+    count_1d = Column(Integer, nullable=False)
+    amount_1d = Column(Float, nullable=False)
+    count_7d = Column(Integer, nullable=False)
+    amount_7d = Column(Float, nullable=False)
+    distinct_recipients = Column(Integer, nullable=False)
+    hour_histogram = Column(JSON, nullable=False)  # 24 counts, UTC hours
+    computed_at = Column(DateTime(timezone=True), nullable=False, index=True)
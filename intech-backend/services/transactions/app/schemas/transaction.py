@@ -1,8 +1,12 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Literal, Optional
 from decimal import Decimal
 from uuid import UUID
-from app.models.transaction import TransactionStatus, TransactionType
+from app.models.transaction import (
+    TransactionJobStatus,
+    TransactionStatus,
+    TransactionType,
+)
 from datetime import datetime
 
 
@@ -30,3 +34,49 @@ class TransactionOut(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+class TransactionBatchCreate(BaseModel):
+    items: List[TransactionCreate] = Field(..., min_length=1, max_length=10_000)
+
+
+class TransactionBatchItemResult(BaseModel):
+    index: int
+    status: Literal["accepted", "rejected"]
+    id: Optional[UUID] = None
+    reference: Optional[str] = None
+    error: Optional[str] = None
+
+
+class TransactionBatchOut(BaseModel):
+    accepted: int
+    rejected: int
+    results: List[TransactionBatchItemResult]
+
+
+class TransactionJobOut(BaseModel):
+    id: UUID
+    format: str
+    status: TransactionJobStatus
+    total_bytes: int
+    processed_bytes: int
+    processed_rows: int
+    accepted_rows: int
+    rejected_rows: int
+    error: Optional[str]
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime]
+
+    class Config:
+        orm_mode = True
+
+
+class TransactionJobRowOut(BaseModel):
+    row_number: int
+    status: Literal["accepted", "rejected"]
+    transaction_id: Optional[UUID]
+    error: Optional[str]
+
+    class Config:
+        orm_mode = True
@@ -0,0 +1,32 @@
+import asyncio
+import logging
+
+from app.core.archive import TransactionArchive, archive_settled_transactions
+from app.core.config import settings
+from app.db.db import AsyncSessionLocal
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("transaction_archiver")
+
+
+async def main() -> None:
+    if not settings.ARCHIVE_URI:
+        raise SystemExit("ARCHIVE_URI is not set")
+    archive = TransactionArchive(settings.ARCHIVE_URI)
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                total = await archive_settled_transactions(
+                    db,
+                    archive,
+                    settings.ARCHIVE_AFTER_DAYS,
+                    settings.ARCHIVE_BATCH_SIZE,
+                )
+            logger.info("Archive run complete: %d transactions", total)
+        except Exception as e:
+            logger.exception("Archive run failed: %s", e)
+        await asyncio.sleep(settings.ARCHIVE_INTERVAL_SECONDS)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
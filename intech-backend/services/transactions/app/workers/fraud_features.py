@@ -0,0 +1,27 @@
+import asyncio
+import logging
+
+from app.core.config import settings
+from app.core.fraud_features import compute_user_features
+from app.db.db import AsyncSessionLocal
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("fraud_features")
+
+
+async def main() -> None:
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                await compute_user_features(
+                    db,
+                    settings.FRAUD_FEATURE_LOOKBACK_DAYS,
+                    settings.FRAUD_FEATURE_CHUNK_ROWS,
+                )
+        except Exception as e:
+            logger.exception("Fraud feature run failed: %s", e)
+        await asyncio.sleep(settings.FRAUD_FEATURE_INTERVAL_SECONDS)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
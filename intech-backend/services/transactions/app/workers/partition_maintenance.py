@@ -0,0 +1,34 @@
+import asyncio
+import logging
+
+from app.core.config import settings
+from app.core.partitions import detach_expired_partitions, ensure_partitions
+from app.db.db import engine
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("partition_maintenance")
+
+
+async def run_once() -> None:
+    async with engine.begin() as conn:
+        await ensure_partitions(conn, settings.TRANSACTION_PARTITION_MONTHS_AHEAD)
+    if settings.TRANSACTION_PARTITION_RETENTION_MONTHS > 0:
+        async with engine.begin() as conn:
+            await detach_expired_partitions(
+                conn,
+                settings.TRANSACTION_PARTITION_RETENTION_MONTHS,
+                settings.TRANSACTION_ARCHIVE_SCHEMA,
+            )
+
+
+async def main() -> None:
+    while True:
+        try:
+            await run_once()
+        except Exception as e:
+            logger.exception("Partition maintenance failed: %s", e)
+        await asyncio.sleep(settings.PARTITION_MAINTENANCE_INTERVAL_SECONDS)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,77 @@
+"""
+Throughput and peak memory of the fraud feature aggregation.
+
+    python -m benchmarks.bench_fraud_features --rows 100000 1000000 5000000
+
+Feeds synthetic (sender, recipient, amount, epoch) rows, already sorted
+the way the job's cursor returns them, through FeatureAggregator in chunks
+of --chunk rows. Peak traced memory should stay flat as --rows grows; the
+database side (cursor and upserts) is not included.
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+
+from app.core.fraud_features import FeatureAggregator, feature_rows
+
+
+def sorted_rows(count: int, senders: int, as_of: float, seed: int = 3):
+    rng = random.Random(seed)
+    per_sender = count // senders
+    for s in range(senders):
+        recipients = sorted(f"r{rng.randrange(500)}" for _ in range(per_sender))
+        for recipient in recipients:
+            yield (
+                f"user-{s:08d}",
+                recipient,
+                rng.lognormvariate(9, 1.5),
+                as_of - rng.uniform(0, 30 * 86400),
+            )
+
+
+def chunked(rows, size: int):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run(count: int, chunk: int) -> None:
+    as_of = time.time()
+    aggregator = FeatureAggregator(as_of)
+    written = 0
+    tracemalloc.start()
+    started = time.perf_counter()
+    aggregate_seconds = 0.0
+    for rows in chunked(sorted_rows(count, max(count // 200, 1), as_of), chunk):
+        t0 = time.perf_counter()
+        block = aggregator.feed(rows)
+        if block is not None:
+            written += len(feature_rows(block, None))
+        aggregate_seconds += time.perf_counter() - t0
+    block = aggregator.finish()
+    if block is not None:
+        written += len(feature_rows(block, None))
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{count:>10} rows  {written:>8} senders  "
+        f"aggregate {aggregate_seconds:6.2f}s ({count / aggregate_seconds:,.0f} rows/s)  "
+        f"total {elapsed:6.2f}s  peak {peak / 2**20:7.1f} MiB"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--chunk", type=int, default=50_000)
+    args = parser.parse_args()
+    for count in args.rows:
+        run(count, args.chunk)
@@ -0,0 +1,109 @@
+"""
+Replay synthetic fraud_queue messages through the fraud consumer's scoring
+path.
+
+    python -m benchmarks.bench_fraud_replay --messages 1000000
+    python -m benchmarks.bench_fraud_replay --messages 100000 \\
+        --redis redis://localhost:6379/15
+
+Messages are built up front as the JSON bodies the API publishes, for a
+skewed population of senders over one simulated day. Each one is decoded,
+scored and timed; the database update is left out so the numbers are
+those of the engine. The window store is in-process unless --redis is
+given (use a scratch database: keys are written under fraud:*).
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import random
+import statistics
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from app.core import fraud
+from app.consumers import fraud_consumer
+
+
+def synthetic_messages(count: int, senders: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    step = 86400 / count
+    currencies = ["NGN"] * 80 + ["USD"] * 15 + ["GBP"] * 4 + ["XAF"]
+    messages = []
+    for i in range(count):
+        # Mostly retail traffic, plus a handful of bursty payroll senders.
+        sender = rng.randrange(20) if rng.random() < 0.02 else rng.randrange(senders)
+        amount = round(rng.lognormvariate(9, 1.5), 2)
+        messages.append(
+            json.dumps(
+                {
+                    "transaction_id": f"00000000-0000-7000-8000-{i:012d}",
+                    "sender_user_id": f"user-{sender}",
+                    "recipient_user_id": f"user-{rng.randrange(senders)}",
+                    "amount": str(amount),
+                    "currency": rng.choice(currencies),
+                    "type": "transfer",
+                    "created_at": (start + timedelta(seconds=i * step)).isoformat(),
+                }
+            ).encode()
+        )
+    return messages
+
+
+async def replay(messages: list) -> tuple:
+    latencies = []
+    outcomes = Counter()
+    score = fraud_consumer.score_fraud_message
+    perf = time.perf_counter_ns
+    started = time.perf_counter()
+    for body in messages:
+        t0 = perf()
+        _, verdict = await score(body)
+        latencies.append(perf() - t0)
+        outcomes[verdict.status.value] += 1
+    return time.perf_counter() - started, latencies, outcomes
+
+
+async def main(args) -> None:
+    print(f"building {args.messages} messages...")
+    messages = synthetic_messages(args.messages, args.senders)
+    # Keep the prebuilt bodies out of the collector's way.
+    gc.collect()
+    gc.freeze()
+
+    if args.redis:
+        from redis.asyncio import Redis
+
+        client = Redis.from_url(args.redis)
+        await client.flushdb()
+        fraud_consumer.engine = fraud.build_engine(client)
+    else:
+        fraud_consumer.engine = fraud.build_engine()
+    engine = fraud_consumer.engine
+    print(
+        f"rules: {', '.join(rule.name for rule in engine.rules)}; "
+        f"windows: {engine.windows}; store: {type(engine.store).__name__}"
+    )
+
+    elapsed, latencies, outcomes = await replay(messages)
+    latencies.sort()
+    us = [n / 1000 for n in latencies]
+    print(
+        f"{len(messages)} messages in {elapsed:.2f}s "
+        f"({len(messages) / elapsed:,.0f} msg/s)\n"
+        f"latency us: mean {statistics.fmean(us):.2f}  "
+        f"p50 {us[len(us) // 2]:.2f}  p99 {us[int(len(us) * 0.99)]:.2f}  "
+        f"max {us[-1]:.2f}\n"
+        f"outcomes: {dict(outcomes)}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--senders", type=int, default=50_000)
+    parser.add_argument("--redis", help="score against Redis windows at this URL")
+    asyncio.run(main(parser.parse_args()))
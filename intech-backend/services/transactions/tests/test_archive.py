@@ -0,0 +1,86 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import insert, select
+
+from app.core.archive import (
+    TransactionArchive,
+    archive_settled_transactions,
+    find_archived_transaction,
+)
+from app.core.ids import uuid7
+from app.models.transaction import (
+    Transaction,
+    TransactionArchiveEntry,
+    TransactionStatus,
+    TransactionType,
+)
+
+pytestmark = pytest.mark.asyncio
+
+
+def _row(created_at, status, amount="10.00"):
+    return {
+        "id": uuid7(created_at),
+        "reference": str(uuid.uuid4()),
+        "sender_user_id": "sender",
+        "recipient_user_id": "recipient",
+        "amount": Decimal(amount),
+        "currency": "NGN",
+        "type": TransactionType.transfer,
+        "status": status,
+        "external_bank": "gtb",
+        "external_reference": "EXT-1",
+        "created_at": created_at,
+        "updated_at": created_at,
+    }
+
+
+async def test_settled_rows_move_to_the_archive_and_stay_readable(
+    session_factory, tmp_path
+):
+    now = datetime.now(timezone.utc)
+    old = now - timedelta(days=200)
+    rows = {
+        "success": _row(old, TransactionStatus.success, "1234.56"),
+        "failed": _row(old + timedelta(hours=1), TransactionStatus.failed),
+        "pending": _row(old, TransactionStatus.pending),
+        "recent": _row(now, TransactionStatus.success),
+    }
+    async with session_factory() as db:
+        await db.execute(insert(Transaction), list(rows.values()))
+        await db.commit()
+
+    archive = TransactionArchive(str(tmp_path / "archive"))
+    async with session_factory() as db:
+        # Batches of one: every archived row in a file of its own.
+        assert await archive_settled_transactions(db, archive, 180, 1) == 2
+
+    archived = {rows["success"]["id"], rows["failed"]["id"]}
+    async with session_factory() as db:
+        index = (await db.execute(select(TransactionArchiveEntry))).scalars().all()
+        live = (await db.execute(select(Transaction.id))).scalars().all()
+    assert {entry.id for entry in index} == archived
+    assert len({entry.location for entry in index}) == 2
+    assert set(live) == {rows["pending"]["id"], rows["recent"]["id"]}
+
+    async with session_factory() as db:
+        found = await find_archived_transaction(db, archive, str(rows["success"]["id"]))
+        assert found["id"] == rows["success"]["id"]
+        assert found["amount"] == Decimal("1234.56")
+        assert found["status"] == "success"
+        assert found["type"] == "transfer"
+        assert found["created_at"] == old
+        assert found["external_reference"] == "EXT-1"
+        # Not archived: the caller reads the live table.
+        assert (
+            await find_archived_transaction(db, archive, str(rows["pending"]["id"]))
+            is None
+        )
+        assert await find_archived_transaction(db, archive, "not-an-id") is None
+
+    # Nothing left to archive.
+    async with session_factory() as db:
+        assert await archive_settled_transactions(db, archive, 180, 1) == 0
@@ -0,0 +1,75 @@
+import time
+from decimal import Decimal
+
+import httpx
+import pytest
+
+from app.connectors import SettlementItem
+from app.connectors.http import BankUnavailable, HttpBankConnector
+from app.connectors.mock_bank import create_mock_bank
+from app.connectors.resilience import CircuitOpenError, DeadlineExceeded
+from app.core.config import settings
+from app.core.metrics import render_bank_metrics
+
+pytestmark = pytest.mark.asyncio
+
+ITEMS = [
+    SettlementItem(f"txn-{i}", "recipient", Decimal("25.00"), "NGN") for i in range(3)
+]
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(settings, "SETTLEMENT_RETRY_BASE_SECONDS", 0.001)
+    monkeypatch.setattr(settings, "SETTLEMENT_RETRY_ATTEMPTS", 3)
+    monkeypatch.setattr(settings, "SETTLEMENT_CIRCUIT_FAILURES", 5)
+
+
+def _connector(bank_app, bank="mockbank", **config):
+    return HttpBankConnector(
+        {bank: {"base_url": "http://bank.test", **config}},
+        transport=httpx.ASGITransport(app=bank_app),
+    )
+
+
+async def test_retries_transient_errors_with_same_idempotency_key():
+    bank = create_mock_bank(fail_first=2, reject={"txn-1"})
+    connector = _connector(bank)
+
+    results = await connector.submit_batch("mockbank", ITEMS, time.monotonic() + 5)
+
+    assert bank.state.requests == 3
+    assert [r.success for r in results] == [True, False, True]
+    assert all(ms is not None and ms <= 5000 for ms in bank.state.deadlines)
+    metrics = render_bank_metrics()
+    assert 'bank_requests_total{bank="mockbank",outcome="http_503"} 2' in metrics
+    assert 'bank_requests_total{bank="mockbank",outcome="ok"} 1' in metrics
+    await connector.close()
+
+
+async def test_circuit_opens_after_repeated_failures():
+    bank = create_mock_bank(failure_rate=1.0)
+    connector = _connector(bank, bank="downbank")
+
+    for _ in range(2):
+        with pytest.raises((BankUnavailable, CircuitOpenError)):
+            await connector.submit_batch("downbank", ITEMS)
+    requests = bank.state.requests
+    with pytest.raises(CircuitOpenError):
+        await connector.submit_batch("downbank", ITEMS)
+
+    assert requests == 5
+    assert bank.state.requests == requests
+    assert 'bank_circuit_state{bank="downbank"} 2' in render_bank_metrics()
+    await connector.close()
+
+
+async def test_slow_bank_is_cut_off_at_the_deadline():
+    connector = _connector(create_mock_bank(latency=1.0), bank="slowbank")
+
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        await connector.submit_batch("slowbank", ITEMS, time.monotonic() + 0.2)
+
+    assert time.monotonic() - started < 0.6
+    await connector.close()
@@ -0,0 +1,141 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import fakeredis
+import orjson
+import pytest
+from sqlalchemy import insert, select
+
+from app.api.v1 import transaction as transaction_api
+from app.core import idempotency
+from app.core.config import settings
+from app.core.ids import uuid7
+from app.models.transaction import (
+    Transaction,
+    TransactionLimit,
+    TransactionStatus,
+    TransactionType,
+)
+from app.schemas.transaction import TransactionBatchCreate
+
+pytestmark = pytest.mark.asyncio
+
+SENDER = {"sub": "sender"}
+
+
+@pytest.fixture
+def published(monkeypatch):
+    messages = []
+
+    async def publish_messages(queue, batch):
+        messages.append((queue, len(batch)))
+
+    async def mark_primary_write(user, *affected):
+        pass
+
+    redis = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(idempotency, "get_redis_or_none", lambda: redis)
+    monkeypatch.setattr(transaction_api, "publish_messages", publish_messages)
+    monkeypatch.setattr(transaction_api, "mark_primary_write", mark_primary_write)
+    return messages
+
+
+def _batch(*amounts):
+    return TransactionBatchCreate(
+        items=[
+            {
+                "recipient_user_id": "recipient",
+                "amount": amount,
+                "currency": "NGN",
+                "type": "transfer",
+            }
+            for amount in amounts
+        ]
+    )
+
+
+async def _submit(session_factory, payload, key=None):
+    async with session_factory() as db:
+        response = await transaction_api.initiate_transaction_batch(
+            payload=payload, db=db, user=SENDER, idempotency_key=key
+        )
+    return response, orjson.loads(response.body)
+
+
+async def _stored(session_factory):
+    async with session_factory() as db:
+        result = await db.execute(
+            select(Transaction.amount).where(Transaction.sender_user_id == "sender")
+        )
+        return sorted(result.scalars().all())
+
+
+async def test_items_over_the_daily_limit_are_rejected_alone(
+    session_factory, published
+):
+    now = datetime.now(timezone.utc)
+    async with session_factory() as db:
+        db.add(TransactionLimit(user_id="sender", daily_limit=Decimal("1000")))
+        # Already spent today; only successful transfers count.
+        await db.execute(
+            insert(Transaction),
+            [
+                {
+                    "id": uuid7(now),
+                    "reference": f"earlier-{status.value}",
+                    "sender_user_id": "sender",
+                    "amount": Decimal("300.00"),
+                    "currency": "NGN",
+                    "type": TransactionType.transfer,
+                    "status": status,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for status in (TransactionStatus.success, TransactionStatus.failed)
+            ],
+        )
+        await db.commit()
+
+    response, body = await _submit(session_factory, _batch("400", "500", "250", "50"))
+
+    assert response.status_code == 201
+    assert (body["accepted"], body["rejected"]) == (3, 1)
+    assert [r["status"] for r in body["results"]] == [
+        "accepted",
+        "rejected",
+        "accepted",
+        "accepted",
+    ]
+    assert [r["index"] for r in body["results"]] == [0, 1, 2, 3]
+    assert body["results"][1]["error"].startswith("Daily transaction limit exceeded")
+    assert "id" not in body["results"][1]
+    assert await _stored(session_factory) == [
+        Decimal("50.00"),
+        Decimal("250.00"),
+        Decimal("300.00"),
+        Decimal("300.00"),
+        Decimal("400.00"),
+    ]
+    # Fraud checks and audit entries for the accepted items only.
+    assert published == [
+        (settings.RABBITMQ_QUEUE_FRAUD, 3),
+        (settings.RABBITMQ_QUEUE_AUDIT, 3),
+    ]
+
+
+async def test_batch_replayed_with_its_key_is_not_inserted_again(
+    session_factory, published
+):
+    payload = _batch("10", "20")
+    first, body = await _submit(session_factory, payload, key="batch-1")
+    replay, replayed = await _submit(session_factory, payload, key="batch-1")
+
+    assert replay.status_code == 201
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replayed == body
+    assert await _stored(session_factory) == [Decimal("10.00"), Decimal("20.00")]
+    assert len(published) == 2
+
+    # Another key is another batch.
+    await _submit(session_factory, payload, key="batch-2")
+    assert len(await _stored(session_factory)) == 4
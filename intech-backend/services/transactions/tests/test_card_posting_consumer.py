@@ -0,0 +1,88 @@
+import uuid
+from datetime import datetime, timezone
+
+import orjson
+import pytest
+from sqlalchemy import select
+
+from app.consumers import card_posting_consumer
+from app.models.transaction import Transaction, TransactionStatus, TransactionType
+
+pytestmark = pytest.mark.asyncio
+
+
+class FakeMessage:
+    def __init__(self, body):
+        self.body = body
+        self.outcome = None
+
+    async def ack(self):
+        self.outcome = "ack"
+
+    async def nack(self, requeue=True):
+        self.outcome = "requeue" if requeue else "drop"
+
+    async def reject(self, requeue=False):
+        self.outcome = "requeue" if requeue else "drop"
+
+
+@pytest.fixture
+def published(session_factory, monkeypatch):
+    messages = []
+
+    async def get_db():
+        async with session_factory() as db:
+            yield db
+
+    async def publish_message(queue, message):
+        messages.append((queue, message))
+
+    monkeypatch.setattr(card_posting_consumer, "get_db", get_db)
+    monkeypatch.setattr(card_posting_consumer, "publish_message", publish_message)
+    return messages
+
+
+def _posting(**overrides):
+    posting = {
+        "posting_id": str(uuid.uuid4()),
+        "account_external_id": "acct-1",
+        "owner_user_id": "owner-1",
+        "currency": "NGN",
+        "amount": "125.50",
+        "captures": 3,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+    posting.update(overrides)
+    return posting
+
+
+async def test_posting_is_recorded_once_as_a_withdrawal(session_factory, published):
+    posting = _posting()
+    for _ in range(2):
+        message = FakeMessage(orjson.dumps(posting))
+        await card_posting_consumer.handle_card_posting_message(message)
+        assert message.outcome == "ack"
+
+    async with session_factory() as db:
+        rows = (await db.execute(select(Transaction))).scalars().all()
+    assert len(rows) == 1
+    txn = rows[0]
+    assert str(txn.id) == posting["posting_id"]
+    assert txn.reference == f"card:{posting['posting_id']}"
+    assert txn.sender_user_id == "owner-1"
+    assert txn.type == TransactionType.withdrawal
+    assert txn.status == TransactionStatus.success
+    assert str(txn.amount) == "125.50"
+    # Audited once, for the delivery that recorded it.
+    assert len(published) == 1
+
+
+async def test_malformed_posting_is_dropped(session_factory, published):
+    message = FakeMessage(orjson.dumps(_posting(amount="lots")))
+    await card_posting_consumer.handle_card_posting_message(message)
+    assert message.outcome == "drop"
+
+    message = FakeMessage(b"not json")
+    await card_posting_consumer.handle_card_posting_message(message)
+    assert message.outcome == "drop"
+    assert published == []
@@ -0,0 +1,46 @@
+from app.core.config import settings
+from app.core.fraud import DEFAULT_RULES, FraudEngine, compile_rules, parse_transfer
+from app.models.transaction import TransactionStatus
+
+
+def engine():
+    return FraudEngine(
+        compile_rules(DEFAULT_RULES),
+        settings.FRAUD_REVIEW_SCORE,
+        settings.FRAUD_BLOCK_SCORE,
+    )
+
+
+def transfer(amount, recipient="recipient-1", currency="NGN"):
+    return parse_transfer(
+        {
+            "transaction_id": "txn-1",
+            "sender_user_id": "sender-1",
+            "recipient_user_id": recipient,
+            "amount": amount,
+            "currency": currency,
+            "type": "transfer",
+            "created_at": "2026-01-05T12:00:00+00:00",
+        }
+    )
+
+
+def test_large_transfer_alone_is_held_for_review_not_failed():
+    fraud = engine()
+    # Known recipient, so only the amount rule can fire.
+    fraud.score(transfer(10))
+
+    verdict = fraud.score(transfer(1_500_000))
+    assert verdict.status == TransactionStatus.pending
+    assert verdict.score == settings.FRAUD_REVIEW_SCORE
+    assert [reason.split(":")[0] for reason in verdict.reasons] == ["amount"]
+
+    assert fraud.score(transfer(500)).status == TransactionStatus.success
+
+
+def test_rules_add_up_to_a_block():
+    fraud = engine()
+    # Large, to a new recipient and in an unlisted currency.
+    verdict = fraud.score(transfer(1_500_000, recipient="stranger", currency="XYZ"))
+    assert verdict.status == TransactionStatus.failed
+    assert verdict.score >= settings.FRAUD_BLOCK_SCORE
@@ -0,0 +1,105 @@
+import contextlib
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import orjson
+import pytest
+from sqlalchemy import insert, select
+
+from app.consumers import fraud_consumer
+from app.core.config import settings
+from app.core.fraud_features import ProfileCache
+from app.core.ids import uuid7
+from app.core.transaction import fraud_message
+from app.models.transaction import Transaction, TransactionStatus, TransactionType
+
+pytestmark = pytest.mark.asyncio
+
+
+class FakeMessage:
+    def __init__(self, body):
+        self.body = body
+
+    @contextlib.asynccontextmanager
+    async def process(self):
+        yield
+
+
+@pytest.fixture
+def published(session_factory, monkeypatch):
+    messages = []
+
+    async def get_db():
+        async with session_factory() as db:
+            yield db
+
+    async def publish_message(queue, message):
+        messages.append((queue, message))
+
+    monkeypatch.setattr(fraud_consumer, "get_db", get_db)
+    monkeypatch.setattr(fraud_consumer, "publish_message", publish_message)
+    monkeypatch.setattr(
+        fraud_consumer.engine, "profiles", ProfileCache(session_factory, 10, 60)
+    )
+    return messages
+
+
+async def _transaction(session_factory, amount, external_bank, status):
+    now = datetime.now(timezone.utc)
+    row = {
+        "id": uuid7(now),
+        "reference": str(uuid.uuid4()),
+        "sender_user_id": "sender",
+        "recipient_user_id": "recipient",
+        "amount": Decimal(amount),
+        "currency": "NGN",
+        "type": TransactionType.transfer,
+        "status": status,
+        "external_bank": external_bank,
+        "created_at": now,
+        "updated_at": now,
+    }
+    async with session_factory() as db:
+        await db.execute(insert(Transaction), [row])
+        await db.commit()
+    return row
+
+
+async def _status(session_factory, row):
+    async with session_factory() as db:
+        return await db.scalar(
+            select(Transaction.status).where(Transaction.id == row["id"])
+        )
+
+
+async def _check(row):
+    await fraud_consumer.handle_fraud_message(
+        FakeMessage(orjson.dumps(fraud_message(row)))
+    )
+
+
+async def test_cleared_external_transfer_is_sent_to_settlement_still_pending(
+    session_factory, published
+):
+    external = await _transaction(session_factory, "25.00", "gtb", "pending")
+    internal = await _transaction(session_factory, "25.00", None, "pending")
+    await _check(external)
+    await _check(internal)
+
+    assert await _status(session_factory, external) == TransactionStatus.pending
+    assert await _status(session_factory, internal) == TransactionStatus.success
+    assert [(queue, m["transaction_id"]) for queue, m in published] == [
+        (settings.RABBITMQ_QUEUE_SETTLEMENT, str(external["id"]))
+    ]
+
+
+async def test_held_or_decided_transfers_are_not_settled(session_factory, published):
+    held = await _transaction(session_factory, "1500000.00", "gtb", "pending")
+    settled = await _transaction(session_factory, "25.00", "gtb", "success")
+    await _check(held)
+    await _check(settled)
+
+    assert await _status(session_factory, held) == TransactionStatus.pending
+    assert await _status(session_factory, settled) == TransactionStatus.success
+    assert published == []
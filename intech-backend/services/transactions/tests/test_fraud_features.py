@@ -0,0 +1,165 @@
+import random
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import pytest
+
+from app.core.fraud_features import (
+    DAY,
+    FeatureAggregator,
+    ProfileCache,
+    feature_rows,
+)
+from app.models.transaction import UserFraudFeatures
+
+AS_OF = datetime(2026, 1, 31, tzinfo=timezone.utc).timestamp()
+
+
+def _rows(seed=7, senders=12, count=300):
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(count):
+        # Few senders and recipients, so pairs repeat and straddle chunks.
+        sender = f"s{rng.randrange(senders):02d}"
+        recipient = rng.choice(["r1", "r2", "r3", "r4", None])
+        amount = round(rng.uniform(1, 5000), 2)
+        epoch = AS_OF - rng.uniform(0, 30 * DAY)
+        rows.append((sender, recipient, amount, epoch))
+    # The order the worker's query returns: NULL recipients last.
+    rows.sort(key=lambda row: (row[0], row[1] is None, row[1] or ""))
+    return rows
+
+
+def _naive(rows):
+    by_sender = defaultdict(list)
+    for row in rows:
+        by_sender[row[0]].append(row)
+    expected = {}
+    for sender, txns in by_sender.items():
+        amounts = [amount for _, _, amount, _ in txns]
+        hours = [0] * 24
+        for _, _, _, epoch in txns:
+            hours[int(epoch // 3600) % 24] += 1
+        recent = [(amount, AS_OF - epoch) for _, _, amount, epoch in txns]
+        expected[sender] = {
+            "txn_count": len(txns),
+            "amount_sum": sum(amounts),
+            "amount_max": max(amounts),
+            "count_1d": sum(age <= DAY for _, age in recent),
+            "amount_1d": sum(amount for amount, age in recent if age <= DAY),
+            "count_7d": sum(age <= 7 * DAY for _, age in recent),
+            "amount_7d": sum(amount for amount, age in recent if age <= 7 * DAY),
+            "distinct_recipients": len({r for _, r, _, _ in txns if r is not None}),
+            "hour_histogram": hours,
+        }
+    return expected
+
+
+def _aggregate(rows, chunk_rows):
+    aggregator = FeatureAggregator(AS_OF)
+    computed_at = datetime.now(timezone.utc)
+    found = []
+    blocks = [
+        aggregator.feed(rows[i : i + chunk_rows])
+        for i in range(0, len(rows), chunk_rows)
+    ]
+    blocks.append(aggregator.finish())
+    for block in blocks:
+        if block is not None:
+            found.extend(feature_rows(block, computed_at))
+    return found
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 2, 5, 17, 64, 1000])
+def test_chunked_features_match_a_single_pass(chunk_rows):
+    rows = _rows()
+    expected = _naive(rows)
+
+    found = _aggregate(rows, chunk_rows)
+    # Each sender once, however many chunks it spanned.
+    assert [row["user_id"] for row in found] == sorted(expected)
+    for row in found:
+        want = expected[row["user_id"]]
+        for name, value in want.items():
+            assert row[name] == pytest.approx(value), (row["user_id"], name)
+        assert row["amount_mean"] == pytest.approx(
+            want["amount_sum"] / want["txn_count"]
+        )
+
+
+def test_recipient_split_between_chunks_is_counted_once():
+    rows = [
+        ("s1", "r1", 10.0, AS_OF),
+        ("s1", "r2", 20.0, AS_OF),
+        ("s1", "r2", 30.0, AS_OF),
+        ("s1", "r2", 40.0, AS_OF),
+        ("s1", None, 50.0, AS_OF),
+        ("s2", None, 60.0, AS_OF),
+    ]
+    for chunk_rows in range(1, len(rows) + 1):
+        found = {row["user_id"]: row for row in _aggregate(rows, chunk_rows)}
+        assert found["s1"]["distinct_recipients"] == 2, chunk_rows
+        assert found["s1"]["txn_count"] == 5
+        assert found["s1"]["amount_max"] == 50.0
+        assert found["s2"]["distinct_recipients"] == 0
+
+
+class CountingSessions:
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+        self.opened = 0
+
+    def __call__(self):
+        self.opened += 1
+        return self.session_factory()
+
+
+@pytest.mark.asyncio
+async def test_profile_cache_is_bounded_and_expires(session_factory):
+    computed_at = datetime.now(timezone.utc)
+    hours = [0] * 24
+    hours[9] = 3
+    hours[21] = 1
+    async with session_factory() as db:
+        for user_id in ("u1", "u2", "u3"):
+            db.add(
+                UserFraudFeatures(
+                    user_id=user_id,
+                    txn_count=4,
+                    amount_sum=400.0,
+                    amount_mean=100.0,
+                    amount_std=5.0,
+                    amount_max=110.0,
+                    count_1d=1,
+                    amount_1d=100.0,
+                    count_7d=2,
+                    amount_7d=200.0,
+                    distinct_recipients=2,
+                    hour_histogram=hours,
+                    computed_at=computed_at,
+                )
+            )
+        await db.commit()
+
+    sessions = CountingSessions(session_factory)
+    cache = ProfileCache(sessions, max_size=2, ttl_seconds=60)
+    profile = await cache.get("u1")
+    assert profile.txn_count == 4
+    assert profile.hour_share[9] == 0.75
+    # Senders with no features are remembered too.
+    assert await cache.get("nobody") is None
+    await cache.get("u1")
+    await cache.get("nobody")
+    assert sessions.opened == 2
+
+    # u1 was used last, so loading u2 evicts "nobody".
+    await cache.get("u1")
+    await cache.get("u2")
+    assert list(cache._entries) == ["u1", "u2"]
+    await cache.get("nobody")
+    assert sessions.opened == 4
+
+    expiring = ProfileCache(sessions, max_size=2, ttl_seconds=0)
+    await expiring.get("u3")
+    await expiring.get("u3")
+    assert sessions.opened == 6
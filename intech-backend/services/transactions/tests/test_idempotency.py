@@ -0,0 +1,118 @@
+import asyncio
+
+import fakeredis
+import orjson
+import pytest
+from fastapi import HTTPException
+
+from app.core import idempotency
+from app.core.config import settings
+from app.core.idempotency import IdempotentRequest
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(idempotency, "get_redis_or_none", lambda: client)
+    return client
+
+
+def request(body=b'{"amount": "10.00"}', key="key-1"):
+    return IdempotentRequest("transactions", "user-1", key, body)
+
+
+async def test_completed_request_is_replayed(redis):
+    first = request()
+    assert await first.begin() is None
+    assert await first.complete(201, b'{"id": "txn-1"}')
+
+    replay = await request().begin()
+    assert replay.status_code == 201
+    assert replay.body == b'{"id": "txn-1"}'
+    assert replay.headers["Idempotent-Replayed"] == "true"
+
+
+async def test_concurrent_duplicate_waits_for_the_original(redis):
+    first = request()
+    assert await first.begin() is None
+    duplicate = asyncio.create_task(request().begin())
+    await asyncio.sleep(0.05)
+    assert not duplicate.done()
+
+    await first.complete(201, b'{"id": "txn-1"}')
+    replay = await duplicate
+    assert replay.body == b'{"id": "txn-1"}'
+
+
+async def test_key_reused_with_another_body_is_rejected(redis):
+    assert await request().begin() is None
+    with pytest.raises(HTTPException) as exc:
+        await request(body=b'{"amount": "99.00"}').begin()
+    assert exc.value.status_code == 422
+
+
+async def test_fails_closed_without_redis(monkeypatch):
+    monkeypatch.setattr(idempotency, "get_redis_or_none", lambda: None)
+    with pytest.raises(HTTPException) as exc:
+        request()
+    assert exc.value.status_code == 503
+
+    server = fakeredis.FakeServer()
+    server.connected = False
+    client = fakeredis.FakeAsyncRedis(server=server)
+    monkeypatch.setattr(idempotency, "get_redis_or_none", lambda: client)
+    with pytest.raises(HTTPException) as exc:
+        await request().begin()
+    assert exc.value.status_code == 503
+
+
+async def test_slow_request_keeps_its_claim(redis, monkeypatch):
+    monkeypatch.setattr(settings, "IDEMPOTENCY_LOCK_SECONDS", 1)
+    monkeypatch.setattr(settings, "IDEMPOTENCY_WAIT_SECONDS", 0.1)
+    first = request()
+    assert await first.begin() is None
+    # Past the lock's TTL; only the refresh keeps the claim.
+    await asyncio.sleep(1.5)
+
+    with pytest.raises(HTTPException) as exc:
+        await request().begin()
+    assert exc.value.status_code == 409
+    assert await first.complete(201, b'{"id": "txn-1"}')
+    assert (await request().begin()).body == b'{"id": "txn-1"}'
+
+
+class FailingStore:
+    """Redis whose every attempt to store a response fails."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    async def eval(self, script, *args):
+        if script == idempotency._COMPLETE_SCRIPT:
+            raise ConnectionError("redis went away")
+        return await self.client.eval(script, *args)
+
+
+async def test_unstored_response_holds_the_claim_and_fails(redis, monkeypatch):
+    monkeypatch.setattr(settings, "IDEMPOTENCY_STORE_ATTEMPTS", 2)
+    monkeypatch.setattr(settings, "IDEMPOTENCY_WAIT_SECONDS", 0.1)
+    first = request()
+    first._client = FailingStore(redis)
+    assert await first.begin() is None
+    assert not await first.complete(201, b'{"id": "txn-1"}')
+
+    # Still claimed, now for as long as a response would be kept: a retry
+    # is refused rather than posting a second transaction.
+    assert orjson.loads(await redis.get(first.redis_key))["state"] == "in_flight"
+    assert await redis.ttl(first.redis_key) > settings.IDEMPOTENCY_LOCK_SECONDS
+    with pytest.raises(HTTPException) as exc:
+        await request().begin()
+    assert exc.value.status_code == 409
+    with pytest.raises(HTTPException) as exc:
+        idempotency.raise_unstored_response()
+    assert exc.value.status_code == 503
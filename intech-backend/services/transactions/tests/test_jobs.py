@@ -0,0 +1,165 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core import jobs
+from app.core.config import settings
+from app.core.jobs import JobWorkerPool, _process_chunk, spool_path
+from app.db.db import Base
+from app.models.transaction import (
+    Transaction,
+    TransactionJob,
+    TransactionJobStatus,
+    TransactionLimit,
+    TransactionStatus,
+)
+
+pytestmark = pytest.mark.asyncio
+
+ROWS = [
+    "recipient_user_id,amount,currency,type\n",
+    "r1,10.00,NGN,transfer\n",
+    "r2,20.00,NGN,transfer\n",
+    "r3,30.00,NGN,transfer\n",
+    "r4,40.00,NGN,transfer\n",
+]
+
+
+@pytest_asyncio.fixture
+async def file_session_factory(tmp_path):
+    # The worker and the test's polling read through separate connections;
+    # the shared in-memory database would roll back each other's work.
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'jobs.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+async def _no_publish(queue, messages):
+    return None
+
+
+async def _wait_for(condition, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not await condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.02)
+
+
+async def test_interrupted_job_is_resumed_once_stale(
+    file_session_factory, tmp_path, monkeypatch
+):
+    session_factory = file_session_factory
+    monkeypatch.setattr(settings, "JOB_SPOOL_DIR", str(tmp_path))
+    monkeypatch.setattr(jobs, "publish_messages", _no_publish)
+
+    # A job whose process died after committing its first two rows: it was
+    # updated moments ago, as after a quick restart.
+    job_id = uuid.uuid4()
+    content = "".join(ROWS).encode()
+    with open(spool_path(job_id), "wb") as f:
+        f.write(content)
+    async with session_factory() as db:
+        db.add(
+            TransactionJob(
+                id=job_id,
+                user_id="sender",
+                format="csv",
+                status=TransactionJobStatus.running,
+                total_bytes=len(content),
+                processed_bytes=len("".join(ROWS[:3]).encode()),
+                processed_rows=2,
+                accepted_rows=2,
+                accepted_amount=30,
+                updated_at=datetime.now(timezone.utc),
+            )
+        )
+        await db.commit()
+
+    async def job():
+        async with session_factory() as db:
+            return await db.get(TransactionJob, job_id, populate_existing=True)
+
+    pool = JobWorkerPool(session_factory)
+    await pool.start(workers=1, chunk_size=10, sweep_interval=0.05)
+    try:
+        # Not stale yet: still presumed to belong to a live worker.
+        await asyncio.sleep(0.3)
+        assert (await job()).status == TransactionJobStatus.running
+
+        # Its heartbeat stopped long enough ago; a later sweep resumes it.
+        async with session_factory() as db:
+            await db.execute(
+                update(TransactionJob)
+                .where(TransactionJob.id == job_id)
+                .values(
+                    updated_at=datetime.now(timezone.utc)
+                    - timedelta(seconds=settings.JOB_STALE_SECONDS + 1)
+                )
+            )
+            await db.commit()
+
+        async def completed():
+            return (await job()).status == TransactionJobStatus.completed
+
+        await _wait_for(completed)
+    finally:
+        await pool.stop()
+
+    finished = await job()
+    assert finished.processed_rows == 4
+    assert finished.accepted_rows == 4
+    async with session_factory() as db:
+        recipients = (
+            await db.execute(
+                select(Transaction.recipient_user_id).order_by(
+                    Transaction.recipient_user_id
+                )
+            )
+        ).scalars()
+        # Only the rows after the recorded offset were submitted.
+        assert list(recipients) == ["r3", "r4"]
+        count = await db.scalar(select(func.count()).select_from(Transaction))
+    assert count == 2
+
+
+def _rows(*amounts):
+    return [
+        {
+            "recipient_user_id": f"r{i}",
+            "amount": amount,
+            "currency": "NGN",
+            "type": "transfer",
+        }
+        for i, amount in enumerate(amounts)
+    ]
+
+
+async def test_cleared_chunks_count_once_against_the_daily_limit(session_factory):
+    async with session_factory() as db:
+        db.add(TransactionLimit(user_id="sender", daily_limit=100))
+        job = TransactionJob(user_id="sender", format="csv", total_bytes=1)
+        db.add(job)
+        await db.commit()
+
+        first = await _process_chunk(db, job, _rows("10.00", "20.00"), 1)
+        # The fraud consumer clears the first chunk: now counted as spent.
+        await db.execute(
+            update(Transaction)
+            .where(Transaction.id == first[0]["id"])
+            .values(status=TransactionStatus.success)
+        )
+        await db.commit()
+
+        # 30 spent or pending, so 70 still fit and 71 do not.
+        second = await _process_chunk(db, job, _rows("30.00", "40.00", "1.00"), 2)
+
+    assert [txn["amount"] for txn in second] == [30, 40]
+    assert job.accepted_rows == 4
+    assert job.rejected_rows == 1
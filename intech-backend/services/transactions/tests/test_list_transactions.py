@@ -0,0 +1,73 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import orjson
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import insert
+
+from app.api.v1.transaction import list_transactions
+from app.core.ids import uuid7
+from app.models.transaction import Transaction, TransactionStatus, TransactionType
+
+pytestmark = pytest.mark.asyncio
+
+
+async def _insert(db, created_at, count):
+    rows = [
+        {
+            "id": uuid7(created_at),
+            "reference": str(uuid.uuid4()),
+            "sender_user_id": "sender",
+            "recipient_user_id": "recipient",
+            "amount": Decimal("10.00"),
+            "currency": "NGN",
+            "type": TransactionType.transfer,
+            "status": TransactionStatus.pending,
+            "created_at": created_at,
+            "updated_at": created_at,
+        }
+        for _ in range(count)
+    ]
+    await db.execute(insert(Transaction), rows)
+    await db.commit()
+    return [str(row["id"]) for row in rows]
+
+
+async def _page(db, cursor=None, limit=2):
+    response = await list_transactions(
+        db=db,
+        user={"sub": "sender"},
+        type=None,
+        status=None,
+        since=None,
+        before=None,
+        cursor=cursor,
+        limit=limit,
+    )
+    ids = [txn["id"] for txn in orjson.loads(response.body)]
+    return ids, response.headers.get("X-Next-Cursor")
+
+
+async def test_pages_through_a_batch_sharing_one_created_at(session_factory):
+    now = datetime.now(timezone.utc)
+    async with session_factory() as db:
+        older = await _insert(db, now - timedelta(minutes=1), 2)
+        # As create_transactions_bulk writes them: one created_at for all.
+        batch = await _insert(db, now, 5)
+
+        seen, cursor = [], None
+        while True:
+            ids, cursor = await _page(db, cursor)
+            seen += ids
+            if cursor is None:
+                break
+
+        assert len(seen) == len(set(seen)) == 7
+        assert set(seen[:5]) == set(batch)
+        assert set(seen[5:]) == set(older)
+
+        with pytest.raises(HTTPException) as exc:
+            await _page(db, cursor="not-a-cursor")
+        assert exc.value.status_code == 400
@@ -0,0 +1,83 @@
+import fakeredis
+import pytest
+
+from app.db import replica
+from app.db.replica import ReplicaLagMonitor, WriteStickiness
+
+pytestmark = pytest.mark.asyncio
+
+
+class FakeConnection:
+    def __init__(self, engine):
+        self.engine = engine
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def scalar(self, statement):
+        self.engine.checks += 1
+        if isinstance(self.engine.lag, Exception):
+            raise self.engine.lag
+        return self.engine.lag
+
+
+class FakeEngine:
+    def __init__(self, lag):
+        self.lag = lag
+        self.checks = 0
+
+    def connect(self):
+        return FakeConnection(self)
+
+
+async def test_lag_is_checked_once_per_interval_and_errors_read_as_unhealthy():
+    engine = FakeEngine(lag=1.0)
+    monitor = ReplicaLagMonitor(engine, max_lag=5, interval=60)
+    assert await monitor.is_healthy()
+    engine.lag = 30.0
+    assert await monitor.is_healthy()
+    assert engine.checks == 1
+
+    monitor = ReplicaLagMonitor(engine, max_lag=5, interval=0)
+    assert not await monitor.is_healthy()
+    engine.lag = RuntimeError("replica down")
+    assert not await monitor.is_healthy()
+    engine.lag = 0.0
+    assert await monitor.is_healthy()
+
+
+async def test_stickiness_without_redis_is_per_process_and_expires(monkeypatch):
+    monkeypatch.setattr(replica, "get_redis_or_none", lambda: None)
+    sticky = WriteStickiness(ttl=60)
+    await sticky.mark("user-1")
+    assert await sticky.is_sticky("user-1")
+    assert not await sticky.is_sticky("user-2")
+    assert not await sticky.is_sticky(None)
+
+    expired = WriteStickiness(ttl=-1)
+    await expired.mark("user-1")
+    assert not await expired.is_sticky("user-1")
+
+
+async def test_superuser_change_pins_the_owners_reads_too(monkeypatch):
+    redis = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(replica, "get_redis_or_none", lambda: redis)
+    monkeypatch.setattr(replica, "stickiness", WriteStickiness(ttl=60))
+
+    await replica.mark_primary_write({"sub": "admin"}, "sender", None)
+    assert await replica.stickiness.is_sticky("admin")
+    assert await replica.stickiness.is_sticky("sender")
+    assert not await replica.stickiness.is_sticky("someone-else")
+
+    # Without the shared marker a recent write cannot be ruled out.
+    await redis.aclose()
+    monkeypatch.setattr(replica, "get_redis_or_none", lambda: BrokenRedis())
+    assert await replica.stickiness.is_sticky("someone-else")
+
+
+class BrokenRedis:
+    async def exists(self, key):
+        raise ConnectionError("redis down")
@@ -0,0 +1,292 @@
+import asyncio
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import httpx
+import pytest
+from sqlalchemy import insert, select, update
+
+from app.connectors import SettlementItem
+from app.connectors.fake import FakeBankConnector
+from app.connectors.http import HttpBankConnector
+from app.connectors.mock_bank import create_mock_bank
+from app.core.config import settings
+from app.core.ids import uuid7
+from app.core.settlement import PendingSettlement, SettlementBatcher
+from app.models.transaction import Transaction, TransactionStatus, TransactionType
+
+pytestmark = pytest.mark.asyncio
+
+
+class FakeDelivery:
+    def __init__(self):
+        self.acked = False
+        self.requeued = False
+
+    async def ack(self):
+        self.acked = True
+
+    async def nack(self, requeue=True):
+        self.requeued = requeue
+
+
+async def _pending(session_factory, count, bank):
+    now = datetime.now(timezone.utc)
+    rows = [
+        {
+            "id": uuid7(now),
+            "reference": str(uuid.uuid4()),
+            "sender_user_id": "sender",
+            "recipient_user_id": "recipient",
+            "amount": Decimal("10.00"),
+            "currency": "NGN",
+            "type": TransactionType.transfer,
+            "status": TransactionStatus.pending,
+            "external_bank": bank,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for _ in range(count)
+    ]
+    async with session_factory() as db:
+        await db.execute(insert(Transaction), rows)
+        await db.commit()
+    return [
+        PendingSettlement(
+            SettlementItem(str(row["id"]), "recipient", row["amount"], "NGN"),
+            now,
+            FakeDelivery(),
+        )
+        for row in rows
+    ]
+
+
+async def _statuses(session_factory):
+    async with session_factory() as db:
+        result = await db.execute(
+            select(Transaction.id, Transaction.status, Transaction.external_reference)
+        )
+        return {str(row.id): (row.status, row.external_reference) for row in result}
+
+
+async def test_batches_per_bank_and_records_results(session_factory):
+    gtb = await _pending(session_factory, 3, "gtb")
+    zenith = await _pending(session_factory, 2, "zenith")
+    connector = FakeBankConnector(reject={zenith[0].item.transaction_id})
+    batcher = SettlementBatcher(
+        connector, session_factory, max_batch=3, window_seconds=0.05
+    )
+
+    for pending in gtb:
+        batcher.add("gtb", pending)
+    for pending in zenith:
+        batcher.add("zenith", pending)
+    await asyncio.sleep(0.1)
+    await batcher.close()
+
+    # gtb filled a batch; zenith was flushed by its window.
+    assert [len(b) for b in connector.batches["gtb"]] == [3]
+    assert [len(b) for b in connector.batches["zenith"]] == [2]
+    assert all(p.message.acked for p in gtb + zenith)
+
+    statuses = await _statuses(session_factory)
+    for pending in gtb + zenith[1:]:
+        status, reference = statuses[pending.item.transaction_id]
+        assert status == TransactionStatus.success
+        assert reference
+    assert statuses[zenith[0].item.transaction_id][0] == TransactionStatus.failed
+
+
+async def test_failed_batch_is_requeued_not_acked(session_factory):
+    batch = await _pending(session_factory, 2, "gtb")
+    batcher = SettlementBatcher(
+        FakeBankConnector(down={"gtb"}),
+        session_factory,
+        max_batch=10,
+        window_seconds=60,
+    )
+
+    for pending in batch:
+        batcher.add("gtb", pending)
+    await batcher.close()
+
+    assert all(p.message.requeued and not p.message.acked for p in batch)
+    statuses = await _statuses(session_factory)
+    assert {s for s, _ in statuses.values()} == {TransactionStatus.pending}
+
+
+def _failing_writes(session_factory, failures):
+    """
+    Session factory for one batch: the status check before submitting gets
+    a session, the next `failures` sessions cannot be opened.
+    """
+    calls = []
+
+    def factory():
+        calls.append(1)
+        if 1 < len(calls) <= failures + 1:
+            raise ConnectionError("database unavailable")
+        return session_factory()
+
+    return factory
+
+
+async def test_settled_batch_is_never_resubmitted(session_factory):
+    batch = await _pending(session_factory, 2, "gtb")
+    connector = FakeBankConnector()
+    batcher = SettlementBatcher(
+        connector,
+        _failing_writes(session_factory, 1),
+        max_batch=2,
+        window_seconds=60,
+        record_attempts=2,
+    )
+    for pending in batch:
+        batcher.add("gtb", pending)
+    await batcher.close()
+
+    # The second write succeeded; the bank saw the batch once.
+    assert len(connector.batches["gtb"]) == 1
+    assert all(p.message.acked and not p.message.requeued for p in batch)
+    statuses = await _statuses(session_factory)
+    assert {s for s, _ in statuses.values()} == {TransactionStatus.success}
+
+    # With the database down throughout, the transfers stay pending but
+    # are still not handed back to the bank.
+    batch = await _pending(session_factory, 2, "gtb")
+    batcher._session_factory = _failing_writes(session_factory, 2)
+    for pending in batch:
+        batcher.add("gtb", pending)
+    await batcher.close()
+
+    assert len(connector.batches["gtb"]) == 2
+    assert all(p.message.acked and not p.message.requeued for p in batch)
+    statuses = await _statuses(session_factory)
+    assert statuses[batch[0].item.transaction_id][0] == TransactionStatus.pending
+
+
+async def test_batch_refused_by_the_bank_fails_instead_of_requeueing(
+    session_factory,
+):
+    requests = []
+
+    def refuse(request):
+        requests.append(request)
+        return httpx.Response(400, json={"detail": "unknown account format"})
+
+    connector = HttpBankConnector(
+        {"gtb": {"base_url": "http://bank.test"}},
+        transport=httpx.MockTransport(refuse),
+    )
+    batcher = SettlementBatcher(
+        connector, session_factory, max_batch=10, window_seconds=60
+    )
+    refused = await _pending(session_factory, 2, "gtb")
+    unconfigured = await _pending(session_factory, 1, "nobank")
+    for pending in refused:
+        batcher.add("gtb", pending)
+    for pending in unconfigured:
+        batcher.add("nobank", pending)
+    await batcher.close()
+    await connector.close()
+
+    assert len(requests) == 1
+    assert all(p.message.acked and not p.message.requeued for p in refused)
+    assert unconfigured[0].message.acked and not unconfigured[0].message.requeued
+    statuses = await _statuses(session_factory)
+    assert {s for s, _ in statuses.values()} == {TransactionStatus.failed}
+
+
+class LosingFirstResponse(httpx.ASGITransport):
+    """The bank acts on the first request, but its answer never arrives."""
+
+    def __init__(self, app):
+        super().__init__(app=app)
+        self.lost = False
+
+    async def handle_async_request(self, request):
+        response = await super().handle_async_request(request)
+        if not self.lost:
+            self.lost = True
+            raise httpx.ReadError("connection reset")
+        return response
+
+
+async def test_regrouped_redelivery_is_not_paid_twice(session_factory, monkeypatch):
+    monkeypatch.setattr(settings, "SETTLEMENT_RETRY_ATTEMPTS", 1)
+    bank = create_mock_bank()
+    connector = HttpBankConnector(
+        {"gtb": {"base_url": "http://bank.test"}},
+        transport=LosingFirstResponse(bank),
+    )
+    batcher = SettlementBatcher(
+        connector, session_factory, max_batch=10, window_seconds=60
+    )
+    first = await _pending(session_factory, 2, "gtb")
+    for pending in first:
+        batcher.add("gtb", pending)
+    await batcher.close()
+    assert all(p.message.requeued and not p.message.acked for p in first)
+    assert len(bank.state.payments) == 2
+
+    # Redelivered next to a new transfer: another batch, another batch_id.
+    later = await _pending(session_factory, 1, "gtb")
+    redelivered = [p._replace(message=FakeDelivery()) for p in first]
+    for pending in redelivered + later:
+        batcher.add("gtb", pending)
+    await batcher.close()
+    await connector.close()
+
+    assert sorted(bank.state.payments) == sorted(
+        p.item.transaction_id for p in first + later
+    )
+    assert all(p.message.acked for p in redelivered + later)
+    statuses = await _statuses(session_factory)
+    assert {s for s, _ in statuses.values()} == {TransactionStatus.success}
+
+
+async def _set_status(session_factory, txn_id, status):
+    async with session_factory() as db:
+        await db.execute(
+            update(Transaction)
+            .where(Transaction.id == uuid.UUID(txn_id))
+            .values(status=status)
+        )
+        await db.commit()
+
+
+class DecidedDuringSubmit(FakeBankConnector):
+    """Fails one transfer in the database while its batch is at the bank."""
+
+    def __init__(self, session_factory, txn_id):
+        super().__init__()
+        self.session_factory = session_factory
+        self.txn_id = txn_id
+
+    async def submit_batch(self, bank, items, deadline=None):
+        await _set_status(self.session_factory, self.txn_id, TransactionStatus.failed)
+        return await super().submit_batch(bank, items, deadline)
+
+
+async def test_only_pending_transfers_are_paid_or_overwritten(session_factory):
+    batch = await _pending(session_factory, 3, "gtb")
+    failed, decided, cleared = (p.item.transaction_id for p in batch)
+    await _set_status(session_factory, failed, TransactionStatus.failed)
+    connector = DecidedDuringSubmit(session_factory, decided)
+    batcher = SettlementBatcher(
+        connector, session_factory, max_batch=10, window_seconds=60
+    )
+    for pending in batch:
+        batcher.add("gtb", pending)
+    await batcher.close()
+
+    # The transfer fraud had failed never reached the bank.
+    assert [[i.transaction_id for i in b] for b in connector.batches["gtb"]] == [
+        [decided, cleared]
+    ]
+    assert all(p.message.acked and not p.message.requeued for p in batch)
+    statuses = await _statuses(session_factory)
+    assert statuses[failed][0] == TransactionStatus.failed
+    assert statuses[decided][0] == TransactionStatus.failed
+    assert statuses[cleared][0] == TransactionStatus.success